@@ -1,7 +1,9 @@
 import typing
+import asyncio
 import pkgutil
 import importlib
 import vcon
+import vcon.changes
 import py_vcon_server.logging_utils
 import py_vcon_server.processor
 
@@ -17,7 +19,7 @@ def import_bindings(path: str, module_prefix: str, label: str):
     path,
     module_prefix
     ):
-    logger.info("{} module load: {}".format(label, module_name))
+    logger.info("%s module load: %s", label, module_name)
     importlib.import_module(module_name)
 
 
@@ -53,7 +55,7 @@ class VconStorage():
     """ method to register storage class types """
 
     VconStorage._vcon_storage_implementations[name] = class_type
-    logger.info("registered {} Vcon storage implementation".format(name))
+    logger.info("registered %s Vcon storage implementation", name)
 
   @staticmethod
   async def set(save_vcon : typing.Union[vcon.Vcon, dict, str]):
@@ -70,17 +72,57 @@ class VconStorage():
     output of a **VconProcessor** or **Pipeline**.
 
     Saves **Vcon**s which have been marked as modified
-    or new in the given **VconProcessorIO**
+    or new in the given **VconProcessorIO**.  For stored **Vcon**s
+    for which the changes are known, only the changes are saved.
+    The whole **Vcon** is saved if the stored version changed since
+    it was loaded.
+
+    Only changes made through the **Vcon** API (e.g. add_analysis,
+    set_party_parameter) are known.  A processor which modifies the
+    **Vcon** data directly (e.g. vcon_object.parties[0]["name"] = "Alice")
+    must replace the **Vcon** with **VconProcessorIO.update_vcon** using
+    a different **Vcon** object, so that the whole **Vcon** is saved.
     """
     num_vcons = processor_output.num_vcons()
     for index in range(0, num_vcons):
       if(processor_output.is_vcon_modified(index)):
-        vcon_dict = await processor_output.get_vcon(
-          index,
-          py_vcon_server.processor.VconTypes.DICT
-          )
+        delta = processor_output.get_vcon_changes(index)
+        if(delta is not None):
+          vcon_object = await processor_output.get_vcon(
+            index,
+            py_vcon_server.processor.VconTypes.OBJECT
+            )
+          try:
+            await VconStorage.apply_changes(vcon_object.uuid, delta)
+
+          except vcon.changes.VconPatchConflict as conflict:
+            logger.warning("vCon: %s changed in storage, saving the whole vCon: %s",
+              vcon_object.uuid, conflict)
+            await VconStorage.set(vcon_object)
+
+          vcon_object.clear_changes()
+
+        else:
+          vcon_dict = await processor_output.get_vcon(
+            index,
+            py_vcon_server.processor.VconTypes.DICT
+            )
+
+          await VconStorage.set(vcon_dict)
 
-        await VconStorage.set(vcon_dict)
+  @staticmethod
+  async def apply_changes(vcon_uuid : str, delta : dict) -> None:
+    """
+    Update the stored Vcon with the given changes, rather than rewriting the whole Vcon.
+
+    Parameters:
+      vcon_uuid (str) - UUID of the stored Vcon
+      delta (dict) - compact delta from **Vcon.get_changes(True)**
+    """
+    if(VconStorage._vcon_storage_binding is None):
+      raise(Exception("Vcon storage implementation not setup"))
+
+    await VconStorage._vcon_storage_binding.apply_changes(vcon_uuid, delta)
 
   @staticmethod
   async def get(vcon_uuid : str) -> typing.Union[None, vcon.Vcon]:
@@ -91,6 +133,30 @@ class VconStorage():
     vCon = await VconStorage._vcon_storage_binding.get(vcon_uuid)
     return(vCon)
 
+  @staticmethod
+  async def get_many(vcon_uuids : typing.List[str]) -> typing.Dict[str, typing.Union[dict, None]]:
+    """
+    Get several Vcons from storage in one round trip, if supported by the
+    storage binding.  Suitable as the fetch_many function for
+    **vcon.group.VconGroupResolver**.
+
+    Returns: dict of UUID: Vcon in dict form or None if not found
+    """
+    if(VconStorage._vcon_storage_binding is None):
+      raise(Exception("Vcon storage implementation not setup"))
+
+    if(hasattr(VconStorage._vcon_storage_binding, "get_many")):
+      return(await VconStorage._vcon_storage_binding.get_many(vcon_uuids))
+
+    async def get_dict(vcon_uuid):
+      try:
+        return((await VconStorage._vcon_storage_binding.get(vcon_uuid)).dumpd(True, False))
+      except VconNotFound:
+        return(None)
+
+    vcon_dicts = await asyncio.gather(*[get_dict(vcon_uuid) for vcon_uuid in vcon_uuids])
+    return(dict(zip(vcon_uuids, vcon_dicts)))
+
   @staticmethod
   async def jq_query(vcon_uuid : str, jq_query_string : str) -> str:
     """
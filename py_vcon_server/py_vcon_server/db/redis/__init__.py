@@ -3,15 +3,30 @@
 import typing
 import json
 import vcon
+import vcon.changes
 import py_vcon_server.db.redis.redis_mgr
 import py_vcon_server.logging_utils
 
 logger = py_vcon_server.logging_utils.init_logger(__name__)
 
+def json_path(path: typing.List[typing.Union[str, int]]) -> str:
+  """ Convert a vcon.changes path (list of keys and indices) to a RedisJSON JSONPath """
+  json_path_string = "$"
+  for token in path:
+    if(isinstance(token, int)):
+      json_path_string += "[{}]".format(token)
+    elif(token.isidentifier()):
+      json_path_string += ".{}".format(token)
+    else:
+      json_path_string += "[{}]".format(json.dumps(token))
+  return(json_path_string)
+
+
 class RedisVconStorage:
   """ Redis binding of VconStorage """
   def __init__(self):
     self._redis_mgr = None
+    self._do_lua_apply_changes = None
 
   def setup(self, redis_uri : str) -> None:
     """ Initialize redis connect """
@@ -24,6 +39,49 @@ class RedisVconStorage:
     # Setup connection pool
     self._redis_mgr.create_pool()
 
+    redis_con = self._redis_mgr.get_client()
+
+    # KEYS = [ VCON_KEY ]
+    # ARGV = [ checks: [[path, base length, array name], ...],
+    #   appends: [[path, [element JSON, ...]], ...], sets: [[path, value JSON], ...] ]
+    lua_script_apply_changes = """
+    if redis.call("EXISTS", KEYS[1]) == 0 then
+      -- error vCon does not exist
+      return -1
+    end
+
+    -- length of the array at path, false or nil if there is no array
+    local function array_length(path)
+      local lengths = redis.call("JSON.ARRLEN", KEYS[1], path)
+      return lengths[1]
+    end
+
+    -- make sure the delta was made from the stored version before changing anything
+    for _, check in ipairs(cjson.decode(ARGV[1])) do
+      local length = array_length(check[1]) or 0
+      if length ~= check[2] then
+        -- error conflict: array name and stored length
+        return {check[3], length}
+      end
+    end
+
+    for _, append in ipairs(cjson.decode(ARGV[2])) do
+      if not array_length(append[1]) then
+        redis.call("JSON.SET", KEYS[1], append[1], "[]")
+      end
+      for _, element in ipairs(append[2]) do
+        redis.call("JSON.ARRAPPEND", KEYS[1], append[1], element)
+      end
+    end
+
+    for _, set in ipairs(cjson.decode(ARGV[3])) do
+      redis.call("JSON.SET", KEYS[1], set[1], set[2])
+    end
+
+    return 0
+    """
+    self._do_lua_apply_changes = redis_con.register_script(lua_script_apply_changes)
+
   async def teardown(self) -> None:
     """ shutdown and wait for redis connections to close """
     if(self._redis_mgr is None):
@@ -55,6 +113,34 @@ class RedisVconStorage:
 
     await redis_con.json().set("vcon:{}".format(uuid), "$", vcon_dict)
 
+  async def apply_changes(self, vcon_uuid : str, delta : dict) -> None:
+    """
+    Apply the compact delta of changes to the **Vcon** in redis storage.
+
+    The check that the delta was made from the stored version and the
+    writes are done in one Lua script, so another writer cannot change
+    the **Vcon** in between.
+    """
+    # paths and JSON values are built here, the script only checks and writes
+    checks = [[json_path([array_name]), length, array_name]
+      for array_name, length in delta.get("base_length", {}).items()]
+    appends = [[json_path([array_name]), [json.dumps(element) for element in elements]]
+      for array_name, elements in delta.get("append", {}).items()]
+    sets = [[json_path(path), json.dumps(value)] for path, value in delta.get("set", [])]
+
+    result = await self._do_lua_apply_changes(
+      keys = ["vcon:{}".format(vcon_uuid)],
+      args = [json.dumps(checks), json.dumps(appends), json.dumps(sets)]
+      )
+
+    if(result == -1):
+      raise py_vcon_server.db.VconNotFound("vCon not found for UUID: {}".format(vcon_uuid))
+
+    if(isinstance(result, list)):
+      array_name, stored_length = result
+      raise vcon.changes.VconPatchConflict("{} array length: {} delta was made from length: {}".format(
+        array_name, stored_length, delta["base_length"][array_name]))
+
   async def get(self, vcon_uuid : str) -> typing.Union[None, vcon.Vcon]:
     """ Get Vcon fro redis storage """
     redis_con = self._redis_mgr.get_client()
@@ -69,6 +155,22 @@ class RedisVconStorage:
 
     return(a_vcon)
 
+  async def get_many(self, vcon_uuids : typing.List[str]) -> typing.Dict[str, typing.Union[dict, None]]:
+    """ Get several Vcons in dict form from redis storage with one JSON.MGET """
+    if(len(vcon_uuids) == 0):
+      return({})
+    redis_con = self._redis_mgr.get_client()
+
+    results = await redis_con.json().mget(["vcon:{}".format(vcon_uuid) for vcon_uuid in vcon_uuids], "$")
+    vcon_dicts = {}
+    for vcon_uuid, result in zip(vcon_uuids, results):
+      # JSONPath results are a list of matches
+      if(isinstance(result, list)):
+        result = result[0] if(len(result) > 0) else None
+      vcon_dicts[vcon_uuid] = result
+
+    return(vcon_dicts)
+
   async def jq_query(self, vcon_uuid : str, jq_query_string : str) -> typing.Union[dict, None]:
     """ Get the jq query results for the given **Vcon** """
 
@@ -67,9 +67,9 @@ class RedisMgr():
   def log_pool_stats(self):
     """ Log infor about current client pool """
     if(self._redis_pool):
-      logger.info("redis pool max: {} in use: {}  available: {}".format(self._redis_pool.max_connections,
+      logger.info("redis pool max: %s in use: %d  available: %d", self._redis_pool.max_connections,
         len(self._redis_pool._in_use_connections),
-        len(self._redis_pool._available_connections)))
+        len(self._redis_pool._available_connections))
     else:
       logger.info("no active redis pool")
 
@@ -81,6 +81,6 @@ class RedisMgr():
       raise RedisPoolNotInitialized("redis pool not initialize")
 
     client = redis.asyncio.client.Redis(connection_pool=self._redis_pool)
-    logger.debug("client type: {}".format(type(client)))
+    logger.debug("client type: %s", type(client))
     return(client)
 
@@ -1,24 +1,11 @@
-import os
 import sys
 import logging
-import logging.config
-import pythonjsonlogger.jsonlogger
+import vcon.logging_utils
+import py_vcon_server.settings
 
-def init_logger(name : str) -> logging.Logger:
-  logger = logging.getLogger(name)
-
-  log_config_filename = "./logging.conf"
-  if(os.path.isfile(log_config_filename)):
-    logging.config.fileConfig(log_config_filename)
-    #print("got logging config", file=sys.stderr)
-  else:
-    logger.setLevel(logging.DEBUG)
-
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(logging.DEBUG)
-    formatter = pythonjsonlogger.jsonlogger.JsonFormatter( "%(timestamp)s %(levelname)s %(message)s %(pathname)s %(module)s %(lineno)d", timestamp=True)
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-  return(logger)
+SERVER_LOG_FORMAT = "%(timestamp)s %(levelname)s %(message)s %(pathname)s %(module)s %(lineno)d"
 
+def init_logger(name : str) -> logging.Logger:
+  # Level is set from VCON_LOG_LEVELS, VCON_LOG_LEVEL or LOG_LEVEL, see vcon.logging_utils
+  return(vcon.logging_utils.build_logger(name, sys.stdout, SERVER_LOG_FORMAT,
+    py_vcon_server.settings.LOG_LEVEL))
@@ -112,7 +112,7 @@ class MultifariousVcon():
     #logger.debug("keys: {}".format(self._vcon_forms.keys()))
     for form in list(self._vcon_forms):
       if(self._vcon_forms[form] is None):
-        logger.debug("removing null: {}".format(form))
+        logger.debug("removing null: %s", form)
         del self._vcon_forms[form]
     #logger.debug("keys after cleanup: {}".format(self._vcon_forms.keys()))
 
@@ -124,6 +124,8 @@ class MultifariousVcon():
         logger.warning("Unable to get Vcon for UUID: {} from storage".format(self._vcon_forms[VconTypes.UUID]))
 
       else:
+        # Record changes relative to the stored version, so that only they need be saved
+        vcon_object.track_changes()
         forms.append(VconTypes.OBJECT)
         self._vcon_forms[VconTypes.OBJECT] = vcon_object
 
@@ -328,6 +330,8 @@ class VconProcessorIO():
     self._vcons = []
     self._vcon_locks = []
     self._vcon_update = []
+    # True if the Vcon object's change log is relative to the stored version
+    self._vcon_changes_tracked = []
 
   def is_vcon_modified(self,
     index: int = 0
@@ -345,6 +349,31 @@ class VconProcessorIO():
     return(self._vcon_update[index])
 
 
+  def get_vcon_changes(self,
+    index: int = 0
+    ) -> typing.Union[dict, None]:
+    """
+    Get the changes made to the **Vcon** at **index**, relative to the
+    version in **VconStorage**, as a compact delta (see vcon.changes).
+
+    Returns: delta dict or None if the changes are not known (e.g. the
+      **Vcon** is new or was replaced with a different **Vcon**), in
+      which case the whole **Vcon** must be saved.
+    """
+
+    if(index >= len(self._vcons)):
+      raise Exception("Invalid index to Vcon")
+
+    if(not self._vcon_changes_tracked[index]):
+      return(None)
+
+    vcon_object = self._vcons[index]._vcon_forms.get(VconTypes.OBJECT, None)
+    if(vcon_object is None):
+      return(None)
+
+    return(vcon_object.get_changes(True))
+
+
   def num_vcons(self) -> int:
     """ Return the number of **Vcons** in this **VconProcessorIO** object """
     return(len(self._vcons))
@@ -425,6 +454,10 @@ class VconProcessorIO():
     self._vcons.append(mVcon)
     self._vcon_locks.append(lock_key)
     self._vcon_update.append(not readonly and lock_key is None)
+    # Only the UUID form is loaded from storage here, so its changes are
+    # known to be relative to the stored version
+    self._vcon_changes_tracked.append(lock_key is not None and
+      MultifariousVcon.get_vcon_type(vcon_to_add) == VconTypes.UUID)
 
     return(len(self._vcons) - 1)
 
@@ -453,6 +486,9 @@ class VconProcessorIO():
             uuid,
             index))
 
+        # Changes are only tracked if the same Vcon object was modified in place
+        self._vcon_changes_tracked[index] = (self._vcon_changes_tracked[index] and
+          self._vcons[index]._vcon_forms.get(VconTypes.OBJECT, None) is modified_vcon)
         self._vcons[index] = mVcon
         self._vcon_update[index] = True
         return(index)
@@ -570,7 +606,7 @@ class VconProcessor:
         **VconProcessorIO**.
     """
 
-    logger.debug("VconProcessor({}).__init__".format(init_options))
+    logger.debug("VconProcessor(%s).__init__", init_options)
     if(init_options is not None and not isinstance(init_options, VconProcessorInitOptions)):
       raise InvalidInitClass("init_options type: {} for {} must be drived from: VconProcessorInitOptions".format(
         init_options.__class__.__name__,
@@ -659,7 +695,7 @@ class VconProcessor:
 
   def __del__(self):
     """ Teardown/uninitialization method for the VconProcessor """
-    logger.debug("deleting {}".format(self.__class__.__name__))
+    logger.debug("deleting %s", self.__class__.__name__)
 
 
 # dict of names and VconProcessor registered
@@ -693,10 +729,10 @@ class VconProcessorRegistry:
       self._module_not_found = False
       self._processor_instance = None
 
-      logger.debug("Loading module: {} for VconProcessor: {}".format(
+      logger.debug("Loading module: %s for VconProcessor: %s",
         self._module_name,
         self._name
-        ))
+        )
       # load module
       if(self.load_module()):
 
@@ -749,9 +785,9 @@ class VconProcessorRegistry:
       loaded = False
       if(not self._module_load_attempted):
         try:
-          logger.info("importing: {} for registering VconProcessor: {}".format(
+          logger.info("importing: %s for registering VconProcessor: %s",
             self._module_name,
-            self._name))
+            self._name)
           self._module = importlib.import_module(self._module_name)
           self._module_load_attempted = True
           self._module_not_found = False
@@ -778,7 +814,7 @@ class VconProcessorRegistry:
     description: typing.Union[str, None] = None
     ):
 
-    logger.debug("Registering VconProcessor: {}".format(name))
+    logger.debug("Registering VconProcessor: %s", name)
     processor_registration = VconProcessorRegistry.VconProcessorRegistration(
       init_options,
       name,
@@ -789,7 +825,7 @@ class VconProcessorRegistry:
       )
 
     VCON_PROCESSOR_REGISTRY[name] = processor_registration
-    logger.info("Registered VconProcessor: {}".format(name))
+    logger.info("Registered VconProcessor: %s", name)
 
   @staticmethod
   def get_processor_names(successfully_loaded: bool = True) -> typing.List[str]:
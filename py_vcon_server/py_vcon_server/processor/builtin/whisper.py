@@ -11,12 +11,13 @@ logger = py_vcon_server.logging_utils.init_logger(__name__)
 
 __version__ = "0.0.1"
 
+# The option classes are got from the plugin class without instantiating
+# the plugin, so the whisper model is not loaded until a Vcon is transcribed.
 plugin = vcon.filter_plugins.FilterPluginRegistry.get("whisper")
 
-
 class WhisperInitOptions(
   py_vcon_server.processor.VconProcessorInitOptions,
-  plugin.plugin().init_options_type
+  plugin.get_init_options_type()
   ):
   pass
   # The folloiwng should be defined in the WhisperInitOptions
@@ -30,7 +31,7 @@ class WhisperInitOptions(
 
 class WhisperOptions(
   py_vcon_server.processor.VconProcessorOptions,
-  plugin.plugin().options_type
+  plugin.get_options_type()
   ):
   pass
   # TODO: add options for specifying which dialogs to transcribe
@@ -75,7 +76,6 @@ The **Whisper** **Vcon** **filter_plug** for transcription is used which is buil
     # options = {"llanguage" : "en", "model_size" : "base", "output_options" : ["vendor", "word_srt", "word_ass"], "whisper" : { "language" : "en"} }
     #  if(options.tel is not None and
     #    options.tel != ""):
-    vcon_whisper_options = {}
 
     index = options.input_vcon_index
     in_vcon = await processor_input.get_vcon(index)
@@ -86,12 +86,14 @@ The **Whisper** **Vcon** **filter_plug** for transcription is used which is buil
       num_dialog = len(in_vcon.dialog)
     else:
       num_dialog = None
-    logger.debug("whisper transcribe on Vcon UUID: {} dialog count: {}".format(
+    logger.debug("whisper transcribe on Vcon UUID: %s dialog count: %d",
       in_vcon.uuid,
       num_dialog
-      ))
+      )
 
-    out_vcon = await in_vcon.whisper(vcon_whisper_options)
+    # WhisperOptions is derived from the filter plugin options, so they are
+    # passed through (e.g. batched, for batching with concurrently processed Vcons)
+    out_vcon = await in_vcon.whisper(options)
 
     await processor_input.update_vcon(out_vcon)
 
@@ -106,7 +106,7 @@ class ServerState:
           server_json_string))
 
     # save to a redis hash
-    logger.info("setting server state: {}".format(server_dict))
+    logger.info("setting server state: %s", server_dict)
     await redis_con.hset(self._hash_key, self.server_key(), value = json.dumps(server_dict))
 
   async def unregister(self) -> None:
@@ -140,7 +140,7 @@ class ServerState:
     for server in server_key_value_pairs:
       server_key_value_pairs[server] = json.loads(server_key_value_pairs[server])
 
-    logger.info("Got servers: {}".format(server_key_value_pairs))
+    logger.info("Got servers: %s", server_key_value_pairs)
 
     return(server_key_value_pairs)
 
@@ -150,7 +150,7 @@ class ServerState:
     redis_con = self._redis_mgr.get_client()
     # Remove server from hash
     await redis_con.hdel(self._hash_key, server_key)
-    logger.debug("Deleted server state for: {}".format(server_key))
+    logger.debug("Deleted server state for: %s", server_key)
 
   def pid(self) -> str:
     """ Return the server prociess id """
@@ -26,7 +26,7 @@ def init(restapi):
     """
 
     try:
-      logger.debug("getting vcon UUID: {}".format(vcon_uuid))
+      logger.debug("getting vcon UUID: %s", vcon_uuid)
       vCon = await py_vcon_server.db.VconStorage.get(vcon_uuid)
 
     except py_vcon_server.db.VconNotFound as e:
@@ -43,7 +43,8 @@ def init(restapi):
     if(vCon is None):
       raise(fastapi.HTTPException(status_code=404, detail="Vcon not found"))
 
-    return(fastapi.responses.JSONResponse(content=vCon.dumpd()))
+    # JSONResponse only reads the dict, no need to deep copy it
+    return(fastapi.responses.JSONResponse(content=vCon.dumpd(True, False)))
 
   @restapi.post("/vcon",
     status_code = 204,
@@ -57,7 +58,7 @@ def init(restapi):
       vcon_dict = inbound_vcon.dict(exclude_none = True)
 
       vcon_uuid = vcon_dict.get("uuid", None)
-      logger.debug("setting vcon UUID: {}".format(vcon_uuid))
+      logger.debug("setting vcon UUID: %s", vcon_uuid)
 
       if(vcon_uuid is None or len(vcon_uuid) < 1):
         return(py_vcon_server.restful_api.ValidationError("vCon UUID: not set"))
@@ -88,14 +89,14 @@ def init(restapi):
     Returns: None
     """
     try:
-      logger.debug("deleting vcon UUID: {}".format(vcon_uuid))
+      logger.debug("deleting vcon UUID: %s", vcon_uuid)
       await py_vcon_server.db.VconStorage.delete(vcon_uuid)
 
     except Exception as e:
       py_vcon_server.restful_api.log_exception(e)
       return(py_vcon_server.restful_api.InternalErrorResponse(e))
 
-    logger.debug("Deleted vcon: UUID={}".format(vcon_uuid))
+    logger.debug("Deleted vcon: UUID=%s", vcon_uuid)
 
     # no return should cause 204, no content
 
@@ -109,9 +110,9 @@ def init(restapi):
     Returns: list - containing jq tranform of the vCon.
     """
     try:
-      logger.info("vcon UID: {} jq transform string: {}".format(vcon_uuid, jq_transform))
+      logger.info("vcon UID: %s jq transform string: %s", vcon_uuid, jq_transform)
       transform_result = await py_vcon_server.db.VconStorage.jq_query(vcon_uuid, jq_transform)
-      logger.debug("jq  transform result: {}".format(transform_result))
+      logger.debug("jq  transform result: %s", transform_result)
 
     except Exception as e:
       py_vcon_server.restful_api.log_exception(e)
@@ -130,9 +131,9 @@ def init(restapi):
     """
 
     try:
-      logger.info("vcon UID: {} jsonpath query string: {}".format(vcon_uuid, path_string))
+      logger.info("vcon UID: %s jsonpath query string: %s", vcon_uuid, path_string)
       query_result = await py_vcon_server.db.VconStorage.json_path_query(vcon_uuid, path_string)
-      logger.debug("jsonpath query result: {}".format(query_result))
+      logger.debug("jsonpath query result: %s", query_result)
 
     except Exception as e:
       py_vcon_server.restful_api.log_exception(e)
@@ -165,8 +166,8 @@ def init(restapi):
         path = request.url.path
         processor_name_from_path = os.path.basename(path)
 
-        logger.debug("type: {} path: {} ({}) options: {} processor: {}".format(
-          processor_name, path, type(options), options, processor_name_from_path))
+        logger.debug("type: %s path: %s (%s) options: %s processor: %s",
+          processor_name, path, type(options), options, processor_name_from_path)
 
         processor_input = py_vcon_server.processor.VconProcessorIO()
         await processor_input.add_vcon(vcon_uuid, "fake_lock", False)
@@ -7,6 +7,7 @@ import py_vcon_server
 import py_vcon_server.processor
 from py_vcon_server.db import VconStorage
 import vcon
+import vcon.group
 
 # invoke only once for all the unit test in this module
 @pytest_asyncio.fixture(autouse=True)
@@ -135,3 +136,91 @@ async def test_processor_io_commit(
     # expected
     pass
 
+
+@pytest.mark.asyncio
+async def test_processor_io_commit_changes(make_2_party_tel_vcon: vcon.Vcon):
+  """
+  Test the commit of only the changes to a stored and locked **Vcon**
+  in a **VconProcessorIO** object to the **VconStorage**.
+  """
+  await VconStorage.set(make_2_party_tel_vcon)
+
+  io_object = py_vcon_server.processor.VconProcessorIO()
+  await io_object.add_vcon(UUID, "fake_lock", False)
+  assert(not io_object.is_vcon_modified(0))
+
+  vcon_object = await io_object.get_vcon(0)
+  vcon_object.set_party_parameter("name", "Alice", 0)
+  vcon_object.add_analysis(0, "summary", "short call", "py-vcon.org")
+  await io_object.update_vcon(vcon_object)
+  assert(io_object.is_vcon_modified(0))
+
+  delta = io_object.get_vcon_changes(0)
+  assert(delta["base_length"] == {"analysis": 0})
+  assert(delta["set"] == [[["parties", 0, "name"], "Alice"]])
+
+  await VconStorage.commit(io_object)
+  assert(vcon_object.get_changes() == [])
+
+  retrieved_vcon = await VconStorage.get(UUID)
+  assert(retrieved_vcon.parties[0]["name"] == "Alice")
+  assert(retrieved_vcon.analysis[0]["body"] == "short call")
+  assert(retrieved_vcon.dumpd() == vcon_object.dumpd())
+
+  # Replaced with a different Vcon object, changes are not known
+  replacement_vcon = vcon.Vcon()
+  replacement_vcon.loads(vcon_object.dumps())
+  await io_object.update_vcon(replacement_vcon)
+  assert(io_object.get_vcon_changes(0) is None)
+
+
+@pytest.mark.asyncio
+async def test_processor_io_commit_changes_conflict(make_2_party_tel_vcon: vcon.Vcon):
+  """
+  Test that a **Vcon** not loaded by the **VconProcessorIO** is saved whole
+  and that a **Vcon** changed in storage since it was loaded is saved whole.
+  """
+  await VconStorage.set(make_2_party_tel_vcon)
+
+  # Built in memory, its changes are not relative to the stored version
+  io_object = py_vcon_server.processor.VconProcessorIO()
+  await io_object.add_vcon(make_2_party_tel_vcon, "fake_lock", False)
+  make_2_party_tel_vcon.add_analysis(0, "summary", "in memory", "py-vcon.org")
+  await io_object.update_vcon(make_2_party_tel_vcon)
+  assert(io_object.get_vcon_changes(0) is None)
+
+  io_object = py_vcon_server.processor.VconProcessorIO()
+  await io_object.add_vcon(UUID, "fake_lock", False)
+  vcon_object = await io_object.get_vcon(0)
+  vcon_object.add_analysis(0, "summary", "short call", "py-vcon.org")
+  await io_object.update_vcon(vcon_object)
+  assert(io_object.get_vcon_changes(0)["base_length"] == {"analysis": 0})
+
+  # Another writer adds an analysis first
+  other_vcon = await VconStorage.get(UUID)
+  other_vcon.add_analysis(0, "summary", "other writer", "py-vcon.org")
+  await VconStorage.set(other_vcon)
+
+  await VconStorage.commit(io_object)
+  assert(vcon_object.get_changes() == [])
+  retrieved_vcon = await VconStorage.get(UUID)
+  assert(retrieved_vcon.dumpd() == vcon_object.dumpd())
+
+
+@pytest.mark.asyncio
+async def test_redis_get_many(make_2_party_tel_vcon: vcon.Vcon):
+  """ Test the batched get of **Vcon**s used by the group resolver """
+  vCon = make_2_party_tel_vcon
+  await VconStorage.set(vCon)
+  await VconStorage.delete("not-there.py-vcon.org")
+
+  vcon_dicts = await VconStorage.get_many([UUID, "not-there.py-vcon.org"])
+  assert(vcon_dicts[UUID]["parties"][0]["tel"] == "1234")
+  assert(vcon_dicts["not-there.py-vcon.org"] is None)
+
+  group_vcon = vcon.Vcon()
+  group_vcon.set_uuid("group.py-vcon.org")
+  group_vcon.group.append({"uuid": UUID})
+  resolver = vcon.group.VconGroupResolver(VconStorage.get_many)
+  group_view = await resolver.resolve(group_vcon)
+  assert(group_view.uuids == [group_vcon.uuid, UUID])
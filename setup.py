@@ -67,6 +67,7 @@ setuptools.setup(
   author_email='dan.vcon@sipez.com',
   license='MIT',
   packages=['vcon', 'vcon.filter_plugins', 'vcon.filter_plugins.impl'],
+  package_data={"vcon.filter_plugins": ["manifest.json"]},
   data_files=[
     ("vcon", ["vcon/docker_dev/pip_package_list.txt"])],
   python_requires=">=3.7",
@@ -0,0 +1,58 @@
+"""
+Benchmarks of the vcon package hot paths using pytest-benchmark.
+
+These are skipped in normal test runs as they are slow.  They do not use
+the network, so they can be run offline.
+
+Run the benchmarks:
+  pytest tests/benchmarks --benchmark-only
+
+Save a baseline (stored in .benchmarks/):
+  pytest tests/benchmarks --benchmark-only --benchmark-save=baseline
+
+Compare with the last saved baseline, failing if a benchmark regressed:
+  pytest tests/benchmarks --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:20%
+
+Run each benchmark once as a smoke test (no timing):
+  pytest tests/benchmarks --benchmark-disable
+
+By default the small and medium vCons are benchmarked.  Set the environment
+variable VCON_BENCHMARK_SIZES=small,medium,huge to include huge vCons.
+"""
+import os
+import pytest
+
+try:
+  import pytest_benchmark
+
+except ImportError:
+  # pytest-benchmark is a dev dependency, see vcon/docker_dev/pip_dev_package_list.txt
+  collect_ignore_glob = ["test_*.py"]
+
+from tests.benchmarks.vcon_generators import SIZES, generate_vcon
+
+BENCHMARK_SIZES = [size.strip() for size in os.getenv("VCON_BENCHMARK_SIZES", "small,medium").split(",")
+  if size.strip() in SIZES]
+
+_generated = {}
+
+
+@pytest.fixture(autouse = True)
+def only_when_benchmarking(request):
+  """ skip benchmarks unless explicitly run """
+  if(not (request.config.getoption("benchmark_only") or
+    request.config.getoption("benchmark_disable"))):
+    pytest.skip("benchmarks run with --benchmark-only or --benchmark-disable")
+
+
+@pytest.fixture(params = BENCHMARK_SIZES)
+def vcon_size(request) -> str:
+  return(request.param)
+
+
+@pytest.fixture
+def unsigned_vcon_json(vcon_size) -> str:
+  """ unsigned vCon JSON of the given size, generated once per session """
+  if(vcon_size not in _generated):
+    _generated[vcon_size] = generate_vcon(vcon_size).dumps()
+  return(_generated[vcon_size])
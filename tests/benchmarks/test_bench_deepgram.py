@@ -0,0 +1,50 @@
+"""
+Benchmarks of Deepgram plugin request throughput against the local stand-in
+server (tests/deepgram_stand_in.py), which adds a fixed latency per request.
+
+The throughput in requests per second is saved in the benchmark extra_info
+(shown with --benchmark-json or --benchmark-verbose).
+"""
+import asyncio
+import pytest
+import vcon
+import vcon.filter_plugins.impl.deepgram
+from tests.deepgram_stand_in import DeepgramStandIn
+
+DIALOGS = 20
+LATENCY = 0.05
+RECORDING = b"RIFF not really a wav" * 5000
+
+
+@pytest.fixture(scope = "module")
+def stand_in():
+  with DeepgramStandIn(latency = LATENCY) as server:
+    yield server
+
+
+def recording_vcon() -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  for index in range(DIALOGS):
+    a_vcon.add_dialog_inline_recording(RECORDING, "2023-01-01T00:00:00Z", 10, [0], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  return(a_vcon)
+
+
+@pytest.mark.parametrize("max_connections", [1, 4, 10])
+def test_deepgram_throughput(benchmark, stand_in, max_connections):
+  plugin = vcon.filter_plugins.impl.deepgram.Deepgram(vcon.filter_plugins.impl.deepgram.DeepgramInitOptions(
+    deepgram_key = "stand_in_key",
+    api_url = stand_in.url,
+    max_connections = max_connections
+    ))
+  options = vcon.filter_plugins.impl.deepgram.DeepgramOptions(max_concurrent_dialogs = DIALOGS)
+
+  def transcribe():
+    a_vcon = recording_vcon()
+    asyncio.run(plugin.filter(a_vcon, options))
+    return(a_vcon)
+
+  a_vcon = benchmark.pedantic(transcribe, rounds = 3)
+  assert(len(a_vcon.analysis) == DIALOGS)
+  benchmark.extra_info["requests"] = DIALOGS
+  if(benchmark.stats is not None):
+    benchmark.extra_info["requests_per_second"] = DIALOGS / benchmark.stats.stats.mean
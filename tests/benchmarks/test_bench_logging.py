@@ -0,0 +1,33 @@
+""" Benchmarks of disabled debug logs on hot paths: eager str.format vs lazy % args vs sampled """
+import logging
+import pytest
+import vcon
+import vcon.accessors
+import vcon.logging_utils
+
+logger = logging.getLogger("vcon.benchmarks.logging")
+logger.setLevel(logging.WARNING)
+sampler = vcon.logging_utils.LogSampler(logger)
+
+# typical debug payloads: a list of tuples and a dialog sized dict
+ACCESSORS = list(vcon.accessors.transcript_accessors.keys()) * 4
+DIALOG = {"type": "text", "start": "2023-01-02T03:04:05+00:00", "parties": [0, 1],
+  "mimetype": "text/plain", "body": "hello " * 200}
+
+
+def eager_format():
+  logger.debug("accessors: {} dialog: {}".format(ACCESSORS, DIALOG))
+
+
+def lazy_format():
+  logger.debug("accessors: %s dialog: %s", ACCESSORS, DIALOG)
+
+
+def sampled():
+  sampler.debug("accessors: %s dialog: %s", ACCESSORS, DIALOG)
+
+
+@pytest.mark.parametrize("log_function", [eager_format, lazy_format, sampled],
+  ids = ["eager_format", "lazy_format", "sampled"])
+def test_disabled_debug_log(benchmark, log_function):
+  benchmark(log_function)
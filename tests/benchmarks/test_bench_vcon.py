@@ -0,0 +1,167 @@
+""" Benchmarks for vcon.Vcon construction, serialization, security and query operations """
+import json
+import datetime
+import pytest
+import jose.jwe
+import vcon
+import vcon.utils
+from tests.benchmarks.vcon_generators import generate_vcon, recording_bytes, START
+
+CA_CERT = "certs/fake_ca_root.crt"
+DIVISION_CERT = "certs/fake_div.crt"
+DIVISION_PRIVATE_KEY = "certs/fake_div.key"
+GROUP_CERT = "certs/fake_grp.crt"
+GROUP_PRIVATE_KEY = "certs/fake_grp.key"
+
+# rounds for benchmarks which need a fresh Vcon per round
+ROUNDS = {"small": 50, "medium": 10, "huge": 3}
+
+
+def loaded_vcon(vcon_json: str) -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  a_vcon.loads(vcon_json)
+  return(a_vcon)
+
+
+def signed_vcon_json(vcon_json: str) -> str:
+  a_vcon = loaded_vcon(vcon_json)
+  a_vcon.sign(GROUP_PRIVATE_KEY, [GROUP_CERT, DIVISION_CERT, CA_CERT])
+  return(a_vcon.dumps())
+
+
+def test_construct(benchmark):
+  benchmark(vcon.Vcon)
+
+
+def test_generate(benchmark, vcon_size):
+  benchmark.pedantic(generate_vcon, args = (vcon_size,), rounds = ROUNDS[vcon_size])
+
+
+def test_loads(benchmark, vcon_size, unsigned_vcon_json):
+  benchmark.pedantic(loaded_vcon, args = (unsigned_vcon_json,), rounds = ROUNDS[vcon_size])
+
+
+def test_loadd(benchmark, vcon_size, unsigned_vcon_json):
+  def setup():
+    return((vcon.Vcon(), json.loads(unsigned_vcon_json)), {})
+
+  benchmark.pedantic(vcon.Vcon.loadd, setup = setup, rounds = ROUNDS[vcon_size])
+
+
+def test_dumps(benchmark, vcon_size, unsigned_vcon_json):
+  a_vcon = loaded_vcon(unsigned_vcon_json)
+  benchmark(a_vcon.dumps)
+
+
+def test_dumpd(benchmark, vcon_size, unsigned_vcon_json):
+  a_vcon = loaded_vcon(unsigned_vcon_json)
+  benchmark(a_vcon.dumpd)
+
+
+def test_sign(benchmark, vcon_size, unsigned_vcon_json):
+  def setup():
+    return((loaded_vcon(unsigned_vcon_json), GROUP_PRIVATE_KEY, [GROUP_CERT, DIVISION_CERT, CA_CERT]), {})
+
+  benchmark.pedantic(vcon.Vcon.sign, setup = setup, rounds = ROUNDS[vcon_size])
+
+
+def test_verify(benchmark, vcon_size, unsigned_vcon_json):
+  signed_json = signed_vcon_json(unsigned_vcon_json)
+
+  def setup():
+    return((loaded_vcon(signed_json), [CA_CERT]), {})
+
+  benchmark.pedantic(vcon.Vcon.verify, setup = setup, rounds = ROUNDS[vcon_size])
+
+
+def test_encrypt(benchmark, vcon_size, unsigned_vcon_json):
+  signed_json = signed_vcon_json(unsigned_vcon_json)
+
+  def setup():
+    return((loaded_vcon(signed_json), DIVISION_CERT), {})
+
+  benchmark.pedantic(vcon.Vcon.encrypt, setup = setup, rounds = ROUNDS[vcon_size])
+
+
+def test_decrypt(benchmark, vcon_size, unsigned_vcon_json):
+  a_vcon = loaded_vcon(signed_vcon_json(unsigned_vcon_json))
+  a_vcon.encrypt(DIVISION_CERT)
+  encrypted_json = a_vcon.dumps()
+
+  # python-jose >= 3.4 refuses to decrypt JWE tokens larger than this
+  jwe_size_limit = getattr(jose.jwe, "JWE_SIZE_LIMIT", None)
+  if(jwe_size_limit is not None and len(encrypted_json) > jwe_size_limit):
+    pytest.skip("encrypted vCon size {} exceeds python-jose JWE_SIZE_LIMIT {}".format(
+      len(encrypted_json), jwe_size_limit))
+
+  def setup():
+    return((loaded_vcon(encrypted_json), DIVISION_PRIVATE_KEY, DIVISION_CERT), {})
+
+  benchmark.pedantic(vcon.Vcon.decrypt, setup = setup, rounds = ROUNDS[vcon_size])
+
+
+def test_jq(benchmark, vcon_size, unsigned_vcon_json):
+  a_vcon = loaded_vcon(unsigned_vcon_json)
+  queries = {
+    "num_dialogs": ".dialog | length",
+    "tels": "[.parties[].tel]",
+    "transcripts": "[.analysis[] | select(.type == \"transcript\") | .dialog]"
+    }
+  result = benchmark(a_vcon.jq, queries)
+  assert(result["num_dialogs"] == len(a_vcon.dialog))
+
+
+def test_find_transcript_for_dialog(benchmark, vcon_size, unsigned_vcon_json):
+  a_vcon = loaded_vcon(unsigned_vcon_json)
+  last_dialog = len(a_vcon.dialog) - 1
+  result = benchmark(a_vcon.find_transcript_for_dialog, last_dialog)
+  assert(result == len(a_vcon.analysis) - 1)
+
+
+@pytest.mark.parametrize("recording_size", [16 * 1024, 1024 * 1024, 16 * 1024 * 1024])
+def test_add_inline_recording(benchmark, recording_size):
+  body = recording_bytes(recording_size)
+
+  def add_recording():
+    a_vcon = vcon.Vcon()
+    a_vcon.add_dialog_inline_recording(body, START, 60.0, [0, 1], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+
+  benchmark(add_recording)
+
+
+@pytest.mark.parametrize("recording_size", [16 * 1024, 1024 * 1024, 16 * 1024 * 1024])
+def test_decode_inline_recording(benchmark, recording_size):
+  body = recording_bytes(recording_size)
+  a_vcon = vcon.Vcon()
+  a_vcon.add_dialog_inline_recording(body, START, 60.0, [0, 1], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  result = benchmark(a_vcon.decode_dialog_inline_body, 0)
+  assert(result == body)
+
+
+class _NullWriter():
+  def __init__(self):
+    self.written = 0
+
+  def write(self, data: bytes) -> None:
+    self.written += len(data)
+
+
+@pytest.mark.parametrize("recording_size", [1024 * 1024, 16 * 1024 * 1024])
+def test_write_inline_recording(benchmark, recording_size):
+  body = recording_bytes(recording_size)
+  a_vcon = vcon.Vcon()
+  a_vcon.add_dialog_inline_recording(body, START, 60.0, [0, 1], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  result = benchmark(a_vcon.write_dialog_inline_body, 0, _NullWriter())
+  assert(result == len(body))
+
+
+@pytest.mark.parametrize("date", [
+  "2023-01-02T03:04:05.000+00:00",
+  "Mon, 02 Jan 2023 03:04:05 -0000",
+  1672628645,
+  START,
+  ], ids = ["rfc3339", "rfc2822", "epoch", "datetime"])
+def test_cannonize_date(benchmark, date):
+  result = benchmark(vcon.utils.cannonize_date, date)
+  assert(result.startswith("2023-01-02T03:04:05"))
+
@@ -0,0 +1,61 @@
+"""
+Benchmarks of batched vs one at a time whisper transcription of short recordings.
+
+The throughput in audio seconds per wall clock second is saved in the
+benchmark extra_info (shown with --benchmark-json or --benchmark-verbose).
+Requires whisper, stable_whisper and ffmpeg and downloads the "tiny" model.
+The model runs on the GPU if torch finds one, otherwise the CPU.
+"""
+import asyncio
+import pytest
+pytest.importorskip("stable_whisper")
+import vcon
+import vcon.audio
+import vcon.filter_plugins
+import vcon.filter_plugins.impl.whisper
+
+RECORDING = "examples/agent_sample.mp3"
+CLIP_SECONDS = 10
+CLIPS = 16
+
+
+@pytest.fixture(scope = "module")
+def clips():
+  with open(RECORDING, "rb") as recording_file:
+    samples = vcon.audio.decode_pcm(recording_file.read(), vcon.Vcon.MIMETYPE_AUDIO_MP3)
+  clip_length = CLIP_SECONDS * vcon.audio.SAMPLE_RATE
+  clip_list = [samples[start:start + clip_length] for start in range(0, len(samples) - clip_length + 1, clip_length)]
+  # repeat the recording if it is too short for the number of clips
+  return([clip_list[index % len(clip_list)] for index in range(CLIPS)])
+
+
+@pytest.fixture(scope = "module")
+def plugin():
+  return(vcon.filter_plugins.impl.whisper.Whisper(
+    vcon.filter_plugins.impl.whisper.WhisperInitOptions(model_size = "tiny", batch_size = CLIPS)))
+
+
+def throughput(benchmark, clips) -> None:
+  audio_seconds = sum(len(clip) for clip in clips) / vcon.audio.SAMPLE_RATE
+  benchmark.extra_info["audio_seconds"] = audio_seconds
+  if(benchmark.stats is not None):
+    benchmark.extra_info["audio_seconds_per_second"] = audio_seconds / benchmark.stats.stats.mean
+
+
+def test_whisper_one_at_a_time(benchmark, plugin, clips):
+  def transcribe():
+    return([plugin._run_model(clip, {"language": "en"}) for clip in clips])
+
+  transcripts = benchmark.pedantic(transcribe, rounds = 2)
+  assert(len(transcripts) == CLIPS)
+  throughput(benchmark, clips)
+
+
+def test_whisper_batched(benchmark, plugin, clips):
+  def transcribe():
+    return(asyncio.run(plugin._run_batch("en", clips)))
+
+  transcripts = benchmark.pedantic(transcribe, rounds = 2)
+  assert(len(transcripts) == CLIPS)
+  assert(all(len(transcript["segments"]) > 0 for transcript in transcripts))
+  throughput(benchmark, clips)
@@ -0,0 +1,79 @@
+""" Deterministic synthetic vCon generators for benchmarks """
+import random
+import datetime
+import vcon
+
+# size name: (parties, text dialogs, recording dialogs, recording bytes, transcript words)
+SIZES = {
+  "small": (2, 2, 1, 16 * 1024, 100),
+  "medium": (5, 50, 2, 512 * 1024, 2000),
+  "huge": (20, 500, 4, 8 * 1024 * 1024, 20000)
+  }
+
+WORDS = ["account", "problem", "please", "thank", "you", "order", "cancel", "shipping",
+  "help", "today", "the", "a", "is", "and", "monthly", "refund", "call", "recorded"]
+
+START = datetime.datetime(2023, 1, 2, 3, 4, 5, tzinfo = datetime.timezone.utc)
+
+
+def recording_bytes(size: int, seed: int = 0) -> bytes:
+  """ pseudo random bytes standing in for a recording (does not compress) """
+  return(random.Random(seed).getrandbits(size * 8).to_bytes(size, "little"))
+
+
+def whisper_transcript(word_count: int, rand: random.Random) -> dict:
+  """ transcript body in the Whisper word time stamp schema """
+  segments = []
+  text = []
+  time = 0.0
+  for segment_index in range(max(1, word_count // 20)):
+    words = [rand.choice(WORDS) for _index in range(20)]
+    segment_text = " ".join(words)
+    text.append(segment_text)
+    segments.append({
+      "id": segment_index,
+      "start": time,
+      "end": time + 5.0,
+      "text": segment_text,
+      "words": [{"word": word, "start": time + index * 0.25, "end": time + index * 0.25 + 0.2}
+        for index, word in enumerate(words)]
+      })
+    time += 5.0
+  return({"text": " ".join(text), "segments": segments, "language": "en"})
+
+
+def generate_vcon(size: str, seed: int = 0) -> vcon.Vcon:
+  """
+  Generate an unsigned vCon with the given size.
+
+  Parameters:
+    size (str) - one of SIZES
+    seed (int) - seed for the content, same seed and size produce the same content
+
+  Returns:
+    Vcon with parties, text dialogs, inline recording dialogs, each with a
+    Whisper transcript analysis
+  """
+  num_parties, num_text, num_recordings, recording_size, transcript_words = SIZES[size]
+  rand = random.Random(seed)
+  a_vcon = vcon.Vcon()
+
+  for party_index in range(num_parties):
+    a_vcon.set_party_parameter("tel", "+1555{:07d}".format(party_index))
+    a_vcon.set_party_parameter("name", "Party {}".format(party_index), party_index)
+
+  for text_index in range(num_text):
+    text = " ".join(rand.choice(WORDS) for _index in range(rand.randint(5, 60)))
+    a_vcon.add_dialog_inline_text(text, START + datetime.timedelta(seconds = 10 * text_index),
+      0, text_index % num_parties, vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+
+  for recording_index in range(num_recordings):
+    a_vcon.add_dialog_inline_recording(recording_bytes(recording_size, seed + recording_index),
+      START + datetime.timedelta(hours = recording_index), 60.0, [0, 1], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+    a_vcon.add_analysis(num_text + recording_index, "transcript",
+      whisper_transcript(transcript_words, rand), "openai", "whisper_word_timestamps",
+      product = "whisper")
+
+  a_vcon.set_uuid("benchmark.py-vcon.org")
+  return(a_vcon)
+
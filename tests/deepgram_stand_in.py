@@ -0,0 +1,171 @@
+"""
+Local stand-in for the Deepgram pre-recorded transcription API, for tests
+and benchmarks of the Deepgram plugin without the network or a key.
+
+It is an HTTP/1.1 server which keeps connections alive, so that
+connection reuse by the plugin can be checked.
+
+Example:
+  with DeepgramStandIn(latency = 0.1) as stand_in:
+    plugin = Deepgram(DeepgramInitOptions(deepgram_key = "key", api_url = stand_in.url))
+"""
+import json
+import time
+import typing
+import threading
+import http.server
+import urllib.parse
+
+TRANSCRIPT = "hello this is the deepgram stand in"
+PATH = "/v1/listen"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+  # keep alive
+  protocol_version = "HTTP/1.1"
+  # headers and body are written separately, don't wait for the ACK of the headers
+  disable_nagle_algorithm = True
+
+  def log_message(self, format, *args) -> None:
+    pass
+
+  def _respond(self, status: int, body: dict, headers: typing.Dict[str, str] = {}) -> None:
+    content = json.dumps(body).encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(content)))
+    for name, value in headers.items():
+      self.send_header(name, value)
+    self.end_headers()
+    self.wfile.write(content)
+
+  def do_POST(self) -> None:
+    stand_in = self.server.stand_in
+    url = urllib.parse.urlsplit(self.path)
+    params = dict(urllib.parse.parse_qsl(url.query))
+    try:
+      if(self.headers.get("Transfer-Encoding", "").lower() == "chunked"):
+        body = self._read_chunked()
+      else:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    except (ValueError, ConnectionError):
+      # the client aborted the upload
+      with stand_in._lock:
+        stand_in.aborted += 1
+      self.close_connection = True
+      return
+
+    status = stand_in._record({name.lower(): value for name, value in self.headers.items()}, params, body, self.client_address)
+
+    if(stand_in.latency > 0):
+      time.sleep(stand_in.latency)
+
+    if(url.path != PATH):
+      self._respond(404, {"err_code": "NOT_FOUND"})
+
+    elif(not self.headers.get("Authorization", "").startswith("Token ")):
+      self._respond(401, {"err_code": "INVALID_AUTH"})
+
+    elif(status is not None):
+      headers = {} if stand_in.retry_after is None else {"Retry-After": stand_in.retry_after}
+      self._respond(status, {"err_code": "STAND_IN_FAILURE"}, headers)
+
+    else:
+      self._respond(200, {
+        "metadata": {
+          "request_id": "stand-in-{}".format(len(stand_in.requests)),
+          "content_length": len(body),
+          "content_type": self.headers.get("Content-Type", None),
+          "options": params
+          },
+        "results": {
+          "channels": [{"alternatives": [{"transcript": TRANSCRIPT, "confidence": 0.99, "words": []}]}]
+          }
+        })
+
+  def _read_chunked(self) -> bytes:
+    body = b""
+    while(True):
+      line = self.rfile.readline()
+      if(line == b""):
+        raise ConnectionError("connection closed before end of chunked body")
+      size = int(line.split(b";")[0], 16)
+      if(size == 0):
+        # trailer
+        while(self.rfile.readline() not in (b"\r\n", b"\n", b"")):
+          pass
+        return(body)
+      body += self.rfile.read(size)
+      self.rfile.readline()
+
+
+class DeepgramStandIn():
+  """ Threaded local HTTP server answering POST /v1/listen like Deepgram """
+  def __init__(
+    self,
+    latency: float = 0.0,
+    failures: typing.Union[typing.List[int], None] = None,
+    retry_after: typing.Union[str, None] = None
+    ):
+    """
+    Parameters:
+      latency (float) - seconds to wait before responding to each request
+      failures (List[int]) - statuses of the responses to the first requests, before succeeding
+      retry_after (str) - Retry-After header value for the failed responses
+    """
+    self.latency = latency
+    self.failures = list(failures or [])
+    self.retry_after = retry_after
+    # (lower case headers, query params, body, client address) of each request
+    self.requests = []
+    # number of uploads which were not completed
+    self.aborted = 0
+    self._lock = threading.Lock()
+    self._server = None
+    self._thread = None
+
+  @property
+  def url(self) -> str:
+    host, port = self._server.server_address[:2]
+    return("http://{}:{}{}".format(host, port, PATH))
+
+  def connections(self) -> int:
+    """ number of distinct client connections the requests arrived on """
+    with self._lock:
+      return(len(set(request[3] for request in self.requests)))
+
+  def _record(
+      self,
+      headers: dict,
+      params: dict,
+      body: bytes,
+      client_address: tuple
+    ) -> typing.Union[int, None]:
+    """ record the request, returns the failure status to respond with if any """
+    with self._lock:
+      self.requests.append((headers, params, body, client_address))
+      if(len(self.failures) > 0):
+        return(self.failures.pop(0))
+    return(None)
+
+  def start(self) -> "DeepgramStandIn":
+    self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    self._server.daemon_threads = True
+    self._server.stand_in = self
+    self._thread = threading.Thread(target = self._server.serve_forever, daemon = True)
+    self._thread.start()
+    return(self)
+
+  def stop(self) -> None:
+    if(self._server is not None):
+      self._server.shutdown()
+      self._server.server_close()
+      self._thread.join()
+      self._server = None
+
+  def __enter__(self) -> "DeepgramStandIn":
+    return(self.start())
+
+  def __exit__(self, *args) -> None:
+    self.stop()
@@ -39,7 +39,8 @@ async def test_add_email_multipart():
   assert(out_vcon.dialog[0]["mimetype"][:len(vcon.Vcon.MIMETYPE_MULTIPART)] == vcon.Vcon.MIMETYPE_MULTIPART)
   assert(out_vcon.dialog[0]["start"] == "2022-09-23T21:44:25.000+00:00")
   assert(out_vcon.dialog[0]["duration"] == 0)
-  assert(len(out_vcon.dialog[0]["body"]) == 2048)
+  # body is taken verbatim from the message, not re-serialized (2048 when re-serialized)
+  assert(len(out_vcon.dialog[0]["body"]) == 2049)
   assert(out_vcon.dialog[0]["encoding"] is None or
     out_vcon.dialog[0]["encoding"].lower() == "none")
   # TODO: fix:
@@ -54,3 +55,13 @@ async def test_add_email_multipart():
   assert(len(texts) == 1)
   assert(texts[0]["text"] == 'Alice:Please find the image attached.\r\n\r\nRegards,Bob\r\n')
 
+
+  # Second call uses the cached text part
+  assert(out_vcon._dialog_text_cache[0][1] == texts[0]["text"])
+  texts = await out_vcon.get_dialog_text(0)
+  assert(texts[0]["text"] == 'Alice:Please find the image attached.\r\n\r\nRegards,Bob\r\n')
+
+  # Replaced body invalidates the cached text
+  out_vcon.dialog[0]["body"] = out_vcon.dialog[0]["body"].replace("Regards,Bob", "Thanks,Bob")
+  texts = await out_vcon.get_dialog_text(0)
+  assert(texts[0]["text"] == 'Alice:Please find the image attached.\r\n\r\nThanks,Bob\r\n')
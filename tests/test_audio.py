@@ -0,0 +1,89 @@
+""" Unit tests for in memory decoding of recordings to PCM samples """
+import io
+import wave
+import shutil
+import pytest
+numpy = pytest.importorskip("numpy")
+import vcon.audio
+
+
+def make_wav(samples, sample_rate: int = 16000, channels: int = 1, sample_width: int = 2) -> bytes:
+  """ WAV file content for the interleaved integer samples """
+  dtype = {1: numpy.uint8, 2: numpy.int16, 4: numpy.int32}[sample_width]
+  wav_bytes = io.BytesIO()
+  with wave.open(wav_bytes, "wb") as wav_file:
+    wav_file.setnchannels(channels)
+    wav_file.setsampwidth(sample_width)
+    wav_file.setframerate(sample_rate)
+    wav_file.writeframes(numpy.array(samples, dtype = dtype).tobytes())
+  return(wav_bytes.getvalue())
+
+
+def test_decode_wav_mono():
+  samples = vcon.audio.decode_pcm(make_wav([0, 16384, -16384, -32768, 32767]), vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  assert(samples.dtype == numpy.float32)
+  assert(samples.tolist() == pytest.approx([0.0, 0.5, -0.5, -1.0, 32767 / 32768]))
+
+
+def test_decode_wav_stereo():
+  # left, right interleaved, averaged to mono
+  samples = vcon.audio.decode_wav(make_wav([16384, 0, -16384, -16384], channels = 2))
+  assert(samples.tolist() == pytest.approx([0.25, -0.5]))
+
+  samples = vcon.audio.decode_wav(make_wav([128, 192, 64], sample_width = 1))
+  assert(samples.tolist() == pytest.approx([0.0, 0.5, -0.5]))
+
+
+def test_decode_wav_unsupported():
+  # needs resampling
+  assert(vcon.audio.decode_wav(make_wav([0, 1, 2], sample_rate = 8000)) is None)
+  # not WAV
+  assert(vcon.audio.decode_wav(b"ID3 not a wav file") is None)
+
+
+def test_decode_ffmpeg(monkeypatch):
+  wav_8k = make_wav([0, 16384] * 4000, sample_rate = 8000)
+  if(shutil.which(vcon.audio.FFMPEG) is None):
+    monkeypatch.setattr(vcon.audio, "FFMPEG", "no_such_ffmpeg")
+    with pytest.raises(vcon.audio.AudioDecodeError, match = "not found"):
+      vcon.audio.decode_pcm(wav_8k, vcon.Vcon.MIMETYPE_AUDIO_WAV)
+    pytest.skip("ffmpeg not installed")
+
+  samples = vcon.audio.decode_pcm(wav_8k, vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  assert(samples.dtype == numpy.float32)
+  # resampled to 16 kHz
+  assert(abs(len(samples) - 16000) < 100)
+
+  with pytest.raises(vcon.audio.AudioDecodeError):
+    vcon.audio.decode_pcm(b"not audio" * 100, vcon.Vcon.MIMETYPE_AUDIO_MP3)
+
+
+def test_split_on_silence():
+  rate = 1000
+  rng = numpy.random.default_rng(1)
+
+  def speech(seconds):
+    return(rng.uniform(-0.5, 0.5, int(seconds * rate)).astype(numpy.float32))
+
+  def silence(seconds):
+    return(rng.uniform(-0.001, 0.001, int(seconds * rate)).astype(numpy.float32))
+
+  # speech with pauses at 4.0-4.5 (short) and 6.0-7.0 (long) and 13.0-13.4
+  samples = numpy.concatenate([speech(4), silence(0.5), speech(1.5), silence(1.0),
+    speech(6), silence(0.4), speech(5)])
+  assert(vcon.audio.split_on_silence(samples, 20.0, rate) == [(0, len(samples))])
+
+  chunks = vcon.audio.split_on_silence(samples, 10.0, rate, frame_seconds = 0.01)
+  # split in the longest pause in 5 - 10 seconds, then in the pause at 13 seconds
+  assert(len(chunks) == 3)
+  assert(chunks[0][0] == 0 and chunks[-1][1] == len(samples))
+  assert(all(end == next_start for (start, end), (next_start, next_end) in zip(chunks, chunks[1:])))
+  assert(all(isinstance(end, int) for start, end in chunks))
+  assert(6000 < chunks[0][1] < 7000)
+  assert(13000 < chunks[1][1] < 13400)
+
+  # no silence, split at most max_seconds apart
+  chunks = vcon.audio.split_on_silence(speech(25), 10.0, rate)
+  assert(len(chunks) >= 3)
+  assert(chunks[-1][1] == 25 * rate)
+  assert(all(0 < end - start <= 10 * rate for start, end in chunks))
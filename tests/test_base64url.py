@@ -0,0 +1,135 @@
+""" Unit tests for streaming base64url decoding of dialog bodies """
+import io
+import os
+import socket
+import asyncio
+import threading
+import pytest
+import jose.utils
+import vcon
+import vcon.base64url
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 3, 4, 5, 100, 1000])
+def test_decode_lengths(length):
+  data = os.urandom(length)
+  encoded = jose.utils.base64url_encode(data).decode("ascii")
+  assert("=" not in encoded)
+  assert(vcon.base64url.decoded_length(encoded) == length)
+  for chunk_size in (4, 8, 12, 1024):
+    assert(vcon.base64url.decode(encoded, chunk_size) == data)
+    assert(vcon.base64url.decode(encoded.encode("ascii"), chunk_size) == data)
+    assert(bytes(vcon.base64url.decode_into(memoryview(encoded.encode("ascii")), None, chunk_size)) == data)
+
+  # padded form
+  padded = encoded + "=" * (-len(encoded) % 4)
+  assert(vcon.base64url.decoded_length(padded) == length)
+  assert(vcon.base64url.decode(padded, 8) == data)
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 56, 57, 58, 1000, 10000])
+def test_decode_wrapped(length):
+  data = os.urandom(length)
+  encoded = jose.utils.base64url_encode(data).decode("ascii")
+  padded = encoded + "=" * (-len(encoded) % 4)
+  for body in (encoded, padded):
+    # MIME style 76 column lines
+    wrapped = "\r\n".join(body[offset:offset + 76] for offset in range(0, len(body), 76)) + "\n"
+    if(body is padded):
+      # jose pads by the length including the white space, so only decodes wrapped padded bodies
+      assert(jose.utils.base64url_decode(wrapped.encode("ascii")) == data)
+    assert(vcon.base64url.decoded_length(wrapped) == length)
+    for chunk_size in (4, 8, 76, 80, 1024):
+      assert(vcon.base64url.decode(wrapped, chunk_size) == data)
+      assert(vcon.base64url.decode(wrapped.encode("ascii"), chunk_size) == data)
+      assert(bytes(vcon.base64url.decode_into(memoryview(wrapped.encode("ascii")), None, chunk_size)) == data)
+      assert(all(len(chunk) <= chunk_size // 4 * 3 for chunk in vcon.base64url.iter_decode(wrapped, chunk_size)))
+
+  with pytest.raises(ValueError):
+    vcon.base64url.decode("abcd\ne")
+
+
+def test_decode_errors():
+  with pytest.raises(ValueError):
+    vcon.base64url.decode("abcde")
+  with pytest.raises(ValueError):
+    vcon.base64url.decode("abcd", 6)
+  with pytest.raises(ValueError):
+    vcon.base64url.decode_into("abcd", bytearray(2))
+  with pytest.raises(ValueError):
+    vcon.base64url.decode_into("abcd", b"123")
+
+
+def test_chunks_bounded():
+  data = os.urandom(100000)
+  encoded = jose.utils.base64url_encode(data).decode("ascii")
+  chunks = list(vcon.base64url.iter_decode(encoded, 4096))
+  assert(max(len(chunk) for chunk in chunks) == 3072)
+  assert(b"".join(chunks) == data)
+
+
+@pytest.fixture(scope="function")
+def recording_vcon():
+  recording = os.urandom(300001)
+  a_vcon = vcon.Vcon()
+  a_vcon.add_dialog_inline_recording(recording, "2023-01-02T03:04:05+00:00", 60.0, [0, 1],
+    vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  a_vcon.add_dialog_inline_text("hello there", "2023-01-02T03:05:05+00:00", 0, 0,
+    vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+  return(a_vcon, recording)
+
+
+def test_vcon_write_inline_body(recording_vcon):
+  a_vcon, recording = recording_vcon
+  assert(a_vcon.decode_dialog_inline_body(0) == recording)
+
+  out_file = io.BytesIO()
+  assert(a_vcon.write_dialog_inline_body(0, out_file, 1024) == len(recording))
+  assert(out_file.getvalue() == recording)
+
+  out_file = io.StringIO()
+  assert(a_vcon.write_dialog_inline_body(1, out_file) == len("hello there"))
+  assert(out_file.getvalue() == "hello there")
+
+  buffer = bytearray(len(recording) + 10)
+  view = a_vcon.decode_dialog_inline_body_into(0, buffer)
+  assert(view.obj is buffer)
+  assert(view == recording)
+  assert(bytes(a_vcon.decode_dialog_inline_body_into(1)) == b"hello there")
+
+  # socket
+  receiver, sender = socket.socketpair()
+  received = []
+  def read_all():
+    while(True):
+      data = receiver.recv(65536)
+      if(len(data) == 0):
+        break
+      received.append(data)
+  reader_thread = threading.Thread(target = read_all)
+  reader_thread.start()
+  a_vcon.write_dialog_inline_body(0, sender, 4096)
+  sender.close()
+  reader_thread.join()
+  receiver.close()
+  assert(b"".join(received) == recording)
+
+
+@pytest.mark.asyncio
+async def test_vcon_write_inline_body_async(recording_vcon):
+  a_vcon, recording = recording_vcon
+  received = bytearray()
+  async def handle(reader, writer):
+    received.extend(await reader.read())
+    writer.close()
+
+  server = await asyncio.start_server(handle, "127.0.0.1", 0)
+  port = server.sockets[0].getsockname()[1]
+  reader, writer = await asyncio.open_connection("127.0.0.1", port)
+  assert(await a_vcon.write_dialog_inline_body_async(0, writer, 8192) == len(recording))
+  writer.write_eof()
+  await reader.read()
+  writer.close()
+  server.close()
+  await server.wait_closed()
+  assert(received == recording)
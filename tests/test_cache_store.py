@@ -0,0 +1,80 @@
+""" Unit tests for the key/value stores of the plugin caches """
+import os
+import time
+import pytest
+import vcon.filter_plugins.impl.cache_store
+
+cache_store = vcon.filter_plugins.impl.cache_store
+
+VALUE = {"choices": [{"message": {"role": "assistant", "content": "a summary"}}], "usage": {"total_tokens": 42}}
+
+
+@pytest.mark.parametrize("file_name", ["cache.db", "cache"])
+def test_store(tmp_path, file_name):
+  location = str(tmp_path / "cache_dir" / file_name)
+  store = cache_store.open_store(location, "responses")
+  # shared by all users of the location
+  assert(cache_store.open_store(location, "responses") is store)
+  assert(cache_store.open_store(location, "transcripts") is not store)
+  assert(cache_store.open_store("", "responses") is None)
+  if(file_name.endswith(".db")):
+    assert(isinstance(store, cache_store.SqliteCacheStore))
+  else:
+    assert(isinstance(store, cache_store.DirectoryCacheStore))
+
+  assert(store.get("a" * 64) is None)
+  store.set("a" * 64, VALUE)
+  assert(store.get("a" * 64) == VALUE)
+  store.set("plugin/options/hash", "transcript")
+  assert(store.get("plugin/options/hash") == "transcript")
+  assert(store.get("plugin/other/hash") is None)
+  assert(store.stats() == {"hits": 2, "misses": 2, "evictions": 0, "hit_ratio": 0.5})
+
+  # persisted, readable by another process
+  if(file_name.endswith(".db")):
+    other = cache_store.SqliteCacheStore(location, "responses", 0.0, 0)
+  else:
+    other = cache_store.DirectoryCacheStore(location, 0.0, 0)
+  assert(other.get("a" * 64) == VALUE)
+  assert(other.get("plugin/options/hash") == "transcript")
+
+
+@pytest.mark.parametrize("file_name", ["cache.db", "cache"])
+def test_ttl(tmp_path, file_name):
+  store = cache_store.open_store(str(tmp_path / file_name), "responses", 0.2, 0)
+  store.set("b" * 64, VALUE)
+  assert(store.get("b" * 64) == VALUE)
+  time.sleep(0.3)
+  assert(store.get("b" * 64) is None)
+  assert(store.evictions == 1)
+  assert(store.get("b" * 64) is None)
+  assert(store.evictions == 1)
+
+
+def test_sqlite_lru_eviction(tmp_path):
+  store = cache_store.open_store(str(tmp_path / "cache.sqlite"), "responses", 0.0, 3)
+  for index in range(3):
+    store.set(str(index) * 64, {"index": index})
+    time.sleep(0.01)
+  # 0 is used, so 1 is the least recently used
+  assert(store.get("0" * 64) == {"index": 0})
+  store.set("3" * 64, {"index": 3})
+  assert(store.evictions == 1)
+  assert(store.get("1" * 64) is None)
+  for index in (0, 2, 3):
+    assert(store.get(str(index) * 64) == {"index": index})
+
+
+def test_directory_lru_eviction(tmp_path):
+  store = cache_store.open_store(str(tmp_path / "cache"), "responses", 0.0, 3)
+  for index in range(5):
+    store.set(str(index) * 64, {"index": index})
+    os.utime(store._file_name(str(index) * 64), (1000 + index, 1000 + index))
+  # 1 is used, so 0 and 2 are the least recently used
+  assert(store.get("1" * 64) == {"index": 1})
+  store.evict()
+  assert(store.evictions == 2)
+  assert(store.get("0" * 64) is None)
+  assert(store.get("2" * 64) is None)
+  for index in (1, 3, 4):
+    assert(store.get(str(index) * 64) == {"index": index})
@@ -0,0 +1,141 @@
+""" Unit tests for token budgeted chat message windows and OpenAIChatCompletion map-reduce """
+import pytest
+import vcon
+import vcon.filter_plugins.impl.chat_windows
+import vcon.filter_plugins.impl.openai
+
+chat_windows = vcon.filter_plugins.impl.chat_windows
+
+
+def message(content: str) -> dict:
+  return({"role": "user", "content": content})
+
+
+def test_context_window():
+  assert(chat_windows.context_window("gpt-4") == 8192)
+  assert(chat_windows.context_window("gpt-4-0613") == 8192)
+  assert(chat_windows.context_window("gpt-4-32k-0613") == 32768)
+  assert(chat_windows.context_window("gpt-3.5-turbo-16k") == 16384)
+  assert(chat_windows.context_window("unknown-model") == chat_windows.DEFAULT_CONTEXT_WINDOW)
+
+
+def test_split_text():
+  text = " ".join(["word{}".format(index) for index in range(200)])
+  parts = chat_windows.split_text(text, 20, "gpt-4")
+  assert(len(parts) > 1)
+  assert("".join(parts) == text)
+  for part in parts:
+    assert(chat_windows.count_tokens(part, "gpt-4") <= 20)
+
+  assert(chat_windows.split_text("", 20, "gpt-4") == [""])
+  with pytest.raises(ValueError):
+    chat_windows.split_text(text, 0, "gpt-4")
+
+
+def test_one_window():
+  messages = [message("hello {}".format(index)) for index in range(5)]
+  windows = chat_windows.token_windows(messages, 1000, 100, "gpt-4")
+  assert(windows == [messages])
+
+
+def test_windows_budget_and_overlap():
+  messages = [message("message number {:02d} ".format(index) * 5) for index in range(40)]
+  tokens = chat_windows.message_tokens(messages[0], "gpt-4")
+  budget = tokens * 6
+  overlap = tokens * 2
+  windows = chat_windows.token_windows(messages, budget, overlap, "gpt-4")
+  assert(len(windows) > 1)
+
+  for window in windows:
+    assert(sum(chat_windows.message_tokens(msg, "gpt-4") for msg in window) <= budget)
+
+  # consecutive windows share the overlap messages
+  for previous, window in zip(windows[:-1], windows[1:]):
+    assert(window[:2] == previous[-2:])
+
+  # all messages in order, each in at least one window
+  seen = []
+  for window in windows:
+    for msg in window:
+      if(msg not in seen):
+        seen.append(msg)
+  assert(seen == messages)
+
+  # no overlap
+  windows = chat_windows.token_windows(messages, budget, 0, "gpt-4")
+  assert([msg for window in windows for msg in window] == messages)
+
+  with pytest.raises(ValueError):
+    chat_windows.token_windows(messages, budget, budget, "gpt-4")
+
+
+def test_long_message_split():
+  long_message = message("a long monologue " * 200)
+  windows = chat_windows.token_windows([message("hi"), long_message, message("bye")], 100, 0, "gpt-4")
+  assert(len(windows) > 2)
+  for window in windows:
+    assert(sum(chat_windows.message_tokens(msg, "gpt-4") for msg in window) <= 100)
+  assert("".join(msg["content"] for window in windows for msg in window) ==
+    "hi" + long_message["content"] + "bye")
+
+
+def build_vcon(num_dialogs: int) -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  a_vcon.set_party_parameter("name", "Alice")
+  a_vcon.set_party_parameter("name", "Bob")
+  for index in range(num_dialogs):
+    a_vcon.add_dialog_inline_text(
+      "this is chat message number {} about the billing problem".format(index),
+      "2023-03-06T20:{:02d}:00+00:00".format(index % 60),
+      0,
+      [index % 2, (index + 1) % 2],
+      vcon.Vcon.MIMETYPE_TEXT_PLAIN
+      )
+  return(a_vcon)
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_map_reduce(monkeypatch):
+  """ Test OpenAIChatCompletion splits a long conversation and combines the answers """
+  calls = []
+  async def acreate(**kwargs):
+    calls.append(kwargs)
+    return({"choices": [{"message": {"role": "assistant", "content": "answer {}".format(len(calls))}}]})
+  monkeypatch.setattr(vcon.filter_plugins.impl.openai.openai.ChatCompletion, "acreate", acreate)
+
+  plugin = vcon.filter_plugins.impl.openai.OpenAIChatCompletion(
+    vcon.filter_plugins.impl.openai.OpenAIChatCompletionInitOptions(openai_api_key = "key")
+    )
+
+  # fits in the context window, one completion
+  in_vcon = build_vcon(10)
+  options = vcon.filter_plugins.impl.openai.OpenAIChatCompletionOptions(model = "gpt-4")
+  out_vcon = await plugin.filter(in_vcon, options)
+  assert(len(calls) == 1)
+  assert(plugin.last_stats["num_windows"] == 1)
+  assert(len(calls[0]["messages"]) == 12)
+  assert(calls[0]["messages"][-1]["content"] == options.prompt)
+  assert(out_vcon.analysis[0]["body"] == "answer 1")
+
+  # split into windows, then reduced
+  calls.clear()
+  in_vcon = build_vcon(60)
+  options = vcon.filter_plugins.impl.openai.OpenAIChatCompletionOptions(
+    model = "gpt-4",
+    chunk_tokens = 200,
+    chunk_overlap_tokens = 40
+    )
+  out_vcon = await plugin.filter(in_vcon, options)
+  num_windows = plugin.last_stats["num_windows"]
+  assert(num_windows > 2)
+  assert(len(calls) == num_windows + 1)
+  for call in calls[:-1]:
+    assert(sum(chat_windows.message_tokens(msg, "gpt-4") for msg in call["messages"][:-3]) <= 200)
+    assert(call["messages"][-1]["content"] == options.prompt)
+  reduce_messages = calls[-1]["messages"]
+  assert(len(reduce_messages) == num_windows + 2)
+  assert(options.prompt in reduce_messages[-1]["content"])
+  assert(reduce_messages[0]["content"].endswith("answer 1"))
+  assert(len(out_vcon.analysis) == 1)
+  assert(out_vcon.analysis[0]["body"] == "answer {}".format(num_windows + 1))
+  assert(out_vcon.analysis[0]["dialog"] == list(range(60)))
@@ -0,0 +1,187 @@
+""" Unit tests of the Deepgram plugin's pooled, retrying HTTP requests using a local stand-in server """
+import json
+import time
+import asyncio
+import pytest
+import pytest_httpserver
+import httpx
+import vcon
+import vcon.filter_plugins.impl.http_client
+import vcon.filter_plugins.impl.deepgram
+from tests.deepgram_stand_in import DeepgramStandIn, TRANSCRIPT
+
+RECORDING = b"RIFF not really a wav" * 50
+
+
+def make_plugin(stand_in: DeepgramStandIn, **init_options) -> vcon.filter_plugins.impl.deepgram.Deepgram:
+  plugin = vcon.filter_plugins.impl.deepgram.Deepgram(vcon.filter_plugins.impl.deepgram.DeepgramInitOptions(
+    deepgram_key = "stand_in_key",
+    api_url = stand_in.url,
+    **init_options
+    ))
+  # fast retries for the tests
+  plugin._http_client.backoff_base = 0.01
+  return(plugin)
+
+
+def recording_vcon(dialog_count: int) -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  for index in range(dialog_count):
+    a_vcon.add_dialog_inline_recording(RECORDING, "2023-01-01T00:00:00Z", 10, [0], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  return(a_vcon)
+
+
+@pytest.mark.asyncio
+async def test_deepgram_stand_in_transcribe():
+  with DeepgramStandIn() as stand_in:
+    plugin = make_plugin(stand_in)
+    a_vcon = recording_vcon(3)
+    await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions())
+
+  assert(len(a_vcon.analysis) == 3)
+  for index, analysis in enumerate(a_vcon.analysis):
+    assert(analysis["dialog"] == index)
+    assert(analysis["vendor"] == "deepgram")
+    assert(analysis["body"]["results"]["channels"][0]["alternatives"][0]["transcript"] == TRANSCRIPT)
+    assert(analysis["body"]["metadata"]["content_length"] == len(RECORDING))
+
+  headers, params, body, client = stand_in.requests[0]
+  assert(headers["authorization"] == "Token stand_in_key")
+  assert(headers["content-type"] == vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  assert(params["model"] == "nova")
+  assert(body == RECORDING)
+  # the connections are kept alive and reused
+  assert(stand_in.connections() <= 3)
+
+  # another vCon reuses the connections
+  with DeepgramStandIn() as stand_in:
+    plugin = make_plugin(stand_in)
+    for _ in range(3):
+      await plugin.filter(recording_vcon(1), vcon.filter_plugins.impl.deepgram.DeepgramOptions())
+  assert(len(stand_in.requests) == 3)
+  assert(stand_in.connections() == 1)
+
+
+@pytest.mark.asyncio
+async def test_deepgram_retries():
+  with DeepgramStandIn(failures = [429, 503]) as stand_in:
+    plugin = make_plugin(stand_in)
+    a_vcon = recording_vcon(1)
+    await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions())
+  assert(len(stand_in.requests) == 3)
+  assert(len(a_vcon.analysis) == 1)
+
+  # not retried
+  with DeepgramStandIn(failures = [400]) as stand_in:
+    plugin = make_plugin(stand_in)
+    with pytest.raises(Exception, match = "failed: 400"):
+      await plugin.filter(recording_vcon(1), vcon.filter_plugins.impl.deepgram.DeepgramOptions())
+  assert(len(stand_in.requests) == 1)
+
+  # retries run out
+  with DeepgramStandIn(failures = [500] * 3) as stand_in:
+    plugin = make_plugin(stand_in, max_retries = 1)
+    with pytest.raises(Exception, match = "failed: 500"):
+      await plugin.filter(recording_vcon(1), vcon.filter_plugins.impl.deepgram.DeepgramOptions())
+  assert(len(stand_in.requests) == 2)
+
+
+@pytest.mark.asyncio
+async def test_retry_after_and_deadline():
+  with DeepgramStandIn(failures = [429], retry_after = "0.3") as stand_in:
+    client = vcon.filter_plugins.impl.http_client.RetryingHttpClient(backoff_base = 0.01)
+    start = time.monotonic()
+    response = await client.request("POST", stand_in.url, content = b"x", headers = {"Authorization": "Token k"})
+    assert(response.status_code == 200)
+    # waited as long as Retry-After asked
+    assert(time.monotonic() - start >= 0.3)
+
+    # no time to wait for the retry, the failed response is returned
+    stand_in.failures = [429]
+    response = await client.request("POST", stand_in.url, content = b"x", deadline = 0.2,
+      headers = {"Authorization": "Token k"})
+    assert(response.status_code == 429)
+
+    stand_in.latency = 0.5
+    with pytest.raises(vcon.filter_plugins.impl.http_client.DeadlineExceeded):
+      await client.request("POST", stand_in.url, content = b"x", deadline = 0.1,
+        headers = {"Authorization": "Token k"})
+    await client.aclose()
+    stopped_url = stand_in.url
+
+  # network errors are retried, then raised
+  client = vcon.filter_plugins.impl.http_client.RetryingHttpClient(max_retries = 2, backoff_base = 0.01)
+  with pytest.raises(httpx.TransportError):
+    await client.request("POST", stopped_url, content = b"x")
+
+
+@pytest.mark.asyncio
+async def test_bounded_concurrency():
+  with DeepgramStandIn(latency = 0.2) as stand_in:
+    plugin = make_plugin(stand_in, max_connections = 2)
+    a_vcon = recording_vcon(4)
+    start = time.monotonic()
+    await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions(max_concurrent_dialogs = 4))
+    elapsed = time.monotonic() - start
+
+  assert(len(a_vcon.analysis) == 4)
+  # 4 requests, 2 at a time
+  assert(0.4 <= elapsed < 0.8)
+  assert(stand_in.connections() == 2)
+
+
+def external_vcon(url: str, body: bytes = RECORDING, sign_type: str = "SHA-512") -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  a_vcon.add_dialog_external_recording(body, "2023-01-01T00:00:00Z", 10, [0], url,
+    vcon.Vcon.MIMETYPE_AUDIO_WAV, sign_type = sign_type)
+  return(a_vcon)
+
+
+@pytest.mark.asyncio
+async def test_external_recordings_stream(httpserver: pytest_httpserver.HTTPServer):
+  recording = RECORDING * 1000
+  httpserver.expect_request("/recording.wav", method = "GET").respond_with_data(recording, content_type = "audio/x-wav")
+  url = httpserver.url_for("/recording.wav")
+
+  with DeepgramStandIn(failures = [503]) as stand_in:
+    plugin = make_plugin(stand_in)
+    a_vcon = external_vcon(url, recording)
+    await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions(external_recordings = "stream"))
+
+    assert(len(a_vcon.analysis) == 1)
+    # the download is streamed again for the retry
+    assert(len(stand_in.requests) == 2)
+    headers, params, body, client = stand_in.requests[-1]
+    assert(headers["transfer-encoding"] == "chunked")
+    assert(body == recording)
+    assert(len(httpserver.log) == 2)
+
+    # signature does not match, the upload is aborted
+    a_vcon = external_vcon(url, b"some other recording")
+    with pytest.raises(vcon.InvalidVconHash):
+      await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions(external_recordings = "stream"))
+    assert(len(a_vcon.analysis) == 0)
+    # wait for the stand in to see the closed connection
+    for _ in range(50):
+      if(stand_in.aborted > 0):
+        break
+      await asyncio.sleep(0.01)
+    assert(stand_in.aborted == 1)
+    assert(len(stand_in.requests) == 2)
+
+
+@pytest.mark.asyncio
+async def test_external_recordings_url():
+  url = "https://example.com/not_fetched.wav"
+  with DeepgramStandIn() as stand_in:
+    plugin = make_plugin(stand_in)
+    a_vcon = external_vcon(url)
+    await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions(external_recordings = "url"))
+
+    assert(len(a_vcon.analysis) == 1)
+    headers, params, body, client = stand_in.requests[0]
+    assert(headers["content-type"] == "application/json")
+    assert(json.loads(body) == {"url": url})
+
+    with pytest.raises(Exception, match = "external_recordings"):
+      await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions(external_recordings = "upload"))
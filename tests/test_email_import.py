@@ -0,0 +1,80 @@
+""" Unit tests for bulk import of mbox and maildir email into vCons """
+import glob
+import mailbox
+import pytest
+import vcon
+import vcon.email_import
+
+EMAIL_FILES = sorted(glob.glob("tests/email_*.txt"))
+
+OTHER_THREAD = [
+  "From: Carol <c@example.com>\r\nTo: Dave <d@example.com>\r\nSubject: Lunch\r\n"
+  "Date: Mon, 2 Jan 2023 12:00:00 +0000\r\nMessage-ID: <lunch-1@example.com>\r\n\r\nNoon?\r\n",
+  "From: Dave <d@example.com>\r\nTo: Carol <c@example.com>\r\nSubject: Re: Lunch\r\n"
+  "Date: Mon, 2 Jan 2023 12:05:00 +0000\r\nMessage-ID: <lunch-2@example.com>\r\n"
+  "In-Reply-To: <lunch-1@example.com>\r\n\r\nSure\r\n",
+  # No Date, cannot be added as a dialog
+  "From: Dave <d@example.com>\r\nTo: Carol <c@example.com>\r\nSubject: Re: Lunch\r\n"
+  "Message-ID: <lunch-3@example.com>\r\nReferences: <lunch-1@example.com> <lunch-2@example.com>\r\n\r\n?\r\n",
+  ]
+
+
+def email_messages():
+  messages = []
+  for file_name in EMAIL_FILES:
+    with open(file_name, "r") as smtp_message_file:
+      messages.append(smtp_message_file.read())
+  # reply is listed before the message it replies to
+  messages.insert(1, OTHER_THREAD[1])
+  messages.append(OTHER_THREAD[0])
+  messages.append(OTHER_THREAD[2])
+  return(messages)
+
+
+def test_group_threads():
+  threads = vcon.email_import.group_threads(email_messages())
+  assert(len(threads) == 2)
+  assert(len(threads[0]) == len(EMAIL_FILES))
+  assert(threads[1][0] == OTHER_THREAD[0])
+  assert(threads[1][1] == OTHER_THREAD[1])
+  # no Date sorts last
+  assert(threads[1][2] == OTHER_THREAD[2])
+
+
+def check_vcons(vcons):
+  assert(len(vcons) == 2)
+  assert(len(vcons[0].dialog) == len(EMAIL_FILES))
+  starts = [dialog["start"] for dialog in vcons[0].dialog]
+  assert(starts == sorted(starts))
+  assert(vcons[0].subject == "Account problem")
+
+  assert(len(vcons[1].dialog) == 2)
+  assert(vcons[1].subject == "Lunch")
+  assert(len(vcons[1].parties) == 2)
+  assert(vcons[1].uuid != vcons[0].uuid)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_import_mbox(tmp_path, max_workers):
+  mbox_path = str(tmp_path / "test.mbox")
+  box = mailbox.mbox(mbox_path)
+  for message in email_messages():
+    box.add(message)
+  box.close()
+
+  vcons = list(vcon.email_import.import_mailbox(mbox_path, "py-vcon.org", max_workers = max_workers))
+  check_vcons(vcons)
+
+
+def test_import_maildir(tmp_path):
+  maildir_path = str(tmp_path / "maildir")
+  box = mailbox.Maildir(maildir_path)
+  for message in email_messages():
+    box.add(message)
+  box.close()
+
+  vcons = list(vcon.email_import.import_mailbox(maildir_path, "py-vcon.org", max_workers = 1))
+  # maildir does not preserve message order, so match threads by subject
+  vcons.sort(key = lambda a_vcon: a_vcon.subject != "Account problem")
+  check_vcons(vcons)
+
@@ -0,0 +1,161 @@
+""" Unit tests for FilterChain and sharing of decoded dialog bodies and text between filters """
+import asyncio
+import pytest
+import vcon
+import vcon.dialog_cache
+import vcon.filter_plugins
+
+RECORDING = b"fake recording " * 1000
+
+
+class RecordingSizeInitOptions(vcon.filter_plugins.FilterPluginInitOptions):
+  pass
+
+
+class RecordingSizeOptions(vcon.filter_plugins.FilterPluginOptions):
+  analysis_type: str = "size"
+
+
+class RecordingSize(vcon.filter_plugins.FilterPlugin):
+  """ Test plugin which adds the size of each recording as analysis """
+  init_options_type = RecordingSizeInitOptions
+
+  def __init__(self, options):
+    super().__init__(options, RecordingSizeOptions)
+
+  async def filter(self, in_vcon, options):
+    for dialog_index, dialog in enumerate(in_vcon.dialog):
+      if(dialog["type"] == "recording"):
+        body = await in_vcon.get_dialog_body(dialog_index)
+        in_vcon.add_analysis(dialog_index, options.analysis_type, str(len(body)))
+    return(in_vcon)
+
+
+class DialogTextInitOptions(vcon.filter_plugins.FilterPluginInitOptions):
+  pass
+
+
+class DialogTextOptions(vcon.filter_plugins.FilterPluginOptions):
+  pass
+
+
+class DialogText(vcon.filter_plugins.FilterPlugin):
+  """ Test plugin which adds the text of each dialog as analysis, modifying the returned text dicts """
+  init_options_type = DialogTextInitOptions
+
+  def __init__(self, options):
+    super().__init__(options, DialogTextOptions)
+
+  async def filter(self, in_vcon, options):
+    for dialog_index, dialog in enumerate(in_vcon.dialog):
+      texts = await in_vcon.get_dialog_text(dialog_index)
+      for text_dict in texts:
+        assert("content" not in text_dict)
+        text_dict["content"] = "said: " + text_dict["text"]
+      in_vcon.add_analysis(dialog_index, "text", " ".join(text_dict["content"] for text_dict in texts))
+    return(in_vcon)
+
+
+for plugin_name, class_name in (("test_recording_size", "RecordingSize"), ("test_dialog_text", "DialogText")):
+  vcon.filter_plugins.FilterPluginRegistry.register(
+    plugin_name,
+    "tests.test_filter_chain",
+    class_name,
+    "FilterChain test plugin",
+    {},
+    replace = True
+    )
+
+
+def make_vcon() -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  a_vcon.set_uuid("py-vcon.org")
+  a_vcon.add_dialog_inline_recording(RECORDING, "2023-01-02T03:04:05+00:00", 60.0, [0, 1],
+    vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  # Whisper format transcript so that get_dialog_text has a transcript to use
+  a_vcon.add_analysis_transcript(0,
+    {"text": "hello there", "segments": [{"start": 1.0, "end": 3.0}]},
+    "openai", "whisper_word_timestamps", product = "whisper")
+  return(a_vcon)
+
+
+@pytest.mark.asyncio
+async def test_filter_chain_shares_bodies_and_text():
+  chain = vcon.filter_plugins.FilterChain([
+    ("test_recording_size", {}),
+    ("test_recording_size", {"analysis_type": "size_again"}),
+    ("test_dialog_text", {}),
+    ("test_dialog_text", {})
+    ])
+  a_vcon = make_vcon()
+  timings = []
+  out_vcon = await chain.filter(a_vcon, timings)
+  assert(out_vcon is a_vcon)
+
+  assert([timing.name for timing in timings] == ["test_recording_size", "test_recording_size",
+    "test_dialog_text", "test_dialog_text"])
+  assert(all(timing.duration >= 0.0 for timing in timings))
+  assert(timings[0].cache_stats["body_misses"] == 1)
+  assert(timings[1].cache_stats["body_hits"] == 1)
+  assert(timings[1].cache_stats["body_misses"] == 0)
+  assert(timings[2].cache_stats["text_misses"] == 1)
+  assert(timings[3].cache_stats["text_hits"] == 1)
+
+  analysis_types = [(analysis["type"], analysis["body"]) for analysis in out_vcon.analysis[1:]]
+  assert(analysis_types == [("size", str(len(RECORDING))), ("size_again", str(len(RECORDING))),
+    ("text", "said: hello there"), ("text", "said: hello there")])
+
+  # cache is only set for the run
+  assert(a_vcon._dialog_cache is None)
+
+
+@pytest.mark.asyncio
+async def test_filter_chain_errors():
+  with pytest.raises(vcon.filter_plugins.FilterPluginNotRegistered):
+    vcon.filter_plugins.FilterChain([("not_a_registered_plugin", {})])
+
+  chain = vcon.filter_plugins.FilterChain([("test_recording_size", {}), ("test_dialog_text", {})])
+  a_vcon = make_vcon()
+  # second step fails as the transcript has no text
+  del a_vcon.analysis[0]["body"]
+  timings = []
+  with pytest.raises(KeyError):
+    await chain.filter(a_vcon, timings)
+  assert(len(timings) == 2)
+  assert(a_vcon._dialog_cache is None)
+
+
+@pytest.mark.asyncio
+async def test_filter_chain_concurrent_timings():
+  """ Test concurrent runs of a shared chain each get their own timings """
+  chain = vcon.filter_plugins.FilterChain([("test_recording_size", {}), ("test_dialog_text", {})])
+  timings = [[], [], []]
+  out_vcons = await asyncio.gather(*[chain.filter(make_vcon(), run_timings) for run_timings in timings])
+  for out_vcon, run_timings in zip(out_vcons, timings):
+    assert(len(out_vcon.analysis) == 3)
+    assert([timing.name for timing in run_timings] == ["test_recording_size", "test_dialog_text"])
+    assert(run_timings[0].cache_stats["body_misses"] == 1)
+
+
+def test_dialog_cache_invalidation():
+  cache = vcon.dialog_cache.DialogCache()
+  dialog = {"body": "YWJj", "encoding": "base64url"}
+  cache.set_body(0, dialog, b"abc")
+  assert(cache.get_body(0, dialog) == b"abc")
+  assert(cache.get_body(1, dialog) is None)
+  # body replaced
+  dialog["body"] = "ZGVm"
+  assert(cache.get_body(0, dialog) is None)
+
+  external = {"url": "https://example.com/recording.wav"}
+  cache.set_body(2, external, b"wav")
+  assert(cache.get_body(2, {"url": "https://example.com/recording.wav"}) == b"wav")
+  assert(cache.get_body(2, {"url": "https://example.com/other.wav"}) is None)
+
+  analysis = {"type": "transcript"}
+  cache.set_text(0, analysis, [{"text": "hi"}])
+  texts = cache.get_text(0, analysis)
+  texts[0]["text"] = "changed"
+  assert(cache.get_text(0, analysis) == [{"text": "hi"}])
+  assert(cache.get_text(0, {"type": "transcript"}) is None)
+  assert(cache.stats() == {"body_hits": 2, "body_misses": 3, "text_hits": 2, "text_misses": 1})
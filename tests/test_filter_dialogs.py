@@ -0,0 +1,120 @@
+""" Unit tests for concurrent per dialog filtering with FilterPlugin.filter_dialogs """
+import asyncio
+import threading
+import pytest
+import vcon
+import vcon.filter_plugins
+
+
+class SlowTranscribeInitOptions(vcon.filter_plugins.FilterPluginInitOptions):
+  pass
+
+
+class SlowTranscribeOptions(vcon.filter_plugins.TranscribeOptions):
+  pass
+
+
+class SlowTranscribe(vcon.filter_plugins.FilterPlugin):
+  """
+  Test transcriber for which the earlier dialogs take longer, so that they
+  complete in reverse dialog order.
+  """
+  init_options_type = SlowTranscribeInitOptions
+
+  def __init__(self, options):
+    super().__init__(options, SlowTranscribeOptions)
+    self.running = 0
+    self.max_running = 0
+    self.completed = []
+    self.fail_dialogs = []
+
+  async def transcribe_dialog(self, in_vcon, dialog_index, buffer):
+    self.running += 1
+    self.max_running = max(self.max_running, self.running)
+    try:
+      await asyncio.sleep(0.01 * (len(in_vcon.dialog) - dialog_index))
+      if(dialog_index in self.fail_dialogs):
+        raise RuntimeError("dialog: {} failed".format(dialog_index))
+      # two analysis per dialog to check that their order is kept
+      buffer.add_analysis_transcript(dialog_index, {"text": "dialog {}".format(dialog_index)}, "test", "test_transcript")
+      buffer.add_analysis(dialog_index, "summary", "summary {}".format(dialog_index), "test", "test_summary")
+      self.completed.append(dialog_index)
+    finally:
+      self.running -= 1
+
+  async def filter(self, in_vcon, options):
+    dialog_indices = self.slice_indices(options.input_dialogs, len(in_vcon.dialog), "input_dialogs")
+    await self.filter_dialogs(in_vcon, dialog_indices, self.transcribe_dialog, options.max_concurrent_dialogs)
+    return(in_vcon)
+
+
+def make_vcon(dialog_count: int) -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  for dialog_index in range(dialog_count):
+    a_vcon.add_dialog_inline_text("text {}".format(dialog_index), "2023-01-02T03:04:05+00:00", 0, 0, "text/plain")
+  return(a_vcon)
+
+
+def analysis_summary(a_vcon: vcon.Vcon):
+  return([(analysis["dialog"], analysis["type"]) for analysis in a_vcon.analysis])
+
+
+@pytest.mark.asyncio
+async def test_dialog_order():
+  plugin = SlowTranscribe(SlowTranscribeInitOptions())
+  a_vcon = make_vcon(5)
+  await plugin.filter(a_vcon, SlowTranscribeOptions(max_concurrent_dialogs = 5))
+
+  # completed in reverse order, but added in dialog order
+  assert(plugin.completed == [4, 3, 2, 1, 0])
+  assert(plugin.max_running == 5)
+  expected = []
+  for dialog_index in range(5):
+    expected.extend([(dialog_index, "transcript"), (dialog_index, "summary")])
+  assert(analysis_summary(a_vcon) == expected)
+  assert(a_vcon.analysis[0]["body"] == {"text": "dialog 0"})
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency():
+  plugin = SlowTranscribe(SlowTranscribeInitOptions())
+  a_vcon = make_vcon(6)
+  await plugin.filter(a_vcon, SlowTranscribeOptions(max_concurrent_dialogs = 2))
+  assert(plugin.max_running == 2)
+  assert(len(a_vcon.analysis) == 12)
+
+  # Same result serially
+  plugin = SlowTranscribe(SlowTranscribeInitOptions())
+  serial_vcon = make_vcon(6)
+  await plugin.filter(serial_vcon, SlowTranscribeOptions(max_concurrent_dialogs = 1))
+  assert(plugin.max_running == 1)
+  assert(plugin.completed == [0, 1, 2, 3, 4, 5])
+  assert(analysis_summary(serial_vcon) == analysis_summary(a_vcon))
+
+  with pytest.raises(Exception):
+    SlowTranscribeOptions(max_concurrent_dialogs = 0)
+
+
+@pytest.mark.asyncio
+async def test_dialog_failure():
+  plugin = SlowTranscribe(SlowTranscribeInitOptions())
+  plugin.fail_dialogs = [3, 1]
+  a_vcon = make_vcon(5)
+  with pytest.raises(RuntimeError, match = "dialog: 1 failed"):
+    await plugin.filter(a_vcon, SlowTranscribeOptions())
+
+  # the dialogs which succeeded are still added
+  assert([analysis["dialog"] for analysis in a_vcon.analysis] == [0, 0, 2, 2, 4, 4])
+
+
+@pytest.mark.asyncio
+async def test_run_blocking():
+  plugin = SlowTranscribe(SlowTranscribeInitOptions())
+  loop_thread = threading.get_ident()
+
+  def blocking(value, scale = 1):
+    return((threading.get_ident(), value * scale))
+
+  thread_id, result = await plugin.run_blocking(blocking, 3, scale = 2)
+  assert(result == 6)
+  assert(thread_id != loop_thread)
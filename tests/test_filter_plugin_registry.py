@@ -0,0 +1,154 @@
+""" Unit tests for lazy filter plugin registration from manifests and entry points """
+import sys
+import json
+import subprocess
+import pytest
+import vcon
+import vcon.filter_plugins
+
+FOO_MANIFEST = {
+  "plugins": {
+    "foo_manifest": {
+      "module": "tests.foo",
+      "class": "Foo",
+      "description": "Foo from a manifest",
+      "init_options": {"api_key": "default key", "size": "small"},
+      "init_options_env": {"api_key": "VCON_TEST_FOO_KEY"}
+    }
+  },
+  "type_defaults": {"foo_type": "foo_manifest"},
+  "transcript_accessors": [
+    {"vendor": "Foo", "product": "", "schema": "foo", "accessor": "vcon.accessors:TranscriptAccessor"}
+  ]
+}
+
+
+def test_import_does_not_load_plugin_modules():
+  # new interpreter as other tests load the plugins
+  code = "\n".join([
+    "import sys, vcon",
+    "names = sorted(vcon.filter_plugins.FilterPluginRegistry.get_names())",
+    "vcon.Vcon()",
+    "print(names)",
+    "print(sorted(m for m in sys.modules if m.startswith('vcon.filter_plugins.')))"
+    ])
+  result = subprocess.run([sys.executable, "-c", code], capture_output = True, text = True, check = True)
+  lines = result.stdout.strip().split("\n")
+  assert(lines[-2] == str(["deepgram", "openai_chat_completion", "openai_completion", "whisper"]))
+  assert(lines[-1] == "[]")
+  # no warning for plugins which are not used
+  assert("OPENAI_API_KEY" not in result.stderr)
+
+
+def test_load_manifest(tmp_path, monkeypatch):
+  manifest_path = tmp_path / "foo_manifest.json"
+  manifest_path.write_text(json.dumps(FOO_MANIFEST))
+  version = vcon.filter_plugins.FilterPluginRegistry.version()
+
+  names = vcon.filter_plugins.FilterPluginRegistry.load_manifest(str(manifest_path), True)
+  assert(names == ["foo_manifest"])
+  assert(vcon.filter_plugins.FilterPluginRegistry.version() > version)
+  assert(vcon.filter_plugins.FilterPluginRegistry.get_type_default_name("foo_type") == "foo_manifest")
+  assert(vcon.accessors.transcript_accessors[("foo", "", "foo")] is vcon.accessors.TranscriptAccessor)
+
+  # Vcon methods added for the new registrations
+  vcon.Vcon()
+  assert(isinstance(vcon.Vcon.__dict__["foo_manifest"], vcon.VconPluginMethodProperty))
+  assert(isinstance(vcon.Vcon.__dict__["foo_type"], vcon.VconPluginMethodProperty))
+
+  # init options from the environment when loaded
+  monkeypatch.setenv("VCON_TEST_FOO_KEY", "env key")
+  registration = vcon.filter_plugins.FilterPluginRegistry.get("foo_manifest")
+  plugin = registration.plugin()
+  assert(plugin._init_options.api_key == "env key")
+  assert(plugin._init_options.size == "small")
+
+  with pytest.raises(vcon.filter_plugins.FilterPluginAlreadyRegistered):
+    vcon.filter_plugins.FilterPluginRegistry.load_manifest(FOO_MANIFEST)
+
+  with pytest.raises(vcon.filter_plugins.InvalidFilterPluginManifest):
+    vcon.filter_plugins.FilterPluginRegistry.load_manifest({"plugins": {"bad": {"module": "tests.foo"}}})
+
+  manifest_path.write_text("not json")
+  with pytest.raises(vcon.filter_plugins.InvalidFilterPluginManifest):
+    vcon.filter_plugins.FilterPluginRegistry.load_manifest(str(manifest_path))
+
+
+class FakeEntryPoint():
+  def __init__(self, name, value):
+    self.name = name
+    self.value = value
+
+
+def test_discover(tmp_path, monkeypatch):
+  manifest = {"plugins": {"foo_env_manifest": FOO_MANIFEST["plugins"]["foo_manifest"]}}
+  manifest_path = tmp_path / "env_manifest.json"
+  manifest_path.write_text(json.dumps(manifest))
+  monkeypatch.setenv(vcon.filter_plugins.PLUGIN_MANIFESTS_ENV, str(manifest_path))
+
+  entry_points = [FakeEntryPoint("foo_entry_point", "tests.foo:Foo"),
+    # name conflict, ignored
+    FakeEntryPoint("whisper", "tests.foo:Foo")]
+  monkeypatch.setattr(vcon.filter_plugins, "_entry_points",
+    lambda group: entry_points if group == "vcon.filter_plugins" else [])
+
+  vcon.filter_plugins.FilterPluginRegistry.discover(True)
+  names = vcon.filter_plugins.FilterPluginRegistry.get_names()
+  assert("foo_env_manifest" in names)
+  assert("foo_entry_point" in names)
+  registration = vcon.filter_plugins.FilterPluginRegistry.get("foo_entry_point")
+  assert(registration._module_name == "tests.foo")
+  assert(registration._class_name == "Foo")
+  assert(registration.plugin() is not None)
+  assert(vcon.filter_plugins.FilterPluginRegistry.get("whisper")._module_name == "vcon.filter_plugins.impl.whisper")
+
+
+class CountedInitOptions(vcon.filter_plugins.FilterPluginInitOptions):
+  pass
+
+
+class CountedOptions(vcon.filter_plugins.FilterPluginOptions):
+  size: int = 1
+
+
+class Counted(vcon.filter_plugins.FilterPlugin):
+  """ Test plugin which counts its instantiations """
+  init_options_type = CountedInitOptions
+  options_type = CountedOptions
+  instances = 0
+
+  def __init__(self, options):
+    super().__init__(options, CountedOptions)
+    Counted.instances += 1
+
+
+def test_options_types_without_instantiation():
+  vcon.filter_plugins.FilterPluginRegistry.register("test_counted", "tests.test_filter_plugin_registry",
+    "Counted", "counts instances", {}, replace = True)
+  registration = vcon.filter_plugins.FilterPluginRegistry.get("test_counted")
+  assert(registration.get_init_options_type() is CountedInitOptions)
+  assert(registration.get_options_type() is CountedOptions)
+  assert(registration.options_type(size = 3).size == 3)
+  assert(Counted.instances == 0)
+
+  assert(isinstance(registration.plugin(), Counted))
+  assert(Counted.instances == 1)
+
+  # class without options_type is instantiated to get it
+  vcon.filter_plugins.FilterPluginRegistry.register("test_foo_options", "tests.foo",
+    "Foo", "no options_type", {}, replace = True)
+  registration = vcon.filter_plugins.FilterPluginRegistry.get("test_foo_options")
+  assert(registration.get_options_type().__name__ == "FooOptions")
+  assert(registration._plugin is not None)
+
+  vcon.filter_plugins.FilterPluginRegistry.register("test_missing_module", "tests.no_such_module",
+    "Missing", "module not found", {}, replace = True)
+  registration = vcon.filter_plugins.FilterPluginRegistry.get("test_missing_module")
+  with pytest.raises(vcon.filter_plugins.FilterPluginModuleNotFound):
+    registration.get_options_type()
+
+  vcon.filter_plugins.FilterPluginRegistry.register("test_missing_class", "tests.foo",
+    "Missing", "class not found", {}, replace = True)
+  registration = vcon.filter_plugins.FilterPluginRegistry.get("test_missing_class")
+  with pytest.raises(vcon.filter_plugins.FilterPluginClassNotFound):
+    registration.get_init_options_type()
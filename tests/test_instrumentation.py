@@ -0,0 +1,112 @@
+""" Unit tests for instrumentation of tagged Vcon methods """
+import pytest
+import vcon
+import vcon.instrumentation
+from tests.common_utils import call_data, empty_vcon, two_party_tel_vcon
+
+
+@pytest.fixture(scope="function")
+def registry():
+  registry = vcon.instrumentation.InMemoryRegistry()
+  vcon.instrumentation.enable(registry)
+  yield(registry)
+  vcon.instrumentation.disable()
+
+
+def test_disabled_has_no_wrappers():
+  original_dumps = vcon.Vcon.dumps
+  assert(not vcon.instrumentation.is_enabled())
+  assert(not hasattr(original_dumps, "__wrapped__"))
+
+  registry = vcon.instrumentation.InMemoryRegistry()
+  vcon.instrumentation.enable(registry)
+  assert(vcon.instrumentation.is_enabled())
+  assert(vcon.Vcon.dumps.__wrapped__ is original_dumps)
+  assert(vcon.Vcon.dumps._tag == "serialize")
+  # untagged methods are not instrumented
+  assert(not hasattr(vcon.Vcon.get_conversation_time, "__wrapped__"))
+
+  vcon.instrumentation.disable()
+  assert(vcon.Vcon.dumps is original_dumps)
+  assert(not vcon.instrumentation.is_enabled())
+
+
+@pytest.mark.asyncio
+async def test_in_memory_registry(registry, two_party_tel_vcon):
+  a_vcon = two_party_tel_vcon
+  a_vcon.set_uuid("py-vcon.org")
+  a_vcon.add_dialog_inline_text("hello", "2023-01-02T03:04:05+00:00", 0, [0], vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+  vcon_json = a_vcon.dumps()
+  a_vcon.dumps()
+
+  copy_vcon = vcon.Vcon()
+  copy_vcon.loads(vcon_json)
+  # async method
+  texts = await copy_vcon.get_dialog_text(0)
+  assert(texts[0]["text"] == "hello")
+
+  # error
+  with pytest.raises(AttributeError):
+    copy_vcon.set_uuid("py-vcon.org")
+
+  method_stats = registry.method_stats()
+  dumps_stats = method_stats[("serialize", "dumps")]
+  assert(dumps_stats.count == 2)
+  assert(dumps_stats.errors == 0)
+  assert(dumps_stats.payload.count == 2)
+  assert(dumps_stats.payload.sum == 2 * len(vcon_json))
+  assert(dumps_stats.latency.count == 2)
+
+  loads_stats = method_stats[("serialize", "loads")]
+  assert(loads_stats.count == 1)
+  assert(loads_stats.payload.sum == len(vcon_json))
+
+  assert(method_stats[("dialog", "get_dialog_text")].count == 1)
+  assert(method_stats[("meta", "set_uuid")].count == 2)
+  assert(method_stats[("meta", "set_uuid")].errors == 1)
+
+  category_stats = registry.category_stats()
+  assert(category_stats["serialize"].count == sum(stats.count for (tag, method), stats in
+    method_stats.items() if tag == "serialize"))
+
+  text = registry.prometheus_text()
+  assert('vcon_method_calls_total{tag="serialize",method="dumps"} 2' in text)
+  assert('vcon_method_errors_total{tag="meta",method="set_uuid"} 1' in text)
+  assert('vcon_method_duration_seconds_bucket{tag="serialize",method="dumps",le="+Inf"} 2' in text)
+  assert('vcon_method_payload_bytes_sum{tag="serialize",method="loads"} ' + str(len(vcon_json)) in text)
+
+  registry.reset()
+  assert(len(registry.method_stats()) == 0)
+
+
+def test_histogram():
+  histogram = vcon.instrumentation.Histogram((1, 10, 100))
+  for value in (0.5, 1, 5, 50, 500):
+    histogram.observe(value)
+  assert(histogram.cumulative_counts() == [("1", 2), ("10", 3), ("100", 4), ("+Inf", 5)])
+  assert(histogram.sum == 556.5)
+
+
+def test_open_telemetry(two_party_tel_vcon):
+  sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+  sdk_export = pytest.importorskip("opentelemetry.sdk.trace.export")
+  in_memory_export = pytest.importorskip("opentelemetry.sdk.trace.export.in_memory_span_exporter")
+
+  exporter = in_memory_export.InMemorySpanExporter()
+  provider = sdk_trace.TracerProvider()
+  provider.add_span_processor(sdk_export.SimpleSpanProcessor(exporter))
+
+  vcon.instrumentation.enable(vcon.instrumentation.OpenTelemetrySink(provider))
+  try:
+    two_party_tel_vcon.set_uuid("py-vcon.org")
+    two_party_tel_vcon.dumps()
+
+  finally:
+    vcon.instrumentation.disable()
+
+  spans = {span.name: span for span in exporter.get_finished_spans()}
+  assert("Vcon.dumps" in spans)
+  assert(spans["Vcon.dumps"].attributes["vcon.tag"] == "serialize")
+  assert(spans["Vcon.dumps"].attributes["vcon.payload_size"] > 100)
+  assert(spans["Vcon.set_uuid"].end_time >= spans["Vcon.set_uuid"].start_time)
+
@@ -5,6 +5,7 @@ import vcon
 import vcon.security
 import json
 import typing
+import io
 
 CA_CERT = "certs/fake_ca_root.crt"
 DIVISION_CERT = "certs/fake_div.crt"
@@ -242,3 +243,70 @@ def test_encrypt_decrypt_serialization(two_party_tel_vcon : vcon.Vcon) -> None:
 
   assert(reconstituted_unsigned_vcon.parties[0]['tel'] == call_data['source'])
   assert(reconstituted_unsigned_vcon.parties[1]['tel'] == call_data['destination'])
+
+
+@pytest.mark.parametrize("encryption", ["A256CBC-HS512", "A256GCM"])
+def test_stream_encrypt(encryption: str) -> None:
+  # Not a multiple of the chunk size, AES block size or base64 group size
+  plaintext = secrets.token_bytes(100003)
+  encryption_key = vcon.security.build_encryption_jwk_from_pem_file(DIVISION_CERT)
+
+  token_handle = io.BytesIO()
+  vcon.security.jwe_encrypt_stream(io.BytesIO(plaintext), token_handle, encryption_key, encryption, chunk_size = 4099)
+  jwe_compact_token = token_handle.getvalue().decode("utf-8")
+  assert(len(jwe_compact_token.split(".")) == 5)
+
+  # Compatible with the complete serialization conversions
+  jwe_complete_serialization = vcon.security.jwe_compact_token_to_complete_serialization(jwe_compact_token, enc = encryption)
+  assert(vcon.security.jwe_complete_serialization_to_compact_token(jwe_complete_serialization) == jwe_compact_token)
+
+  # jose can decrypt the streamed token
+  (header, signing_key) = vcon.security.build_signing_jwk_from_pem_files(DIVISION_PRIVATE_KEY, [DIVISION_CERT])
+  assert(jose.jwe.decrypt(jwe_compact_token, signing_key) == plaintext)
+
+  # stream decrypt with small chunks which split the separators
+  plaintext_handle = io.BytesIO()
+  vcon.security.jwe_decrypt_stream(io.BytesIO(jwe_compact_token.encode("utf-8")), plaintext_handle, signing_key, chunk_size = 1001)
+  assert(plaintext_handle.getvalue() == plaintext)
+
+  # tampered tag
+  tampered = jwe_compact_token[:-2] + ("AA" if jwe_compact_token[-2:] != "AA" else "BB")
+  try:
+    vcon.security.jwe_decrypt_stream(io.StringIO(tampered), io.BytesIO(), signing_key)
+    raise Exception("Should have raised InvalidJweTag")
+
+  except vcon.security.InvalidJweTag:
+    # expected
+    pass
+
+
+def test_stream_decrypt_jose_token() -> None:
+  plaintext = b"the quick brown fox" * 1000
+  encryption_key = vcon.security.build_encryption_jwk_from_pem_file(DIVISION_CERT)
+  jwe_compact_token = jose.jwe.encrypt(plaintext, encryption_key, "A256CBC-HS512", encryption_key['alg'])
+
+  (header, signing_key) = vcon.security.build_signing_jwk_from_pem_files(DIVISION_PRIVATE_KEY, [DIVISION_CERT])
+  plaintext_handle = io.BytesIO()
+  vcon.security.jwe_decrypt_stream(io.BytesIO(jwe_compact_token), plaintext_handle, signing_key, chunk_size = 64)
+  assert(plaintext_handle.getvalue() == plaintext)
+
+
+def test_vcon_encrypt_stream(two_party_tel_vcon : vcon.Vcon, tmp_path) -> None:
+  two_party_tel_vcon.sign(GROUP_PRIVATE_KEY, [GROUP_CERT, DIVISION_CERT, CA_CERT])
+  token_file_name = str(tmp_path / "encrypted.jwe")
+  two_party_tel_vcon.encrypt_stream(DIVISION_CERT, token_file_name, chunk_size = 64)
+  # Streaming does not change the state
+  assert(two_party_tel_vcon._state == vcon.VconStates.SIGNED)
+
+  with open(token_file_name, "r") as token_handle:
+    jwe_compact_token = token_handle.read()
+
+  # Load as an encrypted vCon and decrypt with the non-streaming path
+  encrypted_vcon = vcon.Vcon()
+  encrypted_vcon.loadd(vcon.security.jwe_compact_token_to_complete_serialization(jwe_compact_token, enc = "A256CBC-HS512"))
+  assert(encrypted_vcon._state == vcon.VconStates.ENCRYPTED)
+  encrypted_vcon.decrypt(DIVISION_PRIVATE_KEY, DIVISION_CERT)
+  assert(encrypted_vcon._state == vcon.VconStates.UNVERIFIED)
+  encrypted_vcon.verify([CA_CERT])
+  assert(encrypted_vcon.parties[0]['tel'] == call_data['source'])
+  assert(encrypted_vcon.parties[1]['tel'] == call_data['destination'])
@@ -0,0 +1,92 @@
+""" Unit tests for the common logging configuration """
+import io
+import json
+import logging
+import pytest
+import vcon
+import vcon.logging_utils
+
+
+@pytest.fixture(scope="function")
+def log_env(monkeypatch):
+  monkeypatch.delenv(vcon.logging_utils.LOG_LEVEL_ENV, raising = False)
+  monkeypatch.delenv(vcon.logging_utils.LOG_LEVELS_ENV, raising = False)
+  monkeypatch.setenv(vcon.logging_utils.LOGGING_CONFIG_ENV, "./no_such_logging.conf")
+  yield(monkeypatch)
+
+
+def test_log_levels(log_env):
+  assert(vcon.logging_utils.get_log_level("vcon") == logging.WARNING)
+  assert(vcon.logging_utils.get_log_level("vcon", "error") == logging.ERROR)
+
+  log_env.setenv(vcon.logging_utils.LOG_LEVEL_ENV, "info")
+  assert(vcon.logging_utils.get_log_level("vcon") == logging.INFO)
+  assert(vcon.logging_utils.get_log_level("vcon", "error") == logging.INFO)
+
+  # longest matching prefix wins
+  log_env.setenv(vcon.logging_utils.LOG_LEVELS_ENV,
+    "vcon.filter_plugins=ERROR, vcon.filter_plugins.impl.whisper=DEBUG")
+  assert(vcon.logging_utils.get_log_level("vcon.filter_plugins.impl.whisper") == logging.DEBUG)
+  assert(vcon.logging_utils.get_log_level("vcon.filter_plugins.impl.openai") == logging.ERROR)
+  assert(vcon.logging_utils.get_log_level("vcon.filter_plugins") == logging.ERROR)
+  assert(vcon.logging_utils.get_log_level("vcon.filter_pluginsx") == logging.INFO)
+  assert(vcon.logging_utils.get_log_level("vcon") == logging.INFO)
+
+  log_env.setenv(vcon.logging_utils.LOG_LEVELS_ENV, "vcon")
+  with pytest.raises(ValueError):
+    vcon.logging_utils.get_log_level("vcon")
+
+  with pytest.raises(ValueError):
+    vcon.logging_utils.to_level("LOUD")
+
+
+def test_build_logger(log_env):
+  log_env.setenv(vcon.logging_utils.LOG_LEVELS_ENV, "test_log_pkg.debug_module=DEBUG")
+  stream = io.StringIO()
+  logger = vcon.logging_utils.build_logger("test_log_pkg.debug_module", stream)
+  other_logger = vcon.logging_utils.build_logger("test_log_pkg.other_module", stream)
+  # building again does not add another handler
+  assert(vcon.logging_utils.build_logger("test_log_pkg.debug_module", stream) is logger)
+
+  package_logger = logging.getLogger("test_log_pkg")
+  assert(len(package_logger.handlers) == 1)
+  assert(len(logger.handlers) == 0)
+  assert(logger.level == logging.DEBUG)
+  assert(other_logger.level == logging.WARNING)
+
+  logger.debug("dialog: %d", 3)
+  other_logger.debug("not output: %d", 4)
+  other_logger.warning("warning: %s", "foo")
+
+  records = [json.loads(line) for line in stream.getvalue().splitlines()]
+  assert([record["message"] for record in records] == ["dialog: 3", "warning: foo"])
+  assert(records[0]["levelname"] == "DEBUG")
+
+
+def test_log_sampler(caplog):
+  logger = logging.getLogger("test_log_sampler")
+  logger.setLevel(logging.DEBUG)
+  sampler = vcon.logging_utils.LogSampler(logger, 3)
+
+  with caplog.at_level(logging.DEBUG, logger = "test_log_sampler"):
+    for index in range(7):
+      sampler.debug("item: %d", index)
+
+  messages = [record.getMessage() for record in caplog.records]
+  assert(messages == ["(sampled 1/3, #1) item: 0", "(sampled 1/3, #4) item: 3", "(sampled 1/3, #7) item: 6"])
+  # file and line of the caller, not LogSampler
+  assert(caplog.records[0].filename == "test_logging_utils.py")
+
+  # disabled level does not count
+  logger.setLevel(logging.INFO)
+  sampler.debug("item: %d", 7)
+  assert(next(sampler._counter) == 7)
+
+  with pytest.raises(ValueError):
+    vcon.logging_utils.LogSampler(logger, 0)
+
+
+def test_vcon_build_logger():
+  logger = vcon.build_logger("vcon.test_logging_utils")
+  assert(logger.name == "vcon.test_logging_utils")
+  assert(any(getattr(handler, "_vcon_handler", False) for handler in logging.getLogger("vcon").handlers))
@@ -0,0 +1,108 @@
+""" Unit tests for the lazily loaded, LRU unloaded filter plugin model pool """
+import time
+import concurrent.futures
+import vcon.filter_plugins.impl.model_pool
+
+MB = 1024 * 1024
+MODEL_MEMORY = {"tiny": 75 * MB, "base": 140 * MB, "small": 480 * MB}
+
+
+class FakeModel():
+  def __init__(self, name):
+    self.name = name
+    self.users = 0
+
+
+def make_pool(memory_budget: int = 0):
+  loads = []
+  unloads = []
+
+  def load(name):
+    loads.append(name)
+    time.sleep(0.01)
+    return(FakeModel(name))
+
+  pool = vcon.filter_plugins.impl.model_pool.ModelPool(
+    load,
+    lambda model: MODEL_MEMORY[model.name],
+    memory_budget,
+    lambda model: unloads.append(model.name)
+    )
+  return(pool, loads, unloads)
+
+
+def test_lazy_shared():
+  pool, loads, unloads = make_pool()
+  assert(pool.loaded() == {})
+
+  with pool.use("base") as model:
+    assert(model.name == "base")
+  with pool.use("base") as same_model:
+    assert(same_model is model)
+  assert(loads == ["base"])
+  assert(pool.loaded() == {"base": MODEL_MEMORY["base"]})
+
+  pool.clear()
+  assert(pool.loaded() == {})
+  assert(unloads == ["base"])
+
+
+def test_lru_unload():
+  pool, loads, unloads = make_pool(250 * MB)
+  for name in ("tiny", "base"):
+    with pool.use(name):
+      pass
+  # tiny is most recently used
+  with pool.use("tiny"):
+    pass
+  assert(list(pool.loaded().keys()) == ["base", "tiny"])
+
+  # small does not fit with the others, both are unloaded least recent first
+  with pool.use("small"):
+    assert(unloads == ["base", "tiny"])
+  assert(list(pool.loaded().keys()) == ["small"])
+
+  with pool.use("tiny"):
+    pass
+  assert(loads == ["tiny", "base", "small", "tiny"])
+
+  pool.set_memory_budget(100 * MB)
+  assert(list(pool.loaded().keys()) == ["tiny"])
+
+
+def test_in_use_not_unloaded():
+  pool, loads, unloads = make_pool(200 * MB)
+  with pool.use("base"):
+    with pool.use("tiny"):
+      # over budget, but both are in use
+      assert(unloads == [])
+    # tiny is the most recently used and base is still in use
+    assert(unloads == [])
+  # base is unloaded when no longer used, tiny is kept as the most recently used
+  assert(unloads == ["base"])
+  assert(list(pool.loaded().keys()) == ["tiny"])
+
+  # most recently used is kept even if it alone exceeds the budget
+  with pool.use("small"):
+    pass
+  assert(unloads == ["base", "tiny"])
+  assert(list(pool.loaded().keys()) == ["small"])
+
+
+def test_one_user_at_a_time():
+  pool, loads, unloads = make_pool()
+
+  def use(index):
+    with pool.use("base") as model:
+      model.users += 1
+      max_users = model.users
+      time.sleep(0.005)
+      model.users -= 1
+      return(max_users)
+
+  with concurrent.futures.ThreadPoolExecutor(8) as executor:
+    max_users = list(executor.map(use, range(16)))
+
+  # loaded once, used by one thread at a time
+  assert(loads == ["base"])
+  assert(max(max_users) == 1)
@@ -0,0 +1,154 @@
+""" Unit tests for the token bucket rate limiter and concurrent OpenAI completions """
+import time
+import asyncio
+import pytest
+import vcon
+import vcon.filter_plugins.impl.rate_limiter
+import vcon.filter_plugins.impl.openai
+
+rate_limiter = vcon.filter_plugins.impl.rate_limiter
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute():
+  # burst of a minute's worth, then 1 per 0.05 seconds
+  limiter = rate_limiter.TokenBucketRateLimiter(1200, 0)
+  start = time.monotonic()
+  for count in range(1200):
+    assert(await limiter.acquire(10) == 0.0)
+  assert(limiter.waits == 0)
+
+  waits = await asyncio.gather(*[limiter.acquire(10) for count in range(4)])
+  elapsed = time.monotonic() - start
+  # reserved first come, first served
+  assert(waits == sorted(waits))
+  assert(limiter.waits == 4)
+  assert(0.15 < elapsed < 0.5)
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute_and_release():
+  limiter = rate_limiter.TokenBucketRateLimiter(0, 6000)
+  assert(await limiter.acquire(6000) == 0.0)
+
+  # no tokens left, 100 tokens/second refill
+  start = time.monotonic()
+  wait = await limiter.acquire(20)
+  assert(0.1 < wait <= 0.2)
+  assert(time.monotonic() - start >= wait)
+
+  # unused tokens given back are available right away
+  await limiter.release(30)
+  assert(await limiter.acquire(20) == 0.0)
+
+  # releasing does not exceed the bucket size
+  await limiter.release(100000)
+  assert(await limiter.acquire(6000) == 0.0)
+  assert(await limiter.acquire(100) > 0.0)
+
+
+@pytest.mark.asyncio
+async def test_release_into_full_bucket():
+  limiter = rate_limiter.TokenBucketRateLimiter(60, 6000)
+  await limiter.release(500)
+  assert(limiter._tokens == 6000)
+  # no burst beyond a minute's worth
+  assert(await limiter.acquire(6000) == 0.0)
+  assert(await limiter.acquire(100) > 0.0)
+
+
+@pytest.mark.asyncio
+async def test_no_limit():
+  limiter = rate_limiter.TokenBucketRateLimiter(0, 0)
+  for count in range(100):
+    assert(await limiter.acquire(1000000) == 0.0)
+
+
+def test_shared_limiter():
+  limiter = rate_limiter.get_rate_limiter("test_service", 100, 1000)
+  assert(isinstance(limiter, rate_limiter.TokenBucketRateLimiter))
+  assert(rate_limiter.get_rate_limiter("test_service", 100, 1000, "") is limiter)
+  assert(rate_limiter.get_rate_limiter("test_service", 200, 1000) is not limiter)
+  assert(rate_limiter.get_rate_limiter("other_service", 100, 1000) is not limiter)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_completions(monkeypatch):
+  """ Test OpenAICompletion completes the dialogs concurrently, within the rate limit """
+  in_flight = 0
+  max_in_flight = 0
+  prompts = []
+  async def acreate(**kwargs):
+    nonlocal in_flight, max_in_flight
+    in_flight += 1
+    max_in_flight = max(max_in_flight, in_flight)
+    prompts.append(kwargs["prompt"])
+    await asyncio.sleep(0.05)
+    in_flight -= 1
+    return({"choices": [{"text": "summary of: " + kwargs["prompt"][-2:]}], "usage": {"total_tokens": 20}})
+  monkeypatch.setattr(vcon.filter_plugins.impl.openai.openai.Completion, "acreate", acreate)
+
+  in_vcon = vcon.Vcon()
+  in_vcon.set_uuid("py-vcon.org")
+  in_vcon.set_party_parameter("name", "Alice")
+  in_vcon.set_party_parameter("name", "Bob")
+  for index in range(40):
+    in_vcon.add_dialog_inline_text(
+      "message {:02d}".format(index),
+      "2023-03-06T20:07:{:02d}+00:00".format(index),
+      0,
+      [index % 2],
+      vcon.Vcon.MIMETYPE_TEXT_PLAIN
+      )
+  vcon_json = in_vcon.dumps()
+
+  plugin = vcon.filter_plugins.impl.openai.OpenAICompletion(
+    vcon.filter_plugins.impl.openai.OpenAICompletionInitOptions(
+      openai_api_key = "key",
+      requests_per_minute = 0,
+      tokens_per_minute = 0
+      )
+    )
+  start = time.monotonic()
+  out_vcon = await plugin.filter(in_vcon, vcon.filter_plugins.impl.openai.OpenAICompletionOptions(
+    max_concurrent_dialogs = 10
+    ))
+  assert(time.monotonic() - start < 1.0)
+  assert(len(prompts) == 40)
+  assert(max_in_flight == 10)
+  # analysis in dialog order
+  assert(len(out_vcon.analysis) == 40)
+  for index, analysis in enumerate(out_vcon.analysis):
+    assert(analysis["dialog"] == index)
+    assert(analysis["body"] == "summary of: {:02d}".format(index))
+
+  # a failed dialog does not lose the completions of the others
+  failing_acreate = acreate
+  async def acreate(**kwargs):
+    if(kwargs["prompt"].endswith("03")):
+      raise Exception("completion failed")
+    return(await failing_acreate(**kwargs))
+  monkeypatch.setattr(vcon.filter_plugins.impl.openai.openai.Completion, "acreate", acreate)
+  out_vcon = vcon.Vcon()
+  out_vcon.loads(vcon_json)
+  with pytest.raises(Exception, match = "completion failed"):
+    await plugin.filter(out_vcon, vcon.filter_plugins.impl.openai.OpenAICompletionOptions(input_dialogs = "0:6"))
+  assert([analysis["dialog"] for analysis in out_vcon.analysis] == [0, 1, 2, 4, 5])
+  monkeypatch.setattr(vcon.filter_plugins.impl.openai.openai.Completion, "acreate", failing_acreate)
+
+  # 600 requests/minute: 10 per second after a burst of 600
+  plugin = vcon.filter_plugins.impl.openai.OpenAICompletion(
+    vcon.filter_plugins.impl.openai.OpenAICompletionInitOptions(
+      openai_api_key = "key",
+      requests_per_minute = 600,
+      tokens_per_minute = 0
+      )
+    )
+  for count in range(600 - 5):
+    await plugin._rate_limiter.acquire(0)
+  prompts.clear()
+  start = time.monotonic()
+  out_vcon = await plugin.filter(in_vcon, vcon.filter_plugins.impl.openai.OpenAICompletionOptions(input_dialogs = "0:10"))
+  assert(len(prompts) == 10)
+  # 5 in the burst, 5 at 0.1 second intervals
+  assert(0.45 < time.monotonic() - start < 1.5)
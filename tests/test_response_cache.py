@@ -0,0 +1,62 @@
+""" Unit tests for the generative AI response cache """
+import pytest
+import vcon
+import vcon.filter_plugins.impl.response_cache
+import vcon.filter_plugins.impl.openai
+
+response_cache = vcon.filter_plugins.impl.response_cache
+
+
+def test_response_key():
+  messages = [{"role": "user", "content": "hello"}]
+  key = response_cache.response_key("gpt-4", "Summarize", 0.0, 100, messages)
+  assert(key == response_cache.response_key("gpt-4", "Summarize", 0.0, 100, [{"content": "hello", "role": "user"}]))
+  assert(key != response_cache.response_key("gpt-3.5-turbo", "Summarize", 0.0, 100, messages))
+  assert(key != response_cache.response_key("gpt-4", "Summarize briefly", 0.0, 100, messages))
+  assert(key != response_cache.response_key("gpt-4", "Summarize", 0.5, 100, messages))
+  assert(key != response_cache.response_key("gpt-4", "Summarize", 0.0, 200, messages))
+  assert(key != response_cache.response_key("gpt-4", "Summarize", 0.0, 100, [{"role": "user", "content": "hi"}]))
+
+
+@pytest.mark.asyncio
+async def test_openai_response_cache(tmp_path, monkeypatch):
+  """ Test a cached OpenAI response skips the API call """
+  calls = []
+  async def acreate(**kwargs):
+    calls.append(kwargs)
+    return({"choices": [{"message": {"role": "assistant", "content": "summary {}".format(len(calls))}}],
+      "usage": {"total_tokens": 20}})
+  monkeypatch.setattr(vcon.filter_plugins.impl.openai.openai.ChatCompletion, "acreate", acreate)
+
+  plugin = vcon.filter_plugins.impl.openai.OpenAIChatCompletion(
+    vcon.filter_plugins.impl.openai.OpenAIChatCompletionInitOptions(
+      openai_api_key = "key",
+      response_cache = str(tmp_path / "openai.db")
+      )
+    )
+
+  def build_vcon() -> vcon.Vcon:
+    a_vcon = vcon.Vcon()
+    a_vcon.set_party_parameter("name", "Alice")
+    a_vcon.set_party_parameter("name", "Bob")
+    a_vcon.add_dialog_inline_text("my bill is wrong", "2023-03-06T20:07:00+00:00", 0, [0], vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+    a_vcon.add_dialog_inline_text("let me fix it", "2023-03-06T20:08:00+00:00", 0, [1], vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+    return(a_vcon)
+
+  options = vcon.filter_plugins.impl.openai.OpenAIChatCompletionOptions(model = "gpt-4")
+  out_vcon = await plugin.filter(build_vcon(), options)
+  assert(len(calls) == 1)
+  assert(out_vcon.analysis[0]["body"] == "summary 1")
+
+  # same model, prompt and text
+  out_vcon = await plugin.filter(build_vcon(), options)
+  assert(len(calls) == 1)
+  assert(out_vcon.analysis[0]["body"] == "summary 1")
+  assert(plugin._response_cache.stats()["hits"] == 1)
+
+  # different prompt
+  options = vcon.filter_plugins.impl.openai.OpenAIChatCompletionOptions(model = "gpt-4", prompt = "What is the sentiment?")
+  out_vcon = await plugin.filter(build_vcon(), options)
+  assert(len(calls) == 2)
+  assert(out_vcon.analysis[0]["body"] == "summary 2")
+  assert(plugin._response_cache.stats()["misses"] == 2)
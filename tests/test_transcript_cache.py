@@ -0,0 +1,75 @@
+""" Unit tests for the transcription result cache keyed by recording content """
+import pytest
+import vcon
+import vcon.security
+import vcon.filter_plugins.impl.transcript_cache
+
+TRANSCRIPT = {"results": {"channels": [{"alternatives": [{"transcript": "hello there"}]}]}, "metadata": {}}
+
+
+def test_cache_key(tmp_path):
+  location = str(tmp_path / "cache" / "transcripts.db")
+  cache = vcon.filter_plugins.impl.transcript_cache.open_cache(location)
+  # shared by all users of the location
+  assert(vcon.filter_plugins.impl.transcript_cache.open_cache(location) is cache)
+  assert(vcon.filter_plugins.impl.transcript_cache.open_cache("") is None)
+
+  base = vcon.filter_plugins.impl.transcript_cache.options_hash({"model_size": "base", "language": "en"})
+  # option order does not matter
+  assert(base == vcon.filter_plugins.impl.transcript_cache.options_hash({"language": "en", "model_size": "base"}))
+  tiny = vcon.filter_plugins.impl.transcript_cache.options_hash({"model_size": "tiny", "language": "en"})
+  assert(base != tiny)
+
+  transcript_key = vcon.filter_plugins.impl.transcript_cache.transcript_key
+  assert(cache.get(transcript_key("hash1", "whisper", base)) is None)
+  cache.set(transcript_key("hash1", "whisper", base), TRANSCRIPT)
+  assert(cache.get(transcript_key("hash1", "whisper", base)) == TRANSCRIPT)
+  assert(cache.get(transcript_key("hash1", "whisper", tiny)) is None)
+  assert(cache.get(transcript_key("hash1", "deepgram", base)) is None)
+  assert(cache.get(transcript_key("hash2", "whisper", base)) is None)
+  assert((cache.hits, cache.misses) == (1, 4))
+
+
+@pytest.mark.asyncio
+async def test_dialog_content_hash():
+  body = b"not really audio" * 100
+  a_vcon = vcon.Vcon()
+  a_vcon.add_dialog_inline_recording(body, "2023-01-01T00:00:00Z", 10, [0], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  content_hash, hashed_body = await vcon.filter_plugins.impl.transcript_cache.dialog_content_hash(a_vcon, 0)
+  assert(content_hash == vcon.security.sha_512_hash(body))
+  assert(hashed_body == body)
+
+  # the SHA-512 signature of an external recording is used without fetching it
+  a_vcon.add_dialog_external_recording(body, "2023-01-01T00:00:00Z", 10, [0],
+    "https://example.com/no_such_recording.wav", vcon.Vcon.MIMETYPE_AUDIO_WAV)
+  content_hash, hashed_body = await vcon.filter_plugins.impl.transcript_cache.dialog_content_hash(a_vcon, 1)
+  assert(content_hash == vcon.security.sha_512_hash(body))
+  assert(hashed_body is None)
+
+
+@pytest.mark.asyncio
+async def test_deepgram_cache_hit(tmp_path):
+  import vcon.filter_plugins.impl.deepgram
+  location = str(tmp_path / "transcripts.db")
+  plugin = vcon.filter_plugins.impl.deepgram.Deepgram(
+    vcon.filter_plugins.impl.deepgram.DeepgramInitOptions(deepgram_key = "not_a_key", transcript_cache = location))
+
+  requests = []
+  async def request_transcribe(recording_data, transcribe_options):
+    requests.append(recording_data)
+    return(TRANSCRIPT)
+  plugin.request_transcribe = request_transcribe
+
+  body = b"same recording" * 100
+  for _ in range(2):
+    a_vcon = vcon.Vcon()
+    a_vcon.add_dialog_inline_recording(body, "2023-01-01T00:00:00Z", 10, [0], vcon.Vcon.MIMETYPE_AUDIO_WAV)
+    await plugin.filter(a_vcon, vcon.filter_plugins.impl.deepgram.DeepgramOptions())
+    assert(len(a_vcon.analysis) == 1)
+    assert(a_vcon.analysis[0]["body"] == TRANSCRIPT)
+    assert(a_vcon.analysis[0]["vendor"] == "deepgram")
+
+  # second vCon got the cached transcript
+  assert(len(requests) == 1)
+  cache = vcon.filter_plugins.impl.transcript_cache.open_cache(location)
+  assert((cache.hits, cache.misses) == (1, 1))
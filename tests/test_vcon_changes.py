@@ -0,0 +1,149 @@
+""" Unit tests for Vcon change tracking, JSON Patch and compact deltas """
+import json
+import pytest
+import vcon
+import vcon.changes
+from tests.common_utils import call_data, empty_vcon, two_party_tel_vcon
+
+
+def modify_vcon(a_vcon: vcon.Vcon) -> None:
+  a_vcon.set_party_parameter("name", "Alice", 0)
+  a_vcon.add_dialog_inline_text("hello", "2023-01-02T03:04:05+00:00", 0, [0], vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+  party_index = a_vcon.set_party_parameter("tel", "+15551234567")
+  a_vcon.set_party_parameter("name", "Carol", party_index)
+  a_vcon.add_analysis(0, "summary", "greeting", "py-vcon.org")
+  a_vcon.set_subject("first")
+  a_vcon.set_subject("second")
+
+
+def base_vcon_json(two_party_tel_vcon: vcon.Vcon) -> str:
+  two_party_tel_vcon.set_uuid("py-vcon.org")
+  vcon_json = two_party_tel_vcon.dumps()
+  two_party_tel_vcon.track_changes()
+  return(vcon_json)
+
+
+def test_changes_not_tracked_by_default(two_party_tel_vcon):
+  modify_vcon(two_party_tel_vcon)
+  assert(two_party_tel_vcon.get_changes() == [])
+  assert(len(two_party_tel_vcon._changes) == 0)
+
+  a_vcon = vcon.Vcon()
+  # lock is made on first use
+  assert(a_vcon._changes._lock is None)
+  with a_vcon.locked():
+    a_vcon.set_subject("tracked")
+  assert(a_vcon._changes._lock is not None)
+  assert(a_vcon.get_changes() == [])
+
+  a_vcon.track_changes()
+  a_vcon.set_subject("tracked")
+  assert(a_vcon.get_changes() == [{"op": "add", "path": "/subject", "value": "tracked"}])
+  a_vcon.track_changes(False)
+  a_vcon.set_subject("not tracked")
+  assert(a_vcon.get_changes() == [])
+
+
+def test_json_patch(two_party_tel_vcon):
+  a_vcon = two_party_tel_vcon
+  vcon_json = base_vcon_json(a_vcon)
+  assert(a_vcon.get_changes() == [])
+
+  modify_vcon(a_vcon)
+  patch = a_vcon.get_changes()
+  assert([(operation["op"], operation["path"]) for operation in patch] == [
+    ("add", "/parties/0/name"),
+    ("add", "/dialog/0"),
+    ("add", "/parties/2"),
+    ("add", "/parties/2/tel"),
+    ("add", "/parties/2/name"),
+    ("add", "/analysis/0"),
+    ("add", "/subject"),
+    ("add", "/subject")
+    ])
+
+  copy_vcon = vcon.Vcon()
+  copy_vcon.loads(vcon_json)
+  copy_vcon.apply_changes(json.loads(json.dumps(patch)))
+  assert(copy_vcon.dumpd() == a_vcon.dumpd())
+  # applied changes are not recorded
+  assert(copy_vcon.get_changes() == [])
+
+
+def test_compact_delta(two_party_tel_vcon):
+  a_vcon = two_party_tel_vcon
+  vcon_json = base_vcon_json(a_vcon)
+
+  modify_vcon(a_vcon)
+  delta = a_vcon.get_changes(True)
+  assert(delta["base_length"] == {"dialog": 0, "parties": 2, "analysis": 0})
+  assert(delta["append"]["parties"] == [{"tel": "+15551234567", "name": "Carol"}])
+  # sets on the appended party are in the appended party, only last subject
+  assert(delta["set"] == [[["parties", 0, "name"], "Alice"], [["subject"], "second"]])
+
+  copy_vcon = vcon.Vcon()
+  copy_vcon.loads(vcon_json)
+  copy_vcon.apply_changes(json.loads(json.dumps(delta)))
+  assert(copy_vcon.dumpd() == a_vcon.dumpd())
+
+  # applying again is a conflict as the arrays have grown
+  with pytest.raises(vcon.changes.VconPatchConflict):
+    copy_vcon.apply_changes(delta)
+
+  a_vcon.clear_changes()
+  assert(a_vcon.get_changes(True) == {"base_length": {}, "append": {}, "set": []})
+
+
+def test_load_clears_changes(two_party_tel_vcon):
+  vcon_json = base_vcon_json(two_party_tel_vcon)
+  loaded_vcon = vcon.Vcon()
+  loaded_vcon.track_changes()
+  loaded_vcon.set_subject("before load")
+  loaded_vcon.loads(vcon_json)
+  assert(len(loaded_vcon.get_changes()) == 0)
+
+  # Vcon with missing arrays
+  loaded_vcon = vcon.Vcon()
+  loaded_vcon.track_changes()
+  loaded_vcon.loads('{"vcon": "0.0.1", "uuid": "abc", "parties": []}')
+  loaded_vcon.add_analysis(0, "summary", "text")
+  assert(loaded_vcon.get_changes()[0] == {"op": "add", "path": "/analysis", "value": []})
+  assert(loaded_vcon.get_changes(True)["base_length"] == {"analysis": 0})
+
+
+def test_apply_json_patch():
+  document = {"parties": [{"tel": "1"}, {"tel": "2"}], "a/b": {"~c": 1}}
+  vcon.changes.apply_json_patch(document, [
+    {"op": "test", "path": "/a~1b/~0c", "value": 1},
+    {"op": "replace", "path": "/parties/0/tel", "value": "3"},
+    {"op": "add", "path": "/parties/-", "value": {"tel": "4"}},
+    {"op": "copy", "from": "/parties/2", "path": "/parties/0"},
+    {"op": "move", "from": "/a~1b", "path": "/moved"},
+    {"op": "remove", "path": "/parties/1"}
+    ])
+  assert(document == {"parties": [{"tel": "4"}, {"tel": "2"}, {"tel": "4"}], "moved": {"~c": 1}})
+
+  for bad_patch in [
+    [{"op": "test", "path": "/moved/~0c", "value": 2}],
+    [{"op": "add", "path": "/parties/9", "value": {}}],
+    [{"op": "remove", "path": "/nothing"}],
+    [{"op": "add", "path": "/parties/01", "value": {}}],
+    [{"op": "move", "from": "/moved", "path": "/moved/child"}],
+    [{"op": "frob", "path": "/parties"}],
+    [{"op": "add", "path": "parties"}]
+    ]:
+    with pytest.raises(vcon.changes.InvalidVconPatch):
+      vcon.changes.apply_json_patch(document, bad_patch)
+
+
+def test_pointers():
+  assert(vcon.changes.path_to_pointer(["a/b", "~c", 0]) == "/a~1b/~0c/0")
+  assert(vcon.changes.pointer_to_path("/a~1b/~0c/0") == ["a/b", "~c", "0"])
+  assert(vcon.changes.pointer_to_path("") == [])
+
+
+def test_signed_vcon_changes(two_party_tel_vcon):
+  base_vcon_json(two_party_tel_vcon)
+  two_party_tel_vcon.sign("certs/fake_grp.key", ["certs/fake_grp.crt", "certs/fake_div.crt", "certs/fake_ca_root.crt"])
+  with pytest.raises(vcon.InvalidVconState):
+    two_party_tel_vcon.apply_changes([])
@@ -0,0 +1,181 @@
+""" Unit tests for concurrent modification of a Vcon """
+import json
+import pickle
+import random
+import asyncio
+import threading
+import concurrent.futures
+import pytest
+import vcon
+import vcon.concurrency
+
+THREADS = 8
+ADDS_PER_THREAD = 200
+
+
+def run_threads(target, count = THREADS):
+  with concurrent.futures.ThreadPoolExecutor(count) as executor:
+    return(list(executor.map(target, range(count))))
+
+
+def test_concurrent_adds():
+  a_vcon = vcon.Vcon()
+  a_vcon.set_uuid("py-vcon.org")
+  a_vcon.track_changes()
+
+  def add(thread_index):
+    party_indices = []
+    for add_index in range(ADDS_PER_THREAD):
+      a_vcon.add_analysis(thread_index, "summary", "{}-{}".format(thread_index, add_index))
+      party_indices.append(a_vcon.set_party_parameter("name", "{}-{}".format(thread_index, add_index)))
+    return(party_indices)
+
+  party_indices = run_threads(add)
+
+  assert(len(a_vcon.analysis) == THREADS * ADDS_PER_THREAD)
+  assert(len(a_vcon.parties) == THREADS * ADDS_PER_THREAD)
+  # each new party got its own index and its own name
+  all_indices = [index for indices in party_indices for index in indices]
+  assert(sorted(all_indices) == list(range(THREADS * ADDS_PER_THREAD)))
+  for thread_index, indices in enumerate(party_indices):
+    for add_index, party_index in enumerate(indices):
+      assert(a_vcon.parties[party_index]["name"] == "{}-{}".format(thread_index, add_index))
+
+  # per thread order is preserved
+  for thread_index in range(THREADS):
+    bodies = [analysis["body"] for analysis in a_vcon.analysis if analysis["dialog"] == thread_index]
+    assert(bodies == ["{}-{}".format(thread_index, add_index) for add_index in range(ADDS_PER_THREAD)])
+
+  # change log is consistent with the data
+  copy_vcon = vcon.Vcon()
+  copy_vcon.loads(a_vcon.dumps())
+  copy_vcon.clear_changes()
+  copy_vcon.analysis.clear()
+  copy_vcon.parties.clear()
+  copy_vcon.apply_changes(a_vcon.get_changes())
+  assert(copy_vcon.dumpd() == a_vcon.dumpd())
+
+
+def test_uuid8_time_unique():
+  def make_uuids(thread_index):
+    return([vcon.Vcon.uuid8_time(thread_index) for count in range(1000)])
+
+  uuids = [uuid for thread_uuids in run_threads(make_uuids) for uuid in thread_uuids]
+  assert(len(set(uuids)) == len(uuids))
+  # uuids within a thread are increasing
+  for thread_index in range(THREADS):
+    thread_uuids = uuids[thread_index * 1000:(thread_index + 1) * 1000]
+    assert(thread_uuids == sorted(thread_uuids))
+
+
+def test_locked():
+  a_vcon = vcon.Vcon()
+  added = []
+
+  def add_if_missing(thread_index):
+    with a_vcon.locked():
+      if(len(a_vcon.analysis) == 0):
+        # reentrant
+        a_vcon.add_analysis(0, "summary", "first")
+        added.append(thread_index)
+
+  run_threads(add_if_missing)
+  assert(len(a_vcon.analysis) == 1)
+  assert(len(added) == 1)
+
+
+@pytest.mark.asyncio
+async def test_merge_analysis_deterministic():
+  results = []
+  for run in range(3):
+    a_vcon = vcon.Vcon()
+    a_vcon.set_uuid("py-vcon.org")
+    a_vcon.add_analysis(0, "existing", "before")
+
+    async def analyze(buffer):
+      await asyncio.sleep(random.random() / 100)
+      buffer.add_analysis(buffer.key, "summary", "summary {}".format(buffer.key), "py-vcon.org")
+      buffer.add_analysis_transcript(buffer.key, {"text": "transcript {}".format(buffer.key)}, "py-vcon.org")
+
+    # created out of key order, merged in key order
+    buffers = [vcon.concurrency.AnalysisBuffer(dialog_index) for dialog_index in (3, 1, 2, 0)]
+    await asyncio.gather(*[analyze(buffer) for buffer in buffers])
+    indices = a_vcon.merge_analysis(buffers)
+    assert(indices == list(range(1, 9)))
+    assert(all(len(buffer) == 0 for buffer in buffers))
+    results.append(json.dumps(a_vcon.analysis))
+
+  assert(len(set(results)) == 1)
+  assert([analysis["dialog"] for analysis in a_vcon.analysis] == [0, 0, 0, 1, 1, 2, 2, 3, 3])
+  assert([analysis["type"] for analysis in a_vcon.analysis[1:3]] == ["summary", "transcript"])
+
+
+def test_merge_same_key_creation_order():
+  a_vcon = vcon.Vcon()
+  first = vcon.concurrency.AnalysisBuffer()
+  second = vcon.concurrency.AnalysisBuffer()
+  second.add_analysis(0, "summary", "second")
+  first.add_analysis(0, "summary", "first")
+  a_vcon.merge_analysis([second, first])
+  assert([analysis["body"] for analysis in a_vcon.analysis] == ["first", "second"])
+
+  # validated on merge
+  signed_vcon = vcon.Vcon()
+  signed_vcon._state = vcon.VconStates.SIGNED
+  with pytest.raises(vcon.InvalidVconState):
+    signed_vcon.merge_analysis([first])
+
+
+def test_pickle_keeps_changes():
+  a_vcon = vcon.Vcon()
+  a_vcon.track_changes()
+  a_vcon.add_analysis(0, "summary", "pickled")
+  copy_vcon = pickle.loads(pickle.dumps(a_vcon))
+  assert(copy_vcon.get_changes() == a_vcon.get_changes())
+  assert(copy_vcon.locked() is not a_vcon.locked())
+  with copy_vcon.locked():
+    copy_vcon.add_analysis(0, "summary", "after")
+  assert(len(copy_vcon.get_changes()) == 2)
+
+
+@pytest.mark.asyncio
+async def test_batcher():
+  batches = []
+
+  async def run_batch(batch_key, items):
+    batches.append((batch_key, list(items)))
+    await asyncio.sleep(0)
+    return(["{}:{}".format(batch_key, item) for item in items])
+
+  batcher = vcon.concurrency.Batcher(run_batch, batch_size = 3, max_wait = 0.05)
+
+  # 5 items fill one batch of 3, the remaining 2 are run after max_wait
+  results = await asyncio.gather(*[batcher.submit(item, "en") for item in range(5)])
+  assert(results == ["en:0", "en:1", "en:2", "en:3", "en:4"])
+  assert(batches == [("en", [0, 1, 2]), ("en", [3, 4])])
+
+  # different keys are batched separately
+  batches.clear()
+  results = await asyncio.gather(batcher.submit("a", "en"), batcher.submit("b", "fr"), batcher.submit("c", "en"))
+  assert(results == ["en:a", "fr:b", "en:c"])
+  assert(sorted(batches) == [("en", ["a", "c"]), ("fr", ["b"])])
+
+
+@pytest.mark.asyncio
+async def test_batcher_error():
+  async def run_batch(batch_key, items):
+    raise RuntimeError("model failed")
+
+  batcher = vcon.concurrency.Batcher(run_batch, batch_size = 2, max_wait = 0.01)
+  results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions = True)
+  assert(all(isinstance(result, RuntimeError) for result in results))
+
+  async def short_batch(batch_key, items):
+    return(items[:-1])
+
+  batcher = vcon.concurrency.Batcher(short_batch, batch_size = 2, max_wait = 0.01)
+  with pytest.raises(RuntimeError, match = "returned: 1 results"):
+    await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+  with pytest.raises(ValueError):
+    vcon.concurrency.Batcher(short_batch, batch_size = 0, max_wait = 0.01)
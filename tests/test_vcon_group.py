@@ -0,0 +1,116 @@
+""" Unit tests for group vCon resolution """
+import pytest
+import vcon
+import vcon.group
+import vcon.view
+
+
+def make_member(domain: str, tels: list, starts: list) -> vcon.Vcon:
+  a_vcon = vcon.Vcon()
+  for tel in tels:
+    a_vcon.set_party_parameter("tel", tel)
+  for start in starts:
+    a_vcon.add_dialog_inline_text("text at {}".format(start), start, 0, [0, 1], vcon.Vcon.MIMETYPE_TEXT_PLAIN)
+  a_vcon.add_analysis(0, "summary", "summary of {}".format(domain), "py-vcon.org")
+  a_vcon.set_uuid(domain)
+  return(a_vcon)
+
+
+class FakeStorage():
+  """ stands in for VconStorage.get_many, counting round trips """
+  def __init__(self, vcons):
+    self.vcons = {a_vcon.uuid: a_vcon.dumpd() for a_vcon in vcons}
+    self.requests = []
+
+  async def get_many(self, uuids):
+    self.requests.append(list(uuids))
+    return({uuid: self.vcons.get(uuid, None) for uuid in uuids})
+
+
+@pytest.fixture(scope="function")
+def group_vcons():
+  member1 = make_member("one.py-vcon.org", ["+1111", "+2222"],
+    ["2023-01-02T03:04:05+00:00", "2023-01-02T03:10:00+00:00"])
+  member2 = make_member("two.py-vcon.org", ["+2222", "+3333"],
+    ["2023-01-02T03:05:00+00:00", "2023-01-02T01:00:00-03:00"])
+  inline_member = make_member("three.py-vcon.org", ["+1111", "+4444"], ["2023-01-02T03:00:00+00:00"])
+
+  group_vcon = vcon.Vcon()
+  group_vcon.group.append({"uuid": member1.uuid})
+  group_vcon.group.append({"uuid": member2.uuid})
+  group_vcon.group.append({"body": inline_member.dumpd(), "encoding": "json"})
+  # reference to self is ignored
+  group_vcon.set_uuid("group.py-vcon.org")
+  group_vcon.group.append({"uuid": group_vcon.uuid})
+  return(group_vcon, member1, member2, inline_member)
+
+
+@pytest.mark.asyncio
+async def test_resolve_group(group_vcons):
+  group_vcon, member1, member2, inline_member = group_vcons
+  storage = FakeStorage([member1, member2])
+  resolver = vcon.group.VconGroupResolver(storage.get_many)
+
+  group_view = await resolver.resolve(group_vcon)
+  # one round trip for both references
+  assert(storage.requests == [[member1.uuid, member2.uuid]])
+  assert(group_view.uuids == [group_vcon.uuid, member1.uuid, member2.uuid, inline_member.uuid])
+
+  # member data is shared, not copied
+  assert(group_view.members[1].dumpd(False) is storage.vcons[member1.uuid])
+
+  # same tel merged
+  assert([party["tel"] for party in group_view.parties] == ["+1111", "+2222", "+3333", "+4444"])
+  assert(group_view.party_index(2, 0) == 1)
+  assert(group_view.party_index(3, 1) == 3)
+
+  timeline = list(group_view.dialog_timeline())
+  assert([(entry.member_index, entry.dialog_index) for entry in timeline] == [
+    (3, 0), (1, 0), (2, 0), (1, 1), (2, 1)])
+  assert(timeline[0].parties == [0, 3])
+  assert(timeline[2].parties == [1, 2])
+  assert(isinstance(timeline[0].dialog, vcon.view.ReadOnlyDict))
+
+  summaries = [entry.analysis["body"] for entry in group_view.analysis("summary")]
+  assert(summaries == ["summary of one.py-vcon.org", "summary of two.py-vcon.org",
+    "summary of three.py-vcon.org"])
+  assert(list(group_view.analysis("transcript")) == [])
+  assert(group_view.find_member(member2.uuid) == 2)
+
+  # cached
+  await resolver.resolve(group_vcon.dumps())
+  assert(len(storage.requests) == 1)
+  assert(resolver.cache_hits == 2)
+
+
+@pytest.mark.asyncio
+async def test_resolver_batches_and_missing(group_vcons):
+  group_vcon, member1, member2, inline_member = group_vcons
+  storage = FakeStorage([member1])
+  resolver = vcon.group.VconGroupResolver(storage.get_many, batch_size = 1, cache_size = 1)
+
+  with pytest.raises(vcon.group.GroupMemberNotFound):
+    await resolver.resolve(group_vcon)
+  assert(sorted(storage.requests) == [[member1.uuid], [member2.uuid]])
+
+  resolver.ignore_missing = True
+  group_view = await resolver.resolve(group_vcon)
+  assert(group_view.uuids == [group_vcon.uuid, member1.uuid, inline_member.uuid])
+
+
+@pytest.mark.asyncio
+async def test_nested_groups(group_vcons):
+  group_vcon, member1, member2, inline_member = group_vcons
+  top_vcon = vcon.Vcon()
+  top_vcon.group.append({"uuid": group_vcon.uuid})
+  top_vcon.set_uuid("top.py-vcon.org")
+  storage = FakeStorage([group_vcon, member1, member2])
+
+  resolver = vcon.group.VconGroupResolver(storage.get_many)
+  group_view = await resolver.resolve(top_vcon)
+  assert(storage.requests == [[group_vcon.uuid], [member1.uuid, member2.uuid]])
+  assert(len(group_view) == 5)
+
+  resolver = vcon.group.VconGroupResolver(storage.get_many, max_depth = 1)
+  group_view = await resolver.resolve(top_vcon)
+  assert(group_view.uuids == [top_vcon.uuid, group_vcon.uuid])
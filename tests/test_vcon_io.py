@@ -0,0 +1,146 @@
+""" Unit tests for vcon.io NDJSON and container multi-vCon files """
+import io
+import pytest
+import vcon
+import vcon.io
+import vcon.view
+
+DIVISION_CERT = "certs/fake_div.crt"
+GROUP_PRIVATE_KEY = "certs/fake_grp.key"
+GROUP_CERT = "certs/fake_grp.crt"
+CA_CERT = "certs/fake_ca_root.crt"
+
+NUM_VCONS = 20
+
+
+def make_vcons(count: int = NUM_VCONS):
+  for index in range(count):
+    a_vcon = vcon.Vcon()
+    a_vcon.set_uuid("py-vcon.org")
+    a_vcon.set_party_parameter("tel", "+1555000{:04d}".format(index))
+    a_vcon.add_dialog_inline_text("hello number {}".format(index), "2023-01-01T00:00:00+00:00", 0, 0, "text/plain")
+    yield(a_vcon)
+
+
+def test_ndjson(tmp_path):
+  vcons = list(make_vcons())
+  file_name = str(tmp_path / "vcons.ndjson")
+
+  assert(vcon.io.write_ndjson(vcons, file_name) == NUM_VCONS)
+  with open(file_name) as ndjson_file:
+    assert(len(ndjson_file.readlines()) == NUM_VCONS)
+
+  read_vcons = list(vcon.io.read_ndjson(file_name))
+  assert(len(read_vcons) == NUM_VCONS)
+  for original, read_vcon in zip(vcons, read_vcons):
+    assert(isinstance(read_vcon, vcon.Vcon))
+    assert(read_vcon.uuid == original.uuid)
+    assert(read_vcon.dialog[0]["body"] == original.dialog[0]["body"])
+
+  views = list(vcon.io.read_ndjson(file_name, view = True))
+  assert(all(isinstance(view, vcon.view.VconView) for view in views))
+  assert([view.uuid for view in views] == [a_vcon.uuid for a_vcon in vcons])
+
+  # Text handles and views as input
+  text_handle = io.StringIO()
+  assert(vcon.io.write_ndjson(views, text_handle) == NUM_VCONS)
+  text_handle.seek(0)
+  assert([a_vcon.uuid for a_vcon in vcon.io.read_ndjson(text_handle)] == [a_vcon.uuid for a_vcon in vcons])
+
+
+def test_ndjson_invalid():
+  with pytest.raises(vcon.InvalidVconJson):
+    list(vcon.io.read_ndjson(io.BytesIO(b'{"vcon": "0.0.1", "parties": []}\n{"vcon": \n')))
+
+
+@pytest.mark.parametrize("compression", [None, "zlib", "lzma", "bz2"])
+def test_container(tmp_path, compression):
+  vcons = list(make_vcons())
+  file_name = str(tmp_path / "vcons.vconpack")
+
+  assert(vcon.io.write_container(iter(vcons), file_name, compression) == NUM_VCONS)
+
+  read_vcons = list(vcon.io.read_container(file_name))
+  assert([a_vcon.uuid for a_vcon in read_vcons] == [a_vcon.uuid for a_vcon in vcons])
+
+  with vcon.io.VconContainerReader(file_name, view = True) as reader:
+    assert(sorted(reader.uuids()) == sorted(a_vcon.uuid for a_vcon in vcons))
+    # random access out of order
+    for original in reversed(vcons):
+      view = reader.get(original.uuid)
+      assert(isinstance(view, vcon.view.VconView))
+      assert(view.parties == original.parties)
+
+    with pytest.raises(KeyError):
+      reader.get("not-a-uuid")
+
+    # iteration after random access starts from the beginning
+    assert(len(list(reader)) == NUM_VCONS)
+
+
+def test_container_get_while_iterating():
+  vcons = list(make_vcons(5))
+  handle = io.BytesIO()
+  vcon.io.write_container(vcons, handle)
+  handle.seek(0)
+  reader = vcon.io.VconContainerReader(handle)
+  read_uuids = []
+  for a_vcon in reader:
+    read_uuids.append(a_vcon.uuid)
+    assert(reader.get(vcons[0].uuid).uuid == vcons[0].uuid)
+    assert(reader.get(vcons[-1].uuid).uuid == vcons[-1].uuid)
+  assert(read_uuids == [a_vcon.uuid for a_vcon in vcons])
+
+
+def test_container_not_at_file_start():
+  vcons = list(make_vcons(5))
+  handle = io.BytesIO()
+  handle.write(b"preceding data")
+  vcon.io.write_container(vcons, handle)
+  handle.seek(len(b"preceding data"))
+  reader = vcon.io.VconContainerReader(handle)
+  assert(reader.get(vcons[2].uuid).uuid == vcons[2].uuid)
+  assert([a_vcon.uuid for a_vcon in reader] == [a_vcon.uuid for a_vcon in vcons])
+
+
+def test_container_no_index():
+  vcons = list(make_vcons(5))
+  handle = io.BytesIO()
+  writer = vcon.io.VconContainerWriter(handle, "zlib")
+  offsets = [writer.write(a_vcon) for a_vcon in vcons]
+  # simulate a writer which was never closed
+  handle.seek(0)
+  reader = vcon.io.VconContainerReader(handle)
+  assert(reader.index == {a_vcon.uuid: offset for a_vcon, offset in zip(vcons, offsets)})
+  assert(reader.get(vcons[3].uuid).uuid == vcons[3].uuid)
+  assert(len(list(reader)) == 5)
+
+
+def test_container_signed():
+  a_vcon = next(make_vcons(1))
+  a_vcon.sign(GROUP_PRIVATE_KEY, [GROUP_CERT, DIVISION_CERT, CA_CERT])
+
+  handle = io.BytesIO()
+  with vcon.io.VconContainerWriter(handle) as writer:
+    writer.write(a_vcon)
+    # unverified Vcon, is written but not indexed
+    unverified = vcon.Vcon()
+    unverified.loads(a_vcon.dumps())
+    writer.write(unverified)
+
+  handle.seek(0)
+  reader = vcon.io.VconContainerReader(handle)
+  assert(reader.uuids() == [a_vcon.uuid])
+  read_vcons = list(reader)
+  assert(len(read_vcons) == 2)
+  read_vcons[1].verify([CA_CERT])
+  assert(read_vcons[1].uuid == a_vcon.uuid)
+
+
+def test_container_invalid():
+  with pytest.raises(vcon.io.InvalidVconContainer):
+    vcon.io.VconContainerReader(io.BytesIO(b"not a container"))
+
+  with pytest.raises(AttributeError):
+    vcon.io.VconContainerWriter(io.BytesIO(), "zip")
+
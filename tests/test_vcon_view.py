@@ -0,0 +1,103 @@
+""" Unit tests for compact Vcon objects and read only VconView """
+import struct
+import pytest
+import vcon
+import vcon.view
+from tests.common_utils import call_data, empty_vcon, two_party_tel_vcon
+
+TRANSCRIBED_VCON = "tests/example_external_dialog.vcon"
+
+
+def test_vcon_slots(empty_vcon):
+  # No per instance dict
+  assert(not hasattr(empty_vcon, "__dict__"))
+
+  with pytest.raises(AttributeError):
+    empty_vcon.not_a_vcon_attribute = 1
+
+  # Descriptors accessed on the class return the descriptor
+  assert(isinstance(vcon.Vcon.parties, vcon.VconDictList))
+  assert(vcon.Vcon.attribute_exists("parties"))
+  assert(vcon.Vcon.attribute_exists("_vcon_dict"))
+
+
+def test_view_shares_data(two_party_tel_vcon):
+  a_vcon = two_party_tel_vcon
+  a_vcon.set_uuid("py-vcon.org")
+
+  view = a_vcon.view()
+  assert(view.uuid == a_vcon.uuid)
+  assert(len(view.parties) == 2)
+  assert(view.parties[0]["tel"] == call_data["source"])
+  assert(view.parties == a_vcon.parties)
+  assert(view.dumpd(False) is a_vcon._vcon_dict)
+
+  # View reflects changes to the unsigned Vcon
+  a_vcon.set_subject("view test")
+  assert(view.subject == "view test")
+
+  assert(view.jq(".parties[0].tel") == [call_data["source"]])
+  assert(view.jq({"num_parties": ".parties | length"}) == {"num_parties": 2})
+
+
+def test_view_read_only(two_party_tel_vcon):
+  view = two_party_tel_vcon.view()
+
+  assert(isinstance(view.parties, vcon.view.ReadOnlyList))
+  assert(isinstance(view.parties[0], vcon.view.ReadOnlyDict))
+
+  with pytest.raises(AttributeError):
+    view.subject = "foo"
+
+  with pytest.raises(AttributeError):
+    view.foo = "bar"
+
+  with pytest.raises(TypeError):
+    view.parties[0]["tel"] = "bar"
+
+  with pytest.raises(AttributeError):
+    view.parties.append({})
+
+  with pytest.raises(TypeError):
+    view.parties[0] = {}
+
+  # copies are mutable and independent
+  party_copy = view.parties[0].copy()
+  party_copy["tel"] = "bar"
+  assert(two_party_tel_vcon.parties[0]["tel"] == call_data["source"])
+
+
+def test_view_unverified():
+  signed_json = '{"payload": "abc", "signatures": []}'
+  a_vcon = vcon.Vcon()
+  a_vcon.loads(signed_json)
+  with pytest.raises(vcon.UnverifiedVcon):
+    a_vcon.view()
+
+  with pytest.raises(vcon.UnverifiedVcon):
+    vcon.view.VconView.loads(signed_json)
+
+  with pytest.raises(vcon.InvalidVconJson):
+    vcon.view.VconView.loads('{"foo": "bar"}')
+
+
+def test_view_transcript():
+  vcon_json = vcon.security.load_string_from_file(TRANSCRIBED_VCON)
+  view = vcon.view.VconView.loads(vcon_json)
+
+  a_vcon = vcon.Vcon()
+  a_vcon.loads(vcon_json)
+
+  assert(view.find_transcript_for_dialog(0) == a_vcon.find_transcript_for_dialog(0))
+  text = view.get_transcript_text(0)
+  assert(len(text) == 1)
+  assert(len(text[0]["text"]) > 10)
+
+  assert(view.dumps() == a_vcon.view().dumps())
+
+
+def test_vcon_object_size(empty_vcon):
+  # Without a __dict__ the Vcon object is just the object header and slot pointers
+  assert(empty_vcon.__sizeof__() == object().__sizeof__() +
+    len(vcon.Vcon.__slots__) * struct.calcsize("P"))
+
@@ -0,0 +1,47 @@
+""" Unit tests for stitching the whisper transcripts of the chunks of a recording """
+import pytest
+import vcon.filter_plugins.impl.whisper_chunks
+
+
+def chunk_transcript(text, start, end):
+  return({
+    "text": text,
+    "language": "en",
+    "segments": [{
+      "id": 0,
+      "seek": 0,
+      "start": start,
+      "end": end,
+      "text": text,
+      "tokens": [1, 2],
+      "words": [{"word": text, "start": start, "end": end, "probability": 0.9}],
+      "whole_word_timestamps": [{"word": text, "timestamp": end}],
+      "unstable_word_timestamps": [{"word": text, "token": 1, "timestamps": [start, end]}],
+      "alt_start_timestamps": [start, start + 0.1]
+      }]
+    })
+
+
+def test_stitch_transcripts():
+  transcripts = [chunk_transcript(" Hello", 0.5, 1.0), chunk_transcript("there.", 0.2, 0.8)]
+  stitched = vcon.filter_plugins.impl.whisper_chunks.stitch_transcripts(transcripts, [0.0, 300.0])
+
+  assert(stitched["text"] == " Hello there.")
+  assert(stitched["language"] == "en")
+  first, second = stitched["segments"]
+  assert(first["start"] == 0.5 and first["end"] == 1.0)
+  assert(second["id"] == 1)
+  assert(second["seek"] == 30000)
+  assert(second["start"] == 300.2 and second["end"] == 300.8)
+  assert(second["tokens"] == [1, 2])
+  assert(second["words"][0]["start"] == 300.2)
+  assert(second["words"][0]["probability"] == 0.9)
+  assert(second["whole_word_timestamps"][0]["timestamp"] == 300.8)
+  assert(second["unstable_word_timestamps"][0]["timestamps"] == [300.2, 300.8])
+  assert(second["alt_start_timestamps"] == pytest.approx([300.2, 300.3]))
+
+  # the chunk transcripts are not changed
+  assert(transcripts[1]["segments"][0]["start"] == 0.2)
+
+  with pytest.raises(ValueError):
+    vcon.filter_plugins.impl.whisper_chunks.stitch_transcripts(transcripts, [0.0])
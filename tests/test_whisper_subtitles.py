@@ -0,0 +1,52 @@
+""" Unit tests for formatting the SRT and ASS subtitles of whisper transcripts """
+import builtins
+import tempfile
+import pytest
+import vcon.filter_plugins.impl.whisper_subtitles
+
+# stable_whisper.finalize_segment_word_ts output for two segments
+SEGMENT_WORDS = [
+  ([" Hello", " there."], [{"start": 0.5, "end": 1.0}, {"start": 1.0, "end": 1.25}]),
+  ([" Bye."], [{"start": 3661.5, "end": 3662.0}])
+  ]
+
+PHRASE_WORDS = [
+  {"words": [" Hello", " there."], "idx": 0, "start": 0.5, "end": 1.0},
+  {"words": [" Hello", " there."], "idx": 1, "start": 1.0, "end": 1.25},
+  {"words": [" Bye."], "idx": 0, "start": 3661.5, "end": 3662.0}
+  ]
+
+
+@pytest.fixture
+def no_files(monkeypatch):
+  def fail(*args, **kwargs):
+    raise AssertionError("subtitles must not be written to a file")
+
+  monkeypatch.setattr(tempfile, "TemporaryDirectory", fail)
+  monkeypatch.setattr(tempfile, "NamedTemporaryFile", fail)
+  monkeypatch.setattr(tempfile, "mkstemp", fail)
+  monkeypatch.setattr(builtins, "open", fail)
+
+
+def test_word_srt(no_files):
+  srt_text = vcon.filter_plugins.impl.whisper_subtitles.word_srt(SEGMENT_WORDS)
+  assert(srt_text ==
+    "1\n00:00:00,500 --> 00:00:01,000\n Hello\n\n"
+    "2\n00:00:01,000 --> 00:00:01,250\n there.\n\n"
+    "3\n01:01:01,500 --> 01:01:02,000\n Bye.\n"
+    )
+  assert(vcon.filter_plugins.impl.whisper_subtitles.word_srt([]) == "")
+
+
+def test_sentence_word_ass(no_files):
+  ass_text = vcon.filter_plugins.impl.whisper_subtitles.sentence_word_ass(PHRASE_WORDS)
+  header, events = ass_text.split("[Events]\n")
+  assert(header.startswith("[Script Info]\nScriptType: v4.00+\n"))
+  assert("\nFormat: Name, Fontname, Fontsize, PrimaryColour," in header)
+  assert("\nStyle: Default,Arial,48,&Hffffff," in header)
+  assert(events ==
+    "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n\n"
+    "Dialogue: 0,0:00:0.50,0:00:1.00,Default,,0,0,0,,{\\1c&HFF00&\\u1}Hello{\\r} there.\n"
+    "Dialogue: 0,0:00:1.00,0:00:1.25,Default,,0,0,0,,Hello {\\1c&HFF00&\\u1}there.{\\r}\n"
+    "Dialogue: 0,1:01:1.50,1:01:2.00,Default,,0,0,0,,{\\1c&HFF00&\\u1}Bye.{\\r}"
+    )
@@ -0,0 +1,115 @@
+""" Unit tests for the worker process pool with shared memory array arguments """
+import os
+import time
+import asyncio
+import concurrent.futures
+import multiprocessing.shared_memory
+import pytest
+import numpy
+import vcon.filter_plugins.impl.worker_pool
+
+_worker_state = {}
+
+
+def init_worker(name):
+  _worker_state["name"] = name
+
+
+def sum_arrays(arrays, scale):
+  return((_worker_state.get("name"), os.getpid(), [float(array.sum()) * scale for array in arrays]))
+
+
+def add_in_place(arrays):
+  # changes the shared copy, not the caller's array
+  arrays[0] += 1
+  return(arrays[0].tolist())
+
+
+def sleep_for(arrays, seconds):
+  time.sleep(seconds)
+  return(seconds)
+
+
+def exit_worker(arrays):
+  os._exit(1)
+
+
+@pytest.fixture(scope = "module")
+def pool():
+  worker_pool = vcon.filter_plugins.impl.worker_pool.WorkerPool(2, init_worker, ("loaded", ))
+  yield worker_pool
+  worker_pool.shutdown()
+
+
+def test_shared_arrays(pool, monkeypatch):
+  names = []
+  share_array = vcon.filter_plugins.impl.worker_pool.share_array
+
+  def recording_share_array(array):
+    block, handle = share_array(array)
+    names.append(handle.name)
+    return(block, handle)
+
+  monkeypatch.setattr(vcon.filter_plugins.impl.worker_pool, "share_array", recording_share_array)
+
+  samples = numpy.arange(16000, dtype = numpy.float32)
+  empty = numpy.zeros(0, dtype = numpy.float32)
+  name, pid, sums = asyncio.run(pool.run(sum_arrays, [samples, samples[::2], empty], 2.0))
+  # initializer ran in the worker process
+  assert(name == "loaded")
+  assert(pid != os.getpid())
+  assert(sums == [float(samples.sum()) * 2, float(samples[::2].sum()) * 2, 0.0])
+
+  original = numpy.array([1, 2, 3], dtype = numpy.int16)
+  assert(asyncio.run(pool.run(add_in_place, [original])) == [2, 3, 4])
+  assert(original.tolist() == [1, 2, 3])
+
+  # shared memory blocks are unlinked after the call
+  assert(len(names) == 4)
+  for block_name in names:
+    with pytest.raises(FileNotFoundError):
+      multiprocessing.shared_memory.SharedMemory(name = block_name)
+
+
+def test_event_loop_not_blocked(pool):
+  async def run():
+    ticks = 0
+    work = asyncio.gather(*[pool.run(sleep_for, [], 0.5) for _ in range(2)])
+    while(not work.done()):
+      ticks += 1
+      await asyncio.sleep(0.01)
+    return(ticks, await work)
+
+  ticks, results = asyncio.run(run())
+  assert(results == [0.5, 0.5])
+  # the loop kept running while the workers slept
+  assert(ticks > 10)
+
+
+def test_broken_pool_restarted():
+  worker_pool = vcon.filter_plugins.impl.worker_pool.WorkerPool(1)
+  try:
+    with pytest.raises(concurrent.futures.process.BrokenProcessPool):
+      asyncio.run(worker_pool.run(exit_worker, [numpy.zeros(4)]))
+
+    # new workers are started for the next call
+    assert(asyncio.run(worker_pool.run(sleep_for, [], 0.0)) == 0.0)
+
+  finally:
+    worker_pool.shutdown()
+
+
+def test_shutdown_cancels_pending():
+  worker_pool = vcon.filter_plugins.impl.worker_pool.WorkerPool(1)
+
+  async def run():
+    calls = [asyncio.ensure_future(worker_pool.run(sleep_for, [], 0.5)) for _ in range(4)]
+    # let the calls be submitted and the first start
+    await asyncio.sleep(0.2)
+    worker_pool.shutdown(wait = False)
+    return(await asyncio.gather(*calls, return_exceptions = True))
+
+  results = asyncio.run(run())
+  assert(results[0] == 0.5)
+  # the calls not yet started are cancelled
+  assert(any(isinstance(result, asyncio.CancelledError) for result in results[1:]))
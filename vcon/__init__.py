@@ -4,58 +4,52 @@ see https:/vcon.dev
 """
 # need future to reference Vcon type in Vcon methods
 from __future__ import annotations
-import importlib
-import pkgutil
 import typing
 import sys
 import os
 import copy
 import logging
-import logging.config
 import enum
 import time
 import hashlib
+# aliased as importing the vcon.io submodule rebinds the name io in this module
+import io as std_io
 import inspect
 import functools
+import threading
 import warnings
 import datetime
 import email
 import pathlib
+import re
 import pyjq
 import uuid6
 import requests
 import jose.utils
 import jose.jws
 import jose.jwe
-import pythonjsonlogger.jsonlogger
+import vcon.logging_utils
 import vcon.utils
 import vcon.security
 import vcon.filter_plugins
 import vcon.accessors
+import vcon.view
+import vcon.changes
+import vcon.base64url
+import vcon.concurrency
+import vcon.dialog_cache
 
 __version__ = "0.3"
 
 def build_logger(name : str) -> logging.Logger:
-  logger = logging.getLogger(name)
-
-  log_config_filename = "./logging.conf"
-  if(os.path.isfile(log_config_filename)):
-    logging.config.fileConfig(log_config_filename)
-    #print("got logging config", file=sys.stderr)
-  else:
-    logger.setLevel(logging.DEBUG)
-
-    # Output to stdout WILL BREAK the Vcon CLI.
-    # MUST use stderr.
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.DEBUG)
-    formatter = pythonjsonlogger.jsonlogger.JsonFormatter( "%(timestamp)s %(levelname)s %(message)s ", timestamp=True)
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-  return(logger)
+  # Output to stdout WILL BREAK the Vcon CLI.
+  # MUST use stderr.
+  # Level is set from VCON_LOG_LEVEL and VCON_LOG_LEVELS, see vcon.logging_utils
+  return(vcon.logging_utils.build_logger(name, sys.stderr))
 
 logger = build_logger(__name__)
+# per analysis object debug logs
+_generator_log_sampler = vcon.logging_utils.LogSampler(logger)
 
 try:
   import simplejson as json
@@ -68,10 +62,14 @@ except Exception as import_error:
 
 
 _LAST_V8_TIMESTAMP = None
+_LAST_V8_TIMESTAMP_LOCK = threading.Lock()
+
+# Blank line separating SMTP message headers from the body
+_HEADER_BODY_SEPARATOR = re.compile(r"\n\r?\n")
 
-for finder, module_name, is_package in pkgutil.iter_modules(vcon.filter_plugins.__path__, vcon.filter_plugins.__name__ + "."):
-  logger.info("plugin registration: {}".format(module_name))
-  importlib.import_module(module_name)
+# Register the plugins included in this package, without importing their
+# modules.  Entry point and other manifest plugins are discovered on first use.
+vcon.filter_plugins.FilterPluginRegistry.load_manifest(vcon.filter_plugins.BUILTIN_MANIFEST)
 
 def deprecated(reason : str):
   """
@@ -109,6 +107,10 @@ class VconStates(enum.Enum):
   DECRYPTED = 6
 
 
+# States in which the Vcon data may be read.
+# Tuple so that membership is tested by identity first (see VconAttribute.__get__)
+_READABLE_STATES = (VconStates.UNSIGNED, VconStates.VERIFIED, VconStates.SIGNED)
+
 class UnsupportedVconVersion(Exception):
   """ Thrown if vcon version string is not of set of versions supported by this package"""
 
@@ -175,6 +177,20 @@ def tag_operation(func):
   return(func)
 
 
+def _inline_body(dialog: dict, dialog_index: int) -> typing.Tuple[str, str]:
+  """ Get the inline body and its lower case encoding from the dialog, checking they are supported """
+  if(dialog["type"] not in ["text", "recording"]):
+    raise AttributeError("dialog[{}] type: {} is not supported".format(dialog_index, dialog["type"]))
+  if(dialog.get("body") is None):
+    raise AttributeError("dialog[{}] does not contain an inline body/file".format(dialog_index))
+
+  encoding = dialog.get("encoding", "none").lower()
+  if(encoding not in ("base64url", "none")):
+    raise UnsupportedVconVersion("dialog[{}] body encoding: {} not supported".format(dialog_index, dialog["encoding"]))
+
+  return(dialog["body"], encoding)
+
+
 class VconAttribute:
   """ descriptor base class for attributes in vcon """
   def __init__(self, doc : typing.Union[str, None] = None):
@@ -192,6 +208,14 @@ class VconAttribute:
     # TODO: once signed, this should return a read only attribute
     # This may be done by overloading the __get__ method in derived classes
 
+    # Accessed on the class (e.g. help or getattr(Vcon, name))
+    if(instance_object is None):
+      return(self)
+
+    # Fast path, these attributes are read very frequently
+    if(instance_object._state in _READABLE_STATES):
+      return(instance_object._vcon_dict.get(self.name, None))
+
     if(instance_object._state in [VconStates.UNVERIFIED, VconStates.DECRYPTED]):
       raise UnverifiedVcon("vCon is signed, but not verified. Call verify before reading data.")
 
@@ -265,9 +289,15 @@ class Vcon():
   Attributes:
     See Data descriptors under help(vcon.Vcon)
 
+  Mutations through the Vcon API are thread safe.  See vcon.concurrency
+  for the concurrency model and deterministic merge of concurrently
+  generated analysis.
   """
 
   # Some commonly used MIME types for convenience
+  # FilterPluginRegistry.version for which the plugin methods were last added
+  _filter_plugin_registry_version = None
+
   MIMETYPE_TEXT_PLAIN = "text/plain"
   MIMETYPE_JSON = "application/json"
   MIMETYPE_IMAGE_PNG = "image/png"
@@ -297,6 +327,10 @@ class Vcon():
 
   CURRENT_VCON_VERSION = "0.0.1"
 
+  # No per instance __dict__, keeps the Vcon object small when many are in memory.
+  # Note: if you add new instance members/attributes, they must be added here.
+  __slots__ = ("_state", "_jws_dict", "_jwe_dict", "_vcon_dict", "_dialog_text_cache", "_changes", "_dialog_cache")
+
   # Dict keys
   VCON_VERSION = "vcon"
   UUID = "uuid"
@@ -360,40 +394,49 @@ class Vcon():
     """ Constructor """
     # Note: if you add new instance members/attributes, be sure to add its
     # name to instance_attibutes in Vcon.attribute_exists.
-    # Register filter plugins as named instance methods
-    for plugin_name in vcon.filter_plugins.FilterPluginRegistry.get_names():
-      if(Vcon.attribute_exists(plugin_name) is not True):
-        setattr(vcon.Vcon, plugin_name, VconPluginMethodProperty(plugin_name))
-        logger.info("added Vcon.{}".format(plugin_name))
-      else:
-        existing_attr = getattr(vcon.Vcon, plugin_name)
-        if(issubclass(type(existing_attr), vcon.VconPluginMethodProperty)):
-          #print("Warning: Filter Plugin name: {} previsously added.".format(plugin_name))
-          pass
+    # Register filter plugins as named instance methods, when the registrations have changed
+    registry_version = vcon.filter_plugins.FilterPluginRegistry.version()
+    if(Vcon._filter_plugin_registry_version != registry_version):
+      for plugin_name in vcon.filter_plugins.FilterPluginRegistry.get_names():
+        if(Vcon.attribute_exists(plugin_name) is not True):
+          setattr(vcon.Vcon, plugin_name, VconPluginMethodProperty(plugin_name))
+          logger.info("added Vcon.%s", plugin_name)
         else:
-          logger.warning("Warning: Filter Plugin name: {} conflicts".format(plugin_name) +
-            " with existing instance or class attributes and is not directly callable." +
-            "  Use Vcon.filter method to invoke it." +
-            "  Better yet, change the name so that it does not conflict")
-
-    for plugin_type_name in vcon.filter_plugins.FilterPluginRegistry.get_types():
-      if(Vcon.attribute_exists(plugin_type_name) is not True):
-        setattr(vcon.Vcon, plugin_type_name, VconPluginMethodProperty(plugin_type_name))
-        logger.info("added Vcon.{}".format(plugin_type_name))
-      else:
-        existing_attr = getattr(vcon.Vcon, plugin_type_name)
-        if(issubclass(type(existing_attr), vcon.VconPluginMethodProperty)):
-          #print("Warning: Filter Plugin name: {} previsously added.".format(plugin_type_name))
-          pass
+          existing_attr = getattr(vcon.Vcon, plugin_name)
+          if(issubclass(type(existing_attr), vcon.VconPluginMethodProperty)):
+            #print("Warning: Filter Plugin name: {} previsously added.".format(plugin_name))
+            pass
+          else:
+            logger.warning("Warning: Filter Plugin name: {} conflicts".format(plugin_name) +
+              " with existing instance or class attributes and is not directly callable." +
+              "  Use Vcon.filter method to invoke it." +
+              "  Better yet, change the name so that it does not conflict")
+
+      for plugin_type_name in vcon.filter_plugins.FilterPluginRegistry.get_types():
+        if(Vcon.attribute_exists(plugin_type_name) is not True):
+          setattr(vcon.Vcon, plugin_type_name, VconPluginMethodProperty(plugin_type_name))
+          logger.info("added Vcon.%s", plugin_type_name)
         else:
-           logger.warning("Warning: Filter Plugin Type name: {} conflicts with existing".format(plugin_type_name) +
-           "instance or class attributes and is not directly callable." +
-           "  Use Vcon.filter method to invoke it." +
-           "  Better yet, change the name so that it does not conflict")
+          existing_attr = getattr(vcon.Vcon, plugin_type_name)
+          if(issubclass(type(existing_attr), vcon.VconPluginMethodProperty)):
+            #print("Warning: Filter Plugin name: {} previsously added.".format(plugin_type_name))
+            pass
+          else:
+             logger.warning("Warning: Filter Plugin Type name: {} conflicts with existing".format(plugin_type_name) +
+             "instance or class attributes and is not directly callable." +
+             "  Use Vcon.filter method to invoke it." +
+             "  Better yet, change the name so that it does not conflict")
+      Vcon._filter_plugin_registry_version = registry_version
 
     self._state = VconStates.UNSIGNED
     self._jws_dict = None
     self._jwe_dict = None
+    # dialog index: (dialog body, text extracted from the MIME body)
+    self._dialog_text_cache = {}
+    # mutations made through the Vcon API since track_changes, load or clear_changes
+    self._changes = vcon.changes.VconChangeLog()
+    # optional vcon.dialog_cache.DialogCache shared by several filters (e.g. FilterChain)
+    self._dialog_cache = None
 
     self._vcon_dict = {}
     self._vcon_dict[Vcon.VCON_VERSION] = Vcon.CURRENT_VCON_VERSION
@@ -456,8 +499,7 @@ class Vcon():
 
     party = index
     if(party == -1):
-      self._vcon_dict[Vcon.PARTIES].append({})
-      party = len(self._vcon_dict[Vcon.PARTIES]) - 1
+      party = self._changes.append(self._vcon_dict, Vcon.PARTIES, {})
 
     else:
       if(not len(self._vcon_dict[Vcon.PARTIES]) > index):
@@ -515,10 +557,12 @@ class Vcon():
         "Not supported: setting of Parties Object parameter: {}.  Must be one of the following:  {}".
         format(parameter_name, Vcon.PARTIES_OBJECT_STRING_PARAMETERS))
 
-    party_index = self.__add_new_party(party_index)
+    # The new party and its parameter are added atomically
+    with self._changes.lock:
+      party_index = self.__add_new_party(party_index)
 
-    # TODO parameter specific validation
-    self._vcon_dict[Vcon.PARTIES][party_index][parameter_name] = parameter_value
+      # TODO parameter specific validation
+      self._changes.set(self._vcon_dict, (Vcon.PARTIES, party_index, parameter_name), parameter_value)
 
     return(party_index)
 
@@ -541,8 +585,7 @@ class Vcon():
         raise AttributeError(f"Not supported: setting of Parties Object parameter: {key}." +
           f"  Must be one of the following:  {Vcon.PARTIES_OBJECT_STRING_PARAMETERS}")
     # TODO parameter specific validation
-    self._vcon_dict[Vcon.PARTIES].append(party_dict)
-    party_index = len(self._vcon_dict[Vcon.PARTIES]) - 1
+    party_index = self._changes.append(self._vcon_dict, Vcon.PARTIES, party_dict)
     return party_index
 
 
@@ -628,12 +671,7 @@ class Vcon():
     new_dialog['encoding'] = "none"
     new_dialog['body'] = body
 
-    if(self.dialog is None):
-      self._vcon_dict[Vcon.DIALOG] = []
-
-    self._vcon_dict[Vcon.DIALOG].append(new_dialog)
-
-    return(len(self.dialog) - 1)
+    return(self._changes.append(self._vcon_dict, Vcon.DIALOG, new_dialog))
 
 
   @tag_dialog
@@ -674,7 +712,7 @@ class Vcon():
     party_indices = []
     sender_index = None
     for email_address in [sender] + recipients:
-      logger.debug("email name: {} mailto: {}".format(email_address[0], email_address[1]))
+      logger.debug("email name: %s mailto: %s", email_address[0], email_address[1])
       parties_found = self.find_parties_by_parameter("mailto", email_address[1])
       if(len(parties_found) == 0):
         parties_found = self.find_parties_by_parameter("name", email_address[0])
@@ -687,7 +725,7 @@ class Vcon():
           sender_index = parties_found[0]
 
       elif(sender_index is None):
-          sender_index = party_index
+          sender_index = parties_found[0]
 
       party_indices.extend(parties_found)
 
@@ -699,16 +737,14 @@ class Vcon():
     #date = time.mktime(email.utils.parsedate(email_message.get("date")))
     date = email.utils.parsedate_to_datetime(email_message.get("date"))
 
-    email_body = ""
-
     if(email_message.is_multipart()):
-      body_start = False
-      for line in str(email_message).splitlines():
-        if(body_start):
-          email_body = email_body + line + "\r\n"
-
-        elif(len(line) == 0):
-          body_start = True
+      # The multipart body is everything after the blank line ending the
+      # headers, taken from the original message (not re-serialized) with
+      # line endings normalized to CRLF.
+      separator = _HEADER_BODY_SEPARATOR.search(smtp_message)
+      email_body = ""
+      if(separator is not None):
+        email_body = "".join([line + "\r\n" for line in smtp_message[separator.end():].splitlines()])
 
     else:
       email_body = email_message.get_payload()
@@ -782,10 +818,7 @@ class Vcon():
     #print("encoded body type: {}".format(type(encoded_body)))
     new_dialog['body'] = encoded_body
 
-    if(self.dialog is None):
-      self._vcon_dict[Vcon.DIALOG] = []
-
-    self._vcon_dict[Vcon.DIALOG].append(new_dialog)
+    self._changes.append(self._vcon_dict, Vcon.DIALOG, new_dialog)
 
     return(len(body))
 
@@ -851,6 +884,13 @@ class Vcon():
         return([text_dict])
 
       if(vcon.Vcon.MIMETYPE_MULTIPART in dialog["mimetype"].lower() ):
+        # Parsing the MIME body is expensive, use the cached text part if
+        # the body has not been replaced since it was parsed.
+        cached = self._dialog_text_cache.get(dialog_index, None)
+        if(cached is not None and cached[0] is dialog["body"]):
+          text_dict["text"] = cached[1]
+          return([text_dict])
+
         # Need the content type with the boundry and body separator
         email_message = email.message_from_string("Content-Type: " + dialog["mimetype"] + "\r\n\r\n" + dialog["body"])
 
@@ -859,8 +899,9 @@ class Vcon():
 
         for subpart in email_message.walk():
           if(subpart.get_content_type() == vcon.Vcon.MIMETYPE_TEXT_PLAIN):
-            logger.debug("subpart payload type: {} part is multipart: {}".format(type(subpart.get_payload()), subpart.is_multipart()))
+            logger.debug("subpart payload type: %s part is multipart: %s", type(subpart.get_payload()), subpart.is_multipart())
             text_dict["text"] = subpart.get_payload()
+            self._dialog_text_cache[dialog_index] = (dialog["body"], text_dict["text"])
             return([text_dict])
 
           # else:
@@ -874,13 +915,22 @@ class Vcon():
 
       if(transcript_index is not None):
         analysis = self.analysis[transcript_index]
+        dialog_cache = self._dialog_cache
+        if(dialog_cache is not None):
+          texts = dialog_cache.get_text(dialog_index, analysis)
+          if(texts is not None):
+            return(texts)
+
         accessor_class = vcon.accessors.transcript_accessors[(
           analysis["vendor"].lower(),
           analysis["product"].lower(),
           analysis["schema"].lower(),
           )]
         accessor = accessor_class(dialog, analysis)
-        return(accessor.get_text())
+        texts = accessor.get_text()
+        if(dialog_cache is not None):
+          dialog_cache.set_text(dialog_index, analysis, texts)
+        return(texts)
 
     return([])
 
@@ -905,8 +955,9 @@ class Vcon():
         None if not found.
     """
     if(transcript_accessors is None):
-      transcript_accessors = list(vcon.accessors.transcript_accessors.keys())
-    logger.debug("accessors: {}".format(transcript_accessors))
+      # dict keyed by generator tuple, no need to copy the keys
+      transcript_accessors = vcon.accessors.transcript_accessors
+    logger.debug("accessors: %s", transcript_accessors)
 
     for analysis_index, analysis in enumerate(self.analysis):
       if(analysis["type"] == "transcript" and
@@ -921,7 +972,7 @@ class Vcon():
           analysis.get("schema", "").lower()
           )
 
-        logger.debug("generator: {}".format(generator_tuple))
+        _generator_log_sampler.debug("generator: %s", generator_tuple)
         if(generator_tuple in transcript_accessors):
           return(analysis_index)
 
@@ -940,6 +991,11 @@ class Vcon():
     (str) or (bytes) for the dialog body
     """
     dialog = self.dialog[dialog_index]
+    dialog_cache = self._dialog_cache
+    if(dialog_cache is not None):
+      body_bytes = dialog_cache.get_body(dialog_index, dialog)
+      if(body_bytes is not None):
+        return(body_bytes)
 
     if(any(key in dialog for key in("body", "url"))):
       if("body" in dialog and dialog["body"] is not None and dialog["body"] != ""):
@@ -951,9 +1007,32 @@ class Vcon():
       else:
         raise Exception("dialog[{}] has no body or url.  Should not have gotten here.".format(dialog_index))
 
+    if(dialog_cache is not None):
+      dialog_cache.set_body(dialog_index, dialog, body_bytes)
+
     return(body_bytes)
 
 
+  @tag_dialog
+  def set_dialog_cache(self,
+    dialog_cache: typing.Union[vcon.dialog_cache.DialogCache, None]
+    ) -> typing.Union[vcon.dialog_cache.DialogCache, None]:
+    """
+    Set the cache used by get_dialog_body and get_dialog_text for decoded
+    or fetched dialog bodies and transcript text, e.g. to share them between
+    several filter plugins (see vcon.filter_plugins.FilterChain).
+
+    Parameters:  
+    **dialog_cache** (vcon.dialog_cache.DialogCache) - cache to use or None to stop caching
+
+    Returns:  
+    the previously set DialogCache or None
+    """
+    previous_cache = self._dialog_cache
+    self._dialog_cache = dialog_cache
+    return(previous_cache)
+
+
 
   @tag_dialog
   def decode_dialog_inline_body(self, dialog_index : int) -> typing.Union[str, bytes]:
@@ -966,28 +1045,120 @@ class Vcon():
     Returns:  
       (bytes): the bytes for the recording file
     """
-    dialog = self.dialog[dialog_index]
-    if(dialog["type"] not in ["text", "recording"]):
-      raise AttributeError("dialog[{}] type: {} is not supported".format(dialog_index, dialog["type"]))
-    if(dialog.get("body") is None):
-      raise AttributeError("dialog[{}] does not contain an inline body/file".format(dialog_index))
-
-    encoding = dialog.get("encoding", "none").lower()
+    body, encoding = _inline_body(self.dialog[dialog_index], dialog_index)
     if(encoding == "base64url"):
-      # This is wrong.  decode should take a string not bytes, but it fails without the bytes conversion
-      # this is a bug in jose.baseurl_decode
-      decoded_body = jose.utils.base64url_decode(bytes(dialog["body"], 'utf-8'))
+      # Decoded in chunks, rather than making a bytes copy of the whole body first
+      decoded_body = vcon.base64url.decode(body)
 
     # No encoding
-    elif(encoding == "none"):
-      decoded_body = dialog["body"]
-
     else:
-      raise UnsupportedVconVersion("dialog[{}] body encoding: {} not supported".format(dialog_index, dialog["encoding"]))
+      decoded_body = body
 
     return(decoded_body)
 
 
+  @tag_dialog
+  def decode_dialog_inline_body_into(self,
+    dialog_index : int,
+    buffer : typing.Union[bytearray, memoryview, None] = None
+    ) -> memoryview:
+    """
+    Decode the dialog inline body into a writable buffer without intermediate
+    copies of the whole body.
+
+    Parameters:  
+      **dialog_index** (int) - index the the dialog in the dialog list, containing the inline body  
+      **buffer** (bytearray or memoryview) - writable buffer large enough for the
+        decoded body, None allocates a bytearray of the decoded size.
+
+    Returns:  
+      (memoryview) of the decoded body bytes in the buffer.  A body with
+        no encoding is UTF-8 encoded.
+    """
+    body, encoding = _inline_body(self.dialog[dialog_index], dialog_index)
+    if(encoding == "base64url"):
+      return(vcon.base64url.decode_into(body, buffer))
+
+    if(isinstance(body, str)):
+      body = body.encode("utf-8")
+    if(buffer is None):
+      return(memoryview(body))
+    view = memoryview(buffer).cast("B")
+    view[:len(body)] = body
+    return(view[:len(body)])
+
+
+  @tag_dialog
+  def write_dialog_inline_body(self,
+    dialog_index : int,
+    writer : typing.Any,
+    chunk_size : typing.Union[int, None] = None
+    ) -> int:
+    """
+    Decode the dialog inline body in chunks, writing each chunk as it is
+    decoded, so that large recordings can be extracted with bounded memory.
+
+    Parameters:  
+      **dialog_index** (int) - index the the dialog in the dialog list, containing the inline body  
+      **writer** - binary file handle or socket.  A text file handle may be
+        used for bodies with no encoding.  
+      **chunk_size** (int) - number of encoded characters decoded at a time (multiple of 4),
+        None uses vcon.base64url.DEFAULT_CHUNK_SIZE
+
+    Returns:  
+      (int) number of bytes (or characters for a text writer) written
+    """
+    if(chunk_size is None):
+      chunk_size = vcon.base64url.DEFAULT_CHUNK_SIZE
+    body, encoding = _inline_body(self.dialog[dialog_index], dialog_index)
+    if(encoding == "base64url"):
+      return(vcon.base64url.decode_to_writer(body, writer, chunk_size))
+
+    if(isinstance(body, str) and not isinstance(writer, std_io.TextIOBase)):
+      body = body.encode("utf-8")
+    if(hasattr(writer, "sendall")):
+      writer.sendall(body)
+    else:
+      writer.write(body)
+    return(len(body))
+
+
+  @tag_dialog
+  async def write_dialog_inline_body_async(self,
+    dialog_index : int,
+    writer : typing.Any,
+    chunk_size : typing.Union[int, None] = None
+    ) -> int:
+    """
+    Decode the dialog inline body in chunks, writing each chunk to an
+    async writer as it is decoded.
+
+    Parameters:  
+      **dialog_index** (int) - index the the dialog in the dialog list, containing the inline body  
+      **writer** - asyncio.StreamWriter or object with an async write method  
+      **chunk_size** (int) - number of encoded characters decoded at a time (multiple of 4),
+        None uses vcon.base64url.DEFAULT_CHUNK_SIZE
+
+    Returns:  
+      (int) number of bytes written
+    """
+    if(chunk_size is None):
+      chunk_size = vcon.base64url.DEFAULT_CHUNK_SIZE
+    body, encoding = _inline_body(self.dialog[dialog_index], dialog_index)
+    if(encoding == "base64url"):
+      return(await vcon.base64url.decode_to_async_writer(body, writer, chunk_size))
+
+    if(isinstance(body, str)):
+      body = body.encode("utf-8")
+    # same as a single chunk
+    result = writer.write(body)
+    if(inspect.isawaitable(result)):
+      await result
+    if(hasattr(writer, "drain")):
+      await writer.drain()
+    return(len(body))
+
+
   @tag_dialog
   def add_dialog_external_recording(self, body : bytes,
     start_time : typing.Union[str, int, float, datetime.datetime],
@@ -1063,11 +1234,7 @@ class Vcon():
       else:
         raise AttributeError("Unsupported signature type: {}.  Please use \"SHA-512\" or \"LM-OTS\"".format(sign_type))
 
-    if(self.dialog is None):
-      self._vcon_dict[Vcon.DIALOG] = []
-
-    dialog_index = len(self.dialog)
-    self._vcon_dict[Vcon.DIALOG].append(new_dialog)
+    dialog_index = self._changes.append(self._vcon_dict, Vcon.DIALOG, new_dialog)
 
     return(dialog_index)
 
@@ -1188,10 +1355,7 @@ class Vcon():
     for param, value in optional_parameters.items():
       analysis_element[param] = value
 
-    if(self.analysis is None):
-      self._vcon_dict[Vcon.ANALYSIS] = []
-
-    self._vcon_dict[Vcon.ANALYSIS].append(analysis_element)
+    self._changes.append(self._vcon_dict, Vcon.ANALYSIS, analysis_element)
 
   @tag_analysis
   def add_analysis(self,
@@ -1233,10 +1397,40 @@ class Vcon():
     for parameter_name, value in optional_parameters.items():
       analysis_element[parameter_name] = value
 
-    if(self.analysis is None):
-      self._vcon_dict[Vcon.ANALYSIS] = []
+    self._changes.append(self._vcon_dict, Vcon.ANALYSIS, analysis_element)
+
+
+  @tag_analysis
+  def merge_analysis(self,
+    buffers : typing.Iterable[vcon.concurrency.AnalysisBuffer]
+    ) -> typing.List[int]:
+    """
+    Add the analysis from per thread or per task buffers in a deterministic
+    order: buffer key order, then buffer creation order, then the order
+    added to each buffer (see vcon.concurrency).  All of the analysis is
+    added while holding the lock, so it is contiguous in the analysis list.
+
+    Parameters:  
+    **buffers** (Iterable[vcon.concurrency.AnalysisBuffer]): buffers containing the analysis
+      to be added.  The buffers are cleared once merged.
+
+    Returns:  
+    (List[int]) indices of the added analysis objects in merge order
+    """
+    self._attempting_modify()
+
+    buffers = vcon.concurrency.merge_order(buffers)
+    indices = []
+    with self._changes.lock:
+      for buffer in buffers:
+        for method_name, args, kwargs in buffer.calls():
+          getattr(self, method_name)(*args, **kwargs)
+          indices.append(len(self._vcon_dict[Vcon.ANALYSIS]) - 1)
+
+    for buffer in buffers:
+      buffer.clear()
 
-    self._vcon_dict[Vcon.ANALYSIS].append(analysis_element)
+    return(indices)
 
 
   @tag_attachment
@@ -1295,12 +1489,7 @@ class Vcon():
     #print("encoded body type: {}".format(type(encoded_body)))
     new_attachment['body'] = encoded_body
 
-    if(self.attachments is None):
-      self._vcon_dict[Vcon.ATTACHMENTS] = []
-
-    self._vcon_dict[Vcon.ATTACHMENTS].append(new_attachment)
-
-    return(len(self.attachments) - 1)
+    return(self._changes.append(self._vcon_dict, Vcon.ATTACHMENTS, new_attachment))
 
 
   @tag_serialize
@@ -1346,7 +1535,8 @@ class Vcon():
     Returns:  
              String containing JSON representation of the vCon.
     """
-    return(json.dumps(self.dumpd(signed, False), indent = indent, default=lambda o: o.__dict__, **dumps_options))
+    with self._changes.lock:
+      return(json.dumps(self.dumpd(signed, False), indent = indent, default=lambda o: o.__dict__, **dumps_options))
 
 
   @tag_serialize
@@ -1400,11 +1590,109 @@ class Vcon():
       raise InvalidVconState("vCon state: {} is not valid for dumps".format(self._state))
 
     if(deepcopy):
-      return(copy.deepcopy(vcon_dict))
+      with self._changes.lock:
+        return(copy.deepcopy(vcon_dict))
 
     return(vcon_dict)
 
 
+  @tag_serialize
+  def track_changes(
+      self,
+      enable: bool = True
+    ) -> None:
+    """
+    Start (or stop) recording the changes made to this Vcon, relative to
+    its current data (e.g. as loaded from storage).  Changes are not
+    recorded by default.
+
+    Parameters:  
+    **enable** (bool): True (default) record changes, False stop recording
+
+    Returns: none
+    """
+    with self._changes.lock:
+      self._changes.enabled = enable
+      self._changes.clear()
+
+
+  @tag_serialize
+  def get_changes(
+      self,
+      compact: bool = False
+    ) -> typing.Union[typing.List[dict], dict]:
+    """
+    Get the changes made to this Vcon, through its API (e.g. add_analysis,
+    add_dialog_*, set_party_parameter, set_subject), since track_changes,
+    load or clear_changes was called.  Changes made directly to the Vcon
+    data (e.g. a_vcon.parties[0]["name"] = "Alice") are not included.
+
+    The values in the changes are shared with this Vcon, not copied.
+    Serialize them before further modifying this Vcon.
+
+    Parameters:  
+    **compact** (bool): False (default): RFC 6902 JSON Patch list of operations  
+        True: compact delta dict (see vcon.changes)
+
+    Returns:  
+      list of JSON Patch operations or compact delta dict
+    """
+    if(compact):
+      return(self._changes.compact_delta())
+
+    return(self._changes.json_patch())
+
+
+  @tag_serialize
+  def clear_changes(self) -> None:
+    """
+    Clear the record of changes made to this Vcon (e.g. after
+    the changes have been saved to storage).
+
+    Parameters: none
+
+    Returns: none
+    """
+    self._changes.clear()
+
+
+  @tag_serialize
+  def apply_changes(
+      self,
+      changes: typing.Union[typing.List[dict], dict]
+    ) -> None:
+    """
+    Apply changes from Vcon.get_changes (possibly from another copy of
+    this vCon) to this unsigned Vcon.  The applied changes are not
+    recorded as changes to this Vcon.
+
+    Parameters:  
+    **changes** (Union[List[dict], dict]): RFC 6902 JSON Patch list of
+        operations or compact delta dict
+
+    Returns: none
+
+    Raises:  
+      vcon.changes.InvalidVconPatch if the changes do not apply to this Vcon  
+      vcon.changes.VconPatchConflict if the compact delta was made from a
+        different version of this Vcon
+    """
+    self._attempting_modify()
+
+    with self._changes.lock:
+      if(isinstance(changes, dict)):
+        vcon.changes.apply_delta(self._vcon_dict, changes)
+
+      elif(isinstance(changes, list)):
+        vcon.changes.apply_json_patch(self._vcon_dict, changes)
+
+      else:
+        raise AttributeError("changes must be a JSON Patch list or delta dict, not: {}".format(type(changes)))
+
+      # dialog bodies may have changed
+      self._dialog_text_cache = {}
+
+
   @tag_serialize
   async def post(
     self,
@@ -1555,6 +1843,8 @@ class Vcon():
         raise UnsupportedVconVersion("loads of JSON vcon version: \"{}\" not supported".format(version_string))
 
       self._vcon_dict = self.migrate_0_0_1_vcon(vcon_dict)
+      # Loaded data is the base line for changes
+      self._changes.clear()
 
     # Unknown
     else:
@@ -1787,6 +2077,66 @@ class Vcon():
     self._state = VconStates.ENCRYPTED
 
 
+  @tag_encrypting
+  def encrypt_stream(
+    self,
+    cert_pem_file_name : str,
+    token_file : typing.Union[str, typing.BinaryIO],
+    encryption : str = "A256CBC-HS512",
+    chunk_size : typing.Union[int, None] = None
+    ) -> None:
+    """
+    Encrypt a Signed vcon using the given public key from the given certificate,
+    writing the JWE compact serialization token to the given file in chunks.
+
+    Unlike **encrypt**, the cyphertext is never held in memory as a whole and
+    the state of this Vcon is not changed.  This is intended for very large
+    vCons.  The token written can be converted to the encrypted vCon JSON form
+    using **vcon.security.jwe_compact_token_to_complete_serialization** or
+    decrypted in chunks using **vcon.security.jwe_decrypt_stream**.
+
+    vcon must be signed first.
+
+    Parameters:
+    **cert_pem_file_name** (str): the public key/cert to use for encrypting the vcon.
+    **token_file** (str, BinaryIO): if string, file name else binary file like object to
+        write the JWE compact token to.
+    **encryption** (str): JWE content encryption "A256CBC-HS512" (default) or "A256GCM"
+    **chunk_size** (int): number of plaintext bytes to encrypt at a time
+        defaults to vcon.security.JWE_STREAM_CHUNK_SIZE
+
+    Returns: none
+    """
+
+    if(chunk_size is None):
+      chunk_size = vcon.security.JWE_STREAM_CHUNK_SIZE
+
+    if(self._state not in [VconStates.SIGNED, VconStates.UNVERIFIED, VconStates.VERIFIED]):
+      raise InvalidVconState("Vcon must be signed before it can be encrypted")
+
+    if(len(self._jws_dict) < 2):
+      raise InvalidVconState("Vcon signature does not seem valid: {}".format(self._jws_dict))
+
+    encryption_key = vcon.security.build_encryption_jwk_from_pem_file(cert_pem_file_name)
+
+    if(isinstance(token_file, str)):
+      file_handle = open(token_file, "wb")
+    else:
+      file_handle = token_file
+
+    try:
+      vcon.security.jwe_encrypt_chunks(
+        vcon.security.jws_complete_serialization_chunks(self._jws_dict, chunk_size),
+        file_handle,
+        encryption_key,
+        encryption
+        )
+
+    finally:
+      if(isinstance(token_file, str)):
+        file_handle.close()
+
+
   @tag_encrypting
   def decrypt(self, private_key_pem_file_name : str, cert_pem_file_name : str) -> None:
     """
@@ -1846,7 +2196,7 @@ class Vcon():
     if(create_date is None):
       create_date = time.time()
 
-    self._vcon_dict[Vcon.CREATED_AT] = vcon.utils.cannonize_date(create_date)
+    self._changes.set(self._vcon_dict, (Vcon.CREATED_AT,), vcon.utils.cannonize_date(create_date))
 
 
   @tag_meta
@@ -1862,7 +2212,7 @@ class Vcon():
 
     self._attempting_modify()
 
-    self._vcon_dict[Vcon.SUBJECT] = subject
+    self._changes.set(self._vcon_dict, (Vcon.SUBJECT,), subject)
 
 
   @tag_operation
@@ -1886,18 +2236,40 @@ class Vcon():
     if(self._state in [VconStates.UNVERIFIED, VconStates.DECRYPTED]):
       raise InvalidVconState("Vcon state: {} cannot read parameters".format(self._state))
 
+    # jq does not modify its input, so no need to copy
     if(isinstance(query, str)):
-      return(pyjq.all(query, self.dumpd()))
+      return(pyjq.all(query, self.dumpd(True, False)))
 
     else:
       results = {}
-      vcon_dict = self.dumpd()
+      vcon_dict = self.dumpd(True, False)
       for query_name, query_string in query.items():
         results[query_name] = pyjq.all(query_string, vcon_dict)[0]
 
       return(results)
 
 
+  @tag_operation
+  def view(self) -> vcon.view.VconView:
+    """
+    Get a lightweight, immutable, read only view of this Vcon's data.
+
+    The view shares this Vcon's data rather than copying it.  So it is
+    cheap to create for read only consumers (e.g. jq queries, transcript
+    accessors or API responses).  The view of an UNSIGNED Vcon reflects
+    any subsequent changes to this Vcon.
+
+    Parameters: none
+
+    Returns:  
+      vcon.view.VconView for this Vcon's data
+    """
+    if(self._state not in _READABLE_STATES):
+      raise UnverifiedVcon("vCon state: {} must be verified before viewing data".format(self._state))
+
+    return(vcon.view.VconView(self._vcon_dict))
+
+
   @tag_operation
   async def filter(self,
     filter_name: str,
@@ -1923,6 +2295,23 @@ class Vcon():
     return(await plugin.filter(self, options))
 
 
+  @tag_operation
+  def locked(self) -> threading.RLock:
+    """
+    Get the reentrant lock which serializes changes to this Vcon, to hold
+    across a read and a dependent change (see vcon.concurrency).
+
+    Example:  
+      with a_vcon.locked():  
+        if(a_vcon.find_transcript_for_dialog(0) is None):  
+          a_vcon.add_analysis(0, "transcript", ...)
+
+    Returns:  
+      threading.RLock for this Vcon
+    """
+    return(self._changes.lock)
+
+
   @tag_meta
   def set_uuid(self, domain_name: str, replace: bool= False) -> str:
     """
@@ -1940,12 +2329,13 @@ class Vcon():
 
     self._attempting_modify()
 
-    if(self.uuid is not None and replace is False and len(self.uuid) > 0):
-      raise AttributeError("uuid parameter already set")
+    with self._changes.lock:
+      if(self.uuid is not None and replace is False and len(self.uuid) > 0):
+        raise AttributeError("uuid parameter already set")
 
-    uuid = self.uuid8_domain_name(domain_name)
+      uuid = self.uuid8_domain_name(domain_name)
 
-    self._vcon_dict[Vcon.UUID] = uuid
+      self._changes.set(self._vcon_dict, (Vcon.UUID,), uuid)
 
     return(uuid)
 
@@ -1978,7 +2368,7 @@ class Vcon():
       # The only programatic way to do this is to instantiate a Vcon, but this seemed a bit
       # heavy.  So for now just testing a manually maintained list of attributes and  blacklisted
       # token names.
-      instance_attributes = ['_jwe_dict', '_jws_dict', '_state', '_vcon_dict', 'vcon', "Vcon", "filter_plugins", "security", "utils", "cli"]
+      instance_attributes = ['_changes', '_dialog_cache', '_dialog_text_cache', '_jwe_dict', '_jws_dict', '_state', '_vcon_dict', 'vcon', "Vcon", "filter_plugins", "security", "utils", "cli"]
       if(name in instance_attributes):
         exists = True
 
@@ -2028,10 +2418,12 @@ class Vcon():
     # This is partially from uuid6.uuid7 implementation:
     global _LAST_V8_TIMESTAMP
 
-    nanoseconds = time.time_ns()
-    if _LAST_V8_TIMESTAMP is not None and nanoseconds <= _LAST_V8_TIMESTAMP:
-        nanoseconds = _LAST_V8_TIMESTAMP + 1
-    _last_v7_timestamp = nanoseconds
+    # Keep the timestamps unique and increasing across threads
+    with _LAST_V8_TIMESTAMP_LOCK:
+      nanoseconds = time.time_ns()
+      if _LAST_V8_TIMESTAMP is not None and nanoseconds <= _LAST_V8_TIMESTAMP:
+          nanoseconds = _LAST_V8_TIMESTAMP + 1
+      _LAST_V8_TIMESTAMP = nanoseconds
     timestamp_ms, timestamp_ns = divmod(nanoseconds, 10**6)
     subsec = uuid6._subsec_encode(timestamp_ns)
 
@@ -1,7 +1,36 @@
 """ Vcon accessors and helpers """
 import typing
+import importlib
 
-transcript_accessors: typing.Dict[typing.Tuple[str, str, str], typing.Type] = {}
+
+def import_object(path: str) -> typing.Any:
+  """ Import the object given as "module.name:object_name" """
+  module_name, _separator, object_name = path.partition(":")
+  if(object_name == ""):
+    raise AttributeError("{} should be of the form: module.name:object_name".format(path))
+  return(getattr(importlib.import_module(module_name), object_name))
+
+
+class LazyClassDict(dict):
+  """
+  dict whose values may be given as "module.name:ClassName" strings, so that
+  the module is only imported when the value is first looked up.
+  """
+  def __getitem__(self, key):
+    value = super().__getitem__(key)
+    if(isinstance(value, str)):
+      value = import_object(value)
+      super().__setitem__(key, value)
+    return(value)
+
+  def get(self, key, default = None):
+    if(key in self):
+      return(self[key])
+    return(default)
+
+
+# (vendor, product, schema): TranscriptAccessor derived class or "module.name:ClassName"
+transcript_accessors: typing.Dict[typing.Tuple[str, str, str], typing.Union[typing.Type, str]] = LazyClassDict()
 
 
 class TranscriptAccessor():
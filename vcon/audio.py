@@ -0,0 +1,244 @@
+"""
+In memory decoding of dialog recordings to PCM sample arrays, as used by
+transcription models such as whisper (16 kHz mono float32 in [-1.0, 1.0]).
+
+16 bit (or 8 or 32 bit) PCM WAV at the requested sample rate is decoded
+directly with numpy.  Other media (e.g. mp3, mp4, WAV needing resampling)
+is piped through ffmpeg, without writing the recording to a file.  MP4
+files with the index (moov atom) at the end cannot be demuxed from a pipe,
+so if decoding from the pipe fails, the recording is decoded from a
+temporary file.
+
+split_on_silence splits long recordings into chunks at silences found
+with a frame energy voice activity detector, so that the chunks can be
+transcribed in parallel.
+
+Example:
+  body = await a_vcon.get_dialog_body(dialog_index)
+  samples = vcon.audio.decode_pcm(body, a_vcon.dialog[dialog_index]["mimetype"])
+  for start, end in vcon.audio.split_on_silence(samples, 300.0):
+    transcribe(samples[start:end])
+"""
+import io
+import os
+import sys
+import wave
+import typing
+import tempfile
+import subprocess
+import numpy
+import vcon.logging_utils
+
+logger = vcon.logging_utils.build_logger(__name__, sys.stderr)
+
+# Sample rate expected by whisper
+SAMPLE_RATE = 16000
+
+FFMPEG = "ffmpeg"
+
+# numpy sample type and value offset for WAV PCM sample widths (8 bit WAV is unsigned)
+_WAV_SAMPLE_TYPES = {
+  1: (numpy.uint8, 128),
+  2: (numpy.int16, 0),
+  4: (numpy.int32, 0)
+  }
+
+
+class AudioDecodeError(Exception):
+  """ Raised when a recording cannot be decoded to PCM samples """
+
+
+def decode_wav(body: bytes, sample_rate: int = SAMPLE_RATE) -> typing.Union[numpy.ndarray, None]:
+  """
+  Decode PCM WAV to mono float32 samples without ffmpeg.
+
+  Parameters:
+    body (bytes) - WAV file content
+    sample_rate (int) - required sample rate
+
+  Returns:
+    numpy.ndarray of float32 samples or None if the body is not PCM WAV
+    at the given sample rate (e.g. needs resampling)
+  """
+  try:
+    with wave.open(io.BytesIO(body), "rb") as wav_file:
+      sample_type = _WAV_SAMPLE_TYPES.get(wav_file.getsampwidth(), None)
+      if(sample_type is None or wav_file.getframerate() != sample_rate):
+        return(None)
+      channels = wav_file.getnchannels()
+      frames = wav_file.readframes(wav_file.getnframes())
+
+  except (wave.Error, EOFError) as wav_error:
+    # e.g. not PCM (wave only supports PCM) or not WAV at all
+    logger.debug("not decoding as PCM WAV: %s", wav_error)
+    return(None)
+
+  dtype, offset = sample_type
+  # a truncated last frame is dropped
+  frame_bytes = channels * numpy.dtype(dtype).itemsize
+  samples = numpy.frombuffer(frames, dtype = dtype, count = len(frames) // frame_bytes * channels)
+  scale = float(numpy.iinfo(dtype).max - offset + 1)
+  samples = (samples.astype(numpy.float32) - offset) / scale
+  if(channels > 1):
+    samples = samples.reshape(-1, channels).mean(axis = 1, dtype = numpy.float32)
+  return(samples)
+
+
+def _ffmpeg_command(input_name: str, sample_rate: int) -> typing.List[str]:
+  return([
+    FFMPEG, "-nostdin", "-threads", "0", "-i", input_name,
+    "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+    "-loglevel", "error", "pipe:1"
+    ])
+
+
+def _run_ffmpeg(command: typing.List[str], body: typing.Union[bytes, None]) -> bytes:
+  try:
+    return(subprocess.run(command, input = body, capture_output = True, check = True).stdout)
+
+  except FileNotFoundError as missing_error:
+    raise AudioDecodeError("{} not found, required to decode this media".format(FFMPEG)) from missing_error
+
+
+def decode_ffmpeg(body: bytes, sample_rate: int = SAMPLE_RATE) -> numpy.ndarray:
+  """
+  Decode any media ffmpeg supports to mono float32 samples, piping
+  the body to ffmpeg.
+
+  Parameters:
+    body (bytes) - recording file content
+    sample_rate (int) - sample rate to resample to
+
+  Returns:
+    numpy.ndarray of float32 samples
+  """
+  try:
+    pcm = _run_ffmpeg(_ffmpeg_command("pipe:0", sample_rate), body)
+
+  except subprocess.CalledProcessError as pipe_error:
+    # Some containers (e.g. mp4 with index at end) need a seekable input
+    logger.debug("ffmpeg could not decode from pipe, using temporary file: %s",
+      pipe_error.stderr.decode("utf-8", errors = "replace").strip())
+    with tempfile.TemporaryDirectory() as temp_dir:
+      input_name = os.path.join(temp_dir, "recording")
+      with open(input_name, "wb") as input_file:
+        input_file.write(body)
+      try:
+        pcm = _run_ffmpeg(_ffmpeg_command(input_name, sample_rate), None)
+
+      except subprocess.CalledProcessError as file_error:
+        raise AudioDecodeError("ffmpeg failed to decode recording: {}".format(
+          file_error.stderr.decode("utf-8", errors = "replace").strip())) from file_error
+
+  return(numpy.frombuffer(pcm, numpy.int16).astype(numpy.float32) / 32768.0)
+
+
+def decode_pcm(
+    body: bytes,
+    mime_type: typing.Union[str, None] = None,
+    sample_rate: int = SAMPLE_RATE
+  ) -> numpy.ndarray:
+  """
+  Decode a recording to mono float32 samples in memory.
+
+  Parameters:
+    body (bytes) - recording file content
+    mime_type (str) - recording media type, if known.  Used to skip the
+      WAV decoder for media which is not WAV.
+    sample_rate (int) - sample rate of the returned samples
+
+  Returns:
+    numpy.ndarray of float32 samples in [-1.0, 1.0]
+  """
+  if(mime_type is None or "wav" in mime_type):
+    samples = decode_wav(body, sample_rate)
+    if(samples is not None):
+      return(samples)
+
+  return(decode_ffmpeg(body, sample_rate))
+
+
+def frame_energy(
+    samples: numpy.ndarray,
+    frame_length: int
+  ) -> numpy.ndarray:
+  """
+  Energy of each whole frame of frame_length samples in dB (relative to full scale)
+  """
+  frame_count = len(samples) // frame_length
+  frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length).astype(numpy.float64)
+  return(10.0 * numpy.log10(numpy.mean(frames * frames, axis = 1) + 1e-10))
+
+
+def split_on_silence(
+    samples: numpy.ndarray,
+    max_seconds: float,
+    sample_rate: int = SAMPLE_RATE,
+    frame_seconds: float = 0.03,
+    silence_db: float = 10.0,
+    min_fraction: float = 0.5
+  ) -> typing.List[typing.Tuple[int, int]]:
+  """
+  Split a recording into chunks of at most max_seconds, at silences where possible.
+
+  Frames with energy less than silence_db above the noise floor (the 10th
+  percentile of the frame energies) and silence_db below the speech level
+  (the 90th percentile) are silent.  Each chunk ends in the
+  middle of the longest silence between min_fraction * max_seconds and
+  max_seconds from its start, or at the quietest frame if there is no
+  silence.
+
+  Parameters:
+    samples (numpy.ndarray) - mono samples
+    max_seconds (float) - maximum length of a chunk
+    sample_rate (int) - sample rate of the samples
+    frame_seconds (float) - length of the frames the energy is measured over
+    silence_db (float) - dB above the noise floor considered silence
+    min_fraction (float) - shortest chunk (except the last) as a fraction of max_seconds
+
+  Returns:
+    list of (start, end) sample index of each chunk, covering all of the samples
+  """
+  max_length = int(max_seconds * sample_rate)
+  if(max_length <= 0):
+    raise ValueError("chunk length: {} seconds too short".format(max_seconds))
+  if(len(samples) <= max_length):
+    return([(0, len(samples))])
+
+  frame_length = max(int(frame_seconds * sample_rate), 1)
+  energy = frame_energy(samples, frame_length)
+  noise_floor, speech_level = numpy.percentile(energy, [10, 90])
+  silent = energy < min(noise_floor + silence_db, speech_level - silence_db)
+  max_frames = max(max_length // frame_length, 1)
+  min_frames = max(int(max_frames * min_fraction), 1)
+
+  chunks = []
+  start = 0
+  while(len(samples) - start > max_length):
+    start_frame = -(-start // frame_length)
+    window_start = start_frame + min_frames
+    window_end = min((start + max_length) // frame_length, len(energy))
+    split_frame = None
+    if(window_end > window_start):
+      window = silent[window_start:window_end]
+      # runs of silent frames in the window: (run start, run end)
+      edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], window.astype(numpy.int8), [0]))))
+      runs = edges.reshape(-1, 2)
+      if(len(runs) > 0):
+        # longest run, the latest of equally long runs
+        lengths = runs[:, 1] - runs[:, 0]
+        run_start, run_end = runs[len(lengths) - 1 - numpy.argmax(lengths[::-1])]
+        split_frame = window_start + (run_start + run_end) // 2
+      else:
+        split_frame = window_start + int(numpy.argmin(energy[window_start:window_end]))
+
+    if(split_frame is None):
+      end = start + max_length
+    else:
+      # middle of the split frame
+      end = min(int(split_frame) * frame_length + frame_length // 2, start + max_length)
+    chunks.append((start, end))
+    start = end
+
+  chunks.append((start, len(samples)))
+  return(chunks)
@@ -0,0 +1,227 @@
+"""
+Streaming base64url decoding of large inline bodies (e.g. dialog recordings).
+
+The decoders work on fixed size slices of the encoded body, so that decoding
+a large body needs memory for one chunk rather than for a bytes copy of the
+whole encoded body.  The encoded body may be str, bytes, bytearray or
+memoryview and may be missing its "=" padding.  White space (e.g. the line
+breaks of a body wrapped at 76 columns) is ignored.
+
+Example:
+  with open("recording.mp4", "wb") as out_file:
+    vcon.base64url.decode_to_writer(dialog["body"], out_file)
+"""
+import re
+import typing
+import inspect
+import binascii
+
+# Encoded characters decoded at a time, must be a multiple of 4
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+EncodedType = typing.Union[str, bytes, bytearray, memoryview]
+
+# base64url to base64 alphabet
+_TO_BASE64_BYTES = bytes.maketrans(b"-_", b"+/")
+_TO_BASE64_STR = str.maketrans("-_", "+/")
+
+
+_WHITESPACE_STR = re.compile(r"\s+")
+_WHITESPACE_BYTES = re.compile(rb"\s+")
+
+
+def _has_whitespace(encoded: EncodedType) -> bool:
+  if(isinstance(encoded, str)):
+    return(_WHITESPACE_STR.search(encoded) is not None)
+  return(_WHITESPACE_BYTES.search(encoded) is not None)
+
+
+def _stripped_slices(encoded: EncodedType, chunk_size: int) -> typing.Iterator[bytes]:
+  """ consecutive slices of the encoded body, as base64 alphabet bytes with the white space removed """
+  if(isinstance(encoded, (bytes, bytearray))):
+    encoded = memoryview(encoded)
+  for offset in range(0, len(encoded), chunk_size):
+    raw = encoded[offset:offset + chunk_size]
+    if(isinstance(raw, str)):
+      yield(_WHITESPACE_STR.sub("", raw).translate(_TO_BASE64_STR).encode("ascii"))
+    else:
+      yield(_WHITESPACE_BYTES.sub(b"", bytes(raw)).translate(_TO_BASE64_BYTES))
+
+
+def _check_chunk_size(chunk_size: int) -> None:
+  if(chunk_size < 4 or chunk_size % 4 != 0):
+    raise ValueError("chunk_size: {} must be a positive multiple of 4".format(chunk_size))
+
+
+def _encoded_length(encoded: EncodedType) -> int:
+  """ length of the encoded body, not including any padding or white space """
+  if(_has_whitespace(encoded)):
+    length = 0
+    tail = b""
+    for stripped in _stripped_slices(encoded, DEFAULT_CHUNK_SIZE):
+      length += len(stripped)
+      tail = (tail + stripped)[-2:]
+    length -= len(tail) - len(tail.rstrip(b"="))
+
+  else:
+    length = len(encoded)
+    # at most 2 padding characters
+    for _pad in range(2):
+      if(length > 0 and encoded[length - 1] in ("=", ord("="))):
+        length -= 1
+
+  if(length % 4 == 1):
+    raise ValueError("invalid base64url length: {}".format(length))
+  return(length)
+
+
+def decoded_length(encoded: EncodedType) -> int:
+  """ Get the number of bytes the base64url encoded body decodes to, without decoding it """
+  length = _encoded_length(encoded)
+  return(length // 4 * 3 + max(0, length % 4 - 1))
+
+
+def _decode_chunk(chunk: EncodedType) -> bytes:
+  """ decode one slice of base64url, padding it if needed """
+  if(isinstance(chunk, str)):
+    chunk = chunk.translate(_TO_BASE64_STR).encode("ascii")
+  else:
+    # memoryview and bytearray slices are translated to a new bytes object
+    chunk = bytes(chunk).translate(_TO_BASE64_BYTES)
+  padding = -len(chunk) % 4
+  if(padding > 0):
+    chunk += b"=" * padding
+  try:
+    return(binascii.a2b_base64(chunk))
+
+  except binascii.Error as decode_error:
+    raise ValueError("invalid base64url: {}".format(decode_error)) from decode_error
+
+
+def iter_decode(encoded: EncodedType, chunk_size: int = DEFAULT_CHUNK_SIZE) -> typing.Iterator[bytes]:
+  """
+  Decode the base64url body in chunks.
+
+  Parameters:
+    encoded (str, bytes or memoryview) - base64url encoded body
+    chunk_size (int) - number of encoded characters to decode at a time,
+      a multiple of 4.  Decoded chunks are 3/4 of this size.
+
+  Returns:
+    iterator of decoded bytes chunks
+  """
+  _check_chunk_size(chunk_size)
+  if(_has_whitespace(encoded)):
+    # slice boundaries are not on 4 character boundaries once the white
+    # space is removed, the characters past the last whole 4 are carried
+    # into the next chunk
+    _encoded_length(encoded)
+    carry = b""
+    for stripped in _stripped_slices(encoded, chunk_size):
+      chunk = carry + stripped
+      whole = len(chunk) - len(chunk) % 4
+      carry = chunk[whole:]
+      if(whole > 0):
+        yield(_decode_chunk(chunk[:whole]))
+    carry = carry.rstrip(b"=")
+    if(len(carry) > 0):
+      yield(_decode_chunk(carry))
+    return
+
+  length = _encoded_length(encoded)
+  if(isinstance(encoded, (bytes, bytearray))):
+    # slicing a memoryview does not copy
+    encoded = memoryview(encoded)
+
+  for offset in range(0, length, chunk_size):
+    yield(_decode_chunk(encoded[offset:min(offset + chunk_size, length)]))
+
+
+def decode(encoded: EncodedType, chunk_size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+  """ Decode the whole base64url body to bytes """
+  return(b"".join(iter_decode(encoded, chunk_size)))
+
+
+def decode_into(
+    encoded: EncodedType,
+    buffer: typing.Union[bytearray, memoryview, None] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+  ) -> memoryview:
+  """
+  Decode the base64url body into a writable buffer, without building
+  an intermediate copy of the whole decoded or encoded body.
+
+  Parameters:
+    encoded (str, bytes or memoryview) - base64url encoded body
+    buffer (bytearray or memoryview) - writable buffer of at least
+      decoded_length(encoded) bytes, None allocates a bytearray
+    chunk_size (int) - number of encoded characters to decode at a time
+
+  Returns:
+    memoryview of the decoded bytes in the buffer
+  """
+  length = decoded_length(encoded)
+  if(buffer is None):
+    buffer = bytearray(length)
+  view = memoryview(buffer)
+  if(view.readonly):
+    raise ValueError("buffer must be writable")
+  if(view.nbytes < length):
+    raise ValueError("buffer size: {} too small for decoded length: {}".format(view.nbytes, length))
+  view = view.cast("B")
+
+  offset = 0
+  for chunk in iter_decode(encoded, chunk_size):
+    view[offset:offset + len(chunk)] = chunk
+    offset += len(chunk)
+
+  return(view[:offset])
+
+
+def decode_to_writer(encoded: EncodedType, writer: typing.Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+  """
+  Decode the base64url body, writing each decoded chunk as it is decoded.
+
+  Parameters:
+    encoded (str, bytes or memoryview) - base64url encoded body
+    writer - binary file handle (has write) or socket (has sendall)
+    chunk_size (int) - number of encoded characters to decode at a time
+
+  Returns:
+    int number of decoded bytes written
+  """
+  write = getattr(writer, "sendall", None)
+  if(write is None):
+    write = writer.write
+
+  written = 0
+  for chunk in iter_decode(encoded, chunk_size):
+    write(chunk)
+    written += len(chunk)
+  return(written)
+
+
+async def decode_to_async_writer(encoded: EncodedType, writer: typing.Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+  """
+  Decode the base64url body, writing each decoded chunk to an async writer.
+
+  Parameters:
+    encoded (str, bytes or memoryview) - base64url encoded body
+    writer - asyncio.StreamWriter (write and drain) or an object with an
+      async write method (e.g. aiofiles file handle)
+    chunk_size (int) - number of encoded characters to decode at a time
+
+  Returns:
+    int number of decoded bytes written
+  """
+  drain = getattr(writer, "drain", None)
+  written = 0
+  for chunk in iter_decode(encoded, chunk_size):
+    result = writer.write(chunk)
+    if(inspect.isawaitable(result)):
+      await result
+    # apply back pressure so that at most about a chunk is buffered
+    if(drain is not None):
+      await drain()
+    written += len(chunk)
+  return(written)
@@ -0,0 +1,371 @@
+"""
+Incremental change tracking for Vcon data.
+
+After Vcon.track_changes is called, Vcon records the mutations made
+through its API (e.g. add_analysis, add_dialog_*, set_party_parameter,
+set_subject) in a VconChangeLog.  Changes made directly to the Vcon data
+(e.g. a_vcon.parties[0]["name"] = "Alice") are not recorded.  The
+change log can be emitted as an RFC 6902 JSON Patch or as a more compact
+delta, so that a large vCon that had one analysis object added, can be
+updated in storage or shipped to a client without rewriting the whole
+document.
+
+The values in the emitted patch or delta are shared with the Vcon, not
+copied.  Serialize them (e.g. json.dumps) before further modifying the Vcon.
+
+Compact delta form:
+  {
+    "base_length": {"analysis": 3},
+    "append": {"analysis": [{...}, {...}]},
+    "set": [[["subject"], "new subject"], [["parties", 0, "name"], "Alice"]]
+  }
+
+  **base_length** - length of each top level array before the appends,
+    used to detect that the delta is applied to the version it was made from
+  **append** - elements appended to the top level arrays
+  **set** - [path, value] pairs in the order set.  Sets on elements
+    appended in the same delta are already included in the appended element.
+"""
+import typing
+import copy
+import threading
+
+PathType = typing.Tuple[typing.Union[str, int], ...]
+
+# serializes the lazy creation of the VconChangeLog locks
+_lock_creation = threading.Lock()
+
+
+class InvalidVconPatch(Exception):
+  """ Raised when a JSON Patch or delta is malformed or does not apply to the vCon data """
+
+class VconPatchConflict(InvalidVconPatch):
+  """ Raised when a delta is applied to a different version of the vCon than it was made from """
+
+
+def pointer_to_path(pointer: str) -> typing.List[str]:
+  """ Convert a RFC 6901 JSON Pointer string to a list of unescaped tokens """
+  if(pointer == ""):
+    return([])
+  if(pointer[0] != "/"):
+    raise InvalidVconPatch("JSON Pointer: {} must start with /".format(pointer))
+  return([token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")])
+
+
+def path_to_pointer(path: typing.Sequence[typing.Union[str, int]]) -> str:
+  """ Convert a list of tokens to a RFC 6901 JSON Pointer string """
+  return("".join(["/" + str(token).replace("~", "~0").replace("/", "~1") for token in path]))
+
+
+class VconChangeLog():
+  """
+  Ordered log of the changes made to Vcon data.
+
+  The record methods both make the change to the given vCon dict and
+  record it, so that the two cannot get out of step.  They hold lock
+  while doing so, which Vcon also uses to serialize its compound
+  operations (see vcon.concurrency).
+
+  Changes are only recorded once enabled (e.g. Vcon.track_changes), so
+  that a Vcon which is not going to be saved as a delta, does not keep
+  a log of everything added to it.
+  """
+  __slots__ = ("_changes", "_lock", "enabled")
+
+  # Change record types
+  CREATE = 0
+  APPEND = 1
+  SET = 2
+
+  def __init__(self, enabled: bool = False):
+    # list of (change type, path, value)
+    self._changes = []
+    # created on first use
+    self._lock = None
+    self.enabled = enabled
+
+  def __len__(self) -> int:
+    return(len(self._changes))
+
+  def __getstate__(self) -> typing.Tuple[bool, list]:
+    # The lock is not picklable (e.g. for multiprocessing), a new one is made on unpickle
+    with self.lock:
+      return((self.enabled, list(self._changes)))
+
+  def __setstate__(self, state: typing.Tuple[bool, list]) -> None:
+    self.enabled, self._changes = state
+    self._lock = None
+
+  @property
+  def lock(self) -> threading.RLock:
+    """ reentrant lock serializing the changes """
+    if(self._lock is None):
+      with _lock_creation:
+        if(self._lock is None):
+          self._lock = threading.RLock()
+    return(self._lock)
+
+  def clear(self) -> None:
+    """ Forget all of the recorded changes (e.g. after they are committed to storage) """
+    with self.lock:
+      self._changes = []
+
+  def append(self, vcon_dict: dict, array_name: str, element: typing.Any) -> int:
+    """
+    Append the element to the named top level array, creating the array if needed.
+
+    Returns:
+      int index of the appended element
+    """
+    with self.lock:
+      array = vcon_dict.get(array_name, None)
+      if(array is None):
+        array = vcon_dict[array_name] = []
+        if(self.enabled):
+          self._changes.append((VconChangeLog.CREATE, (array_name,), None))
+
+      array.append(element)
+      index = len(array) - 1
+      if(self.enabled):
+        self._changes.append((VconChangeLog.APPEND, (array_name, index), element))
+      return(index)
+
+  def set(self, vcon_dict: dict, path: PathType, value: typing.Any) -> None:
+    """ Set the value at the given path (e.g. ("parties", 0, "name")) """
+    with self.lock:
+      container = vcon_dict
+      for token in path[:-1]:
+        container = container[token]
+      container[path[-1]] = value
+      if(self.enabled):
+        self._changes.append((VconChangeLog.SET, tuple(path), value))
+
+  def json_patch(self) -> typing.List[dict]:
+    """
+    Get the changes as an RFC 6902 JSON Patch.
+
+    Appended array elements use explicit indices rather than "-", so that
+    applying the patch to a different version of the vCon fails or is
+    detectable, rather than silently appending to the wrong place.
+
+    Returns:
+      list of JSON Patch operation dicts
+    """
+    patch = []
+    with self.lock:
+      changes = list(self._changes)
+    for change_type, path, value in changes:
+      if(change_type == VconChangeLog.CREATE):
+        value = []
+      # add replaces an existing object member, so it covers both cases
+      patch.append({"op": "add", "path": path_to_pointer(path), "value": value})
+
+    return(patch)
+
+  def compact_delta(self) -> dict:
+    """
+    Get the changes in the compact delta form (see module doc).
+
+    Returns:
+      dict containing the delta
+    """
+    base_length = {}
+    appends = {}
+    sets = {}
+    with self.lock:
+      changes = list(self._changes)
+    for change_type, path, value in changes:
+      if(change_type == VconChangeLog.CREATE):
+        base_length[path[0]] = 0
+        appends[path[0]] = []
+
+      elif(change_type == VconChangeLog.APPEND):
+        array_name, index = path
+        if(array_name not in appends):
+          base_length[array_name] = index
+          appends[array_name] = []
+        appends[array_name].append(value)
+
+      else:
+        # Already included in an element appended in this delta
+        if(len(path) > 1 and path[0] in base_length and isinstance(path[1], int) and
+          path[1] >= base_length[path[0]]):
+          continue
+
+        # A later set of the same or a containing path overwrites earlier sets
+        for set_path in list(sets.keys()):
+          if(set_path[:len(path)] == path):
+            del sets[set_path]
+        sets[path] = value
+
+    return({
+      "base_length": base_length,
+      "append": appends,
+      "set": [[list(path), value] for path, value in sets.items()]
+      })
+
+
+def _resolve_parent(document: typing.Any, path: typing.List[str], pointer: str) -> typing.Tuple[typing.Any, typing.Union[str, int]]:
+  """ Get the container and key/index (index may be "-") of the last token of the path """
+  if(len(path) == 0):
+    raise InvalidVconPatch("operation on the whole document is not supported: {}".format(pointer))
+
+  container = document
+  for token in path[:-1]:
+    container = _get_child(container, token, pointer)
+
+  key = path[-1]
+  if(isinstance(container, list) and key != "-"):
+    key = _array_index(key, pointer)
+  return(container, key)
+
+
+def _array_index(token: typing.Union[str, int], pointer: str) -> int:
+  if(isinstance(token, int)):
+    return(token)
+  if(not token.isdigit() or (len(token) > 1 and token[0] == "0")):
+    raise InvalidVconPatch("invalid array index: {} in: {}".format(token, pointer))
+  return(int(token))
+
+
+def _get_child(container: typing.Any, token: typing.Union[str, int], pointer: str) -> typing.Any:
+  try:
+    if(isinstance(container, list)):
+      return(container[_array_index(token, pointer)])
+    return(container[token])
+
+  except (KeyError, IndexError, TypeError):
+    raise InvalidVconPatch("path: {} not found".format(pointer))
+
+
+def _get_value(document: typing.Any, pointer: str) -> typing.Any:
+  value = document
+  for token in pointer_to_path(pointer):
+    value = _get_child(value, token, pointer)
+  return(value)
+
+
+def _add(document: typing.Any, pointer: str, value: typing.Any) -> None:
+  container, key = _resolve_parent(document, pointer_to_path(pointer), pointer)
+  if(isinstance(container, list)):
+    if(key == "-"):
+      container.append(value)
+    elif(key > len(container)):
+      raise InvalidVconPatch("index: {} beyond end of array length: {} in: {}".format(key, len(container), pointer))
+    else:
+      container.insert(key, value)
+  elif(isinstance(container, dict)):
+    container[key] = value
+  else:
+    raise InvalidVconPatch("parent of: {} is not an object or array".format(pointer))
+
+
+def _remove(document: typing.Any, pointer: str) -> typing.Any:
+  container, key = _resolve_parent(document, pointer_to_path(pointer), pointer)
+  try:
+    return(container.pop(key))
+
+  except (KeyError, IndexError, TypeError, AttributeError):
+    raise InvalidVconPatch("path: {} not found".format(pointer))
+
+
+def apply_json_patch(document: dict, patch: typing.List[dict]) -> dict:
+  """
+  Apply an RFC 6902 JSON Patch to the given vCon dict, in place.
+
+  Supports the add, remove, replace, move, copy and test operations.
+  Values from the patch are copied, so the patch may be reused.
+  If an operation fails, the document may be partially patched.
+
+  Parameters:
+    document (dict) - vCon data to patch
+    patch (list) - list of JSON Patch operation dicts
+
+  Returns:
+    the patched document
+  """
+  for operation in patch:
+    op = operation.get("op", None)
+    pointer = operation.get("path", None)
+    if(not isinstance(pointer, str)):
+      raise InvalidVconPatch("JSON Patch operation missing path: {}".format(operation))
+
+    if(op in ("add", "replace", "test") and "value" not in operation):
+      raise InvalidVconPatch("JSON Patch operation missing value: {}".format(operation))
+
+    if(op == "add"):
+      _add(document, pointer, copy.deepcopy(operation["value"]))
+
+    elif(op == "remove"):
+      _remove(document, pointer)
+
+    elif(op == "replace"):
+      _remove(document, pointer)
+      _add(document, pointer, copy.deepcopy(operation["value"]))
+
+    elif(op in ("move", "copy")):
+      from_pointer = operation.get("from", None)
+      if(not isinstance(from_pointer, str)):
+        raise InvalidVconPatch("JSON Patch operation missing from: {}".format(operation))
+      if(op == "move"):
+        if(pointer.startswith(from_pointer + "/")):
+          raise InvalidVconPatch("cannot move: {} into one of its children: {}".format(from_pointer, pointer))
+        value = _remove(document, from_pointer)
+      else:
+        value = copy.deepcopy(_get_value(document, from_pointer))
+      _add(document, pointer, value)
+
+    elif(op == "test"):
+      if(_get_value(document, pointer) != operation["value"]):
+        raise InvalidVconPatch("JSON Patch test failed for path: {}".format(pointer))
+
+    else:
+      raise InvalidVconPatch("unsupported JSON Patch op: {}".format(op))
+
+  return(document)
+
+
+def apply_delta(document: dict, delta: dict) -> dict:
+  """
+  Apply a compact delta (see module doc) to the given vCon dict, in place.
+
+  Parameters:
+    document (dict) - vCon data to update
+    delta (dict) - delta from VconChangeLog.compact_delta
+
+  Returns:
+    the updated document
+
+  Raises:
+    VconPatchConflict if the arrays in the document are not the same length
+      as those the delta was made from.
+  """
+  base_length = delta.get("base_length", {})
+  appends = delta.get("append", {})
+
+  # Check before changing anything
+  for array_name, length in base_length.items():
+    array = document.get(array_name, None)
+    array_length = 0 if array is None else len(array)
+    if(array_length != length):
+      raise VconPatchConflict("{} array length: {} delta was made from length: {}".format(
+        array_name, array_length, length))
+
+  for array_name, elements in appends.items():
+    if(document.get(array_name, None) is None):
+      document[array_name] = []
+    document[array_name].extend(copy.deepcopy(elements))
+
+  for path, value in delta.get("set", []):
+    if(len(path) == 0):
+      raise InvalidVconPatch("set of the whole document is not supported")
+    container = document
+    try:
+      for token in path[:-1]:
+        container = container[token]
+      container[path[-1]] = copy.deepcopy(value)
+
+    except (KeyError, IndexError, TypeError):
+      raise InvalidVconPatch("set path: {} not found".format(path))
+
+  return(document)
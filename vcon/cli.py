@@ -18,6 +18,8 @@ import sox
 import pytz
 import ffmpeg
 import vcon
+import vcon.io
+import vcon.email_import
 
 VERBOSE = False
 
@@ -517,8 +519,25 @@ async def main(argv : typing.Optional[typing.Sequence[str]] = None) -> int:
     metavar='email_file',
     nargs=1,
     type=pathlib.Path,
-    help = "path to SMTP email message file to add as text dialog",
+    help = "path to SMTP email message file to add as text dialog" +
+      " or mbox file or maildir directory when --mailbox is given",
     default=None)
+  add_in_email_subparsers.add_argument(
+    "--mailbox",
+    choices = vcon.email_import.MAILBOX_FORMATS,
+    help = "bulk import email_file as a mailbox of this format, creating a vCon" +
+      " per email thread.  Output is NDJSON, one vCon per line, and the input vCon is ignored.",
+    default = None)
+  add_in_email_subparsers.add_argument(
+    "--domain",
+    help = "domain name used to create UUIDs for vCons imported from a mailbox",
+    type = str,
+    default = socket.gethostname() + ".vcon.dev")
+  add_in_email_subparsers.add_argument(
+    "--workers",
+    help = "number of processes used to import a mailbox, defaults to number of CPUs",
+    type = int,
+    default = None)
   # not needed as they come from the SMTP message:
   # add_in_email_subparsers.add_argument("start", metavar='start_time', nargs="?", type=str, default=None)
   # add_in_email_subparsers.add_argument("parties", metavar='parties', nargs="?", type=str, default=None)
@@ -808,6 +827,13 @@ Name of filter plugin (e.g. {}) or default type filter plugin name (e.g. {})
         in_vcon.add_dialog_external_recording(body, args.start[0], duration, parties_object,
           args.url[0], mimetype, str(args.recfile[0]))
 
+    elif(args.add_command == "in-email" and args.mailbox is not None):
+      stdout_vcon = False
+      count = vcon.io.write_ndjson(
+        vcon.email_import.import_mailbox(str(args.emailfile[0]), args.domain, args.mailbox, args.workers),
+        args.outfile)
+      print("imported {} email threads as vCons".format(count), file=sys.stderr)
+
     elif(args.add_command == "in-email"):
       in_vcon = do_in_email(args, in_vcon)
 
@@ -828,12 +854,14 @@ Name of filter plugin (e.g. {}) or default type filter plugin name (e.g. {})
       if(dialog_index > num_dialogs):
         raise AttributeError("Dialog index: {} must be less than the number of dialog in the vCon: {}".format(dialog_index, num_dialogs))
 
-      recording_bytes = in_vcon.decode_dialog_inline_body(dialog_index)
       stdout_vcon = False
-      if(isinstance(recording_bytes, bytes)):
-        args.outfile.buffer.write(recording_bytes)
+      # Decode and write in chunks so that large recordings use bounded memory
+      if(in_vcon.dialog[dialog_index].get("encoding", "none").lower() == "base64url"):
+        args.outfile.flush()
+        in_vcon.write_dialog_inline_body(dialog_index, args.outfile.buffer)
+        args.outfile.buffer.flush()
       else:
-        args.outfile.write(recording_bytes)
+        in_vcon.write_dialog_inline_body(dialog_index, args.outfile)
 
   #print("vcon._vcon_dict: {}".format(in_vcon._vcon_dict))
   if(stdout_vcon):
@@ -0,0 +1,181 @@
+"""
+Concurrency model for running filters on one Vcon from several threads or asyncio tasks.
+
+Locking:
+
+  * Each Vcon has a reentrant lock (Vcon.locked).  Every mutation made
+    through the Vcon API (add_analysis, add_dialog_*, set_party_parameter,
+    set_uuid, apply_changes, ...) is made while holding it, so concurrent
+    adds are not lost and each gets the correct returned index.
+    dumps, dumpd and get_changes also hold it, so they see a consistent vCon.
+  * Code that reads and then modifies the vCon (e.g. finds an existing
+    analysis and only adds one if it is missing) should hold the lock across
+    both steps:  with a_vcon.locked(): ...
+  * sign, verify, encrypt, decrypt and loads change the state of the whole
+    Vcon and must not be called while filters are still running on it.
+  * Reads of the vCon attributes (e.g. a_vcon.dialog) return the live lists,
+    which other threads may append to.  Iterate by index over a length read
+    up front, or hold the lock, if that matters.
+  * Vcon.uuid8_time (used by set_uuid) is safe to call from any thread.
+
+Deterministic results:
+
+  Elements added concurrently are appended in the order the threads or
+  tasks happen to finish, which varies from run to run.  To get the same
+  vCon every time, give each thread or task its own AnalysisBuffer, add the
+  analysis to the buffer (no locking needed as it is not shared) and then
+  merge all of the buffers into the Vcon in one step with
+  Vcon.merge_analysis.  The buffered analysis is appended in buffer key
+  order (e.g. dialog index), then buffer creation order, then the order in
+  which it was added to the buffer.
+
+  Example:
+    buffers = [vcon.concurrency.AnalysisBuffer(dialog_index) for dialog_index in dialog_indices]
+    await asyncio.gather(*[transcribe(a_vcon, buffer.key, buffer) for buffer in buffers])
+    a_vcon.merge_analysis(buffers)
+
+Batching:
+
+  Batcher collects the items submitted by concurrent tasks (e.g. the
+  dialogs of several vCons being filtered at the same time) into batches
+  for models which process a batch more efficiently than one item at a time.
+
+This module must not import vcon, as it is imported by vcon.
+"""
+import typing
+import asyncio
+import itertools
+
+# Tie breaker so that buffers with the same key merge in creation order
+_buffer_sequence = itertools.count()
+
+
+class AnalysisBuffer():
+  """
+  Per thread or per task buffer of analysis to be added to a Vcon.
+
+  Supports the same add_analysis and add_analysis_transcript parameters
+  as Vcon.  The arguments are validated when merged into the Vcon.
+  """
+  __slots__ = ("key", "_sequence", "_calls")
+
+  def __init__(self, key: typing.Any = 0):
+    """
+    Parameters:
+      key - merge order key, comparable with the keys of the other buffers
+        merged with this one (e.g. the dialog index the analysis is for)
+    """
+    self.key = key
+    self._sequence = next(_buffer_sequence)
+    # list of (Vcon method name, args, kwargs)
+    self._calls = []
+
+  def __len__(self) -> int:
+    return(len(self._calls))
+
+  def sort_key(self) -> typing.Tuple[typing.Any, int]:
+    """ Key which orders buffers for a deterministic merge """
+    return((self.key, self._sequence))
+
+  def add_analysis(self, *args, **kwargs) -> None:
+    """ Buffer a call to Vcon.add_analysis """
+    self._calls.append(("add_analysis", args, kwargs))
+
+  def add_analysis_transcript(self, *args, **kwargs) -> None:
+    """ Buffer a call to Vcon.add_analysis_transcript """
+    self._calls.append(("add_analysis_transcript", args, kwargs))
+
+  def calls(self) -> typing.List[typing.Tuple[str, tuple, dict]]:
+    """ list of buffered (Vcon method name, args, kwargs) in the order added """
+    return(list(self._calls))
+
+  def clear(self) -> None:
+    """ Forget the buffered analysis """
+    self._calls = []
+
+
+def merge_order(buffers: typing.Iterable[AnalysisBuffer]) -> typing.List[AnalysisBuffer]:
+  """ Sort the buffers into the order in which they are merged """
+  return(sorted(buffers, key = AnalysisBuffer.sort_key))
+
+
+class Batcher():
+  """
+  Collects items submitted by concurrent asyncio tasks into batches and
+  scatters the batch results back to the submitting tasks.
+
+  A batch is run when batch_size items with the same batch key are
+  pending, or max_wait seconds after the first of them was submitted.
+  The batch function is called with the batch key and the list of items
+  and must return a list of results in the same order.  If it raises,
+  all of the submitters of the batch get the exception.
+  """
+  def __init__(
+    self,
+    run_batch: typing.Callable[[typing.Any, typing.List[typing.Any]], typing.Awaitable[typing.List[typing.Any]]],
+    batch_size: int,
+    max_wait: float
+    ):
+    """
+    Parameters:
+      run_batch - async function(batch key, items) returning list of results
+      batch_size (int) - maximum number of items in a batch
+      max_wait (float) - seconds to wait for a batch to fill
+    """
+    if(batch_size < 1):
+      raise ValueError("batch_size: {} must be at least 1".format(batch_size))
+    self._run_batch = run_batch
+    self.batch_size = batch_size
+    self.max_wait = max_wait
+    # (event loop, batch key): list of (item, future)
+    self._pending = {}
+    # (event loop, batch key): timer handle
+    self._timers = {}
+    # running batch tasks, referenced so that they are not garbage collected
+    self._tasks = set()
+
+  async def submit(self, item: typing.Any, batch_key: typing.Any = None) -> typing.Any:
+    """
+    Add the item to the next batch with the given key.
+
+    Returns:
+      the batch function's result for the item
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    pending_key = (loop, batch_key)
+    pending = self._pending.setdefault(pending_key, [])
+    pending.append((item, future))
+    if(len(pending) >= self.batch_size):
+      self._flush(pending_key)
+    elif(len(pending) == 1):
+      self._timers[pending_key] = loop.call_later(self.max_wait, self._flush, pending_key)
+
+    return(await future)
+
+  def _flush(self, pending_key: typing.Tuple[asyncio.AbstractEventLoop, typing.Any]) -> None:
+    timer = self._timers.pop(pending_key, None)
+    if(timer is not None):
+      timer.cancel()
+    batch = self._pending.pop(pending_key, [])
+    if(len(batch) > 0):
+      task = pending_key[0].create_task(self._run(pending_key[1], batch))
+      self._tasks.add(task)
+      task.add_done_callback(self._tasks.discard)
+
+  async def _run(self, batch_key: typing.Any, batch: typing.List[typing.Tuple[typing.Any, asyncio.Future]]) -> None:
+    try:
+      results = await self._run_batch(batch_key, [item for item, _future in batch])
+      if(len(results) != len(batch)):
+        raise RuntimeError("batch of: {} items returned: {} results".format(len(batch), len(results)))
+
+    except Exception as batch_error:
+      for _item, future in batch:
+        if(not future.done()):
+          future.set_exception(batch_error)
+      return
+
+    for (_item, future), result in zip(batch, results):
+      # submitter may have been cancelled
+      if(not future.done()):
+        future.set_result(result)
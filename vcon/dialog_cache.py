@@ -0,0 +1,90 @@
+"""
+Cache of decoded or fetched dialog bodies and transcript text.
+
+When set on a Vcon (Vcon.set_dialog_cache), Vcon.get_dialog_body and
+Vcon.get_dialog_text use the cache, so that several filter plugins run on
+the same Vcon (e.g. by vcon.filter_plugins.FilterChain) decode or fetch a
+recording and get the text of its transcript only once.
+
+Cached entries are checked against the dialog body (by identity) or url
+and the transcript analysis object (by identity) they were made from,
+so entries for replaced bodies or transcripts are not used.
+
+This module must not import vcon, as it is imported by vcon.
+"""
+import typing
+import threading
+
+
+class DialogCache():
+  """ Dialog body and transcript text cache, keyed by dialog index """
+  __slots__ = ("_bodies", "_texts", "_lock", "body_hits", "body_misses", "text_hits", "text_misses")
+
+  def __init__(self):
+    # dialog index: ((inline, body or url), decoded or fetched body)
+    self._bodies = {}
+    # dialog index: (transcript analysis dict, list of text dicts)
+    self._texts = {}
+    self._lock = threading.Lock()
+    self.body_hits = 0
+    self.body_misses = 0
+    self.text_hits = 0
+    self.text_misses = 0
+
+  @staticmethod
+  def _body_source(dialog: dict) -> typing.Tuple[bool, typing.Any]:
+    """ (True, inline body) or (False, url) for the dialog """
+    body = dialog.get("body", None)
+    if(body is not None and body != ""):
+      return((True, body))
+    return((False, dialog.get("url", None)))
+
+  def get_body(self, dialog_index: int, dialog: dict) -> typing.Union[bytes, str, None]:
+    """ Get the cached body for the dialog or None if not cached """
+    entry = self._bodies.get(dialog_index, None)
+    inline, source = DialogCache._body_source(dialog)
+    with self._lock:
+      # inline bodies are compared by identity as they may be large, urls by value
+      if(entry is not None and entry[0][0] == inline and
+        ((inline and entry[0][1] is source) or (not inline and entry[0][1] == source))):
+        self.body_hits += 1
+        return(entry[1])
+      self.body_misses += 1
+    return(None)
+
+  def set_body(self, dialog_index: int, dialog: dict, body: typing.Union[bytes, str]) -> None:
+    """ Cache the decoded or fetched body for the dialog """
+    self._bodies[dialog_index] = (DialogCache._body_source(dialog), body)
+
+  def get_text(self, dialog_index: int, analysis: dict) -> typing.Union[typing.List[typing.Dict[str, typing.Any]], None]:
+    """
+    Get the cached text for the dialog from the given transcript analysis
+    or None if not cached.  Returns copies of the text dicts, which the
+    caller may modify.
+    """
+    entry = self._texts.get(dialog_index, None)
+    with self._lock:
+      if(entry is not None and entry[0] is analysis):
+        self.text_hits += 1
+        return([dict(text_dict) for text_dict in entry[1]])
+      self.text_misses += 1
+    return(None)
+
+  def set_text(self, dialog_index: int, analysis: dict, texts: typing.List[typing.Dict[str, typing.Any]]) -> None:
+    """ Cache copies of the text dicts from the given transcript analysis of the dialog """
+    self._texts[dialog_index] = (analysis, [dict(text_dict) for text_dict in texts])
+
+  def clear(self) -> None:
+    """ Drop all of the cached bodies and text """
+    self._bodies = {}
+    self._texts = {}
+
+  def stats(self) -> typing.Dict[str, int]:
+    """ Returns dict of the hit and miss counts """
+    with self._lock:
+      return({
+        "body_hits": self.body_hits,
+        "body_misses": self.body_misses,
+        "text_hits": self.text_hits,
+        "text_misses": self.text_misses
+        })
@@ -0,0 +1,205 @@
+"""
+Bulk import of SMTP email messages from mbox and maildir mailboxes into vCons.
+
+Messages are grouped into threads using the Message-ID, In-Reply-To and
+References headers.  Each thread becomes a vCon with a text dialog per
+message in date order.  Threads are constructed in parallel worker processes.
+"""
+import typing
+import os
+import re
+import email.parser
+import email.policy
+import email.utils
+import mailbox
+import concurrent.futures
+import vcon
+
+logger = vcon.build_logger(__name__)
+
+MAILBOX_FORMATS = ["mbox", "maildir"]
+
+_MESSAGE_ID = re.compile(r"<[^<>\s]+>")
+
+
+def open_mailbox(path: str, mailbox_format: typing.Union[str, None] = None) -> mailbox.Mailbox:
+  """
+  Open a mbox file or maildir directory read only.
+
+  Parameters:
+    path (str) - path to mbox file or maildir directory
+    mailbox_format (str) - "mbox", "maildir" or None to infer from path
+
+  Returns:
+    mailbox.Mailbox
+  """
+  if(mailbox_format is None):
+    mailbox_format = "maildir" if os.path.isdir(path) else "mbox"
+
+  if(mailbox_format == "mbox"):
+    return(mailbox.mbox(path, create = False))
+
+  if(mailbox_format == "maildir"):
+    return(mailbox.Maildir(path, factory = None, create = False))
+
+  raise AttributeError("mailbox format: {} not supported.  Must be one of: {}".format(
+    mailbox_format, MAILBOX_FORMATS))
+
+
+class _ThreadGroups():
+  """ union-find of message ids to group messages into threads """
+  def __init__(self):
+    self._parent = {}
+
+  def find(self, message_id: str) -> str:
+    parent = self._parent.setdefault(message_id, message_id)
+    root = message_id
+    while(parent != root):
+      root = parent
+      parent = self._parent[root]
+    # path compression
+    while(self._parent[message_id] != root):
+      self._parent[message_id], message_id = root, self._parent[message_id]
+    return(root)
+
+  def union(self, message_id: str, other_id: str) -> None:
+    root = self.find(message_id)
+    other_root = self.find(other_id)
+    if(root != other_root):
+      self._parent[other_root] = root
+
+
+def group_threads(
+  smtp_messages: typing.Iterable[typing.Union[str, bytes]]
+  ) -> typing.List[typing.List[str]]:
+  """
+  Group SMTP messages into threads.
+
+  Only the headers are parsed.  Messages referencing each other directly or
+  indirectly through Message-ID, In-Reply-To or References are in the same
+  thread.  Threads are ordered by the first appearance of one of their
+  messages.  Messages in a thread are ordered by Date header.
+
+  Parameters:
+    smtp_messages (Iterable[Union[str, bytes]]) - SMTP messages including headers
+
+  Returns:
+    list of threads, each a list of SMTP message strings
+  """
+  header_parser = email.parser.HeaderParser(policy = email.policy.compat32)
+  groups = _ThreadGroups()
+  messages = []
+
+  for message_number, smtp_message in enumerate(smtp_messages):
+    if(isinstance(smtp_message, bytes)):
+      smtp_message = smtp_message.decode("utf-8", errors = "replace")
+    headers = header_parser.parsestr(smtp_message, headersonly = True)
+
+    message_ids = _MESSAGE_ID.findall(str(headers.get("message-id", "")))
+    # messages without Message-ID are their own thread unless referenced
+    message_id = message_ids[0] if len(message_ids) > 0 else "<no-id-{}>".format(message_number)
+    groups.find(message_id)
+    references = _MESSAGE_ID.findall(str(headers.get("in-reply-to", "")) + " " +
+      str(headers.get("references", "")))
+    for reference in references:
+      groups.union(message_id, reference)
+
+    try:
+      date = email.utils.parsedate_to_datetime(headers.get("date")).timestamp()
+    except (TypeError, ValueError):
+      date = None
+    messages.append((message_id, date, message_number, smtp_message))
+
+  threads = {}
+  for message_id, date, message_number, smtp_message in messages:
+    threads.setdefault(groups.find(message_id), []).append((date, message_number, smtp_message))
+
+  # dict preserves first appearance order of the threads
+  thread_list = []
+  for thread in threads.values():
+    thread.sort(key = lambda message: (message[0] is None, message[0] or 0, message[1]))
+    thread_list.append([message[2] for message in thread])
+
+  return(thread_list)
+
+
+def thread_to_vcon(
+  smtp_messages: typing.List[str],
+  domain_name: str
+  ) -> typing.Union[vcon.Vcon, None]:
+  """
+  Create a vCon with a text dialog for each of the messages in a thread.
+  Messages which cannot be added (e.g. no Date header) are logged and skipped.
+
+  Parameters:
+    smtp_messages (List[str]) - SMTP messages in the thread
+    domain_name (str) - domain name used to generate the vCon UUID
+
+  Returns:
+    the Vcon or None if none of the messages could be added
+  """
+  a_vcon = vcon.Vcon()
+  for smtp_message in smtp_messages:
+    try:
+      a_vcon.add_dialog_inline_email_message(smtp_message)
+
+    except Exception as add_error:
+      logger.warning("skipping email message which could not be added: {}".format(add_error))
+
+  if(len(a_vcon.dialog) == 0):
+    return(None)
+
+  a_vcon.set_uuid(domain_name)
+  return(a_vcon)
+
+
+def _read_messages(box: mailbox.Mailbox) -> typing.Iterator[bytes]:
+  for key in box.iterkeys():
+    yield(box.get_bytes(key))
+
+
+def import_mailbox(
+  path: str,
+  domain_name: str,
+  mailbox_format: typing.Union[str, None] = None,
+  max_workers: typing.Union[int, None] = None
+  ) -> typing.Iterator[vcon.Vcon]:
+  """
+  Generator which imports the messages in a mbox or maildir mailbox as one vCon per thread.
+
+  Parameters:
+    path (str) - path to mbox file or maildir directory
+    domain_name (str) - domain name used to generate the vCon UUIDs
+    mailbox_format (str) - "mbox", "maildir" or None to infer from path
+    max_workers (int) - number of worker processes creating vCons.  None uses
+      the number of CPUs, 1 creates them in this process.
+
+  Returns:
+    iterator over the Vcons, in order of the first appearance of each thread
+  """
+  box = open_mailbox(path, mailbox_format)
+  try:
+    threads = group_threads(_read_messages(box))
+  finally:
+    box.close()
+  logger.info("importing %d email threads from: %s", len(threads), path)
+
+  if(max_workers == 1 or len(threads) < 2):
+    for thread in threads:
+      a_vcon = thread_to_vcon(thread, domain_name)
+      if(a_vcon is not None):
+        yield(a_vcon)
+    return
+
+  if(max_workers is None):
+    max_workers = os.cpu_count() or 1
+  # a few chunks per worker to amortize IPC while balancing thread sizes
+  chunk_size = max(1, len(threads) // (4 * max_workers))
+
+  with concurrent.futures.ProcessPoolExecutor(max_workers = max_workers) as executor:
+    # map yields in thread order
+    for a_vcon in executor.map(thread_to_vcon, threads, [domain_name] * len(threads),
+      chunksize = chunk_size):
+      if(a_vcon is not None):
+        yield(a_vcon)
+
@@ -1,15 +1,61 @@
-""" Vcon module providing frameword for filter plugins which take a Von in and provide a Vcon output """
+"""
+Vcon module providing frameword for filter plugins which take a Von in and provide a Vcon output
+
+Filter plugins are registered without importing their implementation
+modules, which are only imported when the plugin is first used.
+Registrations come from:
+
+  * vcon/filter_plugins/manifest.json - the plugins included in this package
+  * manifest files listed in the VCON_FILTER_PLUGIN_MANIFESTS environment
+    variable (os.pathsep separated), or loaded with
+    FilterPluginRegistry.load_manifest
+  * package entry points in the "vcon.filter_plugins" group, named with the
+    plugin name and referencing the plugin class, e.g. in pyproject.toml:
+      [project.entry-points."vcon.filter_plugins"]
+      my_filter = "my_package.my_module:MyFilter"
+  * FilterPluginRegistry.register
+
+Manifest file format (JSON):
+  {
+    "plugins": {
+      "<plugin name>": {
+        "module": "<implementation module name>",
+        "class": "<FilterPlugin derived class name>",
+        "description": "<text description>",
+        "init_options": {<init option name>: <value>},
+        "init_options_env": {<init option name>: "<environment variable name>"}
+      }
+    },
+    "type_defaults": {"<plugin type>": "<plugin name>"},
+    "transcript_accessors": [
+      {"vendor": "", "product": "", "schema": "", "accessor": "<module name>:<TranscriptAccessor class>"}
+    ]
+  }
+
+init_options_env values are read from the environment when the plugin is
+loaded, overriding the init_options value if the variable is set.
+"""
 from __future__ import annotations
 import importlib
 import os
 import copy
 import sys
+import json
 import typing
 import traceback
+import asyncio
+import functools
+import concurrent.futures
 import operator
+import threading
+import time
 import logging
 import pydantic
-import pythonjsonlogger.jsonlogger
+# vcon.logging_utils, vcon.accessors and vcon.dialog_cache do not import vcon, so they are safe to import here
+import vcon.logging_utils
+import vcon.accessors
+import vcon.dialog_cache
+import vcon.concurrency
 
 
 # This package is dependent upon the vcon package only for typing purposes.
@@ -18,30 +64,20 @@ import pythonjsonlogger.jsonlogger
 if typing.TYPE_CHECKING:
   from vcon import Vcon
 
-# This is cloned from vcon package as we cannot import vcon here due to
+# Same as vcon.build_logger, which we cannot import here due to
 # cyclical import.
 def build_logger(name : str) -> logging.Logger:
-  logger = logging.getLogger(name)
-
-  log_config_filename = "./logging.conf"
-  if(os.path.isfile(log_config_filename)):
-    logging.config.fileConfig(log_config_filename)
-    #print("got logging config", file=sys.stderr)
-  else:
-    logger.setLevel(logging.DEBUG)
-
-    # Output to stdout WILL BREAK the Vcon CLI.
-    # MUST use stderr.
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.DEBUG)
-    formatter = pythonjsonlogger.jsonlogger.JsonFormatter( "%(timestamp)s %(levelname)s %(message)s ", timestamp=True)
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-  return(logger)
+  # Output to stdout WILL BREAK the Vcon CLI.
+  # MUST use stderr.
+  # Level is set from VCON_LOG_LEVEL and VCON_LOG_LEVELS, see vcon.logging_utils
+  return(vcon.logging_utils.build_logger(name, sys.stderr))
 
 logger = build_logger(__name__)
 
+PLUGIN_ENTRY_POINT_GROUP = "vcon.filter_plugins"
+PLUGIN_MANIFESTS_ENV = "VCON_FILTER_PLUGIN_MANIFESTS"
+BUILTIN_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manifest.json")
+
 
 class FilterPluginModuleNotFound(Exception):
   """ Thrown when plugin modeule fails to load """
@@ -58,6 +94,9 @@ class FilterPluginNotRegistered(Exception):
 class FilterPluginAlreadyRegistered(Exception):
   """ Thrown when plugin already exists in the FilterPluginRegistry """
 
+class InvalidFilterPluginManifest(Exception):
+  """ Thrown when a filter plugin manifest is malformed """
+
 
 class FilterPluginInitOptions(pydantic.BaseModel, extra=pydantic.Extra.allow):
   """ base class for **FilterPlugin** initialization options """
@@ -74,6 +113,23 @@ class FilterPluginInitOptions(pydantic.BaseModel, extra=pydantic.Extra.allow):
       cls.__fields__[field_name].default = new_default
 
 
+class TranscribeInitOptions(FilterPluginInitOptions):
+  """ base class for the initialization options of **FilterPlugins** that provide audio transcription """
+  transcript_cache: str = pydantic.Field(
+    title = "transcript cache location",
+    description = """
+SQLite database file (name ending in .db, .sqlite or .sqlite3) or directory in which
+transcripts are cached, keyed by the SHA-512 hash of the recording, the plugin and the
+model and options used.  A recording which has already been transcribed with the same
+model and options gets the cached transcript, without running the model or calling the
+transcription service.  The dialog's SHA-512 **signature** is used as the hash when
+present.  Empty for no cache.
+""",
+    default = "",
+    examples = ["", "/var/cache/vcon/transcripts.db", "/var/cache/vcon/transcripts"]
+    )
+
+
 class FilterPluginOptions(pydantic.BaseModel, extra=pydantic.Extra.allow):
   """ base class for **FilterPlugin.filter** method options """
 
@@ -114,6 +170,19 @@ to be transcribed.
     examples = ["", "0:", "0:-2", "2:5", "0:6:2", [], [1, 4, 5, 9]]
     )
 
+  max_concurrent_dialogs: int = pydantic.Field(
+    title = "maximum number of **dialog** objects transcribed concurrently",
+    description = """
+The number of recording **dialog** objects which are transcribed at the same time.
+The transcript **analysis** objects are added to the **Vcon** in **dialog** order,
+regardless of the order in which the transcriptions complete.
+1 transcribes the **dialog** objects one at a time.
+""",
+    default = 4,
+    ge = 1,
+    examples = [1, 4]
+    )
+
 
 class FilterPlugin():
   """
@@ -151,13 +220,25 @@ class FilterPlugin():
         is the type of the only argument to the derived
         class's **__init__** method.
 
+   * **options_type** SHOULD be set to the derived class of
+        **FilterPluginOptions** taken by the **filter** method,
+        so that it can be used without instantiating the plugin.
+
   To be used the derived class and a specific set of 
   initialization options must be registered using
   **FilterPluginRegistry.register**.  A **FilterPlugin**
   is dynamically loaded only the first time that it
   is actually used. It stays loaded until the system
   exits.
+
+  Derived classes may filter dialogs concurrently using **filter_dialogs**
+  and **run_blocking**.
   """
+  # concurrent.futures.Executor used by run_blocking, None uses the
+  # event loop's default thread pool.  Derived classes with CPU bound work
+  # that does not release the GIL may set a ProcessPoolExecutor.
+  executor: typing.Union[concurrent.futures.Executor, None] = None
+
   def __init__(self,
     options: FilterPluginInitOptions,
     options_type: typing.Type[FilterPluginOptions]
@@ -219,7 +300,7 @@ class FilterPlugin():
 
     Parameters: None
     """
-    logger.debug("deleting {}".format(self.__class__))
+    logger.debug("deleting %s", self.__class__)
 
 
   @staticmethod
@@ -329,7 +410,7 @@ class FilterPlugin():
           incr = None
 
       sliced_list = list(operator.getitem(list(range(list_length)), slice(start, end, incr)))
-      logger.debug("{} given: {}  slicing using [{}:{}:{}] resulting in {} of {} items".format(
+      logger.debug("%s given: %s  slicing using [%s:%s:%s] resulting in %d of %d items",
         option_name,
         slice_spec,
         start,
@@ -337,17 +418,17 @@ class FilterPlugin():
         incr,
         len(sliced_list),
         list_length
-        ))
+        )
 
     # Specified as a list of indices to the dialog
     elif(isinstance(slice_spec, list)):
       sliced_list = slice_spec
-      logger.debug("{} slicing using indices: {} resulting in {} of {} items".format(
+      logger.debug("%s slicing using indices: %s resulting in %d of %d items",
         option_name,
         slice_spec,
         len(sliced_list),
         list_length
-        ))
+        )
 
     else:
       raise AttributeError("{} should be string or list of integers: {}".format(
@@ -358,6 +439,82 @@ class FilterPlugin():
     return(sliced_list)
 
 
+  async def filter_dialogs(
+    self,
+    in_vcon: Vcon,
+    dialog_indices: typing.List[int],
+    dialog_filter: typing.Callable[[Vcon, int, vcon.concurrency.AnalysisBuffer], typing.Awaitable[None]],
+    max_concurrency: int = 1
+    ) -> typing.List[int]:
+    """
+    Run a per dialog coroutine for each of the given dialogs, at most
+    **max_concurrency** at a time, and add the resulting analysis to the
+    Vcon in dialog order.
+
+    **dialog_filter** is called as: await dialog_filter(in_vcon, dialog_index, buffer)
+    and must add its analysis to the given **vcon.concurrency.AnalysisBuffer**
+    rather than directly to the Vcon.  The buffers are merged with
+    Vcon.merge_analysis once all of the dialogs are done, so the result does
+    not depend upon the order in which the dialogs complete.  I/O bound work
+    (e.g. HTTP requests) can simply be awaited in **dialog_filter**.  CPU bound
+    or blocking work should be run with **run_blocking**.
+
+    If any of the dialogs fail, the analysis for the dialogs which succeeded
+    is still added and the exception from the lowest failed dialog index is raised.
+
+    Parameters:
+      in_vcon (vcon.Vcon) - the Vcon containing the dialogs
+      dialog_indices (List[int]) - indices of the dialogs to filter
+      dialog_filter - async function to filter one dialog
+      max_concurrency (int) - maximum number of dialogs filtered at the same time
+
+    Returns:
+      List[int] indices of the added analysis objects
+    """
+    if(max_concurrency is None or max_concurrency < 1):
+      max_concurrency = 1
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_dialog(dialog_index: int, buffer: vcon.concurrency.AnalysisBuffer) -> None:
+      async with semaphore:
+        await dialog_filter(in_vcon, dialog_index, buffer)
+
+    buffers = [vcon.concurrency.AnalysisBuffer(dialog_index) for dialog_index in dialog_indices]
+    results = await asyncio.gather(
+      *[run_dialog(buffer.key, buffer) for buffer in buffers],
+      return_exceptions = True
+      )
+
+    first_error = None
+    succeeded = []
+    for buffer, result in sorted(zip(buffers, results), key = lambda pair: pair[0].sort_key()):
+      if(isinstance(result, BaseException)):
+        logger.warning("%s failed on dialog[%s]: %s", self.__class__.__name__, buffer.key, result)
+        if(first_error is None):
+          first_error = result
+      else:
+        succeeded.append(buffer)
+
+    analysis_indices = in_vcon.merge_analysis(succeeded)
+    if(first_error is not None):
+      raise first_error
+
+    return(analysis_indices)
+
+
+  async def run_blocking(self, func: typing.Callable, *args, **kwargs) -> typing.Any:
+    """
+    Run a blocking or CPU bound function in **executor** so that the
+    event loop and the other dialogs filtered by **filter_dialogs** are
+    not blocked while it runs.
+
+    Returns:
+      the return value of func(*args, **kwargs)
+    """
+    loop = asyncio.get_running_loop()
+    return(await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs)))
+
+
 class FilterPluginRegistration:
   """ Class containing info and helper methods on the registration for a single named plugin filter """
   def __init__(
@@ -366,7 +523,8 @@ class FilterPluginRegistration:
     module_name: str,
     class_name: str,
     description: str,
-    init_options: typing.Union[FilterPluginInitOptions, typing.Dict[str, typing.Any]]
+    init_options: typing.Union[FilterPluginInitOptions, typing.Dict[str, typing.Any]],
+    init_options_env: typing.Union[typing.Dict[str, str], None] = None
     ):
     self.name = name
     self._module_name = module_name
@@ -376,7 +534,10 @@ class FilterPluginRegistration:
     self._class_name = class_name
     self.description = description
     self._init_options = init_options
+    # init option name: environment variable name, read when the plugin is loaded
+    self._init_options_env = init_options_env
     self._plugin : typing.Union[FilterPlugin, None] = None
+    self._class : typing.Union[typing.Type[FilterPlugin], None] = None
 
   def import_plugin(
     self,
@@ -399,14 +560,17 @@ class FilterPluginRegistration:
     """
     succeed = False
     if(not self._module_load_attempted):
-      try:
-        logger.info("importing: {} for registered filter plugin: {}".format(self._module_name, self.name))
-        module = importlib.import_module(self._module_name)
+      class_ = self.plugin_class()
+      if(class_ is not None):
         self._module_load_attempted = True
-        self._module_not_found = False
-
         try:
-          class_ = getattr(module, self._class_name)
+          if(isinstance(init_options, dict) and self._init_options_env):
+            init_options = init_options.copy()
+            for option_name, env_name in self._init_options_env.items():
+              env_value = os.getenv(env_name, None)
+              if(env_value is not None):
+                init_options[option_name] = env_value
+
           if(isinstance(init_options, dict)):
             # convert to proper init options type if a generic dict
             if(not hasattr(class_, "init_options_type")):
@@ -425,11 +589,11 @@ class FilterPluginRegistration:
                 init_options_hidden[name] = "********"
                 # logger.debug("hiding value for: {}".format(name))
 
-            logger.debug("creating init_options type: {} using: dict: {} for plugin: {}".format(
+            logger.debug("creating init_options type: %s using: dict: %s for plugin: %s",
               class_.init_options_type,
               init_options_hidden,
               self.name
-              ))
+              )
             init_options = class_.init_options_type(**init_options)
             # TODO raise "filter_plugin class: {} has not set static attribute: init_options_type.  Should be a class Deribed from FilterPluginInitOptions".format(self._class_name)
           self._plugin = class_(init_options)
@@ -440,15 +604,72 @@ class FilterPluginRegistration:
           logger.warning(ae)
           self._class_not_found = True
 
+    elif(self._plugin is not None):
+      succeed = True
+
+    return(succeed)
+
+  def plugin_class(self) -> typing.Union[typing.Type[FilterPlugin], None]:
+    """
+    Import the implementation module, if not already imported, and get the
+    plugin class without instantiating it (e.g. to get its options types).
+
+    Returns:
+      the plugin class or None if the module or class was not found
+    """
+    if(self._class is None and not self._class_not_found):
+      try:
+        logger.info("importing: %s for registered filter plugin: %s", self._module_name, self.name)
+        module = importlib.import_module(self._module_name)
+        self._module_not_found = False
+
       except ModuleNotFoundError as mod_error:
         logger.warning(mod_error)
         logger.warning(traceback.format_exc(limit=-1))
         self._module_not_found = True
+        return(None)
 
-    elif(self._plugin is not None):
-      succeed = True
+      self._class = getattr(module, self._class_name, None)
+      if(self._class is None):
+        logger.warning("class: %s not found in module: %s for filter plugin: %s",
+          self._class_name, self._module_name, self.name)
+        self._module_load_attempted = True
+        self._class_not_found = True
 
-    return(succeed)
+    return(self._class)
+
+  def _raise_not_found(self) -> None:
+    """ raise if the plugin module or class was not found """
+    if(self._module_not_found is True):
+      message = "plugin: {} not loaded as module: {} was not found".format(self.name, self._module_name)
+      raise FilterPluginModuleNotFound(message)
+
+    if(self._class_not_found is True):
+      message = "plugin: {} not loaded as class: {} not found in module: {}".format(self.name, self._class_name, self._module_name)
+      raise FilterPluginClassNotFound(message)
+
+  def get_init_options_type(self) -> typing.Type[FilterPluginInitOptions]:
+    """ Get the plugin's initialization options class, without instantiating the plugin """
+    class_ = self.plugin_class()
+    self._raise_not_found()
+    return(class_.init_options_type)
+
+  def get_options_type(self) -> typing.Type[FilterPluginOptions]:
+    """
+    Get the plugin's filter method options class.  The plugin is only
+    instantiated if its class does not set options_type.
+    """
+    class_ = self.plugin_class()
+    self._raise_not_found()
+    options_type = getattr(class_, "options_type", None)
+    if(options_type is not None):
+      return(options_type)
+
+    plugin = self.plugin()
+    self._raise_not_found()
+    if(plugin is None):
+      raise Exception("plugin: {} from class: {} module: {} load failed".format(self.name, self._class_name, self._module_name))
+    return(plugin.options_type)
 
   def plugin(
     self,
@@ -464,21 +685,8 @@ class FilterPluginRegistration:
 
 
   def options_type(self, *args, **kwargs) -> FilterPluginOptions:
-    plugin = self.plugin()
-
-    if(self._module_not_found is True):
-      message = "plugin: {} not loaded as module: {} was not found".format(self.name, self._module_name)
-      raise FilterPluginModuleNotFound(message)
-
-    if(self._class_not_found is True):
-      message = "plugin: {} not loaded as class: {} not found in module: {}".format(self.name, self._class_name, self._module_name)
-      raise FilterPluginClassNotFound(message)
-
-    if(plugin is None):
-      logger.debug("plugin: {} from class: {} module: {} load failed".format(self.name, self._class_name, self._module_name))
-      raise Exception("plugin: {} from class: {} module: {} load failed".format(self.name, self._class_name, self._module_name))
-
-    return(plugin.options_type(*args, **kwargs))
+    """ Create an instance of the plugin's filter method options """
+    return(self.get_options_type()(*args, **kwargs))
 
 
   async def filter(
@@ -499,7 +707,7 @@ class FilterPluginRegistration:
 
     plugin = self.plugin(self._init_options)
     if(plugin is None):
-      logger.debug("plugin: {} from class: {} module: {} load failed".format(self.name, self._class_name, self._module_name))
+      logger.debug("plugin: %s from class: %s module: %s load failed", self.name, self._class_name, self._module_name)
       raise Exception("plugin: {} from class: {} module: {} load failed".format(self.name, self._class_name, self._module_name))
 
     if(isinstance(options, dict)):
@@ -515,10 +723,34 @@ class FilterPluginRegistration:
 
     return(await plugin.filter(in_vcon, options))
 
+def _entry_points(group: str) -> list:
+  """ Get the installed package entry points for the group """
+  try:
+    import importlib.metadata as importlib_metadata
+
+  except ImportError:
+    # python < 3.8
+    try:
+      import importlib_metadata
+
+    except ImportError:
+      logger.info("importlib_metadata not installed, %s entry points not discovered", group)
+      return([])
+
+  entry_points = importlib_metadata.entry_points()
+  if(hasattr(entry_points, "select")):
+    return(list(entry_points.select(group = group)))
+  return(list(entry_points.get(group, [])))
+
+
 class FilterPluginRegistry:
   """ class/scope for Vcon filter plugin registrations and defaults for plugin types """
   _registry: typing.Dict[str, FilterPluginRegistration] = {}
   _defaults: typing.Dict[str, str] = {}
+  # incremented whenever a registration or type default changes
+  _version = 0
+  _discovered = False
+  _discover_lock = threading.RLock()
 
   @staticmethod
   def __add_plugin(plugin: FilterPluginRegistration, replace=False):
@@ -534,6 +766,7 @@ class FilterPluginRegistry:
     if(name_registered is None or replace):
          
       FilterPluginRegistry._registry[plugin.name] = plugin
+      FilterPluginRegistry._version += 1
     else:
       raise FilterPluginAlreadyRegistered("Plugin {} already registered".format(plugin.name))
 
@@ -545,9 +778,11 @@ class FilterPluginRegistry:
     class_name: str,
     description: str,
     init_options: typing.Union[FilterPluginInitOptions, typing.Dict[str, typing.Any]],
-    replace: bool = False) -> None:
+    replace: bool = False,
+    init_options_env: typing.Union[typing.Dict[str, str], None] = None) -> None:
     """
-    Register a named filter plugin.
+    Register a named filter plugin.  The module is not imported until
+    the plugin is first used.
 
     Parameters:  
       **name** (str) - the name to register the plugin  
@@ -555,21 +790,137 @@ class FilterPluginRegistry:
       **class_name** (str) - the class name for the plugin implementation in the named module  
       **description** (str) - a text description of what the plugin does  
       **replace** (bool) - if True replace the already registered plugin of the same name  
-                       if False throw an exception if a plugin of the same name is already register
+                       if False throw an exception if a plugin of the same name is already register  
+      **init_options_env** (dict[str, str]) - init option names and the environment variable
+                       names from which they are set when the plugin is loaded
 
     Returns: none
     """
-    logger.info("Registering FilterPlugin: {}".format(locals()))
+    logger.info("Registering FilterPlugin: %s module: %s class: %s", name, module_name, class_name)
     entry = FilterPluginRegistration(
       name,
       module_name,
       class_name,
       description,
-      init_options
+      init_options,
+      init_options_env
       )
     FilterPluginRegistry.__add_plugin(entry, replace)
 
 
+  @staticmethod
+  def load_manifest(
+    manifest: typing.Union[str, typing.Dict[str, typing.Any]],
+    replace: bool = False
+    ) -> typing.List[str]:
+    """
+    Register the filter plugins, type defaults and transcript accessors
+    in a manifest (see module doc for the format), without importing
+    any of the plugin modules.
+
+    Parameters:  
+      **manifest** (str or dict) - path to a JSON manifest file or the manifest dict  
+      **replace** (bool) - if True replace already registered plugins of the same name
+
+    Returns:  
+      list of the registered plugin names
+    """
+    if(isinstance(manifest, str)):
+      manifest_path = manifest
+      with open(manifest_path, "rt") as manifest_file:
+        try:
+          manifest = json.load(manifest_file)
+        except ValueError as json_error:
+          raise InvalidFilterPluginManifest("{}: {}".format(manifest_path, json_error)) from json_error
+    else:
+      manifest_path = "manifest dict"
+
+    if(not isinstance(manifest, dict)):
+      raise InvalidFilterPluginManifest("{} should contain a JSON object".format(manifest_path))
+
+    names = []
+    for name, plugin in manifest.get("plugins", {}).items():
+      try:
+        FilterPluginRegistry.register(
+          name,
+          plugin["module"],
+          plugin["class"],
+          plugin.get("description", ""),
+          plugin.get("init_options", {}),
+          replace,
+          plugin.get("init_options_env", None)
+          )
+      except (KeyError, TypeError, AttributeError) as field_error:
+        raise InvalidFilterPluginManifest("{} plugin: {} missing or invalid field: {}".format(
+          manifest_path, name, field_error)) from field_error
+      names.append(name)
+
+    for plugin_type, name in manifest.get("type_defaults", {}).items():
+      FilterPluginRegistry.set_type_default_name(plugin_type, name)
+
+    for accessor in manifest.get("transcript_accessors", []):
+      try:
+        key = (accessor["vendor"].lower(), accessor["product"].lower(), accessor["schema"].lower())
+        vcon.accessors.transcript_accessors[key] = accessor["accessor"]
+      except (KeyError, TypeError, AttributeError) as field_error:
+        raise InvalidFilterPluginManifest("{} transcript accessor: {} missing or invalid field: {}".format(
+          manifest_path, accessor, field_error)) from field_error
+
+    return(names)
+
+
+  @staticmethod
+  def discover(force: bool = False) -> None:
+    """
+    Register the plugins from the manifests listed in VCON_FILTER_PLUGIN_MANIFESTS
+    and from the "vcon.filter_plugins" package entry points.  This is done
+    once, the first time the registry is queried.  Plugins from the manifests
+    replace those of the same name.  Entry points do not.
+
+    Parameters:  
+      **force** (bool) - discover again, e.g. after installing a package
+
+    Returns: none
+    """
+    if(FilterPluginRegistry._discovered and not force):
+      return
+
+    with FilterPluginRegistry._discover_lock:
+      if(FilterPluginRegistry._discovered and not force):
+        return
+      # set first as register, called below, queries the registry
+      FilterPluginRegistry._discovered = True
+
+      for manifest_path in os.getenv(PLUGIN_MANIFESTS_ENV, "").split(os.pathsep):
+        if(manifest_path.strip() != ""):
+          logger.info("loading filter plugin manifest: %s", manifest_path)
+          FilterPluginRegistry.load_manifest(manifest_path.strip(), True)
+
+      for entry_point in _entry_points(PLUGIN_ENTRY_POINT_GROUP):
+        module_name, _separator, class_name = entry_point.value.partition(":")
+        if(entry_point.name in FilterPluginRegistry._registry):
+          logger.warning("filter plugin entry point: %s = %s ignored, name already registered",
+            entry_point.name, entry_point.value)
+          continue
+        FilterPluginRegistry.register(
+          entry_point.name,
+          module_name.strip(),
+          class_name.strip(),
+          "entry point: {}".format(entry_point.value),
+          {}
+          )
+
+
+  @staticmethod
+  def version() -> int:
+    """
+    Returns a number which changes whenever the registered plugins or
+    type defaults change.
+    """
+    FilterPluginRegistry.discover()
+    return(FilterPluginRegistry._version)
+
+
   @staticmethod
   def get(name: str,
     check_type_default: bool = False,
@@ -579,6 +930,7 @@ class FilterPluginRegistry:
     """
     Returns registration for named plugin
     """
+    FilterPluginRegistry.discover()
     plugin_reg = FilterPluginRegistry._registry.get(name, None)
     if(plugin_reg is None and not check_type_default):
       raise FilterPluginNotRegistered("Filter plugin {} is not registered".format(name))
@@ -602,16 +954,19 @@ class FilterPluginRegistry:
     """
     Returns list of plugin names
     """
+    FilterPluginRegistry.discover()
     return(FilterPluginRegistry._registry.keys())
 
   @staticmethod
   def set_type_default_name(plugin_type: str, name: str) -> None:
     """ Set the default filter name for the given filter type """
     FilterPluginRegistry._defaults[plugin_type] = name
+    FilterPluginRegistry._version += 1
 
   @staticmethod
   def get_type_default_name(plugin_type: str) -> typing.Union[str, None]:
     """ Get the default plugin name for the given filter type """
+    FilterPluginRegistry.discover()
     return(FilterPluginRegistry._defaults.get(plugin_type, None))
 
   @staticmethod
@@ -622,6 +977,7 @@ class FilterPluginRegistry:
     Returns:
       list(str) - names of all the types for which a default is set.
     """
+    FilterPluginRegistry.discover()
     return(FilterPluginRegistry._defaults.keys())
 
   @staticmethod
@@ -636,6 +992,105 @@ class FilterPluginRegistry:
     return(FilterPluginRegistry.get(name))
 
 
+class FilterStepTiming():
+  """ Timing and dialog cache use for one step of a **FilterChain** run """
+  def __init__(
+    self,
+    name: str,
+    duration: float,
+    cache_stats: typing.Dict[str, int]
+    ):
+    self.name = name
+    # seconds
+    self.duration = duration
+    # dialog cache hits and misses during this step (see DialogCache.stats)
+    self.cache_stats = cache_stats
+
+  def __repr__(self) -> str:
+    return("FilterStepTiming({}, {:.6f}, {})".format(self.name, self.duration, self.cache_stats))
+
+
+class FilterChain():
+  """
+  Run several registered filter plugins on a **Vcon** in one pass.
+
+  The decoded inline dialog bodies, fetched external recordings and
+  transcript text are cached for the duration of the run (see
+  **vcon.dialog_cache.DialogCache**), so that each step does not decode,
+  fetch or extract them again.
+
+  Example:
+    chain = vcon.filter_plugins.FilterChain([
+      ("whisper", {}),
+      ("openai_chat_completion", {"analysis_type": "summary"}),
+      ("openai_chat_completion", {"analysis_type": "sentiment", "prompt": "..."})
+      ])
+    timings = []
+    out_vcon = await chain.filter(in_vcon, timings)
+    for step_timing in timings:
+      print(step_timing.name, step_timing.duration)
+
+  A chain may be shared and run on several Vcons at the same time.
+  """
+  def __init__(
+    self,
+    steps: typing.List[typing.Tuple[str, typing.Union[FilterPluginOptions, typing.Dict[str, typing.Any]]]]
+    ):
+    """
+    Parameters:
+      steps (list[tuple[str, options]]) - the plugin name (or plugin type
+        name, e.g. "transcribe") and the FilterPluginOptions or dict of
+        options for each step, in the order to be run.
+    """
+    self.steps = list(steps)
+    for name, options in self.steps:
+      # fail early on unknown plugins, without loading them
+      FilterPluginRegistry.get(name, True)
+
+  async def filter(
+    self,
+    in_vcon: vcon.Vcon,
+    timings: typing.Union[typing.List[FilterStepTiming], None] = None
+    ) -> vcon.Vcon:
+    """
+    Run each of the steps on the output of the previous step.
+
+    Parameters:
+      in_vcon (vcon.Vcon) - the Vcon to be filtered
+      timings (list) - optional list to which the FilterStepTiming for
+        each step run is appended, including a step which raised an exception.
+        Each call has its own list, so concurrent runs of the chain do not
+        mix their timings.
+
+    Returns:
+      the Vcon output from the last step.
+    """
+    if(timings is None):
+      timings = []
+    dialog_cache = vcon.dialog_cache.DialogCache()
+    out_vcon = in_vcon
+    chain_start = time.perf_counter()
+    for name, options in self.steps:
+      step_vcon = out_vcon
+      previous_cache = step_vcon.set_dialog_cache(dialog_cache)
+      stats_before = dialog_cache.stats()
+      start = time.perf_counter()
+      try:
+        out_vcon = await FilterPluginRegistry.get(name, True).filter(step_vcon, options)
+
+      finally:
+        duration = time.perf_counter() - start
+        stats_after = dialog_cache.stats()
+        step_timing = FilterStepTiming(name, duration,
+          {stat: stats_after[stat] - stats_before[stat] for stat in stats_after})
+        timings.append(step_timing)
+        step_vcon.set_dialog_cache(previous_cache)
+        logger.info("filter chain step: %s took: %.6f seconds dialog cache: %s", name, duration, step_timing.cache_stats)
+
+    logger.info("filter chain of %d steps took: %.6f seconds", len(self.steps), time.perf_counter() - chain_start)
+    return(out_vcon)
+
+
 #class TranscriptionFilter(FilterPlugin):
   # TODO abstraction of transcription filters, iterates through dialogs
   # def __init__(self, options):
@@ -1,21 +1,14 @@
-""" Deepgram audio transcription filter plugin registration """
-import os
+"""
+Deepgram transcript accessor.
+
+The deepgram filter plugin and this accessor are registered in
+vcon/filter_plugins/manifest.json.  This module is only imported
+when a Deepgram transcript is first accessed.
+"""
 import datetime
-import vcon.filter_plugins
+import vcon.utils
 import vcon.accessors
 
-deepgram_key = os.getenv("DEEPGRAM_KEY", "")
-# Register the Deepgram filter plugin
-init_options = {"deepgram_key": deepgram_key}
-
-vcon.filter_plugins.FilterPluginRegistry.register(
-  "deepgram",
-  "vcon.filter_plugins.impl.deepgram",
-  "Deepgram",
-  "Deepgram RESTful service implemented transcription of audio dialog recordings",
-  init_options
-  )
-
 # Implement an accessor for the Deepgram transcription format
 class DeepgramTranscriptAccessor(vcon.accessors.TranscriptAccessor):
   def get_text(self):
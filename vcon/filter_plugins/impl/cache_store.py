@@ -0,0 +1,356 @@
+"""
+Persistent key/value stores for the plugin caches (see transcript_cache
+and response_cache).
+
+Values are any JSON serializable value.  Keys are strings of file name safe
+characters, "/" separated components are sub directories in a directory
+store.
+
+Entries optionally expire ttl seconds after they were set, and when the
+store has more than max_entries entries, the least recently used are
+evicted.
+
+The store is one of:
+
+  * an SQLite database: a file name ending in .db, .sqlite or .sqlite3
+  * a Redis server: a redis:// or rediss:// URL (e.g. the Redis of
+    py_vcon_server, shared by its workers), requires the redis package
+  * a directory with a JSON file per entry: any other name
+
+All can be shared by several processes.  The store methods block, so
+plugins call them with run_blocking.  The hits, misses and evictions of
+each store are counted (see stats).
+
+Example:
+  store = open_store("/var/cache/vcon/cache.db", "responses", ttl = 86400.0, max_entries = 10000)
+  value = store.get(key)
+  if(value is None):
+    value = compute()
+    store.set(key, value)
+"""
+import os
+import json
+import time
+import typing
+import sqlite3
+import tempfile
+import threading
+import importlib
+import vcon
+
+logger = vcon.build_logger(__name__)
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+REDIS_SCHEMES = ("redis://", "rediss://", "unix://")
+
+# number of directory store sets between scans for expired and excess entries
+DIRECTORY_EVICT_INTERVAL = 64
+
+
+def _json_default(value: typing.Any) -> typing.Any:
+  # numpy arrays and scalars in model output
+  if(hasattr(value, "tolist")):
+    return(value.tolist())
+  raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+class CacheStore():
+  """ Abstract key/value store """
+  def __init__(
+    self,
+    ttl: float,
+    max_entries: int
+    ):
+    """
+    Parameters:
+      ttl (float) - seconds after which an entry expires, 0 for never
+      max_entries (int) - maximum number of entries, 0 for no limit
+    """
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self.hits = 0
+    self.misses = 0
+    # entries removed as they expired or the store was full
+    self.evictions = 0
+
+  def get(self, key: str) -> typing.Union[typing.Any, None]:
+    """ Get the value for the key or None if not set or expired """
+    value = self._get(key)
+    if(value is None):
+      self.misses += 1
+    else:
+      self.hits += 1
+    return(value)
+
+  def set(self, key: str, value: typing.Any) -> None:
+    """ Set the value (any JSON serializable value) for the key """
+    self._set(key, json.dumps(value, default = _json_default))
+
+  def stats(self) -> typing.Dict[str, typing.Union[int, float]]:
+    """ hits, misses, evictions and hit_ratio of the store """
+    lookups = self.hits + self.misses
+    return({
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "hit_ratio": self.hits / lookups if lookups > 0 else 0.0
+      })
+
+  def _expired(self, created: float, now: float) -> bool:
+    return(self.ttl > 0 and created < now - self.ttl)
+
+  def _get(self, key: str) -> typing.Union[typing.Any, None]:
+    raise NotImplementedError("{}._get not implemented".format(type(self)))
+
+  def _set(self, key: str, value_json: str) -> None:
+    raise NotImplementedError("{}._set not implemented".format(type(self)))
+
+
+class SqliteCacheStore(CacheStore):
+  """ Key/value store in a table of an SQLite database """
+  def __init__(self, path: str, table: str, ttl: float, max_entries: int):
+    super().__init__(ttl, max_entries)
+    self.path = path
+    self._table = table
+    self._lock = threading.Lock()
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    self._connection = sqlite3.connect(path, check_same_thread = False, timeout = 30)
+    with self._lock, self._connection:
+      # write ahead log so other processes can read while one writes
+      self._connection.execute("PRAGMA journal_mode=WAL")
+      self._connection.execute("""CREATE TABLE IF NOT EXISTS {0} (
+        key TEXT PRIMARY KEY NOT NULL,
+        value TEXT NOT NULL,
+        created REAL NOT NULL,
+        accessed REAL NOT NULL)""".format(table))
+      self._connection.execute("CREATE INDEX IF NOT EXISTS {0}_created ON {0} (created)".format(table))
+      self._connection.execute("CREATE INDEX IF NOT EXISTS {0}_accessed ON {0} (accessed)".format(table))
+
+  def _get(self, key: str) -> typing.Union[typing.Any, None]:
+    now = time.time()
+    with self._lock, self._connection:
+      row = self._connection.execute("SELECT value, created FROM {} WHERE key = ?".format(self._table),
+        (key, )).fetchone()
+      if(row is None):
+        return(None)
+      if(self._expired(row[1], now)):
+        self._connection.execute("DELETE FROM {} WHERE key = ?".format(self._table), (key, ))
+        self.evictions += 1
+        return(None)
+      # last use is only needed to evict the least recently used
+      if(self.max_entries > 0):
+        self._connection.execute("UPDATE {} SET accessed = ? WHERE key = ?".format(self._table), (now, key))
+    return(json.loads(row[0]))
+
+  def _set(self, key: str, value_json: str) -> None:
+    now = time.time()
+    with self._lock, self._connection:
+      self._connection.execute("INSERT OR REPLACE INTO {} VALUES (?, ?, ?, ?)".format(self._table),
+        (key, value_json, now, now))
+      if(self.ttl > 0):
+        self.evictions += self._connection.execute(
+          "DELETE FROM {} WHERE created < ?".format(self._table),
+          (now - self.ttl, )
+          ).rowcount
+      if(self.max_entries > 0):
+        excess = self._connection.execute("SELECT COUNT(*) FROM {}".format(self._table)).fetchone()[0] - \
+          self.max_entries
+        if(excess > 0):
+          # least recently used
+          self.evictions += self._connection.execute(
+            "DELETE FROM {0} WHERE key IN (SELECT key FROM {0} ORDER BY accessed LIMIT ?)".format(self._table),
+            (excess, )
+            ).rowcount
+
+
+class DirectoryCacheStore(CacheStore):
+  """
+  Key/value store of JSON files in a directory:
+  <key path>/<first 2 characters of the last key component>/<last key component>.json
+
+  The file modification time is the time of last use.  Expired and excess
+  entries are removed every DIRECTORY_EVICT_INTERVAL sets.
+  """
+  def __init__(self, path: str, ttl: float, max_entries: int):
+    super().__init__(ttl, max_entries)
+    self.path = path
+    self._sets = 0
+    self._lock = threading.Lock()
+    os.makedirs(path, exist_ok = True)
+
+  def _file_name(self, key: str) -> str:
+    components = key.split("/")
+    # fan out so that a directory does not get too many files
+    return(os.path.join(self.path, *components[:-1], components[-1][:2], components[-1] + ".json"))
+
+  def _get(self, key: str) -> typing.Union[typing.Any, None]:
+    file_name = self._file_name(key)
+    try:
+      with open(file_name, "rt", encoding = "utf-8") as entry_file:
+        entry = json.load(entry_file)
+
+    except FileNotFoundError:
+      return(None)
+
+    if(self._expired(entry["created"], time.time())):
+      self._remove(file_name)
+      return(None)
+
+    if(self.max_entries > 0 or self.ttl > 0):
+      try:
+        # mark as recently used
+        os.utime(file_name)
+      except FileNotFoundError:
+        # evicted by another process
+        pass
+    return(entry["value"])
+
+  def _set(self, key: str, value_json: str) -> None:
+    file_name = self._file_name(key)
+    directory = os.path.dirname(file_name)
+    os.makedirs(directory, exist_ok = True)
+    # written to a temporary file and renamed so that readers never see a partial file
+    temp_fd, temp_name = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+    try:
+      with os.fdopen(temp_fd, "wt", encoding = "utf-8") as temp_file:
+        temp_file.write('{{"created": {}, "value": {}}}'.format(json.dumps(time.time()), value_json))
+      os.replace(temp_name, file_name)
+
+    except Exception:
+      os.unlink(temp_name)
+      raise
+
+    with self._lock:
+      self._sets += 1
+      evict = (self._sets % DIRECTORY_EVICT_INTERVAL == 1)
+    if(evict):
+      self.evict()
+
+  def _remove(self, file_name: str) -> None:
+    try:
+      os.unlink(file_name)
+      self.evictions += 1
+    except FileNotFoundError:
+      pass
+
+  def evict(self) -> None:
+    """ Remove the expired entries and the least recently used entries over max_entries """
+    if(self.ttl <= 0 and self.max_entries <= 0):
+      return
+
+    now = time.time()
+    # (last used time, file name)
+    entries = []
+    for directory, _, file_names in os.walk(self.path):
+      for file_name in file_names:
+        if(not file_name.endswith(".json")):
+          continue
+        file_name = os.path.join(directory, file_name)
+        try:
+          entries.append((os.stat(file_name).st_mtime, file_name))
+        except FileNotFoundError:
+          pass
+
+    entries.sort()
+    excess = len(entries) - self.max_entries if self.max_entries > 0 else 0
+    for index, (used, file_name) in enumerate(entries):
+      if(index < excess):
+        self._remove(file_name)
+      elif(self.ttl > 0 and used < now - self.ttl):
+        # not used since it expired, checked on read otherwise
+        self._remove(file_name)
+
+
+class RedisCacheStore(CacheStore):
+  """
+  Key/value store in Redis.  Entries expire with the Redis key TTL, a sorted
+  set of the keys by last use is kept to evict the least recently used.
+  """
+  def __init__(self, url: str, prefix: str, ttl: float, max_entries: int):
+    super().__init__(ttl, max_entries)
+    # optional dependency, only needed if a Redis store is configured
+    redis = importlib.import_module("redis")
+    self.url = url
+    self._prefix = prefix
+    self._index = prefix + ":index"
+    # thread safe, uses a connection pool
+    self._client = redis.Redis.from_url(url, decode_responses = True)
+
+  def _key(self, key: str) -> str:
+    return("{}:{}".format(self._prefix, key))
+
+  def _get(self, key: str) -> typing.Union[typing.Any, None]:
+    value_json = self._client.get(self._key(key))
+    if(self.max_entries > 0):
+      if(value_json is None):
+        # expired keys are left in the index
+        if(self._client.zrem(self._index, key) > 0):
+          self.evictions += 1
+      else:
+        self._client.zadd(self._index, {key: time.time()})
+
+    if(value_json is None):
+      return(None)
+    return(json.loads(value_json))
+
+  def _set(self, key: str, value_json: str) -> None:
+    if(self.max_entries <= 0):
+      self._client.set(self._key(key), value_json, px = int(self.ttl * 1000) if self.ttl > 0 else None)
+      return
+
+    pipeline = self._client.pipeline()
+    pipeline.set(self._key(key), value_json, px = int(self.ttl * 1000) if self.ttl > 0 else None)
+    pipeline.zadd(self._index, {key: time.time()})
+    pipeline.zcard(self._index)
+    entries = pipeline.execute()[-1]
+
+    if(entries > self.max_entries):
+      # least recently used
+      evicted = self._client.zpopmin(self._index, entries - self.max_entries)
+      if(len(evicted) > 0):
+        self._client.delete(*[self._key(evicted_key) for evicted_key, _ in evicted])
+        self.evictions += len(evicted)
+
+
+_stores: typing.Dict[typing.Tuple[str, str, float, int], CacheStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(
+    location: typing.Union[str, None],
+    name: str,
+    ttl: float = 0.0,
+    max_entries: int = 0
+  ) -> typing.Union[CacheStore, None]:
+  """
+  Get the key/value store at the location, shared by all plugins using it.
+
+  Parameters:
+    location (str) - SQLite database file name (ending in .db, .sqlite or .sqlite3),
+      Redis URL (redis://...) or directory name.  None or "" for no store.
+    name (str) - SQLite table name or Redis key prefix of the store
+    ttl (float) - seconds after which an entry expires, 0 for never
+    max_entries (int) - maximum number of entries, 0 for no limit
+
+  Returns:
+    the CacheStore or None
+  """
+  if(location is None or location == ""):
+    return(None)
+
+  is_redis = location.lower().startswith(REDIS_SCHEMES)
+  if(not is_redis):
+    location = os.path.abspath(os.path.expanduser(location))
+  key = (location, name, ttl, max_entries)
+  with _stores_lock:
+    store = _stores.get(key, None)
+    if(store is None):
+      if(is_redis):
+        store = RedisCacheStore(location, name, ttl, max_entries)
+      elif(location.lower().endswith(SQLITE_SUFFIXES)):
+        store = SqliteCacheStore(location, name, ttl, max_entries)
+      else:
+        store = DirectoryCacheStore(location, ttl, max_entries)
+      logger.info("%s cache: %s ttl: %s max entries: %d", name, location, ttl, max_entries)
+      _stores[key] = store
+  return(store)
@@ -0,0 +1,177 @@
+"""
+Token counting and token budgeted windows of chat completion messages.
+
+The messages generated from all of the dialogs in a long conversation may
+not fit in the context window of a chat completion model.  token_windows
+splits the time sorted messages into consecutive windows which each fit
+in a token budget, with the last messages of a window repeated at the
+start of the next (the overlap) so that the context of an exchange is not
+lost at a window boundary.  A message which on its own is over the budget
+is split into parts.
+
+Tokens are counted with the model's tokenizer when tiktoken is installed,
+otherwise they are estimated from the number of characters.
+
+Example:
+  budget = context_window("gpt-4") - max_tokens - prompt_tokens
+  for window in token_windows(messages, budget, 200, "gpt-4"):
+    ...
+"""
+import math
+import typing
+import functools
+
+try:
+  import tiktoken
+except ImportError:
+  tiktoken = None
+
+# characters per token of English text, used when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+# tokens of chat message formatting (role and separators) in addition to the content
+MESSAGE_OVERHEAD = 4
+
+# tokens priming the reply of a chat completion
+REPLY_OVERHEAD = 3
+
+# context window in tokens of model name prefixes, longest prefix matches
+CONTEXT_WINDOWS = {
+  "gpt-4o": 128000,
+  "gpt-4-turbo": 128000,
+  "gpt-4-1106": 128000,
+  "gpt-4-0125": 128000,
+  "gpt-4-32k": 32768,
+  "gpt-4": 8192,
+  "gpt-3.5-turbo-16k": 16384,
+  "gpt-3.5-turbo-1106": 16385,
+  "gpt-3.5-turbo-0125": 16385,
+  "gpt-3.5-turbo": 4096
+  }
+
+DEFAULT_CONTEXT_WINDOW = 4096
+
+Message = typing.Dict[str, str]
+
+
+def context_window(model: str) -> int:
+  """ Number of tokens in the context window of the named model """
+  matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+  if(len(matches) == 0):
+    return(DEFAULT_CONTEXT_WINDOW)
+  return(CONTEXT_WINDOWS[max(matches, key = len)])
+
+
+@functools.lru_cache(maxsize = None)
+def _encoding(model: str) -> typing.Any:
+  if(tiktoken is None):
+    return(None)
+  try:
+    return(tiktoken.encoding_for_model(model))
+
+  except KeyError:
+    # models newer than the installed tiktoken
+    return(tiktoken.get_encoding("cl100k_base"))
+
+
+def count_tokens(text: str, model: str) -> int:
+  """ Number of tokens in the text for the named model """
+  encoding = _encoding(model)
+  if(encoding is None):
+    return(math.ceil(len(text) / CHARS_PER_TOKEN))
+  return(len(encoding.encode(text)))
+
+
+def message_tokens(message: Message, model: str) -> int:
+  """ Number of tokens a chat completion message takes in the context window """
+  return(count_tokens(message["content"], model) + MESSAGE_OVERHEAD)
+
+
+def split_text(text: str, max_tokens: int, model: str) -> typing.List[str]:
+  """
+  Split the text into consecutive parts of at most max_tokens tokens each.
+  """
+  if(max_tokens < 1):
+    raise ValueError("cannot split text into parts of {} tokens".format(max_tokens))
+
+  encoding = _encoding(model)
+  if(encoding is not None):
+    tokens = encoding.encode(text)
+    return([encoding.decode(tokens[start:start + max_tokens])
+      for start in range(0, len(tokens), max_tokens)])
+
+  max_chars = max_tokens * CHARS_PER_TOKEN
+  parts = []
+  while(len(text) > max_chars):
+    # break at the last white space, so words are not split
+    end = text.rfind(" ", 0, max_chars + 1)
+    if(end <= 0):
+      end = max_chars
+    parts.append(text[:end])
+    text = text[end:]
+  if(len(text) > 0 or len(parts) == 0):
+    parts.append(text)
+  return(parts)
+
+
+def token_windows(
+    messages: typing.List[Message],
+    budget: int,
+    overlap: int,
+    model: str
+  ) -> typing.List[typing.List[Message]]:
+  """
+  Split the messages into consecutive windows of at most budget tokens.
+
+  Parameters:
+    messages (List[dict]) - chat completion messages ({"role", "content"}) in order
+    budget (int) - maximum tokens of the messages in a window
+    overlap (int) - maximum tokens of the messages at the end of a window
+      which are repeated at the start of the next window
+    model (str) - name of the model whose tokenizer counts the tokens
+
+  Returns:
+    the windows of messages, which is a single window of all of the
+    messages if they fit in the budget
+  """
+  if(budget <= MESSAGE_OVERHEAD):
+    raise ValueError("token budget: {} is too small for a message".format(budget))
+  if(overlap < 0 or overlap >= budget):
+    raise ValueError("token overlap: {} must be at least 0 and less than the budget: {}".format(overlap, budget))
+
+  # (message, tokens) with the messages over the budget split into parts
+  sized: typing.List[typing.Tuple[Message, int]] = []
+  for message in messages:
+    tokens = message_tokens(message, model)
+    if(tokens <= budget):
+      sized.append((message, tokens))
+      continue
+    for part in split_text(message["content"], budget - MESSAGE_OVERHEAD, model):
+      part_message = dict(message, content = part)
+      sized.append((part_message, message_tokens(part_message, model)))
+
+  windows = []
+  window: typing.List[typing.Tuple[Message, int]] = []
+  window_tokens = 0
+  for message, tokens in sized:
+    if(len(window) > 0 and window_tokens + tokens > budget):
+      windows.append([windowed for windowed, _ in window])
+
+      # carry the last messages which fit in the overlap into the next window
+      carried = []
+      carried_tokens = 0
+      for previous, previous_tokens in reversed(window):
+        if(carried_tokens + previous_tokens > overlap or
+          carried_tokens + previous_tokens + tokens > budget):
+          break
+        carried.insert(0, (previous, previous_tokens))
+        carried_tokens += previous_tokens
+      window = carried
+      window_tokens = carried_tokens
+
+    window.append((message, tokens))
+    window_tokens += tokens
+
+  if(len(window) > 0):
+    windows.append([windowed for windowed, _ in window])
+  return(windows)
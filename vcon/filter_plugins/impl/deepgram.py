@@ -1,16 +1,20 @@
 """ FilterPlugin for Deepgram transcription """
-import typing
 import json
+import typing
+import hashlib
+import functools
 import pydantic
-import requests
+import jose.utils
+import vcon.concurrency
 import vcon.filter_plugins
-import deepgram
+import vcon.filter_plugins.impl.http_client
+import vcon.filter_plugins.impl.transcript_cache
 
 logger = vcon.build_logger(__name__)
 
 
 class DeepgramInitOptions(
-  vcon.filter_plugins.FilterPluginInitOptions,
+  vcon.filter_plugins.TranscribeInitOptions,
   title = "Deepgram transcription **FilterPlugin** intialization object"
   ):
   """
@@ -30,6 +34,49 @@ You can get one at: https://console.deepgram.com/signup?jump=keys
     default = ""
     )
 
+  api_url: str = pydantic.Field(
+    title = "**Deepgram** pre-recorded transcription URL",
+    description = """
+URL of the Deepgram pre-recorded transcription API (e.g. changed for a self hosted
+Deepgram or a test server).
+""",
+    default = "https://api.deepgram.com/v1/listen"
+    )
+
+  max_connections: int = pydantic.Field(
+    title = "maximum concurrent requests to **Deepgram**",
+    description = """
+Maximum number of transcription requests in flight at the same time, across all
+of the **Vcon**s being filtered.  Connections are kept alive and reused between requests.
+""",
+    default = 10,
+    ge = 1,
+    examples = [ 4, 10 ]
+    )
+
+  max_retries: int = pydantic.Field(
+    title = "retries of failed requests",
+    description = """
+Number of times a request which failed with a 408, 429 or 5xx status or a network error
+is retried, with exponential backoff and jitter (or as long as the Retry-After header
+asks for).
+""",
+    default = 4,
+    ge = 0,
+    examples = [ 0, 4 ]
+    )
+
+  request_deadline: float = pydantic.Field(
+    title = "seconds in which a transcription request must complete",
+    description = """
+Seconds in which a transcription request, including its retries, must complete.
+Transcription of long recordings can take a while.
+""",
+    default = 300.0,
+    gt = 0.0,
+    examples = [ 60.0, 300.0 ]
+    )
+
 
 class DeepgramOptions(
   vcon.filter_plugins.TranscribeOptions,
@@ -43,6 +90,21 @@ class DeepgramOptions(
   More details on the OpenAI specific parameters can be found here:
   https://developers.deepgram.com/reference/pre-recorded
   """
+  external_recordings: str = pydantic.Field(
+    title = "how recordings referenced by url are sent to **Deepgram**",
+    description = """
+How recording **dialog** objects with an external **url** are sent to Deepgram:
+
+  * "download" - the recording is downloaded, verified using the **dialog** **signature** and then uploaded
+  * "stream" - the download is piped into the upload as it arrives, without holding the whole
+     recording in memory.  The SHA-512 **signature** is verified as the recording is streamed and
+     the upload is aborted if it does not match.  Recordings without a SHA-512 **signature** are downloaded.
+  * "url" - the **url** is given to Deepgram, which fetches the recording itself.  The recording
+     is not verified and must be reachable by Deepgram.
+""",
+    default = "download",
+    examples = ["download", "stream", "url"]
+    )
 
 
 class Deepgram(vcon.filter_plugins.FilterPlugin):
@@ -50,6 +112,7 @@ class Deepgram(vcon.filter_plugins.FilterPlugin):
   **FilterPlugin** to for transcription using **Deepgram** 
   """
   init_options_type = DeepgramInitOptions
+  options_type = DeepgramOptions
 
   def __init__(
     self,
@@ -67,37 +130,42 @@ class Deepgram(vcon.filter_plugins.FilterPlugin):
     if(init_options.deepgram_key is None or
       init_options.deepgram_key == ""):
       logger.warning("Deepgram plugin: key not set.  Plugin will be a no-op")
-      self.deepgram_client = None
 
-    else:
-      self.deepgram_client = deepgram.Deepgram(init_options.deepgram_key)
+    # shared by all of the requests made by this plugin
+    self._http_client = vcon.filter_plugins.impl.http_client.RetryingHttpClient(
+      max_connections = init_options.max_connections,
+      max_retries = init_options.max_retries,
+      deadline = init_options.request_deadline
+      )
+    self._transcript_cache = vcon.filter_plugins.impl.transcript_cache.open_cache(init_options.transcript_cache)
 
 
 
 
-  def request_transcribe(
+  async def request_transcribe(
     self,
     recording_data: typing.Dict[str, typing.Any],
     transcribe_options: typing.Dict[str, typing.Any]
     ) -> typing.Dict[str, typing.Any]:
-    """ synchronous post of deepgram transcrtion request """
-    url = "https://api.deepgram.com/v1/listen"
+    """
+    post of deepgram transcrtion request, retried on 429 and 5xx
+
+    recording_data["buffer"] is the recording bytes or a function returning a
+    new async iterator of the recording bytes for each attempt (streamed upload).
+    """
+    url = self._init_options.api_url
     headers = {
       "accept": "application/json",
       "content-type": recording_data["mimetype"],
       "Authorization": "Token " + self._init_options.deepgram_key
       }
-    requests_options = {
-      "timeout": 20
-      }
 
-    response = requests.post(
+    response = await self._http_client.request(
+      "POST",
       url,
       params = transcribe_options,
-      #json = recording_data,
-      data = recording_data["buffer"],
-      headers = headers,
-      **requests_options
+      content = recording_data["buffer"],
+      headers = headers
       )
 
     if(response.status_code >= 300):
@@ -112,7 +180,48 @@ class Deepgram(vcon.filter_plugins.FilterPlugin):
         response.status_code
         ))
 
-    return(json.loads(response.content))
+    return(response.json())
+
+
+  async def _verified_download(
+    self,
+    url: str,
+    signature: str,
+    dialog_index: int
+    ) -> typing.AsyncIterator[bytes]:
+    """ Stream the recording from the url, verifying its SHA-512 signature """
+    hasher = hashlib.sha512()
+    async with self._http_client.stream("GET", url) as response:
+      if(not(200 <= response.status_code < 300)):
+        raise Exception("get of {} resulted in error: {}".format(
+          url,
+          response.status_code
+          ))
+      async for chunk in response.aiter_bytes():
+        hasher.update(chunk)
+        yield chunk
+
+    # same encoding as vcon.security.sha_512_hash
+    sig_hash = jose.utils.base64url_encode(hasher.digest()).decode("utf-8")
+    if(sig_hash != signature):
+      # Raised before the end of the chunked upload is sent, so Deepgram
+      # does not get a complete recording.
+      raise vcon.InvalidVconHash("SHA-512 hash in signature does not match the streamed body for dialog[{}]".format(dialog_index))
+
+
+  @staticmethod
+  def _external_recordings_mode(
+    dialog: typing.Dict[str, typing.Any],
+    external_recordings: str
+    ) -> str:
+    """ How the dialog's recording is sent: "download", "stream" or "url" """
+    if(dialog.get("body", None) not in (None, "") or dialog.get("url", None) in (None, "")):
+      # inline
+      return("download")
+    if(external_recordings == "stream" and dialog.get("alg", None) != "SHA-512"):
+      # LM-OTS signatures cannot be verified as the recording is streamed
+      return("download")
+    return(external_recordings)
 
 
   async def filter(
@@ -140,11 +249,16 @@ class Deepgram(vcon.filter_plugins.FilterPlugin):
       "DeepgramOptions.input_dialogs"
       )
 
+    if(options.external_recordings not in ("download", "stream", "url")):
+      raise Exception("DeepgramOptions.external_recordings: {} must be one of: download, stream or url".format(
+        options.external_recordings
+        ))
+
     # no dialogs
     if(len(dialog_indices) == 0):
       return(out_vcon)
 
-    if(self.deepgram_client is None):
+    if(self._init_options.deepgram_key is None or self._init_options.deepgram_key == ""):
       logger.warning("Deepgram.filter: deepgram_key is not set, no transcription performed")
       return(out_vcon)
 
@@ -161,44 +275,102 @@ class Deepgram(vcon.filter_plugins.FilterPlugin):
       'diarize': 'true'
       }
 
-    for dialog_index in dialog_indices:
-      dialog = in_vcon.dialog[dialog_index]
-      if(dialog["type"] == "recording"):
-        transcript_index = in_vcon.find_transcript_for_dialog(
-          dialog_index,
-          True,
-          [
-            ("deepgram", "transcription", "deepgram_prerecorded")
-          ]
-          )
-
-        # We have not already transcribed this dialog
-        if(transcript_index is None):
-          recording_bytes = await in_vcon.get_dialog_body(dialog_index)
-
-          recording_data = {
-            "buffer": recording_bytes,
-            "mimetype": dialog["mimetype"]
-            }
-
-          transcript_dict = self.request_transcribe(
-            recording_data,
-            transcribe_options
-            )
-
-          # For now make synch.
-          # transcript_dict = await self.deepgram_client.transcription.prerecorded(
-          #   recording_data,
-          #   transcribe_options
-          #   )
-          # logger.debug("deepgram return type: {} value: {}".format(type(transcript_dict), transcript_dict))
-          out_vcon.add_analysis_transcript(
-            dialog_index,
-            transcript_dict,
-            "deepgram",
-            "deepgram_prerecorded",
-            **analysis_extras
-            )
+    # The requests for several dialogs are in flight at the same time,
+    # the transcripts are added in dialog order.
+    await self.filter_dialogs(
+      out_vcon,
+      dialog_indices,
+      functools.partial(
+        self._transcribe_dialog,
+        transcribe_options = transcribe_options,
+        analysis_extras = analysis_extras,
+        external_recordings = options.external_recordings
+        ),
+      options.max_concurrent_dialogs
+      )
 
     return(out_vcon)
 
+
+  async def _transcribe_dialog(
+    self,
+    in_vcon: vcon.Vcon,
+    dialog_index: int,
+    buffer: vcon.concurrency.AnalysisBuffer,
+    transcribe_options: typing.Dict[str, typing.Any],
+    analysis_extras: typing.Dict[str, typing.Any],
+    external_recordings: str = "download"
+    ) -> None:
+    """ Transcribe one recording dialog, adding the transcript to the buffer """
+    dialog = in_vcon.dialog[dialog_index]
+    if(dialog["type"] != "recording"):
+      return
+
+    transcript_index = in_vcon.find_transcript_for_dialog(
+      dialog_index,
+      True,
+      [
+        ("deepgram", "transcription", "deepgram_prerecorded")
+      ]
+      )
+
+    # We have already transcribed this dialog
+    if(transcript_index is not None):
+      return
+
+    transcript_dict = None
+    recording_bytes = None
+    cache_key = None
+    transcript_cache = self._transcript_cache
+    mode = self._external_recordings_mode(dialog, external_recordings)
+    # streamed and url recordings are only looked up by their signature, not downloaded to hash them
+    if(transcript_cache is not None and (mode == "download" or dialog.get("alg", None) == "SHA-512")):
+      content_hash, recording_bytes = await vcon.filter_plugins.impl.transcript_cache.dialog_content_hash(
+        in_vcon,
+        dialog_index
+        )
+      cache_key = vcon.filter_plugins.impl.transcript_cache.transcript_key(
+        content_hash,
+        "deepgram",
+        vcon.filter_plugins.impl.transcript_cache.options_hash(transcribe_options)
+        )
+      transcript_dict = await self.run_blocking(transcript_cache.get, cache_key)
+
+    if(transcript_dict is None):
+      if(mode == "url"):
+        # Deepgram fetches the recording
+        recording_data = {
+          "buffer": json.dumps({"url": dialog["url"]}).encode("utf-8"),
+          "mimetype": "application/json"
+          }
+
+      elif(mode == "stream"):
+        recording_data = {
+          "buffer": functools.partial(self._verified_download, dialog["url"], dialog["signature"], dialog_index),
+          "mimetype": dialog["mimetype"]
+          }
+
+      else:
+        if(recording_bytes is None):
+          recording_bytes = await in_vcon.get_dialog_body(dialog_index)
+
+        recording_data = {
+          "buffer": recording_bytes,
+          "mimetype": dialog["mimetype"]
+          }
+
+      transcript_dict = await self.request_transcribe(
+        recording_data,
+        transcribe_options
+        )
+
+      if(cache_key is not None):
+        await self.run_blocking(transcript_cache.set, cache_key, transcript_dict)
+
+    buffer.add_analysis_transcript(
+      dialog_index,
+      transcript_dict,
+      "deepgram",
+      "deepgram_prerecorded",
+      **analysis_extras
+      )
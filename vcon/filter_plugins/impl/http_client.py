@@ -0,0 +1,195 @@
+"""
+Shared async HTTP client for filter plugins calling web services.
+
+One httpx.AsyncClient per event loop keeps connections alive between the
+requests of all the dialogs and vCons a plugin processes.  The number of
+requests in flight is bounded.  Requests which fail with a retryable
+status (429 or 5xx) or a network error are retried with exponential
+backoff and full jitter (the Retry-After header is honored), until the
+retries or the per request deadline run out.
+
+A streamed request body (e.g. a download piped into an upload with
+stream) cannot be resent, so it is given as a function which returns a
+new stream for each attempt.
+
+Example:
+  client = RetryingHttpClient(max_connections = 10, max_retries = 4, deadline = 300.0)
+  response = await client.request("POST", url, content = body, headers = headers)
+"""
+import sys
+import time
+import random
+import typing
+import asyncio
+import weakref
+import contextlib
+import email.utils
+import httpx
+import vcon.logging_utils
+
+logger = vcon.logging_utils.build_logger(__name__, sys.stderr)
+
+RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+class DeadlineExceeded(TimeoutError):
+  """ Raised when a request and its retries did not complete within the deadline """
+
+
+def retry_after(response: httpx.Response) -> typing.Union[float, None]:
+  """ Seconds to wait from the response's Retry-After header, None if it has none """
+  value = response.headers.get("retry-after", None)
+  if(value is None):
+    return(None)
+  try:
+    return(max(float(value), 0.0))
+
+  except ValueError:
+    # HTTP date
+    try:
+      return(max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0))
+
+    except (TypeError, ValueError):
+      return(None)
+
+
+class RetryingHttpClient():
+  """ Keep-alive, bounded concurrency HTTP client with retries """
+  def __init__(
+    self,
+    max_connections: int = 10,
+    max_retries: int = 4,
+    backoff_base: float = 0.5,
+    backoff_max: float = 30.0,
+    deadline: float = 300.0,
+    retry_statuses: typing.AbstractSet[int] = RETRY_STATUSES
+    ):
+    """
+    Parameters:
+      max_connections (int) - maximum number of requests in flight (per event loop)
+      max_retries (int) - number of times a failed request is retried
+      backoff_base (float) - seconds of backoff before the first retry, doubled for each retry
+      backoff_max (float) - maximum seconds of backoff before a retry
+      deadline (float) - seconds in which a request, including its retries, must complete
+      retry_statuses (Set[int]) - HTTP status codes which are retried
+    """
+    self.max_connections = max_connections
+    self.max_retries = max_retries
+    self.backoff_base = backoff_base
+    self.backoff_max = backoff_max
+    self.deadline = deadline
+    self.retry_statuses = retry_statuses
+    # httpx clients and asyncio semaphores are bound to the loop they are used on
+    # event loop: (httpx.AsyncClient, asyncio.Semaphore)
+    self._loop_clients = weakref.WeakKeyDictionary()
+
+  def _client(self) -> typing.Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    client = self._loop_clients.get(loop, None)
+    if(client is None):
+      # requests are bounded by the semaphore, streams (e.g. a download
+      # piped into a request) need connections in addition to the requests
+      limits = httpx.Limits(
+        max_connections = None,
+        max_keepalive_connections = self.max_connections
+        )
+      client = (httpx.AsyncClient(limits = limits, timeout = None), asyncio.Semaphore(self.max_connections))
+      self._loop_clients[loop] = client
+    return(client)
+
+  def backoff(self, attempt: int) -> float:
+    """ Seconds to wait before retry number attempt (0 for the first retry), with full jitter """
+    return(random.uniform(0.0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+
+  async def request(
+    self,
+    method: str,
+    url: str,
+    deadline: typing.Union[float, None] = None,
+    **kwargs
+    ) -> httpx.Response:
+    """
+    Make the request, retrying on retryable statuses and network errors.
+
+    Parameters:
+      method (str) - HTTP method
+      url (str) - URL to request
+      deadline (float) - seconds in which the request must complete, including
+        retries, defaults to the client's deadline
+      kwargs - passed to httpx.AsyncClient.request (e.g. content, headers, params).
+        content is bytes or a function returning new content (e.g. an async
+        iterator of bytes) for each attempt, so that it can be resent.
+
+    Returns:
+      the httpx.Response of the last attempt, which may have a failed status
+      if the retries or the time to retry ran out
+
+    Raises:
+      DeadlineExceeded if the deadline passed
+      httpx.TransportError if the last attempt failed with a network error
+        and there are no retries or time to retry left
+    """
+    client, semaphore = self._client()
+    content = kwargs.pop("content", None)
+    loop = asyncio.get_running_loop()
+    if(deadline is None):
+      deadline = self.deadline
+    end_time = loop.time() + deadline
+    attempt = 0
+    while(True):
+      remaining = end_time - loop.time()
+      if(remaining <= 0):
+        raise DeadlineExceeded("{} {} did not complete in: {} seconds".format(method, url, deadline))
+
+      wait = None
+      response = None
+      try:
+        async with semaphore:
+          response = await asyncio.wait_for(
+            client.request(method, url, content = content() if callable(content) else content, **kwargs),
+            remaining
+            )
+
+        if(response.status_code not in self.retry_statuses or attempt >= self.max_retries):
+          return(response)
+        wait = retry_after(response)
+        logger.warning("%s %s failed: %d, attempt: %d", method, url, response.status_code, attempt + 1)
+
+      except asyncio.TimeoutError as timeout_error:
+        raise DeadlineExceeded("{} {} did not complete in: {} seconds".format(
+          method, url, deadline)) from timeout_error
+
+      except httpx.TransportError as transport_error:
+        if(attempt >= self.max_retries):
+          raise
+        logger.warning("%s %s failed: %s, attempt: %d", method, url, transport_error, attempt + 1)
+        last_error = transport_error
+
+      backoff = self.backoff(attempt)
+      if(wait is not None):
+        backoff = max(backoff, wait)
+      if(backoff >= end_time - loop.time()):
+        # no time left to retry, give the caller the last failure
+        if(response is not None):
+          return(response)
+        raise last_error
+      await asyncio.sleep(backoff)
+      attempt += 1
+
+  @contextlib.asynccontextmanager
+  async def stream(self, method: str, url: str, **kwargs) -> typing.AsyncIterator[httpx.Response]:
+    """
+    Async context manager making a request without retries, with the
+    response body streamed (e.g. response.aiter_bytes()).  Not counted in
+    max_connections, so that it can be used while making a request.
+    """
+    client, semaphore = self._client()
+    async with client.stream(method, url, **kwargs) as response:
+      yield response
+
+  async def aclose(self) -> None:
+    """ Close the connections of the client for the running event loop """
+    loop = asyncio.get_running_loop()
+    client = self._loop_clients.pop(loop, None)
+    if(client is not None):
+      await client[0].aclose()
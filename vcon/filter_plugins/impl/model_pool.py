@@ -0,0 +1,140 @@
+"""
+Process wide pool of lazily loaded models shared by filter plugins.
+
+Models are keyed by name (e.g. whisper model size), loaded on first use
+and shared by all of the plugin registrations using the same name.  When
+the loaded models use more than the memory budget, the least recently
+used models not in use are unloaded.  The most recently used model is
+kept, even if it alone exceeds the budget, so that it is not reloaded for
+every use.  A model is used by one thread at a time (e.g. whisper installs
+per call hooks on the model).
+
+Example:
+  pool = ModelPool(load_model, model_memory, memory_budget = 2 * 1024 * 1024 * 1024)
+  with pool.use("base") as model:
+    model.transcribe(samples)
+"""
+import sys
+import typing
+import threading
+import contextlib
+import collections
+import vcon.logging_utils
+
+logger = vcon.logging_utils.build_logger(__name__, sys.stderr)
+
+
+class _PoolEntry():
+  __slots__ = ("model", "memory", "users", "lock")
+
+  def __init__(self):
+    self.model = None
+    self.memory = 0
+    # number of threads using or waiting to use the model
+    self.users = 0
+    # held while loading or using the model
+    self.lock = threading.Lock()
+
+
+class ModelPool():
+  """ Lazily loaded, LRU unloaded models keyed by name """
+  def __init__(
+    self,
+    load: typing.Callable[[str], typing.Any],
+    memory: typing.Callable[[typing.Any], int],
+    memory_budget: int = 0,
+    unload: typing.Union[typing.Callable[[typing.Any], None], None] = None
+    ):
+    """
+    Parameters:
+      load - function(name) which loads and returns the named model
+      memory - function(model) returning the bytes of memory used by the model
+      memory_budget (int) - bytes of memory the loaded models may use, 0 for no limit
+      unload - optional function(model) called after a model is dropped from the pool
+    """
+    self._load = load
+    self._memory = memory
+    self._unload = unload
+    self.memory_budget = memory_budget
+    # name: _PoolEntry in least to most recently used order
+    self._entries = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  @contextlib.contextmanager
+  def use(self, name: str) -> typing.Iterator[typing.Any]:
+    """
+    Context manager to get exclusive use of the named model, loading it if needed.
+    """
+    with self._lock:
+      entry = self._entries.get(name, None)
+      if(entry is None):
+        entry = self._entries[name] = _PoolEntry()
+      entry.users += 1
+      self._entries.move_to_end(name)
+
+    try:
+      with entry.lock:
+        if(entry.model is None):
+          model = self._load(name)
+          memory = self._memory(model)
+          logger.info("loaded model: %s using: %d MB", name, memory // (1024 * 1024))
+          with self._lock:
+            entry.model = model
+            entry.memory = memory
+          # make room for the new model
+          self._evict()
+        yield entry.model
+
+    finally:
+      with self._lock:
+        entry.users -= 1
+      self._evict()
+
+  def _evict(self) -> None:
+    """ Unload least recently used models not in use until within the memory budget """
+    unloaded = []
+    with self._lock:
+      if(self.memory_budget <= 0):
+        return
+      total = sum(entry.memory for entry in self._entries.values())
+      # all but the most recently used
+      for name, entry in list(self._entries.items())[:-1]:
+        if(total <= self.memory_budget):
+          break
+        if(entry.users == 0 and entry.model is not None):
+          total -= entry.memory
+          unloaded.append((name, entry.model))
+          del self._entries[name]
+
+      if(total > self.memory_budget):
+        logger.warning("models in use: %d MB exceed memory budget: %d MB",
+          total // (1024 * 1024), self.memory_budget // (1024 * 1024))
+
+    for name, model in unloaded:
+      logger.info("unloading least recently used model: %s", name)
+      if(self._unload is not None):
+        self._unload(model)
+
+  def set_memory_budget(self, memory_budget: int) -> None:
+    """ Set the bytes of memory the loaded models may use (0 for no limit), unloading models if needed """
+    self.memory_budget = memory_budget
+    self._evict()
+
+  def loaded(self) -> typing.Dict[str, int]:
+    """ dict of loaded model name: bytes of memory, in least to most recently used order """
+    with self._lock:
+      return({name: entry.memory for name, entry in self._entries.items() if entry.model is not None})
+
+  def clear(self) -> None:
+    """ Unload all of the models not in use """
+    unloaded = []
+    with self._lock:
+      for name, entry in list(self._entries.items()):
+        if(entry.users == 0):
+          if(entry.model is not None):
+            unloaded.append(entry.model)
+          del self._entries[name]
+
+    if(self._unload is not None):
+      for model in unloaded:
+        self._unload(model)
@@ -1,15 +1,23 @@
 """ OpenAI FilterPlugin implentation """
 import typing
+import asyncio
 import datetime
+import functools
 import pydantic
 import openai
 import vcon
+import vcon.concurrency
 import vcon.filter_plugins
+import vcon.logging_utils
+import vcon.filter_plugins.impl.chat_windows
+import vcon.filter_plugins.impl.rate_limiter
+import vcon.filter_plugins.impl.response_cache
 import pyjq
 
 VERBOSE = False
 
 logger = vcon.build_logger(__name__)
+_dialog_log_sampler = vcon.logging_utils.LogSampler(logger)
 
 
 class OpenAICompletionInitOptions(
@@ -32,6 +40,86 @@ You can get one at: https://platform.openai.com/account/api-keys
     example = "sk-cABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstu"
     )
 
+  requests_per_minute: int = pydantic.Field(
+    title = "maximum **OpenAI** requests per minute",
+    description = """
+The requests to **OpenAI** from all of the OpenAI plugins in this process
+(or in all processes sharing the **rate_limit_redis_url**) are limited to
+this many per minute, so that concurrent requests are delayed rather than
+rejected by **OpenAI**.  Set to the requests per minute limit of your account.
+0 for no limit.
+""",
+    default = 3500,
+    ge = 0,
+    examples = [0, 500, 3500]
+    )
+
+  tokens_per_minute: int = pydantic.Field(
+    title = "maximum **OpenAI** tokens per minute",
+    description = """
+The tokens (input and **max_tokens** of output) of the requests to **OpenAI**
+from all of the OpenAI plugins in this process (or in all processes sharing the
+**rate_limit_redis_url**) are limited to this many per minute.  Set to the
+tokens per minute limit of your account.
+0 for no limit.
+""",
+    default = 90000,
+    ge = 0,
+    examples = [0, 40000, 90000]
+    )
+
+  rate_limit_redis_url: str = pydantic.Field(
+    title = "Redis URL for a rate limit shared across processes",
+    description = """
+If set, the **requests_per_minute** and **tokens_per_minute** limits are
+kept in this Redis server and shared by all of the processes using it
+(e.g. the workers of **py_vcon_server**).  Requires the **redis** package.
+If not set, the limits apply to this process only.
+""",
+    default = "",
+    examples = ["", "redis://localhost:6379"]
+    )
+
+  response_cache: str = pydantic.Field(
+    title = "location of the cache of **OpenAI** responses",
+    description = """
+Responses are cached by model, prompt, temperature, max_tokens and
+a hash of the dialog text or messages.  A request which is in the cache
+is answered from it without calling **OpenAI** (e.g. when a **Vcon** is
+processed again).  The cache is one of:
+
+ * an SQLite database: a file name ending in .db, .sqlite or .sqlite3
+ * a Redis server: a redis:// URL (e.g. the Redis used by **py_vcon_server**, shared by its workers), requires the **redis** package
+ * a directory with a JSON file per response: any other name
+
+Empty string for no cache.
+""",
+    default = "",
+    examples = ["", "~/.cache/vcon/openai.db", "redis://localhost:6379", "/var/cache/vcon/openai"]
+    )
+
+  response_cache_ttl: float = pydantic.Field(
+    title = "seconds responses are kept in the cache",
+    description = """
+Cached responses expire this many seconds after they were cached.
+0 to keep them until evicted by **response_cache_max_entries**.
+""",
+    default = 2592000.0,
+    ge = 0.0,
+    examples = [0.0, 86400.0, 2592000.0]
+    )
+
+  response_cache_max_entries: int = pydantic.Field(
+    title = "maximum number of responses in the cache",
+    description = """
+When the cache has more than this many responses, the least recently used
+responses are evicted.  0 for no limit.
+""",
+    default = 100000,
+    ge = 0,
+    examples = [0, 10000, 100000]
+    )
+
 
 class OpenAICompletionOptions(
   vcon.filter_plugins.FilterPluginOptions,
@@ -65,6 +153,21 @@ using the default FilterPlugin transcribe type.
     examples = ["", "0:", "0:-2", "2:5", "0:6:2", [], [1, 4, 5, 9]]
     )
 
+  max_concurrent_dialogs: int = pydantic.Field(
+    title = "maximum number of **dialog** objects completed concurrently",
+    description = """
+The number of **dialog** objects for which the **prompt** is completed at the same time.
+The **analysis** objects are added to the **Vcon** in **dialog** order,
+regardless of the order in which the completions finish.
+1 completes the **dialog** objects one at a time.
+**OpenAIChatCompletion** completes all of the **dialog** objects together
+and does not use this option.
+""",
+    default = 4,
+    ge = 1,
+    examples = [1, 4]
+    )
+
   model: str = pydantic.Field(
     title = "**OpenAI** model name to use for generative AI",
     description = """
@@ -220,9 +323,16 @@ class OpenAICompletion(vcon.filter_plugins.FilterPlugin):
   In contrast, **OpenAIChatCompletion** inputs the context of all of the text
   dialog and transcribe analysis objects as input labeled by time and party
   and will generate a single prompt response as one new analysis object.
+
+  The text of several dialogs is completed concurrently (see
+  **max_concurrent_dialogs**).  The requests of all of
+  the OpenAI plugins are limited by the **requests_per_minute** and
+  **tokens_per_minute** initialization options.  Responses are cached in the
+  **response_cache** if one is configured.
   
   """
   init_options_type = OpenAICompletionInitOptions
+  options_type = OpenAICompletionOptions
 
   def __init__(
     self,
@@ -242,24 +352,96 @@ class OpenAICompletion(vcon.filter_plugins.FilterPlugin):
       logger.warning("OpenAI completion plugin: key not set.  Plugin will be a no-op")
     openai.api_key = init_options.openai_api_key
     self.last_stats: typing.Dict[str, int] = {}
+    # shared by all OpenAI plugins with the same limits
+    self._rate_limiter = vcon.filter_plugins.impl.rate_limiter.get_rate_limiter(
+      "openai",
+      init_options.requests_per_minute,
+      init_options.tokens_per_minute,
+      init_options.rate_limit_redis_url
+      )
+    self._response_cache = vcon.filter_plugins.impl.response_cache.open_cache(
+      init_options.response_cache,
+      init_options.response_cache_ttl,
+      init_options.response_cache_max_entries
+      )
 
 
-  def complete(
+  async def _create(
     self,
-    out_vcon: vcon.Vcon,
+    api: typing.Any,
     options: OpenAICompletionOptions,
-    text_body: str,
-    dialog_index: int
-    ) -> vcon.Vcon:
-    """ Run **OpenAI completion* on the given text and create a new analysis object """
+    input_tokens: int,
+    **kwargs
+    ) -> typing.Dict[str, typing.Any]:
+    """
+    Make a rate limited, asynchronous **OpenAI** request, or get its
+    response from the response cache.
+
+    Parameters:
+      api - the **OpenAI** API class (e.g. openai.Completion or openai.ChatCompletion)
+      options (OpenAICompletionOptions) - model, max_tokens and temperature of the request
+      input_tokens (int) - estimated tokens of the prompt or messages
+      kwargs - the prompt or messages
+
+    Returns:
+      the **OpenAI** result object
+    """
+    cache_key = None
+    if(self._response_cache is not None):
+      cache_key = vcon.filter_plugins.impl.response_cache.response_key(
+        options.model,
+        options.prompt,
+        options.temperature,
+        options.max_tokens,
+        kwargs
+        )
+      result = await self.run_blocking(self._response_cache.get, cache_key)
+      if(result is not None):
+        return(result)
 
-    completion_result = openai.Completion.create(
+    reserved_tokens = input_tokens + options.max_tokens
+    await self._rate_limiter.acquire(reserved_tokens)
+    result = await api.acreate(
       model = options.model,
-      prompt = options.prompt + text_body,
       max_tokens = options.max_tokens,
-      temperature = options.temperature
+      temperature = options.temperature,
+      **kwargs
       )
 
+    # give back what was reserved for output that was not generated
+    usage = result.get("usage", None) if isinstance(result, dict) else None
+    if(usage is not None and "total_tokens" in usage):
+      await self._rate_limiter.release(reserved_tokens - usage["total_tokens"])
+
+    if(cache_key is not None):
+      await self.run_blocking(self._response_cache.set, cache_key, result)
+    return(result)
+
+
+  async def _completion(
+    self,
+    options: OpenAICompletionOptions,
+    text_body: str
+    ) -> typing.Dict[str, typing.Any]:
+    """ Run **OpenAI completion** of the prompt on the given text """
+    prompt = options.prompt + text_body
+    return(await self._create(
+      openai.Completion,
+      options,
+      vcon.filter_plugins.impl.chat_windows.count_tokens(prompt, options.model),
+      prompt = prompt
+      ))
+
+
+  def complete(
+    self,
+    out_vcon: typing.Union[vcon.Vcon, vcon.concurrency.AnalysisBuffer],
+    options: OpenAICompletionOptions,
+    completion_result: typing.Dict[str, typing.Any],
+    dialog_index: int
+    ) -> vcon.Vcon:
+    """ Create a new analysis object from the **OpenAI completion** result for the dialog """
+
     query_result = pyjq.all(options.jq_result, completion_result)
     if(len(query_result) == 0):
       logger.warning("{} jq query resulted in no elements.  No analysis object added".format(
@@ -341,13 +523,14 @@ class OpenAICompletion(vcon.filter_plugins.FilterPlugin):
       logger.warning("OpenAICompletion.filter: OpenAI API key is not set, no filtering performed")
       return(out_vcon)
 
+    # dialog index: text
+    dialog_texts: typing.Dict[int, str] = {}
     for dialog_index in dialog_indices:
       this_dialog_texts = await in_vcon.get_dialog_text(
         dialog_index,
         True, # find text from transcript analysis if dialog is a recording and transcript exists
         True  # transcribe this recording dialog if transcript does not exist
         )
-      dialog = in_vcon.dialog[dialog_index]
 
       text_segments = [d["text"] for d in this_dialog_texts]
 
@@ -356,17 +539,33 @@ class OpenAICompletion(vcon.filter_plugins.FilterPlugin):
         continue
 
       self.last_stats["num_text_segments"] = len(text_segments)
-      all_dialog_text = "  ".join(text_segments)
-      out_vcon = self.complete(
-          out_vcon,
-          options,
-          all_dialog_text,
-          dialog_index
-        )
+      dialog_texts[dialog_index] = "  ".join(text_segments)
+
+    # The completions for several dialogs are in flight at the same time,
+    # within the rate limit.  The analysis is added in dialog order.
+    await self.filter_dialogs(
+      out_vcon,
+      list(dialog_texts.keys()),
+      functools.partial(self._complete_dialog, options = options, dialog_texts = dialog_texts),
+      options.max_concurrent_dialogs
+      )
 
     return(out_vcon)
 
 
+  async def _complete_dialog(
+    self,
+    in_vcon: vcon.Vcon,
+    dialog_index: int,
+    buffer: vcon.concurrency.AnalysisBuffer,
+    options: OpenAICompletionOptions,
+    dialog_texts: typing.Dict[int, str]
+    ) -> None:
+    """ Complete the prompt for the text of one dialog, adding the analysis to buffer """
+    completion_result = await self._completion(options, dialog_texts[dialog_index])
+    self.complete(buffer, options, completion_result, dialog_index)
+
+
 chat_completions_init_options_defaults = {
 }
 
@@ -389,7 +588,59 @@ class OpenAIChatCompletionOptions(
   field_defaults = chat_completion_options_defaults,
   title = "OpenAI Chat Completion filter method options"
   ):
-  pass
+  chunk_tokens: int = pydantic.Field(
+    title = "maximum tokens of dialog messages per chat completion",
+    description = """
+Conversations whose messages do not fit in one chat completion are
+split into consecutive windows of messages of at most **chunk_tokens**
+tokens.  The **prompt** is answered for each window concurrently and the
+partial answers are then combined into one answer using the **reduce_prompt**.
+
+0 sizes the windows to fill the context window of the **model**, less the
+**prompt** and **max_tokens** of output.
+""",
+    default = 0,
+    ge = 0,
+    examples = [0, 2000, 6000]
+    )
+
+  chunk_overlap_tokens: int = pydantic.Field(
+    title = "maximum tokens of messages repeated in the next window",
+    description = """
+When the messages are split into windows, the last messages of a window,
+up to **chunk_overlap_tokens** tokens, are repeated at the start of the next
+window so that the context of an exchange is not lost at the window boundary.
+""",
+    default = 200,
+    ge = 0,
+    examples = [0, 200, 500]
+    )
+
+  reduce_prompt: str = pydantic.Field(
+    title = "the prompt to combine the answers for the windows of a long conversation",
+    description = """
+When the messages are split into windows, the answers to the **prompt**
+for each window are given to the **model** with this prompt to combine them
+into a single answer.  **{prompt}** is replaced with the **prompt**.
+""",
+    default = "These are answers to the following prompt for consecutive parts of one conversation.  "
+      "Combine them into a single answer to the prompt for the whole conversation: {prompt}"
+    )
+
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+# prompt added to the windows of a conversation too long for one chat completion
+PART_PROMPT = "These messages are part {} of {} of the conversation."
+
+
+def _prompt_tokens(prompt: str, model: str) -> int:
+  """ Tokens a system prompt message takes in the context window """
+  return(vcon.filter_plugins.impl.chat_windows.message_tokens({"role": "system", "content": prompt}, model))
+
+
+def _completion_text(chat_completion_result: typing.Dict[str, typing.Any]) -> str:
+  return(chat_completion_result["choices"][0]["message"]["content"])
 
 
 class OpenAIChatCompletion(OpenAICompletion):
@@ -403,7 +654,12 @@ class OpenAIChatCompletion(OpenAICompletion):
   or transcribe analysis text when asking for a completion to the prompt, generating
   a prompt response and a new analysis object for each text dialog and transcribe
   analysis object analysed.
+
+  Conversations too long for the context window of the model are split into
+  windows of messages (see **chunk_tokens**), the prompt is answered for each
+  window concurrently and the answers are combined into the one analysis object.
   """
+  options_type = OpenAIChatCompletionOptions
 
   def __init__(
     self,
@@ -422,6 +678,81 @@ class OpenAIChatCompletion(OpenAICompletion):
     openai.api_key = init_options.openai_api_key
     self.last_stats: typing.Dict[str, int] = {}
 
+  def _window_budget(
+    self,
+    options: OpenAIChatCompletionOptions,
+    prompts: typing.List[str]
+    ) -> int:
+    """ Maximum tokens of the dialog messages in one chat completion with the given prompts """
+    if(options.chunk_tokens > 0):
+      return(options.chunk_tokens)
+
+    prompt_tokens = _prompt_tokens(SYSTEM_PROMPT, options.model) + \
+      sum(_prompt_tokens(prompt, options.model) for prompt in prompts)
+    return(vcon.filter_plugins.impl.chat_windows.context_window(options.model) -
+      options.max_tokens -
+      prompt_tokens -
+      vcon.filter_plugins.impl.chat_windows.REPLY_OVERHEAD)
+
+  async def _chat_completion(
+    self,
+    options: OpenAIChatCompletionOptions,
+    messages: typing.List[typing.Dict[str, str]],
+    prompts: typing.List[str]
+    ) -> typing.Dict[str, typing.Any]:
+    """ Run **OpenAI** chat completion on the messages followed by the prompts """
+    # add the system role at the end so that dialog does not over ride it
+    messages = messages + [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    # Add the prompt
+    messages += [{"role": "system", "content": prompt} for prompt in prompts]
+
+    if(VERBOSE):
+      logger.debug("OpenAIChatCompletion messages: %s", messages)
+
+    # feed message to ChatGPT
+    return(await self._create(
+      openai.ChatCompletion,
+      options,
+      sum(vcon.filter_plugins.impl.chat_windows.message_tokens(message, options.model) for message in messages) +
+        vcon.filter_plugins.impl.chat_windows.REPLY_OVERHEAD,
+      messages = messages
+      ))
+
+  async def _reduce(
+    self,
+    options: OpenAIChatCompletionOptions,
+    answers: typing.List[str]
+    ) -> typing.Dict[str, typing.Any]:
+    """
+    Combine the answers to the prompt for consecutive windows of the
+    conversation into one chat completion.  If the answers do not fit in
+    one chat completion, they are combined in windows and then again.
+    """
+    reduce_prompt = options.reduce_prompt.replace("{prompt}", options.prompt)
+    messages = [{"role": "user", "content": "answer for part {} of the conversation: {}".format(answer_index + 1, answer)}
+      for answer_index, answer in enumerate(answers)]
+    windows = vcon.filter_plugins.impl.chat_windows.token_windows(
+      messages,
+      self._window_budget(options, [reduce_prompt]),
+      0,
+      options.model
+      )
+    if(len(windows) == 1):
+      return(await self._chat_completion(options, windows[0], [reduce_prompt]))
+
+    if(len(windows) >= len(answers)):
+      raise Exception("{}: chunk_tokens: {} too small to combine answers of max_tokens: {}".format(
+        self.__class__.__name__,
+        options.chunk_tokens,
+        options.max_tokens
+        ))
+
+    window_results = await asyncio.gather(*[
+      self._chat_completion(options, window, [reduce_prompt]) for window in windows
+      ])
+    return(await self._reduce(options, [_completion_text(result) for result in window_results]))
+
   async def filter(
     self,
     in_vcon: vcon.Vcon,
@@ -463,17 +794,19 @@ class OpenAIChatCompletion(OpenAICompletion):
         )
       dialog = in_vcon.dialog[dialog_index]
       if(VERBOSE):
-        logger.debug("text dialog[{}] text(s): {}".format(dialog_index, this_dialog_texts))
+        _dialog_log_sampler.debug("text dialog[%d] text(s): %s", dialog_index, this_dialog_texts)
       for text_index, text_dict in enumerate(this_dialog_texts):
+        # text dialog texts have the first "party", transcripts the "parties"
+        parties = text_dict.get("parties", text_dict.get("party", None))
         try:
-          party_label = self.get_party_label(in_vcon, text_dict["parties"], True)
+          party_label = self.get_party_label(in_vcon, parties, True)
         except AttributeError as e:
           logger.exception(e)
           logger.warning("vcon: {} get_dialog_text dialog_index: {} text[{}]: missing parties: {}".format(
             in_vcon.uuid,
             dialog_index,
             text_index,
-            text_dict["parties"]
+            parties
             ))
           party_label = "unknown"
 
@@ -512,12 +845,12 @@ class OpenAIChatCompletion(OpenAICompletion):
 
     # sort the text by start date and remove the date parameter
     sorted_messages = sorted(dialog_text.copy(), key = lambda msg: msg["start"])
-    logger.debug("generated {} messages from {} text dialogs and {} recording dialogs out of {} input dialogs".format(
+    logger.debug("generated %d messages from %d text dialogs and %d recording dialogs out of %d input dialogs",
       len(sorted_messages),
       num_text_dialogs,
       num_transcribe_analysis,
       len(dialog_indices)
-      ))
+      )
 
     # For test and debugging
     self.last_stats["num_messages"] = len(sorted_messages)
@@ -534,22 +867,31 @@ class OpenAIChatCompletion(OpenAICompletion):
       for param in remove_keys:
         del msg[param]
 
-    # add the system role at the end so that dialog does not over ride it
-    sorted_messages.append({"role": "system", "content": "You are a helpful assistant."})
-
-    # Add the prompt
-    sorted_messages.append({"role": "system", "content": options.prompt})
+    # Split long conversations into windows which fit in the context window
+    budget = self._window_budget(options, [PART_PROMPT.format(999, 999), options.prompt])
+    windows = vcon.filter_plugins.impl.chat_windows.token_windows(
+      sorted_messages,
+      budget,
+      min(options.chunk_overlap_tokens, budget // 2),
+      options.model
+      )
+    self.last_stats["num_windows"] = len(windows)
 
-    if(VERBOSE):
-      logger.debug("OpenAIChatCompletion messages: {}".format(sorted_messages))
-    # feed message to ChatGPT
+    if(len(windows) == 1):
+      chat_completion_result = await self._chat_completion(options, windows[0], [options.prompt])
 
-    chat_completion_result = openai.ChatCompletion.create(
-      model = options.model,
-      messages = sorted_messages,
-      max_tokens = options.max_tokens,
-      temperature = options.temperature
-      )
+    else:
+      # map: answer the prompt for each window, then reduce: combine the answers
+      logger.debug("vcon: %s messages split into %d windows of %d tokens",
+        in_vcon.uuid,
+        len(windows),
+        budget
+        )
+      window_results = await asyncio.gather(*[
+        self._chat_completion(options, window, [PART_PROMPT.format(window_index + 1, len(windows)), options.prompt])
+        for window_index, window in enumerate(windows)
+        ])
+      chat_completion_result = await self._reduce(options, [_completion_text(result) for result in window_results])
 
     query_result = pyjq.all(options.jq_result, chat_completion_result)
     if(len(query_result) == 0):
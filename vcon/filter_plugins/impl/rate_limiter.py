@@ -0,0 +1,217 @@
+"""
+Token bucket rate limiting of requests to web services (e.g. OpenAI).
+
+Services such as OpenAI limit both the requests per minute and the tokens
+per minute of an account.  A RateLimiter has a bucket for each, refilled
+continuously at the per minute rate, holding up to a minute's worth.
+acquire takes one request and the estimated tokens of a request from the
+buckets, waiting for them to refill if they have run out.  Requests are
+reserved in the order they arrive, so the waits are first come, first
+served.  When a request's actual token usage is known, the unused tokens
+of the estimate are given back with release.
+
+The buckets are either in process memory (TokenBucketRateLimiter) or in
+Redis (RedisTokenBucketRateLimiter), so that they are shared by the worker
+processes of a server.  get_rate_limiter returns the limiter shared by all
+of the plugin instances in the process with the same limits.
+
+Example:
+  limiter = get_rate_limiter("openai", 3500, 90000)
+  await limiter.acquire(estimated_tokens)
+  response = await make_request()
+  await limiter.release(estimated_tokens - response["usage"]["total_tokens"])
+"""
+import time
+import typing
+import asyncio
+import weakref
+import threading
+import importlib
+import vcon
+
+logger = vcon.build_logger(__name__)
+
+
+class RateLimiter():
+  """ Abstract requests and tokens per minute rate limiter """
+  def __init__(
+    self,
+    requests_per_minute: int,
+    tokens_per_minute: int
+    ):
+    """
+    Parameters:
+      requests_per_minute (int) - requests allowed per minute, 0 for no limit
+      tokens_per_minute (int) - tokens allowed per minute, 0 for no limit
+    """
+    self.requests_per_minute = requests_per_minute
+    self.tokens_per_minute = tokens_per_minute
+    # number of acquires which had to wait and the total seconds waited
+    self.waits = 0
+    self.wait_seconds = 0.0
+
+  async def acquire(self, tokens: int) -> float:
+    """
+    Take a request and the tokens from the buckets, waiting until they are available.
+
+    Returns:
+      seconds waited
+    """
+    wait = await self._reserve(1, tokens)
+    if(wait > 0):
+      self.waits += 1
+      self.wait_seconds += wait
+      logger.debug("rate limited, waiting: %.3f seconds", wait)
+      await asyncio.sleep(wait)
+    return(wait)
+
+  async def release(self, tokens: int) -> None:
+    """ Give back reserved tokens which were not used """
+    if(tokens > 0):
+      await self._reserve(0, -tokens)
+
+  async def _reserve(self, requests: int, tokens: int) -> float:
+    """ Take the requests and tokens from the buckets, returns seconds until they are available """
+    raise NotImplementedError("{}._reserve not implemented".format(type(self)))
+
+
+class TokenBucketRateLimiter(RateLimiter):
+  """ Rate limiter with the buckets in process memory """
+  def __init__(
+    self,
+    requests_per_minute: int,
+    tokens_per_minute: int
+    ):
+    super().__init__(requests_per_minute, tokens_per_minute)
+    # levels may go negative, the debt of requests waiting for the bucket to refill
+    self._requests = float(requests_per_minute)
+    self._tokens = float(tokens_per_minute)
+    self._time = time.monotonic()
+    # used from the event loops of several threads
+    self._lock = threading.Lock()
+
+  async def _reserve(self, requests: int, tokens: int) -> float:
+    with self._lock:
+      now = time.monotonic()
+      elapsed = now - self._time
+      self._time = now
+      wait = 0.0
+      # capped again after the change, as released (negative) amounts must not overfill the bucket
+      if(self.requests_per_minute > 0):
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        self._requests = min(self.requests_per_minute, self._requests - requests)
+        wait = max(wait, -self._requests * 60.0 / self.requests_per_minute)
+      if(self.tokens_per_minute > 0):
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+        self._tokens = min(self.tokens_per_minute, self._tokens - tokens)
+        wait = max(wait, -self._tokens * 60.0 / self.tokens_per_minute)
+    return(wait)
+
+
+# KEYS: requests bucket, tokens bucket
+# ARGV: requests per minute, tokens per minute, requests, tokens
+# returns: seconds to wait as a string (Lua numbers are truncated to integer replies)
+_RESERVE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+for i = 1, 2 do
+  local per_minute = tonumber(ARGV[i])
+  if per_minute > 0 then
+    local state = redis.call('HMGET', KEYS[i], 'level', 'time')
+    local level = tonumber(state[1]) or per_minute
+    local last = tonumber(state[2]) or now
+    level = math.min(per_minute, level + math.max(now - last, 0) * per_minute / 60)
+    -- capped again as released (negative) amounts must not overfill the bucket
+    level = math.min(per_minute, level - tonumber(ARGV[i + 2]))
+    redis.call('HSET', KEYS[i], 'level', tostring(level), 'time', tostring(now))
+    redis.call('EXPIRE', KEYS[i], 120)
+    if level < 0 then
+      wait = math.max(wait, -level * 60 / per_minute)
+    end
+  end
+end
+return tostring(wait)
+"""
+
+
+class RedisTokenBucketRateLimiter(RateLimiter):
+  """ Rate limiter with the buckets in Redis, shared by processes using the same Redis and name """
+  def __init__(
+    self,
+    redis_url: str,
+    name: str,
+    requests_per_minute: int,
+    tokens_per_minute: int
+    ):
+    """
+    Parameters:
+      redis_url (str) - URL of the Redis server (e.g. redis://localhost)
+      name (str) - name of the rate limited service, the prefix of the Redis keys
+    """
+    super().__init__(requests_per_minute, tokens_per_minute)
+    # optional dependency, only needed if a Redis URL is configured
+    self._redis = importlib.import_module("redis.asyncio")
+    self.redis_url = redis_url
+    self._keys = ["rate_limit:{}:requests".format(name), "rate_limit:{}:tokens".format(name)]
+    # redis clients are bound to the loop they are used on
+    self._loop_scripts = weakref.WeakKeyDictionary()
+
+  def _script(self) -> typing.Any:
+    loop = asyncio.get_running_loop()
+    script = self._loop_scripts.get(loop, None)
+    if(script is None):
+      client = self._redis.Redis.from_url(self.redis_url, decode_responses = True)
+      script = client.register_script(_RESERVE_SCRIPT)
+      self._loop_scripts[loop] = script
+    return(script)
+
+  async def _reserve(self, requests: int, tokens: int) -> float:
+    wait = await self._script()(
+      keys = self._keys,
+      args = [self.requests_per_minute, self.tokens_per_minute, requests, tokens]
+      )
+    return(float(wait))
+
+
+_limiters: typing.Dict[typing.Tuple[str, str, int, int], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    name: str,
+    requests_per_minute: int,
+    tokens_per_minute: int,
+    redis_url: typing.Union[str, None] = None
+  ) -> RateLimiter:
+  """
+  Get the rate limiter shared by all users of the named service with the same limits.
+
+  Parameters:
+    name (str) - name of the rate limited service (e.g. "openai")
+    requests_per_minute (int) - requests allowed per minute, 0 for no limit
+    tokens_per_minute (int) - tokens allowed per minute, 0 for no limit
+    redis_url (str) - URL of the Redis server to share the limit across
+      processes, None or "" to limit this process only
+
+  Returns:
+    the RateLimiter
+  """
+  if(redis_url is None):
+    redis_url = ""
+  key = (name, redis_url, requests_per_minute, tokens_per_minute)
+  with _limiters_lock:
+    limiter = _limiters.get(key, None)
+    if(limiter is None):
+      if(redis_url == ""):
+        limiter = TokenBucketRateLimiter(requests_per_minute, tokens_per_minute)
+      else:
+        limiter = RedisTokenBucketRateLimiter(redis_url, name, requests_per_minute, tokens_per_minute)
+      logger.info("%s rate limit: %d requests/minute %d tokens/minute %s",
+        name,
+        requests_per_minute,
+        tokens_per_minute,
+        redis_url
+        )
+      _limiters[key] = limiter
+  return(limiter)
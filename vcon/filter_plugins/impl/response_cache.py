@@ -0,0 +1,74 @@
+"""
+Persistent cache of generative AI (e.g. OpenAI completion) responses.
+
+Reprocessing a vCon with the same model, prompt and text would otherwise
+pay for and wait for the same response again.  Responses are looked up by
+a hash of the model, prompt, temperature, max_tokens and a hash of the
+request content (the prompted text or chat messages).
+
+Entries expire ttl seconds after they were cached, and when the cache has
+more than max_entries entries, the least recently used are evicted.
+
+The cache is a vcon.filter_plugins.impl.cache_store store: an SQLite
+database (a file name ending in .db, .sqlite or .sqlite3), a Redis URL
+(e.g. the Redis of py_vcon_server, shared by its workers) or a directory
+with a JSON file per response.  The cache methods block, so plugins call
+them with run_blocking.  The hits, misses and evictions of each cache are
+counted (see stats).
+
+Example:
+  cache = open_cache("/var/cache/vcon/openai.db", ttl = 86400.0, max_entries = 10000)
+  key = response_key("gpt-4", prompt, 0.0, 100, messages)
+  response = cache.get(key)
+  if(response is None):
+    response = complete(messages)
+    cache.set(key, response)
+"""
+import json
+import typing
+import hashlib
+import vcon
+import vcon.filter_plugins.impl.cache_store
+
+
+def response_key(
+    model: str,
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    content: typing.Any
+  ) -> str:
+  """
+  Cache key of a response.
+
+  Parameters:
+    model (str) - name of the model
+    prompt (str) - prompt the model was given
+    temperature (float) - sampling temperature
+    max_tokens (int) - maximum tokens of output
+    content - JSON serializable request content (e.g. the text or chat messages)
+  """
+  content_hash = hashlib.sha256(json.dumps(content, sort_keys = True).encode("utf-8")).hexdigest()
+  return(hashlib.sha256(json.dumps(
+    [model, prompt, temperature, max_tokens, content_hash]
+    ).encode("utf-8")).hexdigest())
+
+
+def open_cache(
+    location: typing.Union[str, None],
+    ttl: float = 0.0,
+    max_entries: int = 0
+  ) -> typing.Union[vcon.filter_plugins.impl.cache_store.CacheStore, None]:
+  """
+  Get the response cache at the location, shared by all plugins using it.
+
+  Parameters:
+    location (str) - SQLite database file name (ending in .db, .sqlite or .sqlite3),
+      Redis URL (redis://...) or directory name.  None or "" for no cache.
+    ttl (float) - seconds after which an entry expires, 0 for never
+    max_entries (int) - maximum number of entries, 0 for no limit
+
+  Returns:
+    the CacheStore or None
+  """
+  return(vcon.filter_plugins.impl.cache_store.open_store(location, "responses", ttl, max_entries))
@@ -0,0 +1,86 @@
+"""
+Persistent cache of transcription results keyed by recording content.
+
+The same recording is often transcribed more than once (e.g. re-ingested
+vCons, forwarded calls, duplicate uploads).  Transcription plugins look up
+the transcript of a recording by:
+
+  * the SHA-512 hash of the recording (the dialog's SHA-512 signature when
+    it has one, so an external recording need not be fetched to look it up)
+  * the plugin name (e.g. "whisper")
+  * a hash of the model and options which change the transcript
+
+The cache is a vcon.filter_plugins.impl.cache_store store: an SQLite
+database (a file name ending in .db, .sqlite or .sqlite3), a Redis URL or a
+directory with a JSON file per transcript.  All can be shared by several
+processes.  The cache methods block, so plugins call them with run_blocking.
+
+Example:
+  cache = open_cache("/var/cache/vcon/transcripts.db")
+  content_hash, body = await dialog_content_hash(a_vcon, dialog_index)
+  key = transcript_key(content_hash, "whisper", options_hash({"model_size": "base", "language": "en"}))
+  transcript = cache.get(key)
+  if(transcript is None):
+    transcript = transcribe(body)
+    cache.set(key, transcript)
+"""
+import json
+import typing
+import hashlib
+import vcon
+import vcon.security
+import vcon.filter_plugins.impl.cache_store
+
+
+def options_hash(options: typing.Dict[str, typing.Any]) -> str:
+  """ Hash of the model and options which change the transcript """
+  return(hashlib.sha256(json.dumps(options, sort_keys = True, default = str).encode("utf-8")).hexdigest())
+
+
+def transcript_key(content_hash: str, plugin: str, options: str) -> str:
+  """
+  Cache key of a transcript.
+
+  Parameters:
+    content_hash (str) - SHA-512 hash of the recording
+    plugin (str) - name of the transcribing plugin
+    options (str) - options_hash of the model and options
+  """
+  # base64url content hash and hex options hash are safe file names
+  return("{}/{}/{}".format(plugin, options, content_hash))
+
+
+async def dialog_content_hash(
+    in_vcon: vcon.Vcon,
+    dialog_index: int
+  ) -> typing.Tuple[str, typing.Union[bytes, None]]:
+  """
+  SHA-512 hash (base64url, as in the dialog signature) of the dialog's recording.
+
+  Returns:
+    (hash, None) if taken from the dialog's SHA-512 signature or (hash, body)
+    if the body had to be fetched or decoded to hash it.
+  """
+  dialog = in_vcon.dialog[dialog_index]
+  signature = dialog.get("signature", None)
+  if(dialog.get("alg", None) == "SHA-512" and isinstance(signature, str) and signature != ""):
+    return((signature, None))
+
+  body = await in_vcon.get_dialog_body(dialog_index)
+  if(isinstance(body, str)):
+    body = body.encode("utf-8")
+  return((vcon.security.sha_512_hash(body), body))
+
+
+def open_cache(location: typing.Union[str, None]) -> typing.Union[vcon.filter_plugins.impl.cache_store.CacheStore, None]:
+  """
+  Get the transcript cache at the location, shared by all plugins using it.
+
+  Parameters:
+    location (str) - SQLite database file name (ending in .db, .sqlite or .sqlite3),
+      Redis URL (redis://...) or directory name.  None or "" for no cache.
+
+  Returns:
+    the CacheStore or None
+  """
+  return(vcon.filter_plugins.impl.cache_store.open_store(location, "transcripts"))
@@ -1,13 +1,27 @@
 import os
 import sys
 import typing
-import tempfile
+import asyncio
+import itertools
+import threading
+import functools
 import contextlib
 import pydantic
+import numpy
 import vcon
+import vcon.audio
+import vcon.concurrency
 import vcon.filter_plugins
+import vcon.logging_utils
+import vcon.filter_plugins.impl.model_pool
+import vcon.filter_plugins.impl.worker_pool
+import vcon.filter_plugins.impl.whisper_batch
+import vcon.filter_plugins.impl.whisper_chunks
+import vcon.filter_plugins.impl.whisper_subtitles
+import vcon.filter_plugins.impl.transcript_cache
 
 logger = vcon.build_logger(__name__)
+_dialog_log_sampler = vcon.logging_utils.LogSampler(logger)
 
 try:
   import stable_whisper
@@ -17,8 +31,124 @@ except Exception as e:
   logger.info("please install stable_whisper:  \"pip3 install stable-ts\"")
   raise e
 
+import torch
 
-class WhisperInitOptions(vcon.filter_plugins.FilterPluginInitOptions, title = "Whisper **FilterPlugin** intialization object"):
+# Megabytes of memory the loaded whisper models may use, unset or 0 for no limit
+MODEL_MEMORY_ENV = "VCON_WHISPER_MODEL_MEMORY_MB"
+
+# Maximum worker processes started to transcribe the chunks of long recordings
+# when worker_processes is 0.  Each loads its own copy of the model.
+MAX_CHUNK_WORKERS = 4
+
+
+def _load_model(model_size: str) -> torch.nn.Module:
+  logger.info("Loading whisper model size: %s", model_size)
+  return(stable_whisper.load_model(model_size))
+
+
+def _model_memory(model: torch.nn.Module) -> int:
+  """ bytes used by the model's parameters and buffers """
+  return(sum(tensor.numel() * tensor.element_size() for tensor in itertools.chain(model.parameters(), model.buffers())))
+
+
+def _unload_model(model: torch.nn.Module) -> None:
+  if(torch.cuda.is_available()):
+    torch.cuda.empty_cache()
+
+
+# whisper models shared by all Whisper plugin registrations, keyed by model size
+model_pool = vcon.filter_plugins.impl.model_pool.ModelPool(
+  _load_model,
+  _model_memory,
+  int(float(os.getenv(MODEL_MEMORY_ENV, "0") or "0") * 1024 * 1024),
+  _unload_model
+  )
+
+
+def _transcribe_samples(
+    samples: numpy.ndarray,
+    model_size: str,
+    whisper_options: typing.Dict[str, typing.Any]
+  ) -> typing.Dict[str, typing.Any]:
+  """ Blocking transcription of the 16 kHz mono float32 samples """
+  # whisper installs per call hooks on the model, so the pool gives
+  # one thread at a time use of it.
+  # whisper has some print statements that we want to go to stderr
+  with model_pool.use(model_size) as model, _stdout_to_stderr():
+    # ts_num=7 is num of timestamps to get, so 7 is more than the default of 5
+    # stab=True  is disable stabilization so you can do it later with different settings
+    #transcript = model.transcribe(samples, ts_num=7, stab=False)
+    return(model.transcribe(samples, **whisper_options))
+    # dict_keys(['text', 'segments', 'language'])
+
+
+def _transcribe_recordings(
+    recordings: typing.List[numpy.ndarray],
+    model_size: str,
+    language: typing.Union[str, None]
+  ) -> typing.List[typing.Dict[str, typing.Any]]:
+  """ Blocking batch transcription of short recordings """
+  with model_pool.use(model_size) as model, _stdout_to_stderr():
+    return(vcon.filter_plugins.impl.whisper_batch.transcribe_batch(model, recordings, language))
+
+
+def _worker_init(model_size: str) -> None:
+  """ Load the model when a worker process starts, rather than on its first transcription """
+  with model_pool.use(model_size):
+    pass
+
+
+def _worker_transcribe(
+    arrays: typing.List[numpy.ndarray],
+    model_size: str,
+    whisper_options: typing.Dict[str, typing.Any]
+  ) -> typing.Dict[str, typing.Any]:
+  """ Run in a worker process, arrays is the shared memory samples """
+  return(_transcribe_samples(arrays[0], model_size, whisper_options))
+
+
+# contextlib.redirect_stdout swaps the process wide sys.stdout, so overlapping
+# redirects from concurrently transcribed dialogs must share one swap.
+_stdout_redirect_lock = threading.Lock()
+_stdout_redirect_count = 0
+_stdout_saved = None
+
+
+@contextlib.contextmanager
+def _stdout_to_stderr():
+  """ Redirect stdout to stderr, safe to nest and overlap across threads and tasks """
+  global _stdout_redirect_count, _stdout_saved
+  with _stdout_redirect_lock:
+    if(_stdout_redirect_count == 0):
+      _stdout_saved = sys.stdout
+      sys.stdout = sys.stderr
+    _stdout_redirect_count += 1
+  try:
+    yield
+  finally:
+    with _stdout_redirect_lock:
+      _stdout_redirect_count -= 1
+      if(_stdout_redirect_count == 0):
+        sys.stdout = _stdout_saved
+        _stdout_saved = None
+
+
+def _word_srt(transcript: dict) -> str:
+  """ Get the SRT text with a subtitle per word of the transcript """
+  # stable_whisper has some print statements that we want to go to stderr
+  with _stdout_to_stderr():
+    segment_words = stable_whisper.finalize_segment_word_ts(transcript, strip = False)
+  return(vcon.filter_plugins.impl.whisper_subtitles.word_srt(segment_words))
+
+
+def _sentence_word_ass(transcript: dict) -> str:
+  """ Get the ASS text of the transcript phrases with the current word highlighted """
+  with _stdout_to_stderr():
+    phrase_words = stable_whisper.finalize_segment_word_ts(transcript, strip = True, ass_format = True)
+  return(vcon.filter_plugins.impl.whisper_subtitles.sentence_word_ass(phrase_words))
+
+
+class WhisperInitOptions(vcon.filter_plugins.TranscribeInitOptions, title = "Whisper **FilterPlugin** intialization object"):
   """
   A **WhisperInitOptions** object is provided to the
   **Whisper FilterPlugin.__init__** method when it is first loaded.  Its
@@ -34,6 +164,44 @@ https://github.com/openai/whisper#available-models-and-languages
     examples = [ "tiny", "base" ]
     )
 
+  batch_size: int = pydantic.Field(
+    title = "maximum number of recordings in a batched transcription",
+    description = """
+Maximum number of short recordings transcribed together in one pass through
+the model, when the **batched** option is set on **filter**.  Larger batches use more
+memory.
+""",
+    default = 16,
+    ge = 1,
+    examples = [ 8, 16, 32 ]
+    )
+
+  batch_wait: float = pydantic.Field(
+    title = "seconds to wait for a batch to fill",
+    description = """
+When the **batched** option is set, recordings from concurrent **filter** calls
+(e.g. several **Vcon**s processed at the same time by the server) are
+collected for up to this many seconds to fill a batch.
+""",
+    default = 0.05,
+    ge = 0.0,
+    examples = [ 0.05, 0.5 ]
+    )
+
+  worker_processes: int = pydantic.Field(
+    title = "number of worker processes running the model",
+    description = """
+Number of worker processes, each with its own copy of the model loaded when it
+starts, in which transcription is run.  The decoded recordings are passed to the
+workers in shared memory.  Transcription in the workers does not slow down the
+handling of requests in the process calling **filter** (e.g. the server).
+0 transcribes in threads of the calling process.
+""",
+    default = 0,
+    ge = 0,
+    examples = [ 0, 2, 4 ]
+    )
+
 
 class WhisperOptions(vcon.filter_plugins.TranscribeOptions):
   """
@@ -52,12 +220,43 @@ List of output types to generate.  Current set of value supported are:
     default = ["vendor", "word_srt", "word_ass"]
     )
 
+  batched: bool = pydantic.Field(
+    title = "batch short recordings together",
+    description = """
+Transcribe recordings of up to 30 seconds in batches with the recordings
+from the other **dialog**s and concurrent **filter** calls, rather than one at a time.
+Batched transcripts are in whisper's format with word timing in the "words"
+of each segment (if supported by the installed whisper version).
+Only the "vendor" output type is batched.  Recordings needing "word_srt" or
+"word_ass" output, which require stable_whisper's word timestamps, or longer
+recordings are transcribed one at a time.
+""",
+    default = False,
+    examples = [ False, True ]
+    )
+
+  chunk_seconds: float = pydantic.Field(
+    title = "split long recordings into chunks of up to this many seconds",
+    description = """
+Recordings longer than this many seconds are split at silences into chunks of
+at most this length.  The chunks are transcribed in parallel by the **worker_processes**,
+or if there are none, by up to 4 worker processes (one per core, each with its own
+copy of the model) started on first use.  The chunk transcripts are
+joined into one transcript, with the segment and word times offset from the start
+of the recording.  0 transcribes each recording in one pass.
+""",
+    default = 0.0,
+    ge = 0.0,
+    examples = [ 0.0, 300.0, 600.0 ]
+    )
+
 
 class Whisper(vcon.filter_plugins.FilterPlugin):
   """
   **FilterPlugin** to generate transcriptions for a **Vcon**
   """
   init_options_type = WhisperInitOptions
+  options_type = WhisperOptions
   supported_options = [ "language" ]
   _supported_media = [
     vcon.Vcon.MIMETYPE_AUDIO_WAV,
@@ -80,9 +279,34 @@ class Whisper(vcon.filter_plugins.FilterPlugin):
       )
     # make model size configurable
     self.whisper_model_size = init_options.model_size
-    logger.info("Initializing whisper model size: {}".format(self.whisper_model_size))
-    self.whisper_model = stable_whisper.load_model(self.whisper_model_size)
-    #stable_whisper.modify_model(self.whisper_model)
+    # The model is loaded from model_pool on first use and shared with
+    # other registrations using the same model size.
+    logger.info("Initializing whisper model size: %s", self.whisper_model_size)
+    self._batcher = vcon.concurrency.Batcher(
+      self._run_batch,
+      init_options.batch_size,
+      init_options.batch_wait
+      )
+    self._transcript_cache = vcon.filter_plugins.impl.transcript_cache.open_cache(init_options.transcript_cache)
+    self._workers = None
+    if(init_options.worker_processes > 0):
+      logger.info("Starting %d whisper worker processes", init_options.worker_processes)
+      self._workers = vcon.filter_plugins.impl.worker_pool.WorkerPool(
+        init_options.worker_processes,
+        _worker_init,
+        (self.whisper_model_size, )
+        )
+    # started on first use if chunk_seconds is set and there are no worker processes
+    self._chunk_workers = None
+    self._chunk_workers_lock = threading.Lock()
+    self._chunk_workers_warned = False
+
+  def __del__(self):
+    """ Stop the worker processes """
+    for workers in (getattr(self, "_workers", None), getattr(self, "_chunk_workers", None)):
+      if(workers is not None):
+        workers.shutdown(wait = False)
+    super().__del__()
 
   async def filter(
     self,
@@ -111,7 +335,7 @@ class Whisper(vcon.filter_plugins.FilterPlugin):
     output_types = options.output_types
     if(output_types is None or len(output_types) == 0):
       output_types = ["vendor", "word_srt", "word_ass"]
-    logger.info("whisper output_types: {}".format(output_types))
+    logger.debug("whisper output_types: %s", output_types)
 
     if(in_vcon.dialog is None):
       return(out_vcon)
@@ -122,140 +346,286 @@ class Whisper(vcon.filter_plugins.FilterPlugin):
       "WhisperOptions.input_dialogs"
       )
 
-    for dialog_index in dialog_indices:
-      dialog = in_vcon.dialog[dialog_index]
-      #print("dialog keys: {}".format(dialog.keys()))
-      if(dialog["type"] == "recording"):
-        # we have not already created a whisper transcript
-        wwt_index = in_vcon.find_transcript_for_dialog(
-          dialog_index,
-          True,
-          [
-            ("whisper", "", "whisper_word_timestamps"), # old mislabeled
-            ("openai", "whisper", "whisper_word_timestamps")
-          ]
-          )
-        wws_index = in_vcon.find_transcript_for_dialog(
-          dialog_index,
-          True,
-          [
-            ("whisper", "", "whisper_word_srt"), # old mislabeled
-            ("openai", "whisper", "whisper_word_srt")
-          ]
-          )
-        wwa_index = in_vcon.find_transcript_for_dialog(
-          dialog_index,
-          True,
-          [
-            ("whisper", "", "whisper_word_ass"), # old mislabeled
-            ("openai", "whisper", "whisper_word_ass")
-          ]
-          )
-        mime_type = dialog["mimetype"]
-        logger.debug("found: wtt: {} wws: {} wwa: {}".format(wwt_index, wws_index, wwa_index))
-        # if requesting transcript type that does not exist already
-        if(((wwt_index is None and "vendor" in output_types) or
-          (wws_index is None and "word_srt" in output_types) or
-          (wwa_index is None and "word_ass" in output_types)) and
-          mime_type in self._supported_media
-          ):
-
-          body_bytes = await in_vcon.get_dialog_body(dialog_index)
-          if(body_bytes is not None and len(body_bytes)):
-            with tempfile.TemporaryDirectory() as temp_dir:
-              transcript = None
-              suffix = vcon.Vcon.get_mime_extension(mime_type)
-              with tempfile.NamedTemporaryFile(prefix= temp_dir + os.sep, suffix = suffix) as temp_audio_file:
-                temp_audio_file.write(body_bytes)
-                #rate, samples = scipy.io.wavfile.read(body_io)
-                # ts_num=7 is num of timestamps to get, so 7 is more than the default of 5
-                # stab=True  is disable stabilization so you can do it later with different settings
-                #transcript = self.whisper_model.transcribe(samples, ts_num=7, stab=False)
-
-                # whisper has some print statements that we want to go to stderr
-
-                model = self.whisper_model
-
-                with contextlib.redirect_stdout(sys.stderr):
-
-                  # loading a different model is expensive.  Its better to register
-                  # multiple instance of whisper plugin with different names and models.
-                  if(hasattr(options, "model_size")):
-                    logger.warning(
-                      "Ignoring whisper options attribute: model_size: {}, model size must be set in whipser initialization.  Using model size: {}".format(
-
-                      options.model_size,
-                      self.whisper_model_size
-                      ))
-
-                  whisper_options = {}
-                  for field_value in options:
-                    key = field_value[0]
-                    if(key in self.supported_options):
-                      whisper_options[key] = field_value[1]
-                  logger.debug("providing whisper options: {}".format(whisper_options))
-
-                  transcript = model.transcribe(temp_audio_file.name, **whisper_options)
-                  # dict_keys(['text', 'segments', 'language'])
-              # aggressive allows more variation
-              #stabilized_segments = stable_whisper.stabilize_timestamps(transcript["segments"], aggressive=True)
-              #transcript["segments"] = stabilized_segments
-              # stable_segments = stable_whisper.stabilize_timestamps(transcript, top_focus=True)
-              # transcript["stable_segments"] = stable_segments
-
-              # need to add transcription to dialog.analysis
-              # if time stamp transcript does not already exist and requested
-              analysis_extras = {
-                "product": "whisper"
-              }
-              if(wwt_index is None and "vendor" in output_types):
-                out_vcon.add_analysis_transcript(
-                  dialog_index,
-                  transcript,
-                  "openai",
-                  "whisper_word_timestamps",
-                  **analysis_extras
-                  )
-
-              # if srt does not already exist and requested
-              if(wws_index is None and "word_srt" in output_types):
-                with tempfile.NamedTemporaryFile(prefix= temp_dir + os.sep, suffix=".srt") as temp_srt_file:
-                  # stable_whisper has some print statements that we want to go to stderr
-                  with contextlib.redirect_stdout(sys.stderr):
-                    stable_whisper.results_to_word_srt(transcript, temp_srt_file.name)
-                  srt_bytes = temp_srt_file.read()
-                  # TODO: should body be json.loads'd
-                  out_vcon.add_analysis_transcript(
-                    dialog_index,
-                    srt_bytes.decode("utf-8"),
-                    "openai",
-                    "whisper_word_srt",
-                    encoding = "none",
-                    **analysis_extras
-                    )
-
-              # if ass does not already exist and requested
-              if(wwa_index is None and "word_ass" in output_types):
-                # Getting junk on stdout from stable_whisper.  Redirect it.
-                with contextlib.redirect_stdout(sys.stderr):
-                  with tempfile.NamedTemporaryFile(prefix= temp_dir + os.sep, suffix=".ass") as temp_ass_file:
-                    stable_whisper.results_to_sentence_word_ass(transcript, temp_ass_file.name)
-                    ass_bytes = temp_ass_file.read()
-                    # TODO: should body be json.loads'd
-                    out_vcon.add_analysis_transcript(
-                      dialog_index,
-                      ass_bytes.decode("utf-8"),
-                      "openai",
-                      "whisper_word_ass",
-                      encoding = "none",
-                      **analysis_extras
-                      )
-
-          else:
-            pass # ignore??
-
-        else:
-          logger.warning("unsupported media type: {} in dialog[{}], skipped whisper transcription".format(dialog["mimetype"], dialog_index))
+    # loading a different model is expensive.  Its better to register
+    # multiple instance of whisper plugin with different names and models.
+    if(hasattr(options, "model_size")):
+      logger.warning(
+        "Ignoring whisper options attribute: model_size: {}, model size must be set in whipser initialization.  Using model size: {}".format(
+
+        options.model_size,
+        self.whisper_model_size
+        ))
+
+    whisper_options = {}
+    for field_value in options:
+      key = field_value[0]
+      if(key in self.supported_options):
+        whisper_options[key] = field_value[1]
+    logger.debug("providing whisper options: %s", whisper_options)
+
+    # Getting and writing the recording and generating the srt and ass of
+    # one dialog overlap with the model running on another.  The
+    # transcripts are added in dialog order.
+    max_concurrency = options.max_concurrent_dialogs
+    if(options.batched):
+      # all of the dialogs are submitted so that they can be in the same batch
+      max_concurrency = max(max_concurrency, len(dialog_indices))
+    await self.filter_dialogs(
+      out_vcon,
+      dialog_indices,
+      functools.partial(
+        self._transcribe_dialog,
+        output_types = output_types,
+        whisper_options = whisper_options,
+        batched = options.batched,
+        chunk_seconds = options.chunk_seconds
+        ),
+      max_concurrency
+      )
 
     return(out_vcon)
 
+
+  def _run_model(
+    self,
+    samples: numpy.ndarray,
+    whisper_options: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+    """ Blocking transcription of the 16 kHz mono float32 samples, run in the executor """
+    return(_transcribe_samples(samples, self.whisper_model_size, whisper_options))
+
+
+  async def _transcribe(
+    self,
+    samples: numpy.ndarray,
+    whisper_options: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+    """ Transcribe in a worker process if configured, otherwise in the executor """
+    if(self._workers is not None):
+      return(await self._workers.run(_worker_transcribe, [samples], self.whisper_model_size, whisper_options))
+    return(await self.run_blocking(self._run_model, samples, whisper_options))
+
+
+  def _get_chunk_workers(self) -> typing.Union[vcon.filter_plugins.impl.worker_pool.WorkerPool, None]:
+    """
+    Get the worker processes to transcribe the chunks of long recordings:
+    the **worker_processes** if configured, otherwise a pool of up to
+    MAX_CHUNK_WORKERS processes, one per core, started on first use.
+
+    Returns:
+      the WorkerPool or None if there is only one core
+    """
+    if(self._workers is not None):
+      return(self._workers)
+
+    with self._chunk_workers_lock:
+      if(self._chunk_workers is None):
+        processes = min(os.cpu_count() or 1, MAX_CHUNK_WORKERS)
+        if(processes < 2):
+          if(not self._chunk_workers_warned):
+            logger.warning("whisper chunk_seconds is set but there is only one core, chunks are transcribed one at a time")
+            self._chunk_workers_warned = True
+          return(None)
+        logger.info("Starting %d whisper worker processes to transcribe chunks", processes)
+        self._chunk_workers = vcon.filter_plugins.impl.worker_pool.WorkerPool(
+          processes,
+          _worker_init,
+          (self.whisper_model_size, )
+          )
+    return(self._chunk_workers)
+
+
+  async def _transcribe_chunks(
+    self,
+    samples: numpy.ndarray,
+    whisper_options: typing.Dict[str, typing.Any],
+    chunk_seconds: float
+    ) -> typing.Dict[str, typing.Any]:
+    """ Transcribe a long recording split at silences, in parallel in worker processes """
+    chunks = await self.run_blocking(vcon.audio.split_on_silence, samples, chunk_seconds)
+    logger.debug("whisper transcribing %d second recording in %d chunks",
+      len(samples) // vcon.audio.SAMPLE_RATE, len(chunks))
+    workers = self._get_chunk_workers()
+    # the in process model is used by one thread at a time
+    parallel = asyncio.Semaphore(1 if workers is None else workers.processes)
+
+    async def transcribe_chunk(start: int, end: int) -> typing.Dict[str, typing.Any]:
+      async with parallel:
+        if(workers is None):
+          return(await self.run_blocking(self._run_model, samples[start:end], whisper_options))
+        return(await workers.run(_worker_transcribe, [samples[start:end]], self.whisper_model_size, whisper_options))
+
+    transcripts = await asyncio.gather(*[transcribe_chunk(start, end) for start, end in chunks])
+    return(vcon.filter_plugins.impl.whisper_chunks.stitch_transcripts(
+      transcripts,
+      [start / vcon.audio.SAMPLE_RATE for start, end in chunks]
+      ))
+
+
+  def _transcribe_batch(
+    self,
+    recordings: typing.List[numpy.ndarray],
+    language: typing.Union[str, None]
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+    """ Blocking batch transcription, run in the executor """
+    return(_transcribe_recordings(recordings, self.whisper_model_size, language))
+
+
+  async def _run_batch(
+    self,
+    language: typing.Union[str, None],
+    recordings: typing.List[numpy.ndarray]
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+    """ Batch function for the batcher, batches are keyed by language """
+    logger.debug("whisper transcribing batch of: %d recordings", len(recordings))
+    if(self._workers is not None):
+      return(await self._workers.run(_transcribe_recordings, recordings, self.whisper_model_size, language))
+    return(await self.run_blocking(self._transcribe_batch, recordings, language))
+
+
+  async def _transcribe_dialog(
+    self,
+    in_vcon: vcon.Vcon,
+    dialog_index: int,
+    buffer: vcon.concurrency.AnalysisBuffer,
+    output_types: typing.List[str],
+    whisper_options: typing.Dict[str, typing.Any],
+    batched: bool = False,
+    chunk_seconds: float = 0.0
+    ) -> None:
+    """ Transcribe one recording dialog, adding the requested transcripts to the buffer """
+    dialog = in_vcon.dialog[dialog_index]
+    #print("dialog keys: {}".format(dialog.keys()))
+    if(dialog["type"] != "recording"):
+      return
+
+    # we have not already created a whisper transcript
+    wwt_index = in_vcon.find_transcript_for_dialog(
+      dialog_index,
+      True,
+      [
+        ("whisper", "", "whisper_word_timestamps"), # old mislabeled
+        ("openai", "whisper", "whisper_word_timestamps")
+      ]
+      )
+    wws_index = in_vcon.find_transcript_for_dialog(
+      dialog_index,
+      True,
+      [
+        ("whisper", "", "whisper_word_srt"), # old mislabeled
+        ("openai", "whisper", "whisper_word_srt")
+      ]
+      )
+    wwa_index = in_vcon.find_transcript_for_dialog(
+      dialog_index,
+      True,
+      [
+        ("whisper", "", "whisper_word_ass"), # old mislabeled
+        ("openai", "whisper", "whisper_word_ass")
+      ]
+      )
+    mime_type = dialog["mimetype"]
+    _dialog_log_sampler.debug("found: wtt: %s wws: %s wwa: %s", wwt_index, wws_index, wwa_index)
+    if(mime_type not in self._supported_media):
+      logger.warning("unsupported media type: {} in dialog[{}], skipped whisper transcription".format(dialog["mimetype"], dialog_index))
+      return
+
+    # if requesting transcript type that does not exist already
+    if(not ((wwt_index is None and "vendor" in output_types) or
+      (wws_index is None and "word_srt" in output_types) or
+      (wwa_index is None and "word_ass" in output_types))
+      ):
+      return
+
+    # batched transcripts lack the stable_whisper word timestamps srt and ass are made from
+    batchable = (batched and
+      (wws_index is not None or "word_srt" not in output_types) and
+      (wwa_index is not None or "word_ass" not in output_types))
+
+    transcript = None
+    body_bytes = None
+    cache_key = None
+    transcript_cache = self._transcript_cache
+    if(transcript_cache is not None):
+      content_hash, body_bytes = await vcon.filter_plugins.impl.transcript_cache.dialog_content_hash(
+        in_vcon,
+        dialog_index
+        )
+      cache_key = vcon.filter_plugins.impl.transcript_cache.transcript_key(
+        content_hash,
+        "whisper",
+        vcon.filter_plugins.impl.transcript_cache.options_hash({
+          "model_size": self.whisper_model_size,
+          "whisper_options": whisper_options,
+          "batched": batchable,
+          "chunk_seconds": chunk_seconds
+          })
+        )
+      transcript = await self.run_blocking(transcript_cache.get, cache_key)
+
+    if(transcript is None):
+      if(body_bytes is None):
+        body_bytes = await in_vcon.get_dialog_body(dialog_index)
+      if(body_bytes is None or len(body_bytes) == 0):
+        return # ignore??
+
+      # decoded in memory to the PCM samples whisper uses, rather than
+      # written to a file for whisper to read and decode with ffmpeg
+      samples = await self.run_blocking(vcon.audio.decode_pcm, body_bytes, mime_type)
+      if(chunk_seconds > 0 and len(samples) > chunk_seconds * vcon.audio.SAMPLE_RATE):
+        transcript = await self._transcribe_chunks(samples, whisper_options, chunk_seconds)
+      elif(batchable and
+        len(samples) <= vcon.filter_plugins.impl.whisper_batch.MAX_SECONDS * vcon.audio.SAMPLE_RATE
+        ):
+        transcript = await self._batcher.submit(samples, whisper_options.get("language", None))
+      else:
+        transcript = await self._transcribe(samples, whisper_options)
+
+      if(cache_key is not None):
+        await self.run_blocking(transcript_cache.set, cache_key, transcript)
+
+    # aggressive allows more variation
+    #stabilized_segments = stable_whisper.stabilize_timestamps(transcript["segments"], aggressive=True)
+    #transcript["segments"] = stabilized_segments
+    # stable_segments = stable_whisper.stabilize_timestamps(transcript, top_focus=True)
+    # transcript["stable_segments"] = stable_segments
+
+    # need to add transcription to dialog.analysis
+    # if time stamp transcript does not already exist and requested
+    analysis_extras = {
+      "product": "whisper"
+    }
+    if(wwt_index is None and "vendor" in output_types):
+      buffer.add_analysis_transcript(
+        dialog_index,
+        transcript,
+        "openai",
+        "whisper_word_timestamps",
+        **analysis_extras
+        )
+
+    # if srt does not already exist and requested
+    if(wws_index is None and "word_srt" in output_types):
+      srt_text = await self.run_blocking(_word_srt, transcript)
+      # TODO: should body be json.loads'd
+      buffer.add_analysis_transcript(
+        dialog_index,
+        srt_text,
+        "openai",
+        "whisper_word_srt",
+        encoding = "none",
+        **analysis_extras
+        )
+
+    # if ass does not already exist and requested
+    if(wwa_index is None and "word_ass" in output_types):
+      ass_text = await self.run_blocking(_sentence_word_ass, transcript)
+      # TODO: should body be json.loads'd
+      buffer.add_analysis_transcript(
+        dialog_index,
+        ass_text,
+        "openai",
+        "whisper_word_ass",
+        encoding = "none",
+        **analysis_extras
+        )
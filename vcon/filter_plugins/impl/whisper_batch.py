@@ -0,0 +1,228 @@
+"""
+Batched whisper transcription of short recordings.
+
+whisper's transcribe decodes one recording (one 30 second window at a
+time), leaving the batch dimension of the model unused.  transcribe_batch
+decodes the windows of many short (up to 30 second) recordings in one
+batch and splits the decoded tokens of each back into a whisper format
+transcript ({"text", "segments", "language"}), with the same temperature
+fallback as whisper's transcribe.  Word level timestamps are added to the
+segments ("words") when the installed whisper has whisper.timing.
+
+Recordings longer than MAX_SECONDS must be transcribed with the model's
+transcribe method.
+"""
+import typing
+import inspect
+import importlib
+import numpy
+import torch
+import whisper
+import whisper.audio
+import whisper.tokenizer
+import vcon
+
+logger = vcon.build_logger(__name__)
+
+# Longest recording which fits in the single window decoded per batch item
+MAX_SECONDS = whisper.audio.CHUNK_LENGTH
+
+DEFAULT_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+try:
+  _whisper_timing = importlib.import_module("whisper.timing")
+except ImportError:
+  # older whisper, no word level timestamps
+  _whisper_timing = None
+
+
+def _tokenizer(model: whisper.model.Whisper, language: typing.Union[str, None]) -> whisper.tokenizer.Tokenizer:
+  kwargs = {"language": language, "task": "transcribe"}
+  # only newer whisper versions support models with other than 99 languages
+  if("num_languages" in inspect.signature(whisper.tokenizer.get_tokenizer).parameters):
+    kwargs["num_languages"] = model.num_languages
+  return(whisper.tokenizer.get_tokenizer(model.is_multilingual, **kwargs))
+
+
+def token_segments(
+    tokens: typing.List[int],
+    timestamp_begin: int,
+    time_precision: float,
+    duration: float
+  ) -> typing.List[typing.Tuple[float, float, typing.List[int]]]:
+  """
+  Split the tokens decoded from one window into segments at consecutive
+  timestamp tokens, the same as whisper's transcribe.
+
+  Returns:
+    list of (start seconds, end seconds, tokens) for each segment
+  """
+  if(len(tokens) == 0):
+    return([])
+
+  is_timestamp = [token >= timestamp_begin for token in tokens]
+
+  def token_time(token: int) -> float:
+    return(min((token - timestamp_begin) * time_precision, duration))
+
+  consecutive = [index + 1 for index in range(len(tokens) - 1) if(is_timestamp[index] and is_timestamp[index + 1])]
+  if(len(consecutive) == 0):
+    # no consecutive timestamps, one segment ending at the last timestamp if there is one
+    end = duration
+    timestamps = [token for token in tokens if token >= timestamp_begin]
+    if(len(timestamps) > 0 and timestamps[-1] != timestamp_begin):
+      end = token_time(timestamps[-1])
+    return([(0.0, end, tokens)])
+
+  # single timestamp at the end means no speech after the last timestamp
+  if(is_timestamp[-2:] == [False, True]):
+    consecutive.append(len(tokens))
+
+  segments = []
+  last_slice = 0
+  for current_slice in consecutive:
+    sliced = tokens[last_slice:current_slice]
+    segments.append((token_time(sliced[0]), token_time(sliced[-1]), sliced))
+    last_slice = current_slice
+
+  # whisper would decode the text after the last segment again in the next
+  # window, there is no next window, so it ends with the recording.
+  if(last_slice < len(tokens)):
+    remainder = tokens[last_slice:]
+    start = token_time(remainder[0]) if is_timestamp[last_slice] else segments[-1][1]
+    segments.append((start, duration, remainder))
+
+  return(segments)
+
+
+def _needs_fallback(
+    result: whisper.DecodingResult,
+    compression_ratio_threshold: float,
+    logprob_threshold: float,
+    no_speech_threshold: float
+  ) -> bool:
+  """ same fallback criteria as whisper's transcribe """
+  if(result.no_speech_prob > no_speech_threshold and result.avg_logprob < logprob_threshold):
+    # silence
+    return(False)
+  return(result.compression_ratio > compression_ratio_threshold or
+    result.avg_logprob < logprob_threshold)
+
+
+def transcribe_batch(
+    model: whisper.model.Whisper,
+    recordings: typing.List[numpy.ndarray],
+    language: typing.Union[str, None] = None,
+    temperatures: typing.Sequence[float] = DEFAULT_TEMPERATURES,
+    compression_ratio_threshold: float = COMPRESSION_RATIO_THRESHOLD,
+    logprob_threshold: float = LOGPROB_THRESHOLD,
+    no_speech_threshold: float = NO_SPEECH_THRESHOLD
+  ) -> typing.List[typing.Dict[str, typing.Any]]:
+  """
+  Transcribe a batch of short recordings in one pass through the model.
+
+  Parameters:
+    model - whisper model
+    recordings (List[numpy.ndarray]) - 16 kHz mono float32 samples (see vcon.audio),
+      each at most MAX_SECONDS long
+    language (str) - language code, None detects the language of each recording
+    temperatures - decoding temperatures, the later ones are used for the
+      recordings that fail the compression ratio or log probability thresholds
+
+  Returns:
+    list of whisper format transcript dicts, one for each recording
+  """
+  if(len(recordings) == 0):
+    return([])
+
+  for samples in recordings:
+    if(len(samples) > whisper.audio.N_SAMPLES):
+      raise ValueError("recording length: {} seconds too long for batch, maximum: {}".format(
+        len(samples) / whisper.audio.SAMPLE_RATE, MAX_SECONDS))
+
+  fp16 = model.device.type != "cpu"
+  mel = torch.stack([
+    whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(samples)), model.dims.n_mels)
+    for samples in recordings
+    ]).to(model.device)
+
+  # Decode all at the first temperature, then only those needing fallback at the next
+  results = [None] * len(recordings)
+  remaining = list(range(len(recordings)))
+  for temperature in temperatures:
+    options = whisper.DecodingOptions(
+      task = "transcribe",
+      language = language,
+      temperature = temperature,
+      fp16 = fp16
+      )
+    decoded = whisper.decode(model, mel[remaining], options)
+    retry = []
+    for index, result in zip(remaining, decoded):
+      results[index] = result
+      if(_needs_fallback(result, compression_ratio_threshold, logprob_threshold, no_speech_threshold)):
+        retry.append(index)
+    logger.debug("whisper batch of: %d decoded: %d at temperature: %s, %d need fallback",
+      len(recordings), len(remaining), temperature, len(retry))
+    remaining = retry
+    if(len(remaining) == 0):
+      break
+
+  time_precision = whisper.audio.N_FRAMES // model.dims.n_audio_ctx * whisper.audio.HOP_LENGTH / whisper.audio.SAMPLE_RATE
+  transcripts = []
+  for index, (samples, result) in enumerate(zip(recordings, results)):
+    tokenizer = _tokenizer(model, result.language)
+    duration = len(samples) / whisper.audio.SAMPLE_RATE
+    segments = []
+    if(not (result.no_speech_prob > no_speech_threshold and result.avg_logprob < logprob_threshold)):
+      for start, end, tokens in token_segments(result.tokens, tokenizer.timestamp_begin, time_precision, duration):
+        text_tokens = [token for token in tokens if token < tokenizer.eot]
+        if(len(text_tokens) == 0):
+          continue
+        segments.append({
+          "id": len(segments),
+          "seek": 0,
+          "start": start,
+          "end": end,
+          "text": tokenizer.decode(text_tokens),
+          "tokens": tokens,
+          "temperature": result.temperature,
+          "avg_logprob": result.avg_logprob,
+          "compression_ratio": result.compression_ratio,
+          "no_speech_prob": result.no_speech_prob
+          })
+
+    if(_whisper_timing is not None and len(segments) > 0):
+      _add_word_timestamps(model, tokenizer, segments, mel[index], len(samples) // whisper.audio.HOP_LENGTH)
+
+    transcripts.append({
+      "text": "".join(segment["text"] for segment in segments),
+      "segments": segments,
+      "language": result.language
+      })
+
+  return(transcripts)
+
+
+def _add_word_timestamps(
+    model: whisper.model.Whisper,
+    tokenizer: whisper.tokenizer.Tokenizer,
+    segments: typing.List[dict],
+    mel: torch.Tensor,
+    num_frames: int
+  ) -> None:
+  """ Add "words" to the segments using whisper.timing (cross attention alignment) """
+  kwargs = {
+    "segments": segments,
+    "model": model,
+    "tokenizer": tokenizer,
+    "mel": mel,
+    "num_frames": num_frames
+    }
+  # required in newer versions of whisper
+  if("last_speech_timestamp" in inspect.signature(_whisper_timing.add_word_timestamps).parameters):
+    kwargs["last_speech_timestamp"] = 0.0
+  _whisper_timing.add_word_timestamps(**kwargs)
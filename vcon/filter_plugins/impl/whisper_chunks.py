@@ -0,0 +1,106 @@
+"""
+Stitching of whisper transcripts of the chunks of a long recording.
+
+Long recordings are split at silences (see vcon.audio.split_on_silence)
+into chunks which are transcribed in parallel.  stitch_transcripts joins
+the chunk transcripts into one transcript of the whole recording, with the
+segment and word times offset by the start of each chunk.  The times in
+whisper's (e.g. "words") and stable_whisper's (e.g. "whole_word_timestamps")
+segment fields are offset, so that the stitched transcript can be used to
+generate subtitles.
+"""
+import typing
+import numpy
+
+# whisper mel frames per second, the unit of the segment "seek"
+FRAMES_PER_SECOND = 100
+
+# keys of times, or lists of times, in seconds
+_TIME_KEYS = frozenset([
+  "start",
+  "end",
+  "offset",
+  "timestamp",
+  "timestamps",
+  "alt_start_timestamps",
+  "alt_end_timestamps",
+  "more_word_timestamps"
+  ])
+
+# keys of lists of dicts with times
+_NESTED_KEYS = frozenset([
+  "words",
+  "word_timestamps",
+  "whole_word_timestamps",
+  "unstable_word_timestamps"
+  ])
+
+
+def _offset_times(value: typing.Any, offset: float) -> typing.Any:
+  if(value is None or isinstance(value, bool)):
+    return(value)
+  if(isinstance(value, (int, float, numpy.ndarray, numpy.number))):
+    return(value + offset)
+  if(isinstance(value, (list, tuple))):
+    return([_offset_times(item, offset) for item in value])
+  # e.g. a torch tensor
+  return(value + offset)
+
+
+def _offset_dict(item: typing.Dict[str, typing.Any], offset: float) -> typing.Dict[str, typing.Any]:
+  shifted = dict(item)
+  for key, value in item.items():
+    if(key in _TIME_KEYS):
+      shifted[key] = _offset_times(value, offset)
+    elif(key in _NESTED_KEYS and value is not None):
+      shifted[key] = [_offset_dict(nested, offset) for nested in value]
+  return(shifted)
+
+
+def offset_segment(segment: typing.Dict[str, typing.Any], offset: float) -> typing.Dict[str, typing.Any]:
+  """
+  Copy of the whisper transcript segment with its times moved offset seconds later.
+  """
+  shifted = _offset_dict(segment, offset)
+  if(isinstance(segment.get("seek", None), int)):
+    shifted["seek"] = segment["seek"] + int(round(offset * FRAMES_PER_SECOND))
+  return(shifted)
+
+
+def stitch_transcripts(
+    transcripts: typing.List[typing.Dict[str, typing.Any]],
+    offsets: typing.List[float]
+  ) -> typing.Dict[str, typing.Any]:
+  """
+  Join the whisper transcripts of consecutive chunks of a recording.
+
+  Parameters:
+    transcripts (List[dict]) - whisper format transcript ({"text", "segments", "language"}) of each chunk
+    offsets (List[float]) - seconds from the start of the recording to the start of each chunk
+
+  Returns:
+    whisper format transcript of the whole recording
+  """
+  if(len(transcripts) != len(offsets)):
+    raise ValueError("{} transcripts for {} chunk offsets".format(len(transcripts), len(offsets)))
+  if(len(transcripts) == 0):
+    raise ValueError("no transcripts to stitch")
+
+  stitched = dict(transcripts[0])
+  segments = []
+  text = ""
+  for transcript, offset in zip(transcripts, offsets):
+    for segment in transcript.get("segments", []):
+      segment = offset_segment(segment, offset)
+      segment["id"] = len(segments)
+      segments.append(segment)
+
+    chunk_text = transcript.get("text", "")
+    # keep the words either side of a chunk boundary apart
+    if(len(text) > 0 and len(chunk_text) > 0 and not text[-1].isspace() and not chunk_text[0].isspace()):
+      text += " "
+    text += chunk_text
+
+  stitched["text"] = text
+  stitched["segments"] = segments
+  return(stitched)
@@ -0,0 +1,106 @@
+"""
+Formatting of the word level SRT and ASS subtitles of whisper transcripts.
+
+The stable_whisper (< 2.0) subtitle functions (results_to_word_srt and
+results_to_sentence_word_ass) always write the subtitle text to a file.
+Instead, the word timings are grouped with stable_whisper's
+finalize_segment_word_ts and formatted here, in memory, into the same text
+those functions write.
+"""
+import typing
+
+# Advanced SubStation Alpha style of stable_whisper's results_to_sentence_word_ass
+ASS_STYLE = {
+  "Name": "Default",
+  "Fontname": "Arial",
+  "Fontsize": "48",
+  "PrimaryColour": "&Hffffff",
+  "SecondaryColour": "&Hffffff",
+  "OutlineColour": "&H0",
+  "BackColour": "&H0",
+  "Bold": "0",
+  "Italic": "0",
+  "Underline": "0",
+  "StrikeOut": "0",
+  "ScaleX": "100",
+  "ScaleY": "100",
+  "Spacing": "0",
+  "Angle": "0",
+  "BorderStyle": "1",
+  "Outline": "1",
+  "Shadow": "0",
+  "Alignment": "2",
+  "MarginL": "10",
+  "MarginR": "10",
+  "MarginV": "10",
+  "Encoding": "0"
+  }
+
+ASS_HEADER = "[Script Info]\nScriptType: v4.00+\nPlayResX: 384\nPlayResY: 288\nScaledBorderAndShadow: yes\n\n" \
+  "[V4+ Styles]\nFormat: {}\nStyle: {}\n\n" \
+  "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n\n".format(
+    ", ".join(ASS_STYLE.keys()),
+    ",".join(ASS_STYLE.values())
+    )
+
+# the highlighted word is green and underlined
+ASS_WORD_PREFIX = r"{\1c&HFF00&\u1}"
+ASS_WORD_SUFFIX = r"{\r}"
+
+
+def _srt_time(seconds: float) -> str:
+  minutes, seconds = divmod(seconds, 60)
+  hours, minutes = divmod(minutes, 60)
+  return("{:0>2.0f}:{:0>2.0f}:{:0>6.3f}".format(hours, minutes, seconds).replace(".", ","))
+
+
+def _ass_time(seconds: float) -> str:
+  minutes, seconds = divmod(seconds, 60)
+  hours, minutes = divmod(minutes, 60)
+  return("{:0>1.0f}:{:0>2.0f}:{:0>2.2f}".format(hours, minutes, seconds))
+
+
+def word_srt(segment_words: typing.List[typing.Tuple[typing.List[str], typing.List[dict]]]) -> str:
+  """
+  Format the word timings as SRT text with a subtitle per word.
+
+  Parameters:
+    segment_words (List[Tuple[List[str], List[dict]]]) - for each segment, the
+      words and their times ({"start": <seconds>, "end": <seconds>}), as returned by
+      stable_whisper.finalize_segment_word_ts(transcript, strip = False)
+
+  Returns:
+    the SRT text
+  """
+  words = [(word, times) for texts, word_times in segment_words for word, times in zip(texts, word_times)]
+  return("\n".join(
+    "{}\n{} --> {}\n{}\n".format(index, _srt_time(times["start"]), _srt_time(times["end"]), word)
+    for index, (word, times) in enumerate(words, 1)
+    ))
+
+
+def _ass_dialogue(words: typing.List[str], idx: int, start: float, end: float) -> str:
+  text = "".join(
+    (word if index != idx else
+      ("{}{}{}".format(ASS_WORD_PREFIX, word, ASS_WORD_SUFFIX) if not word.startswith(" ") or word == " " else
+      " {}{}{}".format(ASS_WORD_PREFIX, word.strip(), ASS_WORD_SUFFIX)))
+    for index, word in enumerate(words)
+    )
+  return("Dialogue: 0,{},{},Default,,0,0,0,,{}".format(_ass_time(start), _ass_time(end), text.strip()))
+
+
+def sentence_word_ass(phrase_words: typing.List[dict]) -> str:
+  """
+  Format the word timings as ASS text showing each phrase with the
+  current word highlighted.
+
+  Parameters:
+    phrase_words (List[dict]) - for each word, the words of its phrase, its index
+      in the phrase and its times ({"words": [...], "idx": <index>, "start": <seconds>,
+      "end": <seconds>}), as returned by
+      stable_whisper.finalize_segment_word_ts(transcript, ass_format = True)
+
+  Returns:
+    the ASS text
+  """
+  return(ASS_HEADER + "\n".join(_ass_dialogue(**word) for word in phrase_words))
@@ -0,0 +1,174 @@
+"""
+Pool of worker processes for CPU bound filter plugin work.
+
+Model inference (e.g. whisper transcription) holds the GIL for much of
+its run, so running it in a thread of the asyncio server process still
+slows the handling of requests.  WorkerPool runs it in separate processes
+and is awaited without blocking the event loop.
+
+numpy arrays (e.g. decoded audio samples) are handed to the workers in
+multiprocessing.shared_memory blocks rather than pickled with the other
+arguments.  The worker function gets numpy views of the blocks, which are
+only valid for the duration of the call.  The other arguments and the
+return value are pickled as usual.
+
+Workers are started with the "spawn" method (forking a process with
+running threads, e.g. the asyncio server or torch, is not safe), so the
+worker functions must be importable module level functions.  The
+initializer is run once in each worker when it starts (e.g. to load a
+model).
+
+Example:
+  pool = WorkerPool(2, load_model, ("base", ))
+  transcript = await pool.run(transcribe, [samples], "en")
+"""
+import sys
+import typing
+import asyncio
+import functools
+import multiprocessing
+import multiprocessing.shared_memory
+import concurrent.futures
+import numpy
+import vcon.logging_utils
+
+logger = vcon.logging_utils.build_logger(__name__, sys.stderr)
+
+
+class SharedArray(typing.NamedTuple):
+  """ Picklable reference to a numpy array in a shared memory block """
+  name: str
+  shape: typing.Tuple[int, ...]
+  dtype: str
+
+
+def share_array(array: numpy.ndarray) -> typing.Tuple[multiprocessing.shared_memory.SharedMemory, SharedArray]:
+  """
+  Copy the array into a new shared memory block.
+
+  The caller must close and unlink the returned block when the workers
+  are done with it.
+  """
+  array = numpy.ascontiguousarray(array)
+  # zero size blocks are not allowed
+  block = multiprocessing.shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+  try:
+    numpy.ndarray(array.shape, array.dtype, buffer = block.buf)[...] = array
+  except Exception:
+    block.close()
+    block.unlink()
+    raise
+  return(block, SharedArray(block.name, array.shape, array.dtype.str))
+
+
+def _close(block: multiprocessing.shared_memory.SharedMemory) -> None:
+  try:
+    block.close()
+  except BufferError:
+    # a view of the block is still referenced (e.g. by an exception
+    # traceback), it is unmapped when garbage collected
+    logger.debug("shared memory block: %s still referenced", block.name)
+
+
+def _call_with_arrays(
+    func: typing.Callable,
+    handles: typing.List[SharedArray],
+    args: tuple,
+    kwargs: dict
+  ) -> typing.Any:
+  """ Run in the worker, calls func with views of the shared arrays """
+  blocks = []
+  try:
+    for handle in handles:
+      blocks.append(multiprocessing.shared_memory.SharedMemory(name = handle.name))
+    arrays = [numpy.ndarray(handle.shape, numpy.dtype(handle.dtype), buffer = block.buf)
+      for handle, block in zip(handles, blocks)]
+    return(func(arrays, *args, **kwargs))
+
+  finally:
+    # views must be released before the blocks can be closed
+    arrays = None
+    for block in blocks:
+      _close(block)
+
+
+class WorkerPool():
+  """ Worker processes awaited from asyncio, with shared memory array arguments """
+  def __init__(
+    self,
+    processes: int,
+    initializer: typing.Union[typing.Callable, None] = None,
+    initargs: tuple = ()
+    ):
+    """
+    Parameters:
+      processes (int) - number of worker processes
+      initializer - optional module level function run in each worker when it starts
+      initargs (tuple) - arguments for initializer
+    """
+    self.processes = processes
+    self._initializer = initializer
+    self._initargs = initargs
+    self._executor = self._new_executor()
+    # calls submitted and not yet done, cancelled on shutdown
+    self._futures: typing.Set[concurrent.futures.Future] = set()
+
+  def _new_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+    return(concurrent.futures.ProcessPoolExecutor(
+      self.processes,
+      mp_context = multiprocessing.get_context("spawn"),
+      initializer = self._initializer,
+      initargs = self._initargs
+      ))
+
+  async def run(
+    self,
+    func: typing.Callable,
+    arrays: typing.List[numpy.ndarray],
+    *args,
+    **kwargs
+    ) -> typing.Any:
+    """
+    Run func(shared_arrays, *args, **kwargs) in a worker process.
+
+    Parameters:
+      func - module level function, its first argument is the list of
+        views of the shared copies of arrays
+      arrays (List[numpy.ndarray]) - arrays passed to func in shared memory
+
+    Returns:
+      the value returned by func
+    """
+    blocks = []
+    try:
+      handles = []
+      for array in arrays:
+        block, handle = share_array(array)
+        blocks.append(block)
+        handles.append(handle)
+
+      executor = self._executor
+      try:
+        future = executor.submit(functools.partial(_call_with_arrays, func, handles, args, kwargs))
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return(await asyncio.wrap_future(future))
+
+      except concurrent.futures.process.BrokenProcessPool:
+        # a worker died (e.g. out of memory), start new workers for the next call
+        logger.error("worker process pool broken, restarting workers")
+        if(self._executor is executor):
+          self._executor = self._new_executor()
+        raise
+
+    finally:
+      for block in blocks:
+        _close(block)
+        block.unlink()
+
+  def shutdown(self, wait: bool = True) -> None:
+    """ Stop the worker processes, cancelling the calls not yet started """
+    # Executor.shutdown(cancel_futures = True) requires python 3.9
+    for future in list(self._futures):
+      future.cancel()
+    self._executor.shutdown(wait = wait)
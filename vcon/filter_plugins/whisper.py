@@ -1,22 +1,14 @@
-""" Whisper audio transcription filter plugin registration """
+"""
+Whisper transcript accessor.
+
+The whisper filter plugin and this accessor are registered in
+vcon/filter_plugins/manifest.json.  This module is only imported
+when a Whisper transcript is first accessed.
+"""
 import datetime
-import vcon.filter_plugins
+import vcon.utils
 import vcon.accessors
 
-# Register the whisper filter plugin
-init_options = {"model_size": "base"}
-
-vcon.filter_plugins.FilterPluginRegistry.register(
-  "whisper",
-  "vcon.filter_plugins.impl.whisper",
-  "Whisper",
-  "OpenAI Whisper implemented transcription of audio dialog recordings using model size: \"base\"",
-  init_options
-  )
-
-# Make this the default transcribe type filter plugin
-vcon.filter_plugins.FilterPluginRegistry.set_type_default_name("transcribe", "whisper")
-
 # Implement an accessor for the Whisper transcription format
 class WhisperTranscriptAccessor(vcon.accessors.TranscriptAccessor):
   def get_text(self):
@@ -0,0 +1,393 @@
+"""
+Resolution of group vCons into a lazily merged conversation view.
+
+The group parameter of a vCon references (by uuid) or includes (inline
+body) other vCons which are aggregated by it.  VconGroupResolver fetches
+the referenced members, in batches, using a caller provided async
+fetch_many function (e.g. py_vcon_server.db.VconStorage.get_many) and
+caches them.  VconGroupView presents the members as one conversation
+(parties, dialog timeline, analysis) without copying member data.
+
+Example:
+  resolver = vcon.group.VconGroupResolver(py_vcon_server.db.VconStorage.get_many)
+  group_view = await resolver.resolve(group_vcon)
+  for group_dialog in group_view.dialog_timeline():
+    print(group_dialog.start, group_dialog.parties, group_dialog.dialog["type"])
+"""
+import typing
+import heapq
+import asyncio
+import datetime
+import collections
+import vcon
+import vcon.view
+
+logger = vcon.build_logger(__name__)
+
+# async function taking a list of vCon UUIDs and returning a dict of UUID: vCon,
+# where the vCon is a Vcon, VconView, dict or JSON string and missing vCons are
+# None or not in the dict.
+FetchManyType = typing.Callable[[typing.List[str]], typing.Awaitable[typing.Dict[str, typing.Any]]]
+
+# Party parameters which identify the same party in different member vCons
+PARTY_IDENTITY_PARAMETERS = ("tel", "mailto")
+
+
+class GroupMemberNotFound(Exception):
+  """ Raised when a vCon referenced in a group cannot be fetched """
+
+
+class GroupDialog(typing.NamedTuple):
+  """ A dialog in the merged group timeline """
+  member_index: int
+  dialog_index: int
+  start: typing.Union[str, None]
+  # parties of the dialog as indices into VconGroupView.parties
+  parties: typing.Any
+  dialog: vcon.view.ReadOnlyDict
+
+
+class GroupAnalysis(typing.NamedTuple):
+  """ An analysis object of a group member """
+  member_index: int
+  analysis_index: int
+  # dialog of the analysis as indices into the member's dialog list
+  dialog: typing.Any
+  analysis: vcon.view.ReadOnlyDict
+
+
+def to_view(member: typing.Any) -> vcon.view.VconView:
+  """
+  Get a VconView for the given vCon in any of its forms, without copying its data.
+
+  Parameters:
+    member (Vcon, VconView, dict or str) - unsigned or verified vCon
+
+  Returns:
+    VconView of the vCon
+  """
+  if(isinstance(member, vcon.view.VconView)):
+    return(member)
+
+  if(isinstance(member, vcon.Vcon)):
+    return(member.view())
+
+  if(isinstance(member, dict)):
+    return(vcon.view.VconView.loadd(member))
+
+  if(isinstance(member, (str, bytes))):
+    return(vcon.view.VconView.loads(member))
+
+  raise AttributeError("unsupported group member vCon type: {}".format(type(member)))
+
+
+def _start_key(dialog: typing.Mapping) -> float:
+  """ epoch time of the dialog start for ordering, dialogs without a valid start sort last """
+  start = dialog.get("start", None)
+  if(not isinstance(start, str)):
+    return(float("inf"))
+  try:
+    start_time = datetime.datetime.fromisoformat(start.replace("Z", "+00:00"))
+  except ValueError:
+    return(float("inf"))
+  if(start_time.tzinfo is None):
+    start_time = start_time.replace(tzinfo = datetime.timezone.utc)
+  return(start_time.timestamp())
+
+
+def _map_parties(parties: typing.Any, party_map: typing.List[int]) -> typing.Any:
+  """ map the int, list or list of lists of party indices through the party_map """
+  if(isinstance(parties, int)):
+    if(0 <= parties < len(party_map)):
+      return(party_map[parties])
+    return(None)
+  if(isinstance(parties, typing.Sequence) and not isinstance(parties, str)):
+    return([_map_parties(party, party_map) for party in parties])
+  return(None)
+
+
+class VconGroupView():
+  """
+  Read only, lazily merged view of a group vCon and its members.
+
+  Member data is shared with the member VconViews, not copied.  The merged
+  parties are computed on first use and the dialog timeline is generated
+  as it is iterated.
+  """
+  __slots__ = ("_members", "_parties", "_party_maps")
+
+  def __init__(self, members: typing.Sequence[vcon.view.VconView]):
+    """
+    Parameters:
+      members (List[VconView]) - the group vCon followed by its members
+    """
+    self._members = tuple(members)
+    self._parties = None
+    self._party_maps = None
+
+  def __len__(self) -> int:
+    return(len(self._members))
+
+  def __repr__(self):
+    return("VconGroupView(uuids={!r})".format([member.uuid for member in self._members]))
+
+  @property
+  def members(self) -> typing.Tuple[vcon.view.VconView, ...]:
+    """ The group vCon followed by its members, in group order """
+    return(self._members)
+
+  @property
+  def uuids(self) -> typing.List[str]:
+    """ UUIDs of the group vCon and its members """
+    return([member.uuid for member in self._members])
+
+  def _merge_parties(self) -> None:
+    parties = []
+    party_maps = []
+    identities = {}
+    for member in self._members:
+      party_map = []
+      for party in (member.parties or []):
+        merged_index = None
+        party_identities = [(name, str(party[name]).lower()) for name in PARTY_IDENTITY_PARAMETERS
+          if(party.get(name, None))]
+        for identity in party_identities:
+          merged_index = identities.get(identity, None)
+          if(merged_index is not None):
+            break
+
+        if(merged_index is None):
+          merged_index = len(parties)
+          parties.append(party)
+        for identity in party_identities:
+          identities.setdefault(identity, merged_index)
+        party_map.append(merged_index)
+
+      party_maps.append(party_map)
+
+    self._parties = parties
+    self._party_maps = party_maps
+
+  @property
+  def parties(self) -> typing.List[vcon.view.ReadOnlyDict]:
+    """
+    Parties of all of the members, the same party (same tel or mailto) in
+    more than one member appears once, as the first member's party object.
+    """
+    if(self._parties is None):
+      self._merge_parties()
+    return(list(self._parties))
+
+  def party_index(self, member_index: int, party_index: int) -> int:
+    """
+    Get the index into the merged parties for a member's party.
+
+    Parameters:
+      member_index (int) - index of the member in members
+      party_index (int) - index into the member's parties
+
+    Returns:
+      int index into parties
+    """
+    if(self._party_maps is None):
+      self._merge_parties()
+    return(self._party_maps[member_index][party_index])
+
+  def dialog_timeline(self) -> typing.Iterator[GroupDialog]:
+    """
+    Iterate over the dialogs of all of the members ordered by start time.
+    Dialogs with the same start time are in member order.
+
+    Returns:
+      iterator of GroupDialog
+    """
+    if(self._party_maps is None):
+      self._merge_parties()
+
+    def member_dialogs(member_index: int, member: vcon.view.VconView):
+      dialogs = member.dialog or []
+      # Usually already in order, sorting the keys is cheap
+      start_keys = [_start_key(dialog) for dialog in dialogs]
+      for dialog_index in sorted(range(len(dialogs)), key = start_keys.__getitem__):
+        yield((start_keys[dialog_index], member_index, dialog_index, dialogs[dialog_index]))
+
+    party_maps = self._party_maps
+    for start_key, member_index, dialog_index, dialog in heapq.merge(
+      *[member_dialogs(member_index, member) for member_index, member in enumerate(self._members)],
+      key = lambda entry: entry[:3]
+      ):
+      yield(GroupDialog(member_index, dialog_index, dialog.get("start", None),
+        _map_parties(dialog.get("parties", None), party_maps[member_index]), dialog))
+
+  def analysis(self, analysis_type: typing.Union[str, None] = None) -> typing.Iterator[GroupAnalysis]:
+    """
+    Iterate over the analysis objects of all of the members in member order.
+
+    Parameters:
+      analysis_type (str) - only the analysis of this type (e.g. "transcript"), None for all
+
+    Returns:
+      iterator of GroupAnalysis
+    """
+    for member_index, member in enumerate(self._members):
+      for analysis_index, analysis in enumerate(member.analysis or []):
+        if(analysis_type is None or analysis.get("type", None) == analysis_type):
+          yield(GroupAnalysis(member_index, analysis_index, analysis.get("dialog", None), analysis))
+
+  def find_member(self, uuid: str) -> typing.Union[int, None]:
+    """ Returns the index in members of the vCon with the given UUID or None """
+    for member_index, member in enumerate(self._members):
+      if(member.uuid == uuid):
+        return(member_index)
+    return(None)
+
+
+class VconGroupResolver():
+  """
+  Resolves the members of group vCons, fetching referenced vCons in batches
+  and caching them (LRU) for subsequent resolutions.
+  """
+  def __init__(
+      self,
+      fetch_many: FetchManyType,
+      batch_size: int = 100,
+      cache_size: int = 1000,
+      max_depth: int = 8,
+      ignore_missing: bool = False
+    ):
+    """
+    Parameters:
+      fetch_many (async function) - fetches a list of vCons by UUID, see FetchManyType
+      batch_size (int) - maximum number of UUIDs per fetch_many call
+      cache_size (int) - maximum number of member vCons cached, 0 disables caching
+      max_depth (int) - maximum depth of groups of groups to resolve
+      ignore_missing (bool) - skip members which cannot be fetched rather than
+        raising GroupMemberNotFound
+    """
+    if(batch_size < 1):
+      raise AttributeError("batch_size must be >= 1")
+    self._fetch_many = fetch_many
+    self.batch_size = batch_size
+    self.cache_size = cache_size
+    self.max_depth = max_depth
+    self.ignore_missing = ignore_missing
+    self._cache = collections.OrderedDict()
+    self.cache_hits = 0
+    self.cache_misses = 0
+    self.fetch_count = 0
+
+  def clear_cache(self) -> None:
+    """ Forget all of the cached member vCons """
+    self._cache.clear()
+
+  def _cache_member(self, uuid: str, view: vcon.view.VconView) -> None:
+    if(self.cache_size <= 0):
+      return
+    self._cache[uuid] = view
+    self._cache.move_to_end(uuid)
+    while(len(self._cache) > self.cache_size):
+      self._cache.popitem(last = False)
+
+  async def _fetch_batch(self, uuids: typing.List[str]) -> typing.Dict[str, vcon.view.VconView]:
+    self.fetch_count += 1
+    fetched = await self._fetch_many(uuids)
+    views = {}
+    for uuid in uuids:
+      member = fetched.get(uuid, None)
+      if(member is not None):
+        views[uuid] = to_view(member)
+    return(views)
+
+  async def get_members(self, uuids: typing.Sequence[str]) -> typing.Dict[str, vcon.view.VconView]:
+    """
+    Get the vCons for the given UUIDs from the cache or by fetching them in batches.
+
+    Parameters:
+      uuids (List[str]) - vCon UUIDs
+
+    Returns:
+      dict of UUID: VconView, vCons which were not found are not included
+        if ignore_missing is True
+    """
+    members = {}
+    missing = []
+    for uuid in uuids:
+      if(uuid in members or uuid in missing):
+        continue
+      view = self._cache.get(uuid, None)
+      if(view is not None):
+        self._cache.move_to_end(uuid)
+        self.cache_hits += 1
+        members[uuid] = view
+      else:
+        self.cache_misses += 1
+        missing.append(uuid)
+
+    if(len(missing) > 0):
+      batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+      for fetched in await asyncio.gather(*[self._fetch_batch(batch) for batch in batches]):
+        for uuid, view in fetched.items():
+          self._cache_member(uuid, view)
+          members[uuid] = view
+
+      not_found = [uuid for uuid in missing if uuid not in members]
+      if(len(not_found) > 0):
+        if(not self.ignore_missing):
+          raise GroupMemberNotFound("group member vCon(s) not found: {}".format(not_found))
+        logger.warning("group member vCon(s) not found: %s", not_found)
+
+    return(members)
+
+  async def resolve(self, group_vcon: typing.Any) -> VconGroupView:
+    """
+    Resolve the members of the given group vCon, level by level for groups
+    of groups, with one batched fetch per level.  vCons already in the
+    group (e.g. cycles) are not added again.
+
+    Parameters:
+      group_vcon (Vcon, VconView, dict or str) - vCon with group parameter
+
+    Returns:
+      VconGroupView of the group vCon and its members
+    """
+    root = to_view(group_vcon)
+    members = [root]
+    seen = {root.uuid}
+    if(root.uuid is None):
+      seen = {id(root)}
+    level = [root]
+    depth = 0
+    while(len(level) > 0 and depth < self.max_depth):
+      depth += 1
+      # (uuid, None) for references to fetch or (None, view) for inline members
+      references = []
+      for view in level:
+        for group_object in (view.group or []):
+          if(group_object.get("body", None) is not None):
+            body = group_object["body"]
+            if(isinstance(body, vcon.view.ReadOnlyDict)):
+              body = body._data
+            references.append((None, to_view(body)))
+          elif(group_object.get("uuid", None) is not None):
+            references.append((group_object["uuid"], None))
+          else:
+            logger.warning("group object without uuid or inline body not supported: %s", dict(group_object))
+
+      fetched = await self.get_members([uuid for uuid, inline in references
+        if(uuid is not None and uuid not in seen)])
+
+      level = []
+      for uuid, view in references:
+        if(view is None):
+          view = fetched.get(uuid, None)
+        if(view is None):
+          continue
+        # inline members may not have a UUID
+        member_key = view.uuid if(view.uuid is not None) else id(view)
+        if(member_key in seen):
+          continue
+        seen.add(member_key)
+        members.append(view)
+        level.append(view)
+
+    return(VconGroupView(members))
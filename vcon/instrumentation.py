@@ -0,0 +1,304 @@
+"""
+Opt in instrumentation of the tagged (tag_meta, tag_dialog, tag_serialize, ...) Vcon methods.
+
+When enabled, each tagged Vcon method (sync or async) is replaced with a
+wrapper which records the call count, latency and payload size per method
+and tag category to one or more sinks.  When disabled, the original methods
+are restored, so there is no overhead at all.
+
+Payload size is the length of the first positional argument if it is str
+or bytes (e.g. loads, add_dialog_inline_recording), otherwise the length of
+the return value if it is str or bytes (e.g. dumps, decode_dialog_inline_body).
+
+Example:
+  registry = vcon.instrumentation.InMemoryRegistry()
+  vcon.instrumentation.enable(registry)
+  ...
+  print(registry.prometheus_text())
+  vcon.instrumentation.disable()
+"""
+import typing
+import time
+import bisect
+import inspect
+import functools
+import threading
+import vcon
+
+try:
+  import opentelemetry.trace
+
+except ImportError:
+  opentelemetry = None
+
+logger = vcon.build_logger(__name__)
+
+# Upper bounds of the histogram buckets, the last bucket is +Inf
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+
+class InstrumentationSink():
+  """ Abstract sink for instrumented Vcon method calls """
+  def record(
+    self,
+    tag: str,
+    method_name: str,
+    start_time_ns: int,
+    duration: float,
+    payload_size: typing.Union[int, None],
+    error: typing.Union[BaseException, None]
+    ) -> None:
+    """
+    Record an instrumented call.
+
+    Parameters:
+      tag (str) - tag category of the method (e.g. "serialize")
+      method_name (str) - name of the Vcon method
+      start_time_ns (int) - epoch time in nanoseconds at which the call started
+      duration (float) - duration of the call in seconds
+      payload_size (int) - size in bytes or characters of the payload or None if not applicable
+      error (BaseException) - exception raised by the method or None
+    """
+    raise Exception("not implemented")
+
+
+class Histogram():
+  """ Cumulative style histogram with fixed bucket upper bounds """
+  def __init__(self, bounds: typing.Sequence[float]):
+    self.bounds = tuple(bounds)
+    # last count is the +Inf bucket
+    self.bucket_counts = [0] * (len(self.bounds) + 1)
+    self.count = 0
+    self.sum = 0
+
+  def observe(self, value: float) -> None:
+    self.bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+    self.count += 1
+    self.sum += value
+
+  def cumulative_counts(self) -> typing.List[typing.Tuple[str, int]]:
+    """ list of (upper bound label, cumulative count) including +Inf """
+    counts = []
+    total = 0
+    for bound, bucket_count in zip(list(self.bounds) + ["+Inf"], self.bucket_counts):
+      total += bucket_count
+      counts.append((str(bound), total))
+    return(counts)
+
+
+class MethodStats():
+  """ Statistics for one instrumented method or tag category """
+  def __init__(self):
+    self.count = 0
+    self.errors = 0
+    self.latency = Histogram(LATENCY_BUCKETS)
+    self.payload = Histogram(PAYLOAD_BUCKETS)
+
+  def add(self, duration: float, payload_size: typing.Union[int, None], error: typing.Union[BaseException, None]) -> None:
+    self.count += 1
+    if(error is not None):
+      self.errors += 1
+    self.latency.observe(duration)
+    if(payload_size is not None):
+      self.payload.observe(payload_size)
+
+
+class InMemoryRegistry(InstrumentationSink):
+  """ Sink which aggregates statistics in memory, per method and per tag category """
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._methods = {}
+    self._categories = {}
+
+  def record(self, tag, method_name, start_time_ns, duration, payload_size, error) -> None:
+    with self._lock:
+      method_stats = self._methods.get((tag, method_name), None)
+      if(method_stats is None):
+        method_stats = self._methods[(tag, method_name)] = MethodStats()
+      category_stats = self._categories.get(tag, None)
+      if(category_stats is None):
+        category_stats = self._categories[tag] = MethodStats()
+
+      method_stats.add(duration, payload_size, error)
+      category_stats.add(duration, payload_size, error)
+
+  def method_stats(self) -> typing.Dict[typing.Tuple[str, str], MethodStats]:
+    """ Returns dict of (tag, method name): MethodStats """
+    with self._lock:
+      return(dict(self._methods))
+
+  def category_stats(self) -> typing.Dict[str, MethodStats]:
+    """ Returns dict of tag: MethodStats aggregated over the methods with that tag """
+    with self._lock:
+      return(dict(self._categories))
+
+  def reset(self) -> None:
+    """ Clear all of the statistics """
+    with self._lock:
+      self._methods = {}
+      self._categories = {}
+
+  def prometheus_text(self, prefix: str = "vcon") -> str:
+    """
+    Format the per method statistics in the Prometheus text exposition format.
+
+    Parameters:
+      prefix (str) - metric name prefix
+
+    Returns:
+      str containing the metrics
+    """
+    lines = []
+    metrics = sorted(self.method_stats().items())
+
+    lines.append("# HELP {}_method_calls_total Number of calls to Vcon methods".format(prefix))
+    lines.append("# TYPE {}_method_calls_total counter".format(prefix))
+    for (tag, method_name), stats in metrics:
+      lines.append('{}_method_calls_total{{tag="{}",method="{}"}} {}'.format(prefix, tag, method_name, stats.count))
+
+    lines.append("# HELP {}_method_errors_total Number of Vcon method calls which raised an exception".format(prefix))
+    lines.append("# TYPE {}_method_errors_total counter".format(prefix))
+    for (tag, method_name), stats in metrics:
+      lines.append('{}_method_errors_total{{tag="{}",method="{}"}} {}'.format(prefix, tag, method_name, stats.errors))
+
+    for metric_name, help_text, attribute in (
+      ("method_duration_seconds", "Latency of Vcon method calls", "latency"),
+      ("method_payload_bytes", "Size of the str or bytes payload of Vcon method calls", "payload")
+      ):
+      lines.append("# HELP {}_{} {}".format(prefix, metric_name, help_text))
+      lines.append("# TYPE {}_{} histogram".format(prefix, metric_name))
+      for (tag, method_name), stats in metrics:
+        histogram = getattr(stats, attribute)
+        if(histogram.count == 0):
+          continue
+        labels = 'tag="{}",method="{}"'.format(tag, method_name)
+        for bound, count in histogram.cumulative_counts():
+          lines.append('{}_{}_bucket{{{},le="{}"}} {}'.format(prefix, metric_name, labels, bound, count))
+        lines.append("{}_{}_sum{{{}}} {}".format(prefix, metric_name, labels, histogram.sum))
+        lines.append("{}_{}_count{{{}}} {}".format(prefix, metric_name, labels, histogram.count))
+
+    return("\n".join(lines) + "\n")
+
+
+class OpenTelemetrySink(InstrumentationSink):
+  """ Sink which creates an OpenTelemetry span for each instrumented call """
+  def __init__(self, tracer_provider = None):
+    """
+    Parameters:
+      tracer_provider - OpenTelemetry TracerProvider, None uses the global provider
+
+    Requires the opentelemetry-api package.
+    """
+    if(opentelemetry is None):
+      raise ImportError("OpenTelemetrySink requires the opentelemetry-api package")
+    self._tracer = opentelemetry.trace.get_tracer(__name__, tracer_provider = tracer_provider)
+
+  def record(self, tag, method_name, start_time_ns, duration, payload_size, error) -> None:
+    span = self._tracer.start_span("Vcon.{}".format(method_name), start_time = start_time_ns)
+    span.set_attribute("vcon.tag", tag)
+    if(payload_size is not None):
+      span.set_attribute("vcon.payload_size", payload_size)
+    if(error is not None):
+      span.record_exception(error)
+      span.set_status(opentelemetry.trace.Status(opentelemetry.trace.StatusCode.ERROR))
+    span.end(end_time = start_time_ns + int(duration * 1e9))
+
+
+_original_methods: typing.Dict[str, typing.Callable] = {}
+_sinks: typing.List[InstrumentationSink] = []
+
+
+def _payload_size(args: tuple, result: typing.Any) -> typing.Union[int, None]:
+  # args[0] is self
+  if(len(args) > 1 and isinstance(args[1], (str, bytes))):
+    return(len(args[1]))
+  if(isinstance(result, (str, bytes))):
+    return(len(result))
+  return(None)
+
+
+def _record(tag, method_name, start_time_ns, duration, payload_size, error) -> None:
+  for sink in _sinks:
+    try:
+      sink.record(tag, method_name, start_time_ns, duration, payload_size, error)
+
+    except Exception as sink_error:
+      # instrumentation must not break the instrumented method
+      logger.warning("instrumentation sink %s failed: %s", type(sink).__name__, sink_error)
+
+
+def _instrument(method_name: str, func: typing.Callable) -> typing.Callable:
+  tag = func._tag
+
+  if(inspect.iscoroutinefunction(func)):
+    @functools.wraps(func)
+    async def async_wrapper(*args, **kwargs):
+      start_time_ns = time.time_ns()
+      start = time.perf_counter()
+      result = None
+      error = None
+      try:
+        result = await func(*args, **kwargs)
+        return(result)
+      except BaseException as method_error:
+        error = method_error
+        raise
+      finally:
+        _record(tag, method_name, start_time_ns, time.perf_counter() - start, _payload_size(args, result), error)
+
+    return(async_wrapper)
+
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    start_time_ns = time.time_ns()
+    start = time.perf_counter()
+    result = None
+    error = None
+    try:
+      result = func(*args, **kwargs)
+      return(result)
+    except BaseException as method_error:
+      error = method_error
+      raise
+    finally:
+      _record(tag, method_name, start_time_ns, time.perf_counter() - start, _payload_size(args, result), error)
+
+  return(wrapper)
+
+
+def is_enabled() -> bool:
+  """ Returns True if the Vcon methods are instrumented """
+  return(len(_original_methods) > 0)
+
+
+def enable(*sinks: InstrumentationSink) -> None:
+  """
+  Instrument the tagged Vcon methods, recording calls to the given sinks.
+  If already enabled, the sinks replace the current sinks.
+
+  Parameters:
+    sinks (InstrumentationSink) - one or more sinks (e.g. InMemoryRegistry, OpenTelemetrySink)
+  """
+  if(len(sinks) == 0):
+    raise AttributeError("at least one InstrumentationSink is required")
+  _sinks[:] = sinks
+
+  if(is_enabled()):
+    return
+
+  for method_name, func in list(vars(vcon.Vcon).items()):
+    if(inspect.isfunction(func) and hasattr(func, "_tag")):
+      _original_methods[method_name] = func
+      setattr(vcon.Vcon, method_name, _instrument(method_name, func))
+
+  logger.info("instrumented %d Vcon methods", len(_original_methods))
+
+
+def disable() -> None:
+  """ Restore the original uninstrumented Vcon methods """
+  for method_name, func in _original_methods.items():
+    setattr(vcon.Vcon, method_name, func)
+  _original_methods.clear()
+  _sinks.clear()
+
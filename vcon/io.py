@@ -0,0 +1,433 @@
+"""
+Streaming readers and writers for files containing many vCons.
+
+Two formats are supported:
+
+  * NDJSON - one vCon JSON object (unsigned, signed or encrypted form) per line.
+  * vCon container - a length prefixed binary format with optional per record
+    compression and a trailing UUID to offset index for random access.
+
+Container layout (all integers are big endian):
+
+  file header:  CONTAINER_MAGIC (8 bytes) + format version (1 byte)
+  record:       compression (1 byte) + UUID length (1 byte) + payload length (8 bytes)
+                + UUID (ascii) + payload (possibly compressed vCon JSON)
+  index:        a record with compression INDEX_RECORD whose payload is the
+                zlib compressed JSON object {uuid: record offset}
+  trailer:      index record offset (8 bytes) + INDEX_MAGIC (8 bytes)
+
+A container that was not closed (e.g. writer crashed) has no index or trailer.
+It can still be iterated and the reader rebuilds the index by skipping
+through the record headers.
+"""
+import typing
+import io
+import bz2
+import json
+import lzma
+import zlib
+import struct
+import vcon
+import vcon.view
+
+logger = vcon.build_logger(__name__)
+
+CONTAINER_MAGIC = b"VCONPACK"
+CONTAINER_VERSION = 1
+INDEX_MAGIC = b"VCONIDX\x01"
+
+# compression name: (record code, compress, decompress)
+COMPRESSIONS = {
+  None: (0, None, None),
+  "zlib": (1, zlib.compress, zlib.decompress),
+  "lzma": (2, lzma.compress, lzma.decompress),
+  "bz2": (3, bz2.compress, bz2.decompress)
+  }
+INDEX_RECORD = 0xFF
+
+_RECORD_HEADER = struct.Struct(">BBQ")
+_TRAILER = struct.Struct(">Q8s")
+_DECOMPRESSORS = {code: decompress for code, _compress, decompress in COMPRESSIONS.values()}
+
+VconSource = typing.Union["vcon.Vcon", vcon.view.VconView, dict]
+VconResult = typing.Union["vcon.Vcon", vcon.view.VconView]
+
+
+class InvalidVconContainer(Exception):
+  """ File is not a valid vCon container or is corrupt """
+
+
+def _vcon_json_and_uuid(a_vcon: VconSource) -> typing.Tuple[str, typing.Union[str, None]]:
+  """
+  Get the compact JSON for the given vCon and its UUID if it can be read.
+  The UUID of a signed, but unverified or an encrypted Vcon cannot be read.
+  """
+  if(isinstance(a_vcon, dict)):
+    return(json.dumps(a_vcon), a_vcon.get("uuid", None))
+
+  if(isinstance(a_vcon, vcon.view.VconView)):
+    return(a_vcon.dumps(), a_vcon.uuid)
+
+  try:
+    uuid = a_vcon.uuid
+  except vcon.UnverifiedVcon:
+    uuid = None
+  return(a_vcon.dumps(), uuid)
+
+
+def _json_to_vcon(vcon_json: typing.Union[str, bytes], view: bool) -> VconResult:
+  if(view):
+    return(vcon.view.VconView.loads(vcon_json))
+
+  a_vcon = vcon.Vcon()
+  a_vcon.loads(vcon_json)
+  return(a_vcon)
+
+
+def _open(file: typing.Union[str, typing.IO], mode: str) -> typing.Tuple[typing.IO, bool]:
+  """ returns the file handle and whether we opened it """
+  if(isinstance(file, str)):
+    return(open(file, mode), True)
+  return(file, False)
+
+
+def write_ndjson(
+  vcons: typing.Iterable[VconSource],
+  file: typing.Union[str, typing.IO]
+  ) -> int:
+  """
+  Write the given vCons as NDJSON, one vCon per line.
+
+  Parameters:
+    vcons (Iterable[Union[Vcon, VconView, dict]]) - vCons to write, may be a generator
+    file (Union[str, IO]) - file name or text or binary file handle to write to
+
+  Returns:
+    number of vCons written
+  """
+  handle, opened = _open(file, "wb")
+  binary = not isinstance(handle, io.TextIOBase)
+  count = 0
+  try:
+    for a_vcon in vcons:
+      vcon_json, _uuid = _vcon_json_and_uuid(a_vcon)
+      # json.dumps escapes new lines in strings, so there are none in vcon_json
+      line = vcon_json + "\n"
+      handle.write(line.encode("utf-8") if binary else line)
+      count += 1
+
+  finally:
+    if(opened):
+      handle.close()
+
+  return(count)
+
+
+def read_ndjson(
+  file: typing.Union[str, typing.IO],
+  view: bool = False
+  ) -> typing.Iterator[VconResult]:
+  """
+  Generator which reads NDJSON one vCon at a time.
+
+  Parameters:
+    file (Union[str, IO]) - file name or text or binary file handle to read from
+    view (bool) - if True, yield read only VconView instead of Vcon.  Only
+      unsigned vCons can be viewed.
+
+  Returns:
+    iterator over Vcon or VconView objects
+  """
+  handle, opened = _open(file, "rb")
+  try:
+    for line_number, line in enumerate(handle, 1):
+      if(len(line.strip()) == 0):
+        continue
+      try:
+        yield(_json_to_vcon(line, view))
+      # vcon may use simplejson, both JSONDecodeErrors are ValueErrors
+      except ValueError as json_error:
+        raise vcon.InvalidVconJson("NDJSON line {}: {}".format(line_number, json_error)) from json_error
+
+  finally:
+    if(opened):
+      handle.close()
+
+
+class VconContainerWriter():
+  """
+  Writer for the length prefixed binary vCon container.
+
+  Use as a context manager or call close to write the UUID index and trailer.
+  """
+  def __init__(
+    self,
+    file: typing.Union[str, typing.BinaryIO],
+    compression: typing.Union[str, None] = None
+    ):
+    """
+    Parameters:
+      file (Union[str, BinaryIO]) - file name or binary file handle to write to
+      compression (str) - per record compression: None, "zlib", "lzma" or "bz2"
+    """
+    if(compression not in COMPRESSIONS):
+      raise AttributeError("compression: {} not supported.  Must be one of: {}".format(
+        compression, list(COMPRESSIONS.keys())))
+    self._compression = compression
+    self._handle, self._opened = _open(file, "wb")
+    # offsets in the index are file positions, the handle may not be at the start of the file
+    self._offset = self._handle.tell() if self._handle.seekable() else 0
+    self._index = {}
+    self._closed = False
+    self._write(CONTAINER_MAGIC + bytes([CONTAINER_VERSION]))
+
+  def _write(self, data: bytes) -> None:
+    self._handle.write(data)
+    self._offset += len(data)
+
+  def _write_record(self, code: int, uuid: bytes, payload: bytes) -> int:
+    record_offset = self._offset
+    self._write(_RECORD_HEADER.pack(code, len(uuid), len(payload)))
+    self._write(uuid)
+    self._write(payload)
+    return(record_offset)
+
+  def write(self, a_vcon: VconSource) -> int:
+    """
+    Append a vCon to the container.
+
+    Parameters:
+      a_vcon (Union[Vcon, VconView, dict]) - the vCon to append.  Signed but
+        unverified or encrypted Vcons are written, but not indexed as their
+        UUID cannot be read.
+
+    Returns:
+      offset of the record in the container
+    """
+    if(self._closed):
+      raise InvalidVconContainer("container writer is closed")
+
+    vcon_json, uuid = _vcon_json_and_uuid(a_vcon)
+    code, compress, _decompress = COMPRESSIONS[self._compression]
+    payload = vcon_json.encode("utf-8")
+    if(compress is not None):
+      payload = compress(payload)
+
+    uuid_bytes = b"" if uuid is None else uuid.encode("ascii")
+    record_offset = self._write_record(code, uuid_bytes, payload)
+    if(uuid is not None):
+      self._index[uuid] = record_offset
+
+    return(record_offset)
+
+  def write_all(self, vcons: typing.Iterable[VconSource]) -> int:
+    """ Append all of the given vCons, returns the number written """
+    count = 0
+    for a_vcon in vcons:
+      self.write(a_vcon)
+      count += 1
+    return(count)
+
+  def close(self) -> None:
+    """ Write the index and trailer and close the file if opened by this writer """
+    if(self._closed):
+      return
+    self._closed = True
+
+    index_payload = zlib.compress(json.dumps(self._index).encode("utf-8"))
+    index_offset = self._write_record(INDEX_RECORD, b"", index_payload)
+    self._write(_TRAILER.pack(index_offset, INDEX_MAGIC))
+    if(self._opened):
+      self._handle.close()
+    else:
+      self._handle.flush()
+
+  def __enter__(self):
+    return(self)
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+class VconContainerReader():
+  """
+  Reader for the length prefixed binary vCon container.
+
+  Iterating the reader streams the vCons in order and works on non-seekable
+  handles (e.g. pipes).  Random access by UUID (get) requires a seekable file.
+  """
+  def __init__(
+    self,
+    file: typing.Union[str, typing.BinaryIO],
+    view: bool = False
+    ):
+    """
+    Parameters:
+      file (Union[str, BinaryIO]) - file name or binary file handle to read from
+      view (bool) - if True, yield/get read only VconView instead of Vcon
+    """
+    self._view = view
+    self._handle, self._opened = _open(file, "rb")
+    self._index = None
+    header = self._handle.read(len(CONTAINER_MAGIC) + 1)
+    if(len(header) != len(CONTAINER_MAGIC) + 1 or header[:-1] != CONTAINER_MAGIC):
+      raise InvalidVconContainer("not a vCon container")
+    if(header[-1] != CONTAINER_VERSION):
+      raise InvalidVconContainer("vCon container version: {} not supported".format(header[-1]))
+    self._first_record_offset = self._handle.tell() if self._handle.seekable() else len(header)
+
+  def _read_exactly(self, length: int) -> bytes:
+    data = self._handle.read(length)
+    if(len(data) != length):
+      raise InvalidVconContainer("truncated vCon container record")
+    return(data)
+
+  def _read_record(self) -> typing.Union[typing.Tuple[int, str, bytes], None]:
+    """ returns (code, uuid, payload) or None at end of records """
+    header = self._handle.read(_RECORD_HEADER.size)
+    if(len(header) == 0):
+      return(None)
+    if(len(header) != _RECORD_HEADER.size):
+      raise InvalidVconContainer("truncated vCon container record header")
+
+    code, uuid_length, payload_length = _RECORD_HEADER.unpack(header)
+    uuid = self._read_exactly(uuid_length).decode("ascii")
+    payload = self._read_exactly(payload_length)
+    return(code, uuid, payload)
+
+  def _decode(self, code: int, payload: bytes) -> VconResult:
+    decompress = _DECOMPRESSORS.get(code, False)
+    if(decompress is False):
+      raise InvalidVconContainer("unknown record compression: {}".format(code))
+    if(decompress is not None):
+      payload = decompress(payload)
+    return(_json_to_vcon(payload, self._view))
+
+  def __iter__(self) -> typing.Iterator[VconResult]:
+    """ Generator over the vCons in the container in the order written """
+    seekable = self._handle.seekable()
+    # get and index move the handle, so the generator keeps its own position
+    offset = self._first_record_offset
+    while(True):
+      if(seekable):
+        self._handle.seek(offset)
+      record = self._read_record()
+      if(record is None or record[0] == INDEX_RECORD):
+        return
+      if(seekable):
+        offset = self._handle.tell()
+      yield(self._decode(record[0], record[2]))
+
+  @property
+  def index(self) -> typing.Dict[str, int]:
+    """ dict of UUID to record offset, read from the trailer or rebuilt by scanning """
+    if(self._index is None):
+      self._index = self._read_index()
+      if(self._index is None):
+        logger.warning("vCon container has no index, rebuilding it by scanning")
+        self._index = self._scan_index()
+    return(self._index)
+
+  def _read_index(self) -> typing.Union[typing.Dict[str, int], None]:
+    handle = self._handle
+    end = handle.seek(0, io.SEEK_END)
+    if(end < self._first_record_offset + _TRAILER.size):
+      return(None)
+    handle.seek(end - _TRAILER.size)
+    index_offset, magic = _TRAILER.unpack(handle.read(_TRAILER.size))
+    if(magic != INDEX_MAGIC):
+      return(None)
+    handle.seek(index_offset)
+    code, _uuid, payload = self._read_record()
+    if(code != INDEX_RECORD):
+      raise InvalidVconContainer("vCon container index offset is corrupt")
+    return(json.loads(zlib.decompress(payload)))
+
+  def _scan_index(self) -> typing.Dict[str, int]:
+    handle = self._handle
+    index = {}
+    offset = handle.seek(self._first_record_offset)
+    while(True):
+      header = handle.read(_RECORD_HEADER.size)
+      if(len(header) < _RECORD_HEADER.size):
+        break
+      code, uuid_length, payload_length = _RECORD_HEADER.unpack(header)
+      if(code == INDEX_RECORD):
+        break
+      uuid = handle.read(uuid_length).decode("ascii")
+      if(uuid_length > 0):
+        index[uuid] = offset
+      offset = handle.seek(payload_length, io.SEEK_CUR)
+    return(index)
+
+  def uuids(self) -> typing.List[str]:
+    """ Returns the UUIDs of the indexed vCons in the container """
+    return(list(self.index.keys()))
+
+  def get(self, uuid: str) -> VconResult:
+    """
+    Read the vCon with the given UUID using the index.
+
+    Parameters:
+      uuid (str) - UUID of the vCon to read
+
+    Returns:
+      Vcon or VconView
+
+    Raises:
+      KeyError if the UUID is not in the container index
+    """
+    offset = self.index[uuid]
+    self._handle.seek(offset)
+    code, _uuid, payload = self._read_record()
+    return(self._decode(code, payload))
+
+  def close(self) -> None:
+    """ Close the file if opened by this reader """
+    if(self._opened):
+      self._handle.close()
+
+  def __enter__(self):
+    return(self)
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+def write_container(
+  vcons: typing.Iterable[VconSource],
+  file: typing.Union[str, typing.BinaryIO],
+  compression: typing.Union[str, None] = None
+  ) -> int:
+  """
+  Write the given vCons to a vCon container.
+
+  Parameters:
+    vcons (Iterable[Union[Vcon, VconView, dict]]) - vCons to write, may be a generator
+    file (Union[str, BinaryIO]) - file name or binary file handle to write to
+    compression (str) - per record compression: None, "zlib", "lzma" or "bz2"
+
+  Returns:
+    number of vCons written
+  """
+  with VconContainerWriter(file, compression) as writer:
+    return(writer.write_all(vcons))
+
+
+def read_container(
+  file: typing.Union[str, typing.BinaryIO],
+  view: bool = False
+  ) -> typing.Iterator[VconResult]:
+  """
+  Generator which reads a vCon container one vCon at a time.
+
+  Parameters:
+    file (Union[str, BinaryIO]) - file name or binary file handle to read from
+    view (bool) - if True, yield read only VconView instead of Vcon
+
+  Returns:
+    iterator over Vcon or VconView objects
+  """
+  with VconContainerReader(file, view) as reader:
+    yield from reader
+
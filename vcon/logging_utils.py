@@ -0,0 +1,200 @@
+"""
+Common logging configuration for the vcon package, its filter plugins and py_vcon_server.
+
+If a logging configuration file exists (./logging.conf or the path given in
+the VCON_LOGGING_CONFIG environment variable), it is loaded once, the first
+time a logger is built.  Otherwise the top level package logger (e.g. "vcon")
+gets a JSON formatted stream handler and each logger gets a level taken from
+the environment:
+
+  VCON_LOG_LEVEL - default level for all loggers (default: WARNING)
+  VCON_LOG_LEVELS - comma separated per logger overrides, e.g.:
+      "vcon.filter_plugins=INFO,vcon.filter_plugins.impl.whisper=DEBUG"
+    the override with the longest matching logger name prefix wins.
+  VCON_LOG_SAMPLE_EVERY - LogSampler rate for per item debug logs (default: 100)
+
+Messages should use lazy %-style arguments (e.g. logger.debug("dialog: %s", index))
+so that nothing is formatted when the level is not enabled.
+
+This module must not import vcon as it is used by vcon.filter_plugins
+while vcon is still being imported.
+"""
+import os
+import sys
+import typing
+import logging
+import logging.config
+import itertools
+import pythonjsonlogger.jsonlogger
+
+LOG_LEVEL_ENV = "VCON_LOG_LEVEL"
+LOG_LEVELS_ENV = "VCON_LOG_LEVELS"
+LOG_SAMPLE_EVERY_ENV = "VCON_LOG_SAMPLE_EVERY"
+LOGGING_CONFIG_ENV = "VCON_LOGGING_CONFIG"
+
+DEFAULT_LOG_LEVEL = "WARNING"
+DEFAULT_LOGGING_CONFIG_FILE = "./logging.conf"
+DEFAULT_LOG_FORMAT = "%(timestamp)s %(levelname)s %(message)s "
+DEFAULT_SAMPLE_EVERY = 100
+
+_config_file_loaded = False
+
+
+def logging_config_file() -> typing.Union[str, None]:
+  """ Returns the path to the logging configuration file or None if it does not exist """
+  log_config_filename = os.getenv(LOGGING_CONFIG_ENV, DEFAULT_LOGGING_CONFIG_FILE)
+  if(os.path.isfile(log_config_filename)):
+    return(log_config_filename)
+  return(None)
+
+
+def parse_log_levels(levels: str) -> typing.Dict[str, int]:
+  """
+  Parse logger level overrides.
+
+  Parameters:
+    levels (str) - comma separated list of logger_name=LEVEL
+
+  Returns:
+    dict of logger name: int level
+  """
+  overrides = {}
+  for token in levels.split(","):
+    token = token.strip()
+    if(token == ""):
+      continue
+    name_level = token.split("=")
+    if(len(name_level) != 2):
+      raise ValueError("Invalid {} token: {} should be logger_name=LEVEL".format(LOG_LEVELS_ENV, token))
+    overrides[name_level[0].strip()] = to_level(name_level[1])
+  return(overrides)
+
+
+def to_level(level: typing.Union[str, int]) -> int:
+  """ Convert a level name (e.g. "info") or number to the logging int level """
+  if(isinstance(level, int)):
+    return(level)
+  level = level.strip().upper()
+  if(level.isdigit()):
+    return(int(level))
+  int_level = logging.getLevelName(level)
+  if(not isinstance(int_level, int)):
+    raise ValueError("Invalid log level: {}".format(level))
+  return(int_level)
+
+
+def get_log_level(name: str, default_level: typing.Union[str, int, None] = None) -> int:
+  """
+  Get the level for the named logger from the environment.
+
+  Parameters:
+    name (str) - logger name
+    default_level (str or int) - level used if neither VCON_LOG_LEVELS nor
+      VCON_LOG_LEVEL apply.  None uses DEFAULT_LOG_LEVEL.
+
+  Returns:
+    int level
+  """
+  overrides = parse_log_levels(os.getenv(LOG_LEVELS_ENV, ""))
+  best_match = None
+  for logger_name in overrides.keys():
+    if(name == logger_name or name.startswith(logger_name + ".")):
+      if(best_match is None or len(logger_name) > len(best_match)):
+        best_match = logger_name
+  if(best_match is not None):
+    return(overrides[best_match])
+
+  if(default_level is None):
+    default_level = DEFAULT_LOG_LEVEL
+  return(to_level(os.getenv(LOG_LEVEL_ENV, default_level)))
+
+
+def build_logger(
+    name: str,
+    stream: typing.TextIO = None,
+    log_format: str = DEFAULT_LOG_FORMAT,
+    default_level: typing.Union[str, int, None] = None
+  ) -> logging.Logger:
+  """
+  Get the named logger, configured from the logging configuration file or
+  the environment.  Safe to call more than once for the same name.
+
+  Parameters:
+    name (str) - logger name, typically __name__
+    stream (TextIO) - stream for the handler, None uses stderr.
+      Output to stdout WILL BREAK the Vcon CLI.
+    log_format (str) - JsonFormatter format
+    default_level (str or int) - level if not set in the environment
+
+  Returns:
+    logging.Logger
+  """
+  global _config_file_loaded
+  logger = logging.getLogger(name)
+
+  log_config_filename = logging_config_file()
+  if(log_config_filename is not None):
+    if(not _config_file_loaded):
+      logging.config.fileConfig(log_config_filename, disable_existing_loggers = False)
+      _config_file_loaded = True
+    return(logger)
+
+  logger.setLevel(get_log_level(name, default_level))
+
+  # One handler on the top level package logger (e.g. "vcon") which the
+  # module loggers propagate to, so that each record is output only once.
+  package_logger = logging.getLogger(name.split(".")[0])
+  if(not any(getattr(handler, "_vcon_handler", False) for handler in package_logger.handlers)):
+    handler = logging.StreamHandler(sys.stderr if stream is None else stream)
+    handler._vcon_handler = True
+    formatter = pythonjsonlogger.jsonlogger.JsonFormatter(log_format, timestamp = True)
+    handler.setFormatter(formatter)
+    package_logger.addHandler(handler)
+
+  return(logger)
+
+
+class LogSampler():
+  """
+  Logs only the first and then every Nth message, for debug logs issued
+  once per item (e.g. per dialog or per segment).  The number of messages
+  seen is added to the logged message.
+
+  Example:
+    dialog_sampler = LogSampler(logger)
+    ...
+    dialog_sampler.debug("dialog[%d] type: %s", index, dialog["type"])
+  """
+  def __init__(self, logger: logging.Logger, every: typing.Union[int, None] = None):
+    """
+    Parameters:
+      logger (logging.Logger) - logger to sample messages to
+      every (int) - log every Nth message, None uses VCON_LOG_SAMPLE_EVERY or 100
+    """
+    if(every is None):
+      every = int(os.getenv(LOG_SAMPLE_EVERY_ENV, DEFAULT_SAMPLE_EVERY))
+    if(every < 1):
+      raise ValueError("LogSampler every must be >= 1")
+    self.logger = logger
+    self.every = every
+    self._counter = itertools.count()
+
+  def _log(self, stacklevel: int, level: int, msg: str, args: tuple) -> None:
+    # Level check first so that disabled logs cost as little as possible
+    if(not self.logger.isEnabledFor(level)):
+      return
+    count = next(self._counter)
+    if(count % self.every == 0):
+      # stacklevel so that the record has the caller's file and line number
+      self.logger.log(level, "(sampled 1/%d, #%d) " + msg, self.every, count + 1, *args,
+        stacklevel = stacklevel)
+
+  def log(self, level: int, msg: str, *args) -> None:
+    self._log(3, level, msg, args)
+
+  def debug(self, msg: str, *args) -> None:
+    self._log(3, logging.DEBUG, msg, args)
+
+  def info(self, msg: str, *args) -> None:
+    self._log(3, logging.INFO, msg, args)
+
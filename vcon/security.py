@@ -1,11 +1,22 @@
 
 import os
+import io
+import json
+import hmac
+import struct
 import typing
+import cryptography.exceptions
 import cryptography.hazmat.backends.openssl.backend
+import cryptography.hazmat.primitives.ciphers
+import cryptography.hazmat.primitives.hashes
+import cryptography.hazmat.primitives.hmac
+import cryptography.hazmat.primitives.padding
 import cryptography.x509
 #import re
 import base64
 import jose
+import jose.jwk
+import jose.utils
 import datetime
 import hsslms
 import hashlib
@@ -311,6 +322,336 @@ def jwe_complete_serialization_to_compact_token(jwe_complete_serialization : dic
 
   return(jwe_compact_token)
 
+# =============================== Streaming JWE Helper Functions ===========================
+#         JOSE JWE compact serialization (RFC7516) encrypted/decrypted in chunks
+
+# Default size of plaintext or cyphertext read or written at a time
+JWE_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# content encryption algorithms supported by the streaming functions
+# CEK size in bytes and IV size in bytes (RFC7518 section 5)
+_STREAM_CONTENT_ENCRYPTIONS = {
+  "A256CBC-HS512": (64, 16),
+  "A256GCM": (32, 12)
+  }
+
+class InvalidJweTag(Exception):
+  """ JWE authentication tag does not match the cyphertext """
+
+class _Base64urlStreamEncoder():
+  """ base64url encode bytes in chunks without padding, buffering partial 3 byte groups """
+  def __init__(self, out_handle):
+    self._out_handle = out_handle
+    self._remainder = b""
+
+  def write(self, data: bytes) -> None:
+    data = self._remainder + data
+    whole = len(data) - len(data) % 3
+    self._remainder = data[whole:]
+    if(whole > 0):
+      _write_ascii(self._out_handle, base64.urlsafe_b64encode(data[:whole]).rstrip(b"="))
+
+  def flush(self) -> None:
+    if(len(self._remainder) > 0):
+      _write_ascii(self._out_handle, base64.urlsafe_b64encode(self._remainder).rstrip(b"="))
+    self._remainder = b""
+
+def _write_ascii(handle, data: bytes) -> None:
+  """ write ASCII bytes to either a binary or text file handle """
+  if(isinstance(handle, io.TextIOBase)):
+    handle.write(data.decode("ascii"))
+  else:
+    handle.write(data)
+
+def _base64url_decode_chunk(data: bytes) -> bytes:
+  """ decode base64url bytes which may be missing padding """
+  return(base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4)))
+
+def _jwe_content_cipher(
+  enc: str,
+  cek: bytes,
+  iv: bytes,
+  aad: bytes,
+  encrypt: bool
+  ) -> typing.Tuple[typing.Any, typing.Any]:
+  """
+  Build the incremental content cipher and authenticator for the given JWE enc.
+
+  Returns:
+    Tuple(cipher context, hmac or None) - the HMAC is only used for CBC-HS
+  """
+  if(enc == "A256CBC-HS512"):
+    # RFC7518 5.2.2.1: first half of CEK is the MAC key, second half the encryption key
+    mac_key = cek[:32]
+    enc_key = cek[32:]
+    cipher = cryptography.hazmat.primitives.ciphers.Cipher(
+      cryptography.hazmat.primitives.ciphers.algorithms.AES(enc_key),
+      cryptography.hazmat.primitives.ciphers.modes.CBC(iv))
+    mac = cryptography.hazmat.primitives.hmac.HMAC(mac_key, cryptography.hazmat.primitives.hashes.SHA512())
+    mac.update(aad)
+    mac.update(iv)
+    context = cipher.encryptor() if encrypt else cipher.decryptor()
+    return(context, mac)
+
+  # A256GCM
+  cipher = cryptography.hazmat.primitives.ciphers.Cipher(
+    cryptography.hazmat.primitives.ciphers.algorithms.AES(cek),
+    cryptography.hazmat.primitives.ciphers.modes.GCM(iv))
+  context = cipher.encryptor() if encrypt else cipher.decryptor()
+  context.authenticate_additional_data(aad)
+  return(context, None)
+
+def _cbc_hs512_tag(mac, aad: bytes) -> bytes:
+  """ finish the CBC-HS512 authentication tag: HMAC(... || AL) truncated to 32 bytes """
+  mac.update(struct.pack(">Q", len(aad) * 8))
+  return(mac.finalize()[:32])
+
+def jwe_encrypt_chunks(
+  plaintext_chunks: typing.Iterable[bytes],
+  token_handle: typing.Union[typing.BinaryIO, typing.TextIO],
+  encryption_key: dict,
+  enc: str = "A256CBC-HS512"
+  ) -> None:
+  """
+  Encrypt the plaintext provided as a sequence of chunks and write the JWE
+  compact serialization token to the given file handle.
+
+  Only one chunk of plaintext and cyphertext is held in memory at a time.
+  The token written is the same form as that generated by
+  **jwe_complete_serialization_to_compact_token** and can be decrypted
+  with **jose.jwe.decrypt** or **jwe_decrypt_stream**.
+
+  Parameters:
+    plaintext_chunks (Iterable[bytes]) - plaintext to encrypt
+    token_handle (BinaryIO, TextIO) - file handle to write the compact JWE token to
+    encryption_key (dict) - JWK for the recipient (e.g. from **build_encryption_jwk_from_pem_file**)
+    enc (str) - content encryption algorithm "A256CBC-HS512" or "A256GCM"
+
+  Returns: none
+  """
+  if(enc not in _STREAM_CONTENT_ENCRYPTIONS):
+    raise AttributeError("streaming JWE enc: {} not supported.  Must be one of: {}".format(
+      enc,
+      list(_STREAM_CONTENT_ENCRYPTIONS.keys())
+      ))
+
+  cek_size, iv_size = _STREAM_CONTENT_ENCRYPTIONS[enc]
+  cek = os.urandom(cek_size)
+  iv = os.urandom(iv_size)
+
+  algorithm = encryption_key["alg"]
+  header = {"alg": algorithm, "enc": enc}
+  if("kid" in encryption_key):
+    header["kid"] = encryption_key["kid"]
+  protected = jose.utils.base64url_encode(
+    json.dumps(header, separators = (",", ":"), sort_keys = True).encode("utf-8"))
+
+  encrypted_key = jose.jwk.construct(encryption_key, algorithm).wrap_key(cek)
+
+  # The protected header is the additional authenticated data (RFC7516 5.1 step 14)
+  aad = protected
+  context, mac = _jwe_content_cipher(enc, cek, iv, aad, True)
+  padder = None
+  if(mac is not None):
+    padder = cryptography.hazmat.primitives.padding.PKCS7(128).padder()
+
+  _write_ascii(token_handle, protected + b".")
+  _write_ascii(token_handle, jose.utils.base64url_encode(encrypted_key) + b".")
+  _write_ascii(token_handle, jose.utils.base64url_encode(iv) + b".")
+
+  encoder = _Base64urlStreamEncoder(token_handle)
+  for chunk in plaintext_chunks:
+    if(padder is not None):
+      chunk = padder.update(chunk)
+    cyphertext = context.update(chunk)
+    if(mac is not None):
+      mac.update(cyphertext)
+    encoder.write(cyphertext)
+
+  if(padder is not None):
+    cyphertext = context.update(padder.finalize()) + context.finalize()
+    mac.update(cyphertext)
+    encoder.write(cyphertext)
+    tag = _cbc_hs512_tag(mac, aad)
+  else:
+    encoder.write(context.finalize())
+    tag = context.tag
+  encoder.flush()
+
+  _write_ascii(token_handle, b"." + jose.utils.base64url_encode(tag))
+
+def jwe_encrypt_stream(
+  plaintext_handle: typing.BinaryIO,
+  token_handle: typing.Union[typing.BinaryIO, typing.TextIO],
+  encryption_key: dict,
+  enc: str = "A256CBC-HS512",
+  chunk_size: int = JWE_STREAM_CHUNK_SIZE
+  ) -> None:
+  """
+  Encrypt the plaintext read from the given binary file handle and write
+  the JWE compact serialization token to the token file handle.
+  See **jwe_encrypt_chunks** for details.
+
+  Parameters:
+    plaintext_handle (BinaryIO) - file handle to read the plaintext from
+    token_handle (BinaryIO, TextIO) - file handle to write the compact JWE token to
+    encryption_key (dict) - JWK for the recipient (e.g. from **build_encryption_jwk_from_pem_file**)
+    enc (str) - content encryption algorithm "A256CBC-HS512" or "A256GCM"
+    chunk_size (int) - number of plaintext bytes to read at a time
+
+  Returns: none
+  """
+  jwe_encrypt_chunks(
+    iter(lambda: plaintext_handle.read(chunk_size), b""),
+    token_handle,
+    encryption_key,
+    enc
+    )
+
+def jws_complete_serialization_chunks(
+  jws_dict: dict,
+  chunk_size: int = JWE_STREAM_CHUNK_SIZE
+  ) -> typing.Iterator[bytes]:
+  """
+  Generate the JSON serialization of a JWS complete serialization in chunks.
+  The payload, which contains the whole signed content base64url encoded,
+  is sliced rather than copied into one large JSON string.
+
+  Parameters:
+    jws_dict (dict) - JWS complete serialization (payload and signatures)
+    chunk_size (int) - maximum number of payload characters per chunk
+
+  Returns:
+    Iterator of UTF-8 encoded JSON chunks
+  """
+  payload = jws_dict.get("payload")
+  if(not isinstance(payload, str)):
+    yield(json.dumps(jws_dict).encode("utf-8"))
+    return
+
+  # base64url payload needs no JSON escaping
+  yield(b'{"payload": "')
+  for start in range(0, len(payload), chunk_size):
+    yield(payload[start:start + chunk_size].encode("ascii"))
+  yield(b'"')
+
+  for key, value in jws_dict.items():
+    if(key != "payload"):
+      yield(", {}: {}".format(json.dumps(key), json.dumps(value)).encode("utf-8"))
+  yield(b"}")
+
+def _read_token_part(token_handle, buffer: bytes, chunk_size: int) -> typing.Tuple[bytes, bytes]:
+  """ read up to the next "." separator in the token, returning the part and the remaining buffer """
+  while(buffer.find(b".") == -1):
+    data = token_handle.read(chunk_size)
+    if(isinstance(data, str)):
+      data = data.encode("ascii")
+    if(len(data) == 0):
+      raise AttributeError("JWE compact token truncated, expected 5 dot separated parts")
+    buffer += data
+
+  part, buffer = buffer.split(b".", 1)
+  return(part, buffer)
+
+def jwe_decrypt_stream(
+  token_handle: typing.Union[typing.BinaryIO, typing.TextIO],
+  plaintext_handle: typing.BinaryIO,
+  private_key: dict,
+  chunk_size: int = JWE_STREAM_CHUNK_SIZE
+  ) -> None:
+  """
+  Decrypt a JWE compact serialization token read from the given file handle
+  and write the plaintext to the given binary file handle.
+
+  The cyphertext is decoded and decrypted in chunks, so only one chunk is
+  held in memory at a time.  The authentication tag is at the end of the
+  token, so the plaintext is written before it is authenticated.  If
+  **InvalidJweTag** is raised, the content written to **plaintext_handle**
+  MUST be discarded.
+
+  Parameters:
+    token_handle (BinaryIO, TextIO) - file handle to read the compact JWE token from
+    plaintext_handle (BinaryIO) - file handle to write the decrypted plaintext to
+    private_key (dict) - JWK containing the private key of the recipient
+      (e.g. from **build_signing_jwk_from_pem_files**)
+    chunk_size (int) - number of token bytes to read at a time
+
+  Returns: none
+
+  Raises InvalidJweTag if the authentication tag does not verify.
+  """
+  buffer = b""
+  protected, buffer = _read_token_part(token_handle, buffer, chunk_size)
+  encrypted_key, buffer = _read_token_part(token_handle, buffer, chunk_size)
+  iv_b64, buffer = _read_token_part(token_handle, buffer, chunk_size)
+
+  header = json.loads(_base64url_decode_chunk(protected))
+  enc = header.get("enc")
+  if(enc not in _STREAM_CONTENT_ENCRYPTIONS):
+    raise AttributeError("streaming JWE enc: {} not supported.  Must be one of: {}".format(
+      enc,
+      list(_STREAM_CONTENT_ENCRYPTIONS.keys())
+      ))
+
+  cek = jose.jwk.construct(private_key, header["alg"]).unwrap_key(_base64url_decode_chunk(encrypted_key))
+  iv = _base64url_decode_chunk(iv_b64)
+  aad = protected
+  context, mac = _jwe_content_cipher(enc, cek, iv, aad, False)
+  unpadder = None
+  if(mac is not None):
+    unpadder = cryptography.hazmat.primitives.padding.PKCS7(128).unpadder()
+
+  # Decode the cyphertext in multiples of 4 base64url characters until the
+  # separator before the tag is found
+  tag_b64 = None
+  while(tag_b64 is None):
+    separator = buffer.find(b".")
+    if(separator != -1):
+      encoded = buffer[:separator]
+      tag_b64 = buffer[separator + 1:]
+      buffer = b""
+    else:
+      data = token_handle.read(chunk_size)
+      if(isinstance(data, str)):
+        data = data.encode("ascii")
+      if(len(data) == 0):
+        raise AttributeError("JWE compact token truncated, expected 5 dot separated parts")
+      buffer += data
+      whole = len(buffer) - len(buffer) % 4
+      # leave the last group in the buffer in case the separator follows it
+      if(whole > 0 and buffer.find(b".") == -1):
+        encoded = buffer[:whole]
+        buffer = buffer[whole:]
+      else:
+        continue
+
+    cyphertext = _base64url_decode_chunk(encoded)
+    if(mac is not None):
+      mac.update(cyphertext)
+    plaintext = context.update(cyphertext)
+    if(unpadder is not None):
+      plaintext = unpadder.update(plaintext)
+    plaintext_handle.write(plaintext)
+
+  # rest of the token is the tag
+  rest = token_handle.read()
+  if(isinstance(rest, str)):
+    rest = rest.encode("ascii")
+  tag = _base64url_decode_chunk((tag_b64 + rest).strip())
+
+  if(mac is not None):
+    plaintext = context.finalize()
+    expected_tag = _cbc_hs512_tag(mac, aad)
+    if(not hmac.compare_digest(expected_tag, tag)):
+      raise InvalidJweTag("JWE authentication tag does not match cyphertext")
+    plaintext_handle.write(unpadder.update(plaintext) + unpadder.finalize())
+
+  else:
+    try:
+      plaintext_handle.write(context.finalize_with_tag(tag))
+    except cryptography.exceptions.InvalidTag as tag_error:
+      raise InvalidJweTag("JWE authentication tag does not match cyphertext") from tag_error
+
 # =============================== SHA-512 Hash Helper Functions ===========================
 #                            SHA-512 Hash (RFC6234)
 
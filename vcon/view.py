@@ -0,0 +1,285 @@
+""" Lightweight read only views of vCon data """
+import typing
+import copy
+import json
+import collections.abc
+import pyjq
+import vcon
+
+
+class ReadOnlyDict(collections.abc.Mapping):
+  """
+  Read only proxy to a dict in vCon data.
+
+  The wrapped dict is shared, not copied.  Nested dicts and lists are
+  wrapped in read only proxies as they are accessed.
+  """
+  __slots__ = ("_data",)
+
+  def __init__(self, data: dict):
+    self._data = data
+
+  def __getitem__(self, key):
+    return(_read_only(self._data[key]))
+
+  def __iter__(self):
+    return(iter(self._data))
+
+  def __len__(self):
+    return(len(self._data))
+
+  def __contains__(self, key):
+    return(key in self._data)
+
+  def __eq__(self, other):
+    if(isinstance(other, (ReadOnlyDict, ReadOnlyList))):
+      other = other._data
+    return(self._data == other)
+
+  __hash__ = None
+
+  def __repr__(self):
+    return("ReadOnlyDict({!r})".format(self._data))
+
+  def copy(self) -> dict:
+    """ Returns a mutable deep copy of the wrapped dict """
+    return(copy.deepcopy(self._data))
+
+
+class ReadOnlyList(collections.abc.Sequence):
+  """
+  Read only proxy to a list in vCon data.
+
+  The wrapped list is shared, not copied.  Nested dicts and lists are
+  wrapped in read only proxies as they are accessed.
+  """
+  __slots__ = ("_data",)
+
+  def __init__(self, data: list):
+    self._data = data
+
+  def __getitem__(self, index):
+    if(isinstance(index, slice)):
+      return(ReadOnlyList(self._data[index]))
+    return(_read_only(self._data[index]))
+
+  def __len__(self):
+    return(len(self._data))
+
+  def __eq__(self, other):
+    if(isinstance(other, (ReadOnlyDict, ReadOnlyList))):
+      other = other._data
+    return(self._data == other)
+
+  __hash__ = None
+
+  def __repr__(self):
+    return("ReadOnlyList({!r})".format(self._data))
+
+  def copy(self) -> list:
+    """ Returns a mutable deep copy of the wrapped list """
+    return(copy.deepcopy(self._data))
+
+
+def _read_only(value: typing.Any) -> typing.Any:
+  """ wrap containers in read only proxies, scalars are immutable already """
+  if(isinstance(value, dict)):
+    return(ReadOnlyDict(value))
+  if(isinstance(value, list)):
+    return(ReadOnlyList(value))
+  return(value)
+
+
+class VconViewAttribute:
+  """ descriptor for read only top level vCon attributes in VconView """
+  def __init__(self, name: str, doc: typing.Union[str, None] = None):
+    self.name = name
+    if(doc is not None):
+      self.__doc__ = doc
+
+  def __get__(self, instance_object, class_type = None):
+    if(instance_object is None):
+      return(self)
+
+    return(_read_only(instance_object._vcon_dict.get(self.name, None)))
+
+  def __set__(self, instance_object, value) -> None:
+    raise AttributeError("not allowed to set {} on read only VconView".format(self.name))
+
+
+class VconView:
+  """
+  Immutable, read only view of the data in an unsigned or verified vCon.
+
+  A VconView shares the underlying vCon dict rather than copying it, so it
+  is cheap to create for read only consumers such as jq queries, transcript
+  accessors and API responses.  Containers are returned as ReadOnlyDict and
+  ReadOnlyList proxies.  A view of an UNSIGNED Vcon reflects subsequent
+  modifications made to that Vcon.
+
+  Use Vcon.view to get a view of a Vcon or VconView.loads/VconView.loadd to
+  create one directly from unsigned vCon JSON without building a Vcon.
+  """
+  __slots__ = ("_vcon_dict",)
+
+  vcon = VconViewAttribute("vcon", doc = "vCon version string attribute")
+  uuid = VconViewAttribute("uuid", doc = "vCon UUID string attribute")
+  created_at = VconViewAttribute("created_at", doc = "vCon creation date string attribute")
+  subject = VconViewAttribute("subject", doc = "vCon subject string attribute")
+  redacted = VconViewAttribute("redacted", doc = "redacted Dict")
+  appended = VconViewAttribute("appended", doc = "appended Dict")
+  group = VconViewAttribute("group", doc = "List of Dicts referencing or including other vCons")
+  parties = VconViewAttribute("parties", doc = "List of Dicts, one for each party to this conversation")
+  dialog = VconViewAttribute("dialog", doc = "List of Dicts for the dialog segments of this conversation")
+  analysis = VconViewAttribute("analysis", doc = "List of Dicts of analysis data for this conversation")
+  attachments = VconViewAttribute("attachments", doc = "List of Dicts of ancillary documents to this conversation")
+
+  def __init__(self, vcon_dict: dict):
+    """
+    Constructor
+
+    Parameters:
+      vcon_dict (dict) - unsigned vCon dict to be viewed.  This dict is shared,
+        not copied, and must not be modified through other references while
+        the view is in use.
+    """
+    object.__setattr__(self, "_vcon_dict", vcon_dict)
+
+  def __setattr__(self, name, value):
+    raise AttributeError("VconView is read only, cannot set: {}".format(name))
+
+  def __delattr__(self, name):
+    raise AttributeError("VconView is read only, cannot delete: {}".format(name))
+
+  def __repr__(self):
+    return("VconView(uuid={!r})".format(self._vcon_dict.get("uuid", None)))
+
+  @staticmethod
+  def loadd(vcon_dict: dict) -> "VconView":
+    """
+    Create a view from an unsigned vCon dict, migrating older forms as
+    Vcon.loadd does.  The dict may be modified in place by the migration.
+
+    Parameters:
+      vcon_dict (dict) - unsigned vCon in dict form
+
+    Returns:
+      VconView of the vCon data
+    """
+    if(("payload" in vcon_dict) and ("signatures" in vcon_dict)):
+      raise vcon.UnverifiedVcon("vCon is signed.  Load into a Vcon and verify it before viewing.")
+
+    if(("cyphertext" in vcon_dict) and ("recipients" in vcon_dict)):
+      raise vcon.UnverifiedVcon("vCon is encrypted.  Load into a Vcon, decrypt and verify it before viewing.")
+
+    if(vcon.Vcon.VCON_VERSION not in vcon_dict or not (
+      vcon.Vcon.PARTIES in vcon_dict or
+      vcon.Vcon.DIALOG in vcon_dict or
+      vcon.Vcon.ANALYSIS in vcon_dict or
+      vcon.Vcon.ATTACHMENTS in vcon_dict
+      )):
+      raise vcon.InvalidVconJson("Not recognized as unsigned form of JSON vCon.")
+
+    version_string = vcon_dict.get(vcon.Vcon.VCON_VERSION, "not set")
+    if(version_string != "0.0.1"):
+      raise vcon.UnsupportedVconVersion("JSON vcon version: \"{}\" not supported".format(version_string))
+
+    return(VconView(vcon.Vcon.migrate_0_0_1_vcon(vcon_dict)))
+
+  @staticmethod
+  def loads(vcon_json: typing.Union[str, bytes]) -> "VconView":
+    """
+    Create a view from unsigned vCon JSON.
+
+    Parameters:
+      vcon_json (str) - unsigned vCon JSON
+
+    Returns:
+      VconView of the vCon data
+    """
+    return(VconView.loadd(json.loads(vcon_json)))
+
+  def dumpd(self, deepcopy: bool = True) -> dict:
+    """
+    Dump the viewed vCon as a dict.
+
+    Parameters:
+      deepcopy (bool) - True (default) returns a mutable copy, False returns
+        the shared underlying dict which MUST NOT be modified.
+
+    Returns:
+      dict containing the JSON representation of the vCon
+    """
+    if(deepcopy):
+      return(copy.deepcopy(self._vcon_dict))
+
+    return(self._vcon_dict)
+
+  def dumps(self, indent: typing.Union[int, None] = None, **dumps_options) -> str:
+    """
+    Dump the viewed vCon as a JSON string.
+
+    Parameters:
+      indent (int) - passed through to json.dumps
+      dumps_options - additional json.dumps options
+
+    Returns:
+      JSON string representation of the vCon
+    """
+    return(json.dumps(self._vcon_dict, indent = indent, **dumps_options))
+
+  def jq(
+    self,
+    query: typing.Union[str, typing.Dict[str, str]]
+    ) -> typing.Union[typing.List[typing.Any], typing.Dict[str, typing.Any]]:
+    """
+    Perform jq style queries on the viewed vCon without copying it.
+    See Vcon.jq for query and result forms.
+    """
+    if(isinstance(query, str)):
+      return(pyjq.all(query, self._vcon_dict))
+
+    results = {}
+    for query_name, query_string in query.items():
+      results[query_name] = pyjq.all(query_string, self._vcon_dict)[0]
+
+    return(results)
+
+  def find_transcript_for_dialog(
+    self,
+    dialog_index: int,
+    transcript_accessor_exists: bool = True,
+    transcript_accessors: typing.Union[typing.List[typing.Tuple[str, str, str]], None] = None
+    ) -> typing.Union[int, None]:
+    """
+    Find the index to the transcript analysis for the indicated dialog.
+    See Vcon.find_transcript_for_dialog.
+    """
+    return(vcon.Vcon.find_transcript_for_dialog(self, dialog_index,
+      transcript_accessor_exists, transcript_accessors))
+
+  def get_transcript_text(self, dialog_index: int) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    Get the text from an existing transcript for the indicated recording dialog.
+    Unlike Vcon.get_dialog_text, this never generates a transcript.
+
+    Parameters:
+      dialog_index (int) - index to a recording dialog
+
+    Returns:
+      list of text dicts as returned by the TranscriptAccessor, empty if no
+      transcript with a registered accessor was found.
+    """
+    transcript_index = self.find_transcript_for_dialog(dialog_index)
+    if(transcript_index is None):
+      return([])
+
+    analysis = self._vcon_dict[vcon.Vcon.ANALYSIS][transcript_index]
+    accessor_class = vcon.accessors.transcript_accessors[(
+      analysis["vendor"].lower(),
+      analysis["product"].lower(),
+      analysis["schema"].lower(),
+      )]
+    accessor = accessor_class(self._vcon_dict[vcon.Vcon.DIALOG][dialog_index], analysis)
+    return(accessor.get_text())
+